@@ -0,0 +1,289 @@
+/*
+ * Preparación de datos del informe — sin DOM, compartida por js/informe.js y
+ * js/informe-worker.js.
+ *
+ * Todo lo que aquí se arma (filas de las tablas de resumen, matriz y
+ * tooltips del heatmap) es trabajo proporcional a laboratorios × analitos que
+ * antes corría en el hilo principal justo cuando la página tiene que responder
+ * al primer scroll. informe.js lo encarga a un Web Worker y, si el navegador no
+ * lo ofrece, llama a estas mismas funciones en el hilo principal: por eso no
+ * pueden tocar `document` ni `window`.
+ *
+ * La REGLA de informe.js vale igual aquí: no se calculan métricas. Solo se
+ * reordenan y se rotulan los números que ya trae el JSON.
+ */
+
+// Nombres de las clasificaciones A/C/I según el modelo. En el modelo CLIA
+// (aptitud al uso) se usan los términos de PROASECAL/ESfEQA; en el de consenso,
+// la nomenclatura del z-score de ISO 13528. El consenso queda EXACTAMENTE igual.
+function etiquetas(modelo) {
+    const clia = modelo === 'clia';
+    return {
+        Ap:     clia ? 'Satisfactorios'    : 'Aceptables',
+        Cp:     clia ? 'Alertas'           : 'Cuestionables',
+        Ip:     clia ? 'No satisfactorios' : 'Inaceptables',
+        A:      clia ? 'Satisfactorio'     : 'Aceptable',
+        C:      clia ? 'Alerta'            : 'Cuestionable',
+        I:      clia ? 'No satisfactorio'  : 'Inaceptable',
+        conf:   clia ? 'Satisfactorios'    : 'Conformes',
+        noconf: clia ? 'No satisfactorios' : 'No conformes',
+    };
+}
+
+// ── Evaluación por grupo de pares ─────────────────────────────────────
+// Cuando dos plataformas analíticas no son comparables entre sí, cada una
+// recibe su propio valor asignado (ISO 13528 §7). Un grupo demasiado
+// pequeño no da estadística defendible: esos laboratorios se reportan sin
+// evaluar en vez de anexarlos al grupo más parecido, que sería incorrecto.
+function esPorPares(a) {
+    return a.evaluacion === 'grupo_pares';
+}
+
+// Analito publicado sin calificación de desempeño, por decisión del proveedor
+// (data/config.json → decisiones_evaluacion.<ronda>.<area>.sin_evaluar). No
+// trae valor asignado y todos sus resultados vienen como 'NE'. Se dibuja en
+// gris y sin la banda de aceptación: el color de estado y el z-score
+// afirmarían una conformidad que la ronda declara que no puede sostener.
+function esNoEvaluado(a) {
+    return a.evaluacion === 'no_evaluada';
+}
+
+// Paleta por grupo. Es identidad, no estado: nunca los colores A/C/I.
+const COLOR_GRUPO = ['#1f4e9c', '#c77f0a', '#00857a', '#7b4ea3'];
+
+function colorGrupo(a, nombre) {
+    const evs = a.grupos.filter(g => g.evaluado).map(g => g.nombre);
+    return COLOR_GRUPO[evs.indexOf(nombre) % COLOR_GRUPO.length];
+}
+
+// ── Tabla por laboratorio ────────────────────────────────────────────────
+// Adapta la consolidación ya calculada en Python al formato que usa la
+// tabla. La exclusión de analitos no concluyentes y el criterio de que
+// 'NE' no cuenta ya vienen aplicados desde consolidar_por_laboratorio().
+// Los excluidos viajan como nombre + motivo, no como la ficha entera: es lo
+// único que la nota necesita y lo que cruza del worker a la página.
+function consolidarPorLab(data) {
+    const g = data.desempeno_global || {};
+    const filas = (g.por_laboratorio || []).map(r => ({
+        id: r.id, a: r.A, c: r.C, i: r.I, n: r.n, pct: r.pct_conformidad
+    }));
+    const excluidosNombres = g.analitos_excluidos || [];
+    const excluidos = data.analitos
+        .filter(a => excluidosNombres.includes(a.nombre))
+        .map(a => ({ nombre: a.nombre, noEvaluado: esNoEvaluado(a) }));
+    const usables = data.analitos.length - excluidos.length;
+    return { filas, usables, excluidos };
+}
+
+// ── Tabla resumen por analito ────────────────────────────────────────────
+// Devuelve el cuerpo completo de la tabla: la página lo asigna de una vez en
+// lugar de reanalizar el <tbody> entero con cada fila.
+function filasResumen(analitos) {
+    const filas = [];
+    analitos.forEach(a => {
+        const { A: countA, C: countC, I: countI } = a.conteos;
+
+        // Un analito por grupo de pares ocupa una fila por grupo: no tiene un
+        // X* único, y mostrar un promedio de ambos no describiría a ninguno.
+        if (esPorPares(a)) {
+            const evs = a.grupos.filter(g => g.evaluado);
+            evs.forEach((g, k) => {
+                const { A: cA, C: cC, I: cI } = g.conteos;
+                const cvClass = g.cv > 30 ? 'cv-critical' : (g.cv > 15 ? 'cv-high' : '');
+                filas.push(`
+                <tr>
+                    <td>${k === 0 ? `<strong>${a.nombre}</strong>` : ''}
+                        <div class="sub-grupo"><span class="punto-grupo"
+                            style="background:${colorGrupo(a, g.nombre)}"></span>${g.nombre}</div></td>
+                    <td>${g.n}</td>
+                    <td>${g.valor_asignado} ${a.unidad}</td>
+                    <td>${g.sd_robusta} ${a.unidad}</td>
+                    <td class="${cvClass}">${g.cv}%</td>
+                    <td>${cA}</td><td>${cC}</td><td>${cI}</td>
+                </tr>`);
+            });
+            a.grupos.filter(g => !g.evaluado).forEach(g => {
+                filas.push(`
+                <tr>
+                    <td><div class="sub-grupo"><span class="punto-grupo"
+                        style="background:#9aa3b2"></span>${g.nombre}</div></td>
+                    <td>${g.n}</td>
+                    <td colspan="6" class="sin-eval">Sin evaluar — ${g.motivo}</td>
+                </tr>`);
+            });
+            return;
+        }
+
+        // Un analito no evaluado no tiene X* ni σ*: la fila lo dice en vez de
+        // dejar celdas con 'null', y no muestra conteos A/C/I porque no los hay.
+        if (esNoEvaluado(a)) {
+            const ref = a.referencia_descriptiva || {};
+            filas.push(`
+            <tr class="fila-no-evaluada">
+                <td><strong>${a.nombre}</strong></td>
+                <td>${a.n}</td>
+                <td colspan="6" class="sin-eval">Sin evaluación de desempeño —
+                    mediana ${ref.mediana} ${a.unidad} (referencia descriptiva)</td>
+            </tr>`);
+            return;
+        }
+
+        let cvClass = '';
+        if (a.cv > 30) cvClass = 'cv-critical';
+        else if (a.cv > 15) cvClass = 'cv-high';
+
+        filas.push(`
+        <tr>
+            <td><strong>${a.nombre}</strong></td>
+            <td>${a.n}</td>
+            <td>${a.valor_asignado} ${a.unidad}</td>
+            <td>${a.sd_robusta} ${a.unidad}</td>
+            <td class="${cvClass}">${a.cv}%</td>
+            <td>${countA}</td>
+            <td>${countC}</td>
+            <td>${countI}</td>
+        </tr>
+    `);
+    });
+    return filas.join('');
+}
+
+// Cadena vacía si ningún analito supera el 15%: la página deja el bloque vacío.
+function alertasCV(analitos) {
+    const highCV = analitos.filter(a => !esPorPares(a) && !esNoEvaluado(a) && a.cv > 15)
+        .sort((a, b) => b.cv - a.cv);
+    if (highCV.length === 0) return '';
+
+    let html = '<h3 style="color: var(--primary-color); margin-bottom: 1rem;">⚠️ Alertas de Coeficiente de Variación</h3>';
+    highCV.forEach(a => {
+        const isVeryHigh = a.cv > 30;
+        const cls = isVeryHigh ? 'alert-danger' : 'alert-warning';
+        const icon = isVeryHigh ? '🔴' : '⚠️';
+        const nivel = isVeryHigh ? 'MUY ALTO' : 'ALTO';
+
+        html += `<div class="alert-box ${cls}">
+        ${icon} <strong>${a.nombre}</strong> — CV = ${a.cv}% (${nivel}).
+        σ* = ${a.sd_robusta} ${a.unidad} sobre X* = ${a.valor_asignado} ${a.unidad}.
+        Un CV elevado indica alta dispersión entre laboratorios.
+    </div>`;
+    });
+    return html;
+}
+
+// ── Heatmap ──────────────────────────────────────────────────────────────
+// Una celda gris tiene tres causas distintas y el tooltip debe distinguirlas:
+// el laboratorio no reportó, su grupo de pares era insuficiente, o el analito
+// entero se publicó sin calificar. Sin esto, un analito no evaluado se leería
+// como "no participó".
+function hoverSinZ(id, a, resultado) {
+    if (resultado === undefined) return `${id}<br>${a.nombre}<br>No participó`;
+    return esNoEvaluado(a)
+        ? `${id}<br>${a.nombre}<br>Resultado: ${resultado} ${a.unidad}<br>Analito sin evaluación de desempeño`
+        : `${id}<br>${a.nombre}<br>Resultado: ${resultado} ${a.unidad}<br>Sin evaluar (grupo de pares insuficiente)`;
+}
+
+function hoverConZ(LB, id, a, z, resultado, clasificacion) {
+    const clasif = clasificacion === 'A' ? LB.A : clasificacion === 'C' ? LB.C : LB.I;
+    return `${id}<br>${a.nombre}<br>Z-Score: ${z.toFixed(2)}<br>Resultado: ${resultado} ${a.unidad}<br>${clasif}`;
+}
+
+// Matriz ya armada en Python (calcular_zscore.matriz_heatmap) y auditada por
+// validar_informe.py; el PDF dibuja la misma. No hace falta tener los
+// resultados de cada analito, que con índice aún no se han pedido.
+function celdasDesdeBloque(data) {
+    const h = data.heatmap;
+    return {
+        labIds: h.laboratorios,
+        estado: h.estado,
+        z: h.z,
+        resultado: h.resultado,
+        // El z de color viene recortado; el tooltip muestra el publicado.
+        reales: Object.fromEntries(h.z_recortado.map(([i, j, z]) => [`${i},${j}`, z])),
+    };
+}
+
+// JSON sin bloque heatmap (rondas anteriores a matriz_heatmap): se arma desde
+// analitos[] con la misma forma que el bloque.
+function celdasDesdeAnalitos(data) {
+    const CLAMP = 5;
+    const allLabIds = new Set();
+    data.analitos.forEach(a => a.laboratorios.forEach(l => allLabIds.add(l.id)));
+    // Orden lexicográfico. Coincide con el numérico porque el identificador viene
+    // con relleno fijo desde Python (L-001 … L-146); sin relleno daría L-1, L-10, L-2.
+    const labIds = [...allLabIds].sort();
+
+    // Each row = one analyte, each col = one lab
+    const estado = [], z = [], resultado = [], reales = {};
+    data.analitos.forEach((a, i) => {
+        const labMap = {};
+        a.laboratorios.forEach(l => { labMap[l.id] = l; });
+
+        let fila = '';
+        const zFila = [], rFila = [];
+        labIds.forEach((id, j) => {
+            const l = labMap[id];
+            if (l && l.z_score !== null) {
+                fila += l.clasificacion;
+                zFila.push(Math.max(-CLAMP, Math.min(CLAMP, l.z_score)));
+                if (Math.abs(l.z_score) > CLAMP) reales[`${i},${j}`] = l.z_score;
+            } else {
+                fila += l ? 'N' : '.';
+                zFila.push(null);
+            }
+            rFila.push(l ? l.resultado : null);
+        });
+        estado.push(fila);
+        z.push(zFila);
+        resultado.push(rFila);
+    });
+    return { labIds, estado, z, resultado, reales };
+}
+
+// Tooltip de una celda, armado a partir de la matriz. El modo normal lo llama
+// para todas las celdas de antemano; el de matriz grande, solo para la celda
+// bajo el cursor.
+function hoverCelda(m, LB, i, j) {
+    const id = m.labIds[j];
+    const a = m.fichas[i];
+    const e = m.estado[i][j];
+    if (e === '.') return hoverSinZ(id, a, undefined);
+    const resultado = m.resultado[i][j];
+    if (m.z[i][j] === null) return hoverSinZ(id, a, resultado);
+    const z = m.reales[`${i},${j}`] ?? m.z[i][j];
+    return hoverConZ(LB, id, a, z, resultado, e);
+}
+
+// Por encima de `celdasMax` celdas la página dibuja en canvas (ver
+// renderHeatmapLienzo en informe.js): no se arma la matriz de tooltips, que
+// sería una cadena por celda, y se envían las piezas para generarlos al vuelo.
+function matrizHeatmap(data, LB, celdasMax) {
+    const m = data.heatmap ? celdasDesdeBloque(data) : celdasDesdeAnalitos(data);
+    // Solo lo que los tooltips leen de cada analito.
+    m.fichas = data.analitos.map(a => ({
+        nombre: a.nombre, unidad: a.unidad, evaluacion: a.evaluacion
+    }));
+    // Analyte names (Y axis). El analito sin calificar se rotula como tal: su
+    // fila queda toda en gris y, sin la marca, se confundiría con laboratorios
+    // que no participaron.
+    m.analyteNames = data.analitos.map(a =>
+        esNoEvaluado(a) ? `${a.nombre} (no evaluado)` : a.nombre);
+    m.zMatrix = m.z;
+    m.grande = m.estado.length * m.labIds.length > celdasMax;
+    if (!m.grande) {
+        m.hoverMatrix = m.estado.map((fila, i) =>
+            m.labIds.map((_, j) => hoverCelda(m, LB, i, j)));
+    }
+    return m;
+}
+
+// Todo lo que la página necesita para las tablas y el heatmap, en un solo
+// objeto clonable: es el mensaje que devuelve el worker.
+function prepararInforme(data, modelo, celdasMax = Infinity) {
+    const LB = etiquetas(modelo);
+    return {
+        labs: consolidarPorLab(data),
+        resumen: filasResumen(data.analitos),
+        alertas: alertasCV(data.analitos),
+        heatmap: matrizHeatmap(data, LB, celdasMax),
+    };
+}
@@ -0,0 +1,17 @@
+/*
+ * Hilo de fondo del informe. Recibe el documento de la ronda (índice o JSON
+ * completo) y devuelve las tablas y la matriz del heatmap ya armadas, para que
+ * el hilo principal solo tenga que asignarlas al DOM y llamar a Plotly.
+ *
+ * Mensaje de entrada: { data, modelo, celdasMax }. Respuesta:
+ * prepararInforme(data, modelo, celdasMax)
+ * — ver js/informe-datos.js, que es también lo que corre informe.js cuando el
+ * navegador no ofrece Worker.
+ */
+
+importScripts('informe-datos.js');
+
+self.onmessage = e => {
+    const { data, modelo, celdasMax } = e.data;
+    self.postMessage(prepararInforme(data, modelo, celdasMax));
+};
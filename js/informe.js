@@ -16,32 +16,34 @@
  * qué barras se rotulan, colores. Si hace falta una cifra nueva, se agrega al
  * JSON, no aquí. Ver CLAUDE.md → "Todas las métricas se calculan en Python".
  *
- * Requiere Plotly y css/informe.css.
+ * Requiere Plotly, js/informe-datos.js (cargado antes que este archivo) y
+ * css/informe.css.
  */
 
 const CFG = Object.assign({
     codigo: '',
     area: 'quimica',
     json: '',
+    // Índice de la ronda (calcular_zscore.escribir_fragmentos). Con él la
+    // página dibuja la portada sin descargar los resultados de cada analito.
+    indice: '',
     preliminar: false,
+    // Por encima de estas celdas (analitos × laboratorios) el heatmap se dibuja
+    // en canvas en vez de con Plotly. Ver renderHeatmapLienzo.
+    heatmapCeldasMax: 20000,
     areas: [],
     montaje: 'informe-root',
 }, window.INFORME || {});
 
-// Nombres de las clasificaciones A/C/I según el modelo. En el modelo CLIA
-// (aptitud al uso) se usan los términos de PROASECAL/ESfEQA; en el de consenso,
-// la nomenclatura del z-score de ISO 13528. El consenso queda EXACTAMENTE igual.
-const _clia = CFG.modelo === 'clia';
-const LB = {
-    Ap:     _clia ? 'Satisfactorios'    : 'Aceptables',
-    Cp:     _clia ? 'Alertas'           : 'Cuestionables',
-    Ip:     _clia ? 'No satisfactorios' : 'Inaceptables',
-    A:      _clia ? 'Satisfactorio'     : 'Aceptable',
-    C:      _clia ? 'Alerta'            : 'Cuestionable',
-    I:      _clia ? 'No satisfactorio'  : 'Inaceptable',
-    conf:   _clia ? 'Satisfactorios'    : 'Conformes',
-    noconf: _clia ? 'No satisfactorios' : 'No conformes',
-};
+// Rótulos A/C/I del modelo de la ronda (ver etiquetas() en informe-datos.js).
+const LB = etiquetas(CFG.modelo);
+
+// El worker se resuelve junto a este archivo, no junto a la página: las rondas
+// viven en carpetas distintas. document.currentScript solo existe mientras el
+// script se evalúa, así que se captura aquí.
+const WORKER_URL = document.currentScript
+    ? new URL('informe-worker.js', document.currentScript.src).href
+    : '';
 
 // ── Esqueleto del informe ────────────────────────────────────────────────
 // Se genera aquí para que una ronda nueva no tenga que clonar 130 líneas de
@@ -179,8 +181,8 @@ const ESQUELETO = `<!-- Aviso global de analitos no concluyentes -->
 <!-- Methodology -->
 <div class="methodology" id="methodology-box" style="display:none;">
     <strong>Metodología:</strong><br>
-    • <strong>Valor asignado (X*):</strong> Media robusta — Algoritmo A, ISO 13528:2022<br>
-    • <strong>Desviación estándar (σ*):</strong> SD robusta — Algoritmo S, ISO 13528:2022<br>
+    • <strong>Valor asignado (X*):</strong> <span id="metodo-valor-asignado">Media robusta — Algoritmo A, ISO 13528:2022</span><br>
+    • <strong>Desviación estándar (σ*):</strong> <span id="metodo-sd-robusta">SD robusta — Algoritmo S, ISO 13528:2022</span><br>
     • <strong>Z-Score:</strong> z = (x − X*) / σ*, donde x es el resultado del laboratorio<br>
     • <strong>Criterios:</strong> |z| ≤ 2 → Aceptable &nbsp;|&nbsp; 2 &lt; |z| &lt; 3 → Cuestionable
     &nbsp;|&nbsp; |z| ≥ 3 → Inaceptable<br>
@@ -233,38 +235,12 @@ function etaLabel(eta, unidad) {
     return regla + resuelto + vb;
 }
 
-// ── Evaluación por grupo de pares ─────────────────────────────────────
-// Cuando dos plataformas analíticas no son comparables entre sí, cada una
-// recibe su propio valor asignado (ISO 13528 §7). Un grupo demasiado
-// pequeño no da estadística defendible: esos laboratorios se reportan sin
-// evaluar en vez de anexarlos al grupo más parecido, que sería incorrecto.
-function esPorPares(a) {
-    return a.evaluacion === 'grupo_pares';
-}
-
-// Analito publicado sin calificación de desempeño, por decisión del proveedor
-// (data/config.json → decisiones_evaluacion.<ronda>.<area>.sin_evaluar). No
-// trae valor asignado y todos sus resultados vienen como 'NE'. Se dibuja en
-// gris y sin la banda de aceptación: el color de estado y el z-score
-// afirmarían una conformidad que la ronda declara que no puede sostener.
-function esNoEvaluado(a) {
-    return a.evaluacion === 'no_evaluada';
-}
-
 function notaNoEvaluado(a) {
     return `<div class="alert-box alert-neutro" style="margin-bottom:1rem;">
         ℹ️ ${a.nota_sin_evaluar || 'Analito publicado solo con fines informativos.'}
     </div>`;
 }
 
-// Paleta por grupo. Es identidad, no estado: nunca los colores A/C/I.
-const COLOR_GRUPO = ['#1f4e9c', '#c77f0a', '#00857a', '#7b4ea3'];
-
-function colorGrupo(a, nombre) {
-    const evs = a.grupos.filter(g => g.evaluado).map(g => g.nombre);
-    return COLOR_GRUPO[evs.indexOf(nombre) % COLOR_GRUPO.length];
-}
-
 function paresAlert(a) {
     const ev = a.grupos.filter(g => g.evaluado);
     const sin = a.grupos.filter(g => !g.evaluado);
@@ -321,11 +297,7 @@ function bimodalAlert(a) {
 // busca elementos por id y el fetch resuelve después, pero dejarlo al azar del
 // orden de ejecución sería frágil.
 if (montarEsqueleto()) {
-    fetch(JSON_URL)
-        .then(res => {
-            if (!res.ok) throw new Error('No se pudo cargar el JSON');
-            return res.json();
-        })
+    cargarInforme()
         .then(data => renderReport(data))
         .catch(err => {
             document.getElementById('loading-msg').innerHTML =
@@ -333,6 +305,45 @@ if (montarEsqueleto()) {
         });
 }
 
+function pedirJSON(url) {
+    return fetch(url).then(res => {
+        if (!res.ok) throw new Error('No se pudo cargar el JSON');
+        return res.json();
+    });
+}
+
+// Con índice, la portada se dibuja con un documento pequeño y cada analito se
+// pide aparte al acercarse a la pantalla (ver cargarAnalito). Si el índice no
+// está —ronda anterior a los fragmentos, o una subida incompleta— se cae al
+// JSON completo: más lento, pero el informe nunca queda en blanco.
+function cargarInforme() {
+    if (!CFG.indice) return pedirJSON(JSON_URL);
+    return pedirJSON(CFG.indice)
+        .then(indice => {
+            // Cadena, no URL: el documento se envía al worker y un objeto URL
+            // no se puede clonar.
+            indice._base = new URL(CFG.indice, location.href).href;
+            return indice;
+        })
+        .catch(err => {
+            if (!JSON_URL) throw err;
+            console.warn('informe.js: índice no disponible, se usa el JSON completo', err);
+            return pedirJSON(JSON_URL);
+        });
+}
+
+// Resultados de un analito. En el JSON completo ya vienen; con índice se piden
+// a su fragmento una sola vez y se funden en la ficha, de modo que el resto del
+// archivo ve siempre un analito completo.
+function cargarAnalito(data, a) {
+    if (a.laboratorios) return Promise.resolve(a);
+    if (!a._pedido) {
+        a._pedido = pedirJSON(new URL(a.fragmento, data._base))
+            .then(completo => Object.assign(a, completo));
+    }
+    return a._pedido;
+}
+
 function renderReport(data) {
     // Header
     const header = document.getElementById('report-header');
@@ -498,18 +509,34 @@ function renderReport(data) {
     `;
     });
 
-    dibujarCuandoSeVean(data);
+    // Tablas y heatmap se arman fuera del hilo principal. Se encarga antes de
+    // registrar el dibujo perezoso: cargarAnalito cuelga promesas de las
+    // fichas, y esas no se pueden enviar al worker.
+    const preparado = prepararEnSegundoPlano(data);
+    dibujarCuandoSeVean(data, preparado);
 
     // Summary table + alerts
     renderGlobalMetric(data);
-    renderLabTable(data);
-    renderSummaryTable(data.analitos);
-    renderCVAlerts(data.analitos);
+    preparado.then(p => {
+        renderLabTable(p.labs);
+        renderSummaryTable(p.resumen);
+        renderCVAlerts(p.alertas);
+    });
     // El recuadro de metodología del pie describe el z-score de consenso
     // (z=(x−X*)/σ*). En el modelo CLIA eso sería incorrecto: el panel de
     // criterios del inicio ya declara la metodología correcta, así que se oculta.
     document.getElementById('methodology-box').style.display =
         data.criterios_aceptacion ? 'none' : 'block';
+    // Solo una ronda que declaró otro estimador que el Algoritmo A trae
+    // `estimador`; sin él el recuadro queda como está.
+    const est = data.estimador;
+    if (est) {
+        const valor = est.valor_asignado.charAt(0).toUpperCase() + est.valor_asignado.slice(1);
+        document.getElementById('metodo-valor-asignado').textContent =
+            `${valor} — ${est.nombre}, ${est.referencia}`;
+        document.getElementById('metodo-sd-robusta').textContent =
+            `${est.sd_robusta}, ${est.referencia}`;
+    }
 }
 
 function dibujarSeccion(analyte, index) {
@@ -821,24 +848,34 @@ function renderCharts(analyte, index) {
 }
 
 // ── Resumen por laboratorio ───────────────────────────────────────────
-// Consolida el desempeño de cada laboratorio a través de todos los analitos.
-//
-// Excluye los analitos marcados como no concluyentes: su σ* inflada hace que
-// casi todo resulte aceptable, de modo que incluirlos regalaría conformidad a
-// todos los laboratorios por igual (hasta +5 puntos porcentuales) y la tabla
-// dejaría de reflejar desempeño real.
-// Adapta la consolidación ya calculada en Python al formato que usa la
-// tabla. La exclusión de analitos no concluyentes y el criterio de que
-// 'NE' no cuenta ya vienen aplicados desde consolidar_por_laboratorio().
-function consolidarPorLab(data) {
-    const g = data.desempeno_global || {};
-    const filas = (g.por_laboratorio || []).map(r => ({
-        id: r.id, a: r.A, c: r.C, i: r.I, n: r.n, pct: r.pct_conformidad
-    }));
-    const excluidosNombres = g.analitos_excluidos || [];
-    const excluidos = data.analitos.filter(a => excluidosNombres.includes(a.nombre));
-    const usables = data.analitos.filter(a => !excluidosNombres.includes(a.nombre));
-    return { filas, usables, excluidos };
+// ── Preparación en segundo plano ─────────────────────────────────────────
+// Las tablas de resumen y la matriz del heatmap crecen con laboratorios ×
+// analitos, y armarlas en el hilo principal compite con el primer scroll y con
+// las gráficas que se están dibujando. Se arman en js/informe-worker.js con las
+// funciones de js/informe-datos.js. Sin Worker, o si falla (p. ej. la página
+// abierta desde file://), esas mismas funciones corren aquí: el informe nunca
+// queda sin tablas.
+function prepararEnSegundoPlano(data) {
+    const aqui = () => prepararInforme(data, CFG.modelo, CFG.heatmapCeldasMax);
+    if (typeof Worker === 'undefined' || !WORKER_URL) {
+        return Promise.resolve().then(aqui);
+    }
+    return new Promise(resolve => {
+        let w;
+        const alHiloPrincipal = err => {
+            console.warn('informe.js: worker no disponible, se prepara en el hilo principal', err);
+            if (w) w.terminate();
+            resolve(aqui());
+        };
+        try {
+            w = new Worker(WORKER_URL);
+            w.onmessage = e => { w.terminate(); resolve(e.data); };
+            w.onerror = e => { e.preventDefault(); alHiloPrincipal(e.message); };
+            w.postMessage({ data, modelo: CFG.modelo, celdasMax: CFG.heatmapCeldasMax });
+        } catch (err) {
+            alHiloPrincipal(err);
+        }
+    });
 }
 
 // Solo dibuja: las cifras vienen calculadas de calcular_zscore.py y
@@ -883,8 +920,8 @@ function renderGlobalMetric(data) {
     document.getElementById('global-metric').style.display = 'block';
 }
 
-function renderLabTable(data) {
-    const { filas, usables, excluidos } = consolidarPorLab(data);
+function renderLabTable(labs) {
+    const { filas, usables, excluidos } = labs;
 
     const nota = document.getElementById('lab-table-note');
     nota.innerHTML =
@@ -892,9 +929,9 @@ function renderLabTable(data) {
         // decir cuál: un analito no concluyente tiene la σ* inflada por
         // bimodalidad; uno no evaluado es una decisión declarada del proveedor.
         // Atribuir la exclusión al motivo equivocado desinforma.
-        `Consolidado de los ${usables.length} analitos con evaluación concluyente` +
+        `Consolidado de los ${usables} analitos con evaluación concluyente` +
         (excluidos.length
-            ? '; se excluyen ' + excluidos.map(a => esNoEvaluado(a)
+            ? '; se excluyen ' + excluidos.map(a => a.noEvaluado
                 ? `<strong>${a.nombre}</strong>, publicado sin evaluación de desempeño en esta ronda`
                 : `<strong>${a.nombre}</strong>, cuya evaluación agrupada no es interpretable`
               ).join(' y ') + '.'
@@ -959,99 +996,15 @@ function renderLabTable(data) {
     pintar();
 }
 
-function renderSummaryTable(analitos) {
+function renderSummaryTable(filas) {
     const container = document.getElementById('summary-table-container');
     container.style.display = 'block';
     container.id = 'resumen-tabla';
-    const tbody = document.getElementById('summary-tbody');
-
-    analitos.forEach(a => {
-        const { A: countA, C: countC, I: countI } = a.conteos;
-
-        // Un analito por grupo de pares ocupa una fila por grupo: no tiene un
-        // X* único, y mostrar un promedio de ambos no describiría a ninguno.
-        if (esPorPares(a)) {
-            const evs = a.grupos.filter(g => g.evaluado);
-            evs.forEach((g, k) => {
-                const { A: cA, C: cC, I: cI } = g.conteos;
-                const cvClass = g.cv > 30 ? 'cv-critical' : (g.cv > 15 ? 'cv-high' : '');
-                tbody.innerHTML += `
-                <tr>
-                    <td>${k === 0 ? `<strong>${a.nombre}</strong>` : ''}
-                        <div class="sub-grupo"><span class="punto-grupo"
-                            style="background:${colorGrupo(a, g.nombre)}"></span>${g.nombre}</div></td>
-                    <td>${g.n}</td>
-                    <td>${g.valor_asignado} ${a.unidad}</td>
-                    <td>${g.sd_robusta} ${a.unidad}</td>
-                    <td class="${cvClass}">${g.cv}%</td>
-                    <td>${cA}</td><td>${cC}</td><td>${cI}</td>
-                </tr>`;
-            });
-            a.grupos.filter(g => !g.evaluado).forEach(g => {
-                tbody.innerHTML += `
-                <tr>
-                    <td><div class="sub-grupo"><span class="punto-grupo"
-                        style="background:#9aa3b2"></span>${g.nombre}</div></td>
-                    <td>${g.n}</td>
-                    <td colspan="6" class="sin-eval">Sin evaluar — ${g.motivo}</td>
-                </tr>`;
-            });
-            return;
-        }
-
-        // Un analito no evaluado no tiene X* ni σ*: la fila lo dice en vez de
-        // dejar celdas con 'null', y no muestra conteos A/C/I porque no los hay.
-        if (esNoEvaluado(a)) {
-            const ref = a.referencia_descriptiva || {};
-            tbody.innerHTML += `
-            <tr class="fila-no-evaluada">
-                <td><strong>${a.nombre}</strong></td>
-                <td>${a.n}</td>
-                <td colspan="6" class="sin-eval">Sin evaluación de desempeño —
-                    mediana ${ref.mediana} ${a.unidad} (referencia descriptiva)</td>
-            </tr>`;
-            return;
-        }
-
-        let cvClass = '';
-        if (a.cv > 30) cvClass = 'cv-critical';
-        else if (a.cv > 15) cvClass = 'cv-high';
-
-        tbody.innerHTML += `
-        <tr>
-            <td><strong>${a.nombre}</strong></td>
-            <td>${a.n}</td>
-            <td>${a.valor_asignado} ${a.unidad}</td>
-            <td>${a.sd_robusta} ${a.unidad}</td>
-            <td class="${cvClass}">${a.cv}%</td>
-            <td>${countA}</td>
-            <td>${countC}</td>
-            <td>${countI}</td>
-        </tr>
-    `;
-    });
+    document.getElementById('summary-tbody').innerHTML = filas;
 }
 
-function renderCVAlerts(analitos) {
-    const container = document.getElementById('cv-alerts');
-    const highCV = analitos.filter(a => !esPorPares(a) && !esNoEvaluado(a) && a.cv > 15)
-        .sort((a, b) => b.cv - a.cv);
-    if (highCV.length === 0) return;
-
-    let html = '<h3 style="color: var(--primary-color); margin-bottom: 1rem;">⚠️ Alertas de Coeficiente de Variación</h3>';
-    highCV.forEach(a => {
-        const isVeryHigh = a.cv > 30;
-        const cls = isVeryHigh ? 'alert-danger' : 'alert-warning';
-        const icon = isVeryHigh ? '🔴' : '⚠️';
-        const nivel = isVeryHigh ? 'MUY ALTO' : 'ALTO';
-
-        html += `<div class="alert-box ${cls}">
-        ${icon} <strong>${a.nombre}</strong> — CV = ${a.cv}% (${nivel}).
-        σ* = ${a.sd_robusta} ${a.unidad} sobre X* = ${a.valor_asignado} ${a.unidad}.
-        Un CV elevado indica alta dispersión entre laboratorios.
-    </div>`;
-    });
-    container.innerHTML = html;
+function renderCVAlerts(html) {
+    if (html) document.getElementById('cv-alerts').innerHTML = html;
 }
 
 // ── Dibujo perezoso ──────────────────────────────────────────────────────
@@ -1063,7 +1016,7 @@ function renderCVAlerts(analitos) {
 // siguen apuntando al sitio correcto.
 const MARGEN_PREDIBUJO = '800px 0px';
 
-function dibujarCuandoSeVean(data) {
+function dibujarCuandoSeVean(data, preparado) {
     const secciones = data.analitos.map((a, i) => ({
         a, i, el: document.getElementById(safeId(a.nombre))
     })).filter(s => s.el);
@@ -1083,10 +1036,20 @@ function dibujarCuandoSeVean(data) {
 
     // Sin IntersectionObserver (navegador antiguo) se dibuja todo de una vez:
     // más lento, pero el informe nunca queda en blanco.
+    // El fragmento se pide en el mismo momento en que antes se dibujaba: el
+    // margen de predibujo da tiempo a que llegue antes de que la sección entre
+    // en pantalla.
+    const dibujar = s => cargarAnalito(data, s.a)
+        .then(a => dibujarSeccion(a, s.i))
+        .catch(err => {
+            document.getElementById(`hist-${s.i}`).innerHTML =
+                `<p style="color: #dc3545;">❌ No se pudieron cargar los resultados de ${s.a.nombre}: ${err.message}</p>`;
+        });
+
     if (!('IntersectionObserver' in window)) {
         requestAnimationFrame(() => {
-            secciones.forEach(s => dibujarSeccion(s.a, s.i));
-            renderHeatmap(data);
+            secciones.forEach(dibujar);
+            preparado.then(p => renderHeatmap(p.heatmap));
         });
         return;
     }
@@ -1096,10 +1059,10 @@ function dibujarCuandoSeVean(data) {
             if (!e.isIntersecting) return;
             o.unobserve(e.target);              // cada gráfica se dibuja una sola vez
             if (e.target === heatmap) {
-                renderHeatmap(data);
+                preparado.then(p => renderHeatmap(p.heatmap));
             } else {
                 const s = secciones.find(x => x.el === e.target);
-                if (s) dibujarSeccion(s.a, s.i);
+                if (s) dibujar(s);
             }
         });
     }, { rootMargin: MARGEN_PREDIBUJO });
@@ -1108,61 +1071,15 @@ function dibujarCuandoSeVean(data) {
     if (heatmap) obs.observe(heatmap);
 }
 
-function renderHeatmap(data) {
+// La matriz y los tooltips llegan armados (matrizHeatmap en informe-datos.js).
+function renderHeatmap(matriz) {
     document.getElementById('heatmap-section').style.display = 'block';
+    if (matriz.grande) return renderHeatmapLienzo(matriz);
 
-    // Collect all unique lab IDs sorted
-    const allLabIds = new Set();
-    data.analitos.forEach(a => a.laboratorios.forEach(l => allLabIds.add(l.id)));
-    // Orden lexicográfico. Coincide con el numérico porque el identificador viene
-    // con relleno fijo desde Python (L-001 … L-146); sin relleno daría L-1, L-10, L-2.
-    const labIds = [...allLabIds].sort();
-    const labLabels = labIds.map(id => id);
-
-    // Analyte names (Y axis). El analito sin calificar se rotula como tal: su
-    // fila queda toda en gris y, sin la marca, se confundiría con laboratorios
-    // que no participaron.
-    const analyteNames = data.analitos.map(a =>
-        esNoEvaluado(a) ? `${a.nombre} (no evaluado)` : a.nombre);
-
-    // Build Z-score matrix and custom hover text
-    // Each row = one analyte, each col = one lab
-    const zMatrix = [];
-    const hoverMatrix = [];
+    const { labIds, zMatrix, hoverMatrix, analyteNames } = matriz;
+    const labLabels = labIds;
     const CLAMP = 5;
 
-    data.analitos.forEach(a => {
-        const labMap = {};
-        a.laboratorios.forEach(l => { labMap[l.id] = l; });
-
-        const row = [];
-        const hoverRow = [];
-        labIds.forEach(id => {
-            if (labMap[id] && labMap[id].z_score !== null) {
-                const z = labMap[id].z_score;
-                row.push(Math.max(-CLAMP, Math.min(CLAMP, z)));
-                const clasif = labMap[id].clasificacion === 'A' ? LB.A
-                    : labMap[id].clasificacion === 'C' ? LB.C : LB.I;
-                hoverRow.push(
-                    `${id}<br>${a.nombre}<br>Z-Score: ${z.toFixed(2)}<br>Resultado: ${labMap[id].resultado} ${a.unidad}<br>${clasif}`
-                );
-            } else {
-                row.push(null);
-                // Una celda gris tiene tres causas distintas y el tooltip debe
-                // distinguirlas: el laboratorio no reportó, su grupo de pares era
-                // insuficiente, o el analito entero se publicó sin calificar.
-                // Sin esto, un analito no evaluado se leería como "no participó".
-                hoverRow.push(!labMap[id]
-                    ? `${id}<br>${a.nombre}<br>No participó`
-                    : esNoEvaluado(a)
-                        ? `${id}<br>${a.nombre}<br>Resultado: ${labMap[id].resultado} ${a.unidad}<br>Analito sin evaluación de desempeño`
-                        : `${id}<br>${a.nombre}<br>Resultado: ${labMap[id].resultado} ${a.unidad}<br>Sin evaluar (grupo de pares insuficiente)`);
-            }
-        });
-        zMatrix.push(row);
-        hoverMatrix.push(hoverRow);
-    });
-
     // Discrete colorscale aligned with bar charts:
     // |z| ≤ 2 → green, 2 < |z| < 3 → yellow, |z| ≥ 3 → red
     // Positions: z=-5→0, z=-3→0.2, z=-2→0.3, z=0→0.5, z=+2→0.7, z=+3→0.8, z=+5→1
@@ -1222,3 +1139,110 @@ function renderHeatmap(data) {
         paper_bgcolor: 'white'
     }, { responsive: true });
 }
+
+// ── Heatmap de matriz grande ─────────────────────────────────────────────
+// Plotly guarda un tooltip por celda y arma el eje con un rótulo SVG por
+// laboratorio: con varias áreas y cientos de laboratorios son decenas de miles
+// de cadenas y nodos. Por encima de CFG.heatmapCeldasMax se dibuja en un canvas
+// del ancho de la pantalla que solo pinta las columnas visibles; el resto de la
+// matriz se recorre con el scroll horizontal. El tooltip se arma al vuelo
+// (hoverCelda) para la celda bajo el cursor.
+const HM_ANCHO = 14;     // px por laboratorio
+const HM_ALTO = 24;      // px por analito
+const HM_PIE = 70;       // franja de rótulos de laboratorio
+
+// Los mismos cortes que la escala discreta de Plotly en renderHeatmap.
+function colorZ(z) {
+    if (z === null) return '#f0f0f0';
+    const az = Math.abs(z);
+    return az <= 2 ? '#28a745' : az < 3 ? '#ffc107' : '#dc3545';
+}
+
+function renderHeatmapLienzo(m) {
+    const el = document.getElementById('heatmap-chart');
+    const nFilas = m.analyteNames.length;
+    const nCols = m.labIds.length;
+    const alto = nFilas * HM_ALTO + HM_PIE;
+
+    el.innerHTML = `
+    <div class="hm-lienzo">
+        <div class="hm-filas" style="height:${alto}px">
+            ${m.analyteNames.map(n => `<div style="height:${HM_ALTO}px" title="${n}">${n}</div>`).join('')}
+        </div>
+        <div class="hm-scroll">
+            <div style="width:${nCols * HM_ANCHO}px;height:${alto}px">
+                <canvas class="hm-canvas"></canvas>
+            </div>
+        </div>
+        <div class="hm-tooltip" hidden></div>
+    </div>
+    <div class="hm-leyenda">
+        <span><i style="background:#28a745"></i>|z| ≤ 2</span>
+        <span><i style="background:#ffc107"></i>2 &lt; |z| &lt; 3</span>
+        <span><i style="background:#dc3545"></i>|z| ≥ 3</span>
+        <span><i style="background:#f0f0f0"></i>Sin calificación</span>
+        <span>${nCols} laboratorios — desplace horizontalmente para ver el resto</span>
+    </div>`;
+
+    const scroll = el.querySelector('.hm-scroll');
+    const canvas = el.querySelector('.hm-canvas');
+    const tip = el.querySelector('.hm-tooltip');
+    const ctx = canvas.getContext('2d');
+
+    function pintar() {
+        const ancho = scroll.clientWidth;
+        const dpr = window.devicePixelRatio || 1;
+        if (canvas.width !== Math.round(ancho * dpr)) {
+            canvas.width = Math.round(ancho * dpr);
+            canvas.height = Math.round(alto * dpr);
+            canvas.style.width = ancho + 'px';
+            canvas.style.height = alto + 'px';
+        }
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.clearRect(0, 0, ancho, alto);
+
+        const x0 = scroll.scrollLeft;
+        const desde = Math.floor(x0 / HM_ANCHO);
+        const hasta = Math.min(nCols, Math.ceil((x0 + ancho) / HM_ANCHO));
+        for (let j = desde; j < hasta; j++) {
+            const x = j * HM_ANCHO - x0;
+            for (let i = 0; i < nFilas; i++) {
+                ctx.fillStyle = colorZ(m.zMatrix[i][j]);
+                // 1 px de separación, como el xgap/ygap de la versión Plotly.
+                ctx.fillRect(x + 1, i * HM_ALTO + 1, HM_ANCHO - 2, HM_ALTO - 2);
+            }
+            ctx.save();
+            ctx.translate(x + HM_ANCHO / 2, nFilas * HM_ALTO + 6);
+            ctx.rotate(-Math.PI / 4);
+            ctx.fillStyle = '#444';
+            ctx.font = '9px sans-serif';
+            ctx.textAlign = 'right';
+            ctx.fillText(m.labIds[j], 0, 3);
+            ctx.restore();
+        }
+    }
+
+    // Un solo repintado por cuadro aunque el scroll dispare muchos eventos.
+    let pendiente = false;
+    const repintar = () => {
+        if (pendiente) return;
+        pendiente = true;
+        requestAnimationFrame(() => { pendiente = false; pintar(); });
+    };
+    scroll.addEventListener('scroll', () => { tip.hidden = true; repintar(); }, { passive: true });
+    window.addEventListener('resize', repintar);
+
+    canvas.addEventListener('mousemove', e => {
+        const j = Math.floor((e.offsetX + scroll.scrollLeft) / HM_ANCHO);
+        const i = Math.floor(e.offsetY / HM_ALTO);
+        if (i < 0 || i >= nFilas || j < 0 || j >= nCols) { tip.hidden = true; return; }
+        tip.innerHTML = hoverCelda(m, LB, i, j);
+        tip.hidden = false;
+        const caja = el.querySelector('.hm-lienzo').getBoundingClientRect();
+        tip.style.left = (e.clientX - caja.left + 12) + 'px';
+        tip.style.top = (e.clientY - caja.top + 12) + 'px';
+    });
+    canvas.addEventListener('mouseleave', () => { tip.hidden = true; });
+
+    pintar();
+}
@@ -444,3 +444,18 @@ document.addEventListener('DOMContentLoaded', function () {
     console.log('CONCALAB-UASD: JavaScript cargado correctamente');
 });
 
+
+// ==========================================
+// SERVICE WORKER (caché para visitas repetidas, ver sw.js)
+// ==========================================
+// sw.js vive en la raíz para que su alcance cubra todo el sitio; se resuelve
+// desde este archivo porque las páginas están a distinta profundidad. Abierto
+// desde file:// no hay service worker posible y el sitio funciona igual.
+if ('serviceWorker' in navigator && location.protocol.startsWith('http') && document.currentScript) {
+    const swUrl = new URL('../sw.js', document.currentScript.src);
+    window.addEventListener('load', function () {
+        navigator.serviceWorker.register(swUrl).catch(function (err) {
+            console.warn('CONCALAB-UASD: no se pudo registrar el service worker', err);
+        });
+    });
+}
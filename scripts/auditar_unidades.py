@@ -39,14 +39,13 @@ Uso:
 
 import os
 import sys
-import json
 import argparse
 from collections import defaultdict
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from calcular_zscore import (  # noqa: E402
-    cargar, calcular_agrupado, analitos_por_grupo_pares, CONFIG_PATH,
-)
+from nucleo import analitos_por_grupo_pares, codigo_activo, estimador_robusto  # noqa: E402
+from calcular_zscore import cargar, calcular_agrupado, usar_estimador  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
 
 # Tolerancia relativa para aceptar que un factor observado coincide con uno teórico.
 TOL = 0.12
@@ -211,16 +210,20 @@ def main():
     ap = argparse.ArgumentParser(description="Audita si los no conformes lo son por unidad.")
     ap.add_argument("--codigo")
     ap.add_argument("--incluir-cuestionables", action="store_true")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("auditar_unidades", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo))
 
-    por_analito, _ = cargar(codigo)
-    analitos = calcular_agrupado(por_analito,
-                                 por_grupo_pares=analitos_por_grupo_pares(codigo))
+    with etapa("cargar"):
+        por_analito, _ = cargar(codigo)
+    with etapa("estimar_puntuar"):
+        analitos = calcular_agrupado(por_analito,
+                                     por_grupo_pares=analitos_por_grupo_pares(codigo),
+                                     remuestreos=0)
 
     # El cálculo no arrastra la unidad cruda; se reincorpora aquí para el veredicto.
     crudo = {(f["cod"], nom): f["unidad"] for nom, fs in por_analito.items() for f in fs}
@@ -228,7 +231,9 @@ def main():
         for l in a["laboratorios"]:
             l["unidad_raw"] = crudo.get((l["id"], a["nombre"]), "")
 
-    imprimir(auditar(analitos, args.incluir_cuestionables), args.incluir_cuestionables)
+    with etapa("auditar"):
+        casos = auditar(analitos, args.incluir_cuestionables)
+    imprimir(casos, args.incluir_cuestionables)
 
 
 if __name__ == "__main__":
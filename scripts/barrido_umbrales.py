@@ -0,0 +1,305 @@
+"""
+Barrido de umbrales de evaluación — uso interno CONCALAB.
+
+N_MINIMO, N_MINIMO_GRUPO y RAZON_BIMODAL son constantes de calcular_zscore.py y
+los cortes |z| ≤ 2 / |z| ≥ 3 viven en clasificar(): para saber qué pasaría con
+otro valor había que editar el código y volver a correr. Este script evalúa una
+grilla de esos umbrales contra una ronda en una sola pasada y muestra, por
+combinación, cómo cambian las clasificaciones, los NE y los analitos marcados
+como bimodales. Sirve para sostener con datos una decisión del proveedor, no
+para cambiar los umbrales de una ronda ya publicada.
+
+Qué mueve cada umbral:
+  N_MINIMO        solo la marca de "n bajo" de cada valor asignado
+  N_MINIMO_GRUPO  qué grupos de pares se evalúan (los demás quedan NE) y qué
+                  plataformas entran en la detección de bimodalidad
+  RAZON_BIMODAL   qué analitos se marcan bimodales; los no declarados en
+                  config.json se publican como no concluyentes
+  cortes          los límites A/C/I de |z| (por defecto 2 y 3)
+
+Nada de eso cambia X*, σ* ni z: las estimaciones robustas del analito y de cada
+plataforma se calculan una vez y cada combinación solo decide qué se evalúa y
+cómo se clasifica, todo vectorizado sobre los resultados de la ronda. Las
+decisiones de config.json (grupo de pares, sin evaluar) quedan fijas.
+
+"cambian" cuenta los resultados cuya clasificación difiere de la de los
+umbrales vigentes (la fila marcada ←).
+
+Uso:
+  conda activate concalab
+  python scripts/barrido_umbrales.py --codigo EA-001-2026
+  python scripts/barrido_umbrales.py --n-minimo-grupo 5,6,8,10 --razon-bimodal 1.3,1.5,2
+  python scripts/barrido_umbrales.py --cortes 2:3,2.5:3.5 --modelo clia --csv barrido.csv
+"""
+
+import os
+import sys
+import csv
+import argparse
+import warnings
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import (  # noqa: E402
+    analitos_por_grupo_pares, analitos_sin_evaluar, codigo_activo, estimador_robusto, analito_de,
+)
+from calcular_zscore import (  # noqa: E402
+    cargar, _stats, usar_estimador, avisar_solo_z, N_MINIMO, N_MINIMO_GRUPO, RAZON_BIMODAL,
+)
+from influencia import Modelo  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+
+CORTES = (2.0, 3.0)
+
+# Grilla por defecto: los vigentes y un paso a cada lado.
+GRILLA = {
+    "n_minimo": (10, 12, 15),
+    "n_minimo_grupo": (6, 8, 10),
+    "razon_bimodal": (1.3, 1.5, 2.0),
+    "cortes": (CORTES,),
+}
+
+CLASES = ("A", "C", "I", "NE")
+
+
+# ====================================================================
+# ESTIMACIONES (una vez por ronda)
+# ====================================================================
+
+def preparar(por_analito, por_pares, sin_eval, modelo):
+    """
+    Todo lo que no depende de los umbrales, aplanado a arrays:
+
+      z           z de cada resultado, contra su analito o contra su grupo de
+                  pares según la decisión de config.json (NaN si sin evaluar)
+      n_bloque    tamaño del grupo de pares de cada resultado (inf si el
+                  analito se evalúa agrupado): se evalúa si n_bloque ≥ N_MINIMO_GRUPO
+      bloques     tamaño de cada valor asignado posible, y si es de grupo
+      tamanos,    por analito × plataforma: n y mediana (NaN de relleno), para
+      medianas    la detección de bimodalidad
+    """
+    import numpy as np
+    z, n_bloque, bloques, plataformas = [], [], [], []
+    nombres = sorted(por_analito)
+    for nombre in nombres:
+        filas = por_analito[nombre]
+        grupos = defaultdict(list)
+        for f in filas:
+            grupos[f["plataforma"]].append(f["valor"])
+        plataformas.append([(len(v), float(np.median(v))) for v in grupos.values()])
+
+        if analito_de(nombre) in sin_eval:
+            z.append(np.full(len(filas), np.nan))
+            n_bloque.append(np.full(len(filas), np.inf))
+        elif analito_de(nombre) in por_pares:
+            for v in grupos.values():
+                x_r, s_r, _ = _stats(v)
+                z.append(modelo.z(np.array(v), x_r, float(modelo.sigma_pt(nombre, x_r, s_r))))
+                n_bloque.append(np.full(len(v), len(v)))
+                bloques.append((len(v), True))
+        else:
+            v = np.array([f["valor"] for f in filas])
+            x_r, s_r, _ = _stats(v)
+            z.append(modelo.z(v, x_r, float(modelo.sigma_pt(nombre, x_r, s_r))))
+            n_bloque.append(np.full(len(filas), np.inf))
+            bloques.append((len(filas), False))
+
+    ancho = max(len(p) for p in plataformas)
+    tamanos = np.zeros((len(nombres), ancho))
+    medianas = np.full((len(nombres), ancho), np.nan)
+    for i, p in enumerate(plataformas):
+        tamanos[i, :len(p)] = [t for t, _ in p]
+        medianas[i, :len(p)] = [m for _, m in p]
+    return {
+        "nombres": nombres,
+        "z": np.concatenate(z),
+        "n_bloque": np.concatenate(n_bloque),
+        "bloques": np.array(bloques, dtype=float).reshape(-1, 2),
+        "tamanos": tamanos,
+        "medianas": medianas,
+        "declarados": np.array([analito_de(n) in por_pares or analito_de(n) in sin_eval
+                                for n in nombres]),
+    }
+
+
+# ====================================================================
+# BARRIDO
+# ====================================================================
+
+def clases(z, n_bloque, grupos, cortes):
+    """Clase (índice en CLASES) de cada resultado: matriz N_MINIMO_GRUPO × cortes × resultado."""
+    import numpy as np
+    g = np.asarray(grupos, dtype=float)[:, None, None]
+    c1, c2 = (np.asarray(c, dtype=float)[None, :, None] for c in zip(*cortes))
+    a = np.abs(z)[None, None, :]
+    codigo = np.where(a <= c1, 0, np.where(a < c2, 1, 2))
+    return np.where(np.isnan(a) | (n_bloque[None, None, :] < g), 3, codigo)
+
+
+def razones(tamanos, medianas, grupos):
+    """Razón entre la mayor y la menor mediana de las plataformas con n ≥ cada
+    N_MINIMO_GRUPO (NaN si hay menos de dos): matriz N_MINIMO_GRUPO × analito."""
+    import numpy as np
+    grandes = tamanos[None, :, :] >= np.asarray(grupos, dtype=float)[:, None, None]
+    med = np.where(grandes, medianas[None, :, :], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)    # filas sin plataformas grandes
+        r = np.nanmax(med, axis=2) / np.nanmin(med, axis=2)
+    return np.where(grandes.sum(axis=2) >= 2, r, np.nan)
+
+
+def barrer(cache, grilla):
+    """
+    Una fila por combinación de N_MINIMO_GRUPO, RAZON_BIMODAL y cortes, más los
+    nombres de los analitos bimodales por (N_MINIMO_GRUPO, RAZON_BIMODAL).
+    N_MINIMO solo cuenta valores asignados con n bajo: va como {N_MINIMO: n}
+    dentro de cada fila en vez de multiplicarlas.
+    """
+    import numpy as np
+    grupos = list(grilla["n_minimo_grupo"])
+    cortes = list(grilla["cortes"])
+    cl = clases(cache["z"], cache["n_bloque"], grupos, cortes)
+    conteos = np.stack([(cl == k).sum(axis=2) for k in range(len(CLASES))], axis=2)
+    vigente = clases(cache["z"], cache["n_bloque"], [N_MINIMO_GRUPO], [CORTES])[0, 0]
+    cambian = (cl != vigente[None, None, :]).sum(axis=2)
+
+    tam, de_grupo = cache["bloques"][:, 0], cache["bloques"][:, 1].astype(bool)
+    evaluados = ~de_grupo[None, :] | (tam[None, :] >= np.array(grupos, dtype=float)[:, None])
+    r = razones(cache["tamanos"], cache["medianas"], grupos)
+
+    filas, bimodales = [], {}
+    for gi, g in enumerate(grupos):
+        for razon in grilla["razon_bimodal"]:
+            marca = r[gi] >= razon
+            bimodales[(g, razon)] = [n for n, b in zip(cache["nombres"], marca) if b]
+            n_bimodales = int(marca.sum())
+            no_concluyentes = int((marca & ~cache["declarados"]).sum())
+            n_bajo = {n_min: int((evaluados[gi] & (tam < n_min)).sum())
+                      for n_min in grilla["n_minimo"]}
+            for ki, (c1, c2) in enumerate(cortes):
+                a, c, i, ne = (int(v) for v in conteos[gi, ki])
+                filas.append({
+                    "n_minimo_grupo": g, "razon_bimodal": razon, "corte_c": c1, "corte_i": c2,
+                    "A": a, "C": c, "I": i, "NE": ne, "cambian": int(cambian[gi, ki]),
+                    "valores_asignados": int(evaluados[gi].sum()), "n_bajo": n_bajo,
+                    "bimodales": n_bimodales, "no_concluyentes": no_concluyentes,
+                    "vigente": (g, razon, (c1, c2)) == (N_MINIMO_GRUPO, RAZON_BIMODAL, CORTES),
+                })
+    return filas, bimodales
+
+
+# ====================================================================
+# REPORTE
+# ====================================================================
+
+def imprimir(filas, bimodales, modelo, n_minimos):
+    print("\n" + "=" * 104)
+    print(f"  BARRIDO DE UMBRALES — modelo {modelo.nombre}, {len(filas)} combinaciones")
+    print("=" * 104)
+    n_bajo = "n<" + "/".join(str(n) for n in n_minimos)
+    print(f"  {'N_GRUPO':>7} {'RAZÓN':>6} {'cortes':>9}  {'A':>5} {'C':>5} {'I':>5} {'NE':>5}"
+          f"  {'cambian':>7}  {'X*':>4} {n_bajo:>12}  {'bimod.':>6} {'no concl.':>9}")
+    for f in filas:
+        cortes = f"{f['corte_c']:g}/{f['corte_i']:g}"
+        bajos = "/".join(str(f["n_bajo"][n]) for n in n_minimos)
+        print(f"  {f['n_minimo_grupo']:>7} {f['razon_bimodal']:>6g} {cortes:>9}"
+              f"  {f['A']:>5} {f['C']:>5} {f['I']:>5} {f['NE']:>5}  {f['cambian']:>7}"
+              f"  {f['valores_asignados']:>4} {bajos:>12}  {f['bimodales']:>6} {f['no_concluyentes']:>9}"
+              + ("  ←" if f["vigente"] else ""))
+
+    base = set(bimodales.get((N_MINIMO_GRUPO, RAZON_BIMODAL), ()))
+    print(f"\n  Bimodales con los umbrales vigentes: {', '.join(sorted(base)) or 'ninguno'}")
+    for (g, razon), nombres in bimodales.items():
+        mas, menos = sorted(set(nombres) - base), sorted(base - set(nombres))
+        if mas or menos:
+            cambio = ", ".join([f"+{n}" for n in mas] + [f"−{n}" for n in menos])
+            print(f"    N_MINIMO_GRUPO={g}, RAZON_BIMODAL={razon:g}: {cambio}")
+    print("\n" + "=" * 104)
+    print("  X* = valores asignados evaluados (analitos agrupados + grupos de pares con n suficiente);")
+    print(f"  {n_bajo}: cuántos de ellos quedan con n bajo para cada N_MINIMO (vigente: {N_MINIMO}).")
+    print("  'no concl.' = bimodales que config.json no declara: se publicarían como no concluyentes.")
+    print("=" * 104)
+
+
+def escribir_csv(filas, ruta):
+    """Una columna n_bajo_<N_MINIMO> por valor de la grilla."""
+    planas = []
+    for f in filas:
+        p = {k: v for k, v in f.items() if k != "n_bajo"}
+        p.update({f"n_bajo_{n}": c for n, c in f["n_bajo"].items()})
+        planas.append(p)
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(planas[0]))
+        w.writeheader()
+        w.writerows(planas)
+
+
+def _lista(tipo):
+    def leer(txt):
+        try:
+            return tuple(tipo(v) for v in txt.split(",") if v.strip())
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"lista inválida: {txt!r}")
+    return leer
+
+
+def _corte(txt):
+    c, i = txt.split(":")
+    if not 0 < float(c) < float(i):
+        raise ValueError(txt)
+    return float(c), float(i)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Barre umbrales de evaluación sobre una ronda.")
+    ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    ap.add_argument("--area", default="quimica")
+    ap.add_argument("--modelo", choices=["consenso", "clia"], default="consenso")
+    ap.add_argument("--n-minimo", type=_lista(int), default=GRILLA["n_minimo"])
+    ap.add_argument("--n-minimo-grupo", type=_lista(int), default=GRILLA["n_minimo_grupo"])
+    ap.add_argument("--razon-bimodal", type=_lista(float), default=GRILLA["razon_bimodal"])
+    ap.add_argument("--cortes", type=_lista(_corte), default=GRILLA["cortes"],
+                    help="Pares C:I de |z|, p. ej. 2:3,2.5:3.5")
+    ap.add_argument("--csv", help="Escribe además la tabla en este CSV")
+    argumento_perfil(ap)
+    args = ap.parse_args()
+
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("barrido_umbrales", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo, args.area))
+
+    with etapa("cargar"):
+        por_analito, _ = cargar(codigo)
+    if not por_analito:
+        sys.exit(f"No hay resultados de Química Clínica para {codigo}.")
+    sin_eval, _ = analitos_sin_evaluar(codigo, args.area)
+    por_pares = analitos_por_grupo_pares(codigo, args.area) - sin_eval
+    esp = None
+    if args.modelo == "clia":
+        from evaluar_clia import leer_especificaciones
+        esp = leer_especificaciones(args.area)
+    modelo = Modelo(args.modelo, esp)
+
+    # Los vigentes siempre entran: "cambian" se mide contra ellos.
+    grilla = {
+        "n_minimo": sorted(set(args.n_minimo) | {N_MINIMO}),
+        "n_minimo_grupo": sorted(set(args.n_minimo_grupo) | {N_MINIMO_GRUPO}),
+        "razon_bimodal": sorted(set(args.razon_bimodal) | {RAZON_BIMODAL}),
+        "cortes": sorted(set(args.cortes) | {CORTES}),
+    }
+
+    print(f"\nRonda {codigo} — barrido de umbrales")
+    avisar_solo_z(codigo, args.area, [args.modelo])
+    with etapa("estimar"):
+        cache = preparar(por_analito, por_pares, sin_eval, modelo)
+    with etapa("barrer"):
+        filas, bimodales = barrer(cache, grilla)
+    imprimir(filas, bimodales, modelo, grilla["n_minimo"])
+    if args.csv:
+        escribir_csv(filas, args.csv)
+        print(f"  CSV escrito en: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Benchmark de los caminos calientes de la estadística y del informe.
+
+Sin una medición no hay forma de saber si un cambio "de rendimiento" ayudó,
+empeoró o solo movió el costo de sitio. Este script corre cada etapa del
+pipeline sobre rondas sintéticas de tamaño creciente
+(generar_ronda_sintetica.py, misma semilla en cada corrida) y guarda los
+tiempos en JSON junto con la información de la máquina, para poder comparar dos
+corridas y fallar si algo se volvió más lento que un umbral.
+
+Casos: cargar, robust_mean_sd, q_hampel, incertidumbre_asignado (bootstrap),
+calcular_agrupado, detectar_bimodales, modas_kde, efecto_metodo, influencia
+(jackknife de toda la ronda), evaluar_clia.evaluar, escribir_json (consenso y
+CLIA), Validador (validar_informe.validar) y cada figura de informe_pdf.
+
+Todo corre en un directorio temporal con su propio support/ y data/: las
+rutas del pipeline son relativas al directorio de trabajo, así que el benchmark
+no toca ni el CSV ni los JSON reales.
+
+Uso:
+  python scripts/benchmark.py                            # escalas 1 y 10
+  python scripts/benchmark.py --escalas 1,10,100 --repeticiones 5
+  python scripts/benchmark.py --casos calcular_agrupado,evaluar_clia
+  python scripts/benchmark.py comparar base.json nuevo.json --umbral 0.10
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import tempfile
+import argparse
+import statistics
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import calcular_zscore as cz  # noqa: E402
+import evaluar_clia as ec  # noqa: E402
+import validar_informe as vi  # noqa: E402
+import influencia as inf  # noqa: E402
+import generar_ronda_sintetica as gs  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS_DIR = os.path.join(RAIZ, "support", "benchmarks")
+
+ESCALAS = (1, 10)
+REPETICIONES = 3
+SEMILLA = 0
+CODIGO = "EA-990-2099"
+# Por debajo de esto la diferencia entre dos corridas es ruido del reloj y del
+# sistema, no una regresión.
+PISO_S = 0.005
+UMBRAL = 0.10
+
+
+def maquina():
+    return {
+        "host": socket.gethostname(),
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def medir(fn, repeticiones):
+    """Mínimo y mediana de `repeticiones` corridas. El mínimo es el que se compara:
+    es el menos contaminado por el resto del sistema."""
+    tiempos = []
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), statistics.median(tiempos)
+
+
+@contextlib.contextmanager
+def ronda_temporal(escala, semilla):
+    """Directorio de trabajo aislado con la ronda sintética y el config.json real."""
+    previo = os.getcwd()
+    tmp = tempfile.mkdtemp(prefix="concalab-bench-")
+    try:
+        os.makedirs(os.path.join(tmp, "data", "informes"))
+        shutil.copy(os.path.join(RAIZ, "data", "config.json"), os.path.join(tmp, "data"))
+        os.chdir(tmp)
+        n_labs = max(1, round(gs.LABS_REALES * escala))
+        filas = gs.generar(n_labs, semilla=semilla)
+        gs.escribir_csv(filas, CODIGO)
+        yield n_labs, len(filas)
+    finally:
+        os.chdir(previo)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def casos():
+    """Preparación y lista de (nombre, función) en orden de pipeline.
+
+    La preparación corre una vez por escala y no se mide: deja en `e` las
+    entradas de cada caso, para que cada uno mida solo su propia etapa.
+    """
+    import informe_pdf as ip   # matplotlib solo si se llega aquí
+    e = {}
+
+    def prep_cargar():
+        with contextlib.redirect_stdout(io.StringIO()):
+            e["por_analito"], _ = cz.cargar(CODIGO)
+            e["agrupado"] = cz.calcular_agrupado(e["por_analito"], remuestreos=0)
+            e["bimodales"] = cz.detectar_bimodales(e["agrupado"], e["por_analito"])
+            e["pares"] = frozenset(e["bimodales"])
+            e["analitos"] = cz.calcular_agrupado(e["por_analito"], por_grupo_pares=e["pares"])
+            e["esp"] = gs.especificaciones_para(e["por_analito"], ec.leer_especificaciones("quimica"))
+            e["clia"] = ec.evaluar(e["por_analito"], e["esp"], e["pares"])
+            ec.escribir_json(CODIGO, e["clia"])
+            with open(os.path.join(cz.SALIDA_DIR, f"{CODIGO}-quimica-clia.json"), encoding="utf-8") as f:
+                e["doc"] = json.load(f)
+        mayor = max(e["por_analito"].values(), key=len)
+        e["valores"] = [f["valor"] for f in mayor]
+        e["a_agrupado"] = next(a for a in e["doc"]["analitos"] if a["evaluacion"] == "agrupada")
+        e["a_pares"] = next((a for a in e["doc"]["analitos"] if a["evaluacion"] == "grupo_pares"),
+                            e["a_agrupado"])
+        os.makedirs("figs", exist_ok=True)
+
+    return prep_cargar, [
+        ("cargar", lambda: cz.cargar(CODIGO)),
+        ("robust_mean_sd", lambda: cz.robust_mean_sd(e["valores"])),
+        ("q_hampel", lambda: cz.q_hampel(e["valores"])),
+        ("incertidumbre_asignado", lambda: cz.incertidumbre_asignado(e["valores"], 1.0, "benchmark")),
+        ("calcular_agrupado", lambda: cz.calcular_agrupado(e["por_analito"], por_grupo_pares=e["pares"])),
+        ("detectar_bimodales", lambda: cz.detectar_bimodales(e["agrupado"], e["por_analito"])),
+        ("modas_kde", lambda: cz.modas_kde(e["por_analito"])),
+        ("efecto_metodo", lambda: cz.efecto_metodo(e["agrupado"], e["por_analito"])),
+        ("influencia", lambda: inf.analizar(e["por_analito"], e["pares"], frozenset(),
+                                            inf.Modelo("consenso"))),
+        ("evaluar_clia", lambda: ec.evaluar(e["por_analito"], e["esp"], e["pares"])),
+        ("escribir_json", lambda: cz.escribir_json(CODIGO, e["analitos"], bimodales=e["bimodales"])),
+        ("escribir_json_clia", lambda: ec.escribir_json(CODIGO, e["clia"])),
+        ("validar_informe", lambda: vi.validar(CODIGO, "quimica", "clia")),
+        ("fig_histograma", lambda: ip.fig_histograma(e["a_agrupado"], "figs/h.pdf")),
+        ("fig_histograma_pares", lambda: ip.fig_histograma(e["a_pares"], "figs/hp.pdf")),
+        ("fig_zscore", lambda: ip.fig_zscore(e["a_agrupado"], "figs/z.pdf")),
+        ("fig_no_evaluado", lambda: ip.fig_no_evaluado(e["a_agrupado"], "figs/n1.pdf", "figs/n2.pdf")),
+        ("fig_estratos", lambda: ip.fig_estratos(e["doc"], "figs/e.pdf")),
+        ("fig_heatmap", lambda: ip.fig_heatmap(e["doc"], "figs/m.pdf")),
+    ]
+
+
+def correr(escalas, repeticiones, semilla, filtro=None):
+    resultados = []
+    for escala in escalas:
+        with ronda_temporal(escala, semilla) as (n_labs, n_filas):
+            print(f"\n  Escala {escala}× — {n_labs} laboratorios, {n_filas} filas")
+            preparar, lista = casos()
+            preparar()
+            for nombre, fn in lista:
+                if filtro and not any(nombre.startswith(f) for f in filtro):
+                    continue
+                minimo, mediana = medir(fn, repeticiones)
+                print(f"    {nombre:<24} min {minimo * 1000:>10.1f} ms   mediana {mediana * 1000:>10.1f} ms")
+                resultados.append({
+                    "caso": nombre, "escala": escala, "laboratorios": n_labs, "filas": n_filas,
+                    "repeticiones": repeticiones,
+                    "min_s": round(minimo, 6), "mediana_s": round(mediana, 6),
+                })
+    return resultados
+
+
+def comparar(base, nuevo, umbral=UMBRAL):
+    """Casos cuyo mínimo empeoró más de `umbral` (relativo) y más que PISO_S. Imprime la tabla."""
+    clave = lambda r: (r["caso"], r["escala"])
+    antes = {clave(r): r for r in base["resultados"]}
+    regresiones = []
+    print(f"\n  {'caso':<24} {'escala':>6} {'antes ms':>11} {'ahora ms':>11} {'cambio':>8}")
+    for r in nuevo["resultados"]:
+        b = antes.get(clave(r))
+        if not b:
+            continue
+        cambio = r["min_s"] / b["min_s"] - 1 if b["min_s"] else 0.0
+        peor = cambio > umbral and r["min_s"] - b["min_s"] > PISO_S
+        if peor:
+            regresiones.append((r["caso"], r["escala"], cambio))
+        print(f"  {r['caso']:<24} {r['escala']:>6} {b['min_s'] * 1000:>11.1f} {r['min_s'] * 1000:>11.1f} "
+              f"{cambio:>+7.0%}{'  <<< REGRESIÓN' if peor else ''}")
+    if base.get("maquina") != nuevo.get("maquina"):
+        print("\n  AVISO: las corridas son de máquinas distintas; la comparación es orientativa.")
+    return regresiones
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del pipeline de estadística e informe.")
+    sub = ap.add_subparsers(dest="orden")
+    cmp_ = sub.add_parser("comparar", help="Compara dos corridas y falla si hay regresión")
+    cmp_.add_argument("base")
+    cmp_.add_argument("nuevo")
+    cmp_.add_argument("--umbral", type=float, default=UMBRAL,
+                      help=f"Empeoramiento relativo tolerado (por defecto {UMBRAL:.0%})")
+    ap.add_argument("--escalas", default=",".join(map(str, ESCALAS)),
+                    help="Múltiplos del tamaño real, separados por coma")
+    ap.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    ap.add_argument("--semilla", type=int, default=SEMILLA)
+    ap.add_argument("--casos", help="Solo los casos cuyo nombre empieza con alguno de estos")
+    ap.add_argument("--salida", help="Ruta del JSON (por defecto support/benchmarks/<fecha>.json)")
+    args = ap.parse_args()
+
+    if args.orden == "comparar":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.nuevo, encoding="utf-8") as f:
+            nuevo = json.load(f)
+        regresiones = comparar(base, nuevo, args.umbral)
+        if regresiones:
+            print(f"\n  {len(regresiones)} regresión(es) por encima de {args.umbral:.0%}.")
+            sys.exit(1)
+        print("\n  Sin regresiones.")
+        return
+
+    escalas = [float(x) if "." in x else int(x) for x in args.escalas.split(",")]
+    filtro = args.casos.split(",") if args.casos else None
+    doc = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": maquina(),
+        "semilla": args.semilla,
+        "resultados": correr(escalas, args.repeticiones, args.semilla, filtro),
+    }
+    salida = args.salida or os.path.join(
+        RESULTADOS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{socket.gethostname()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    print(f"\n  Resultados: {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,27 +13,51 @@ laboratorios juntos, sin importar el equipo.
 Diagnóstico --efecto-metodo: no calcula el informe; compara el resultado agrupado
 contra el que se obtendría evaluando cada plataforma analítica por separado
 (grupo de pares). Sirve para decidir qué analitos NO deben evaluarse agrupados.
+Agrega las modas de la densidad de cada analito (modas_kde), que también ven
+separaciones que no siguen a la plataforma.
+
+Estimador robusto: Algoritmo A salvo que la ronda declare otro de ISO 13528
+("estimador" en decisiones_evaluacion: q_hampel, made, niqr; ver ESTIMADORES).
+Diagnóstico --estimadores: X*/σ* y clasificaciones con cada uno, lado a lado.
+
+Rondas con varias muestras (columna 'muestra' del CSV): cada analito se evalúa
+por muestra, como un ítem propio ("Glucosa · M1"), y el JSON agrega el
+diagnóstico de Youden de cada par de muestras (youden()): qué parte de la
+dispersión entre laboratorios es sesgo propio que se repite y qué parte azar.
+
+Otros puntajes de ISO 13528 §9 (z′, ζ, En; ver puntajes.py): si la ronda declara
+"puntaje" en decisiones_evaluacion, o el CSV trae 'incertidumbre_raw', cada
+laboratorio lleva todos bajo puntajes.CLAVE y el tipo declarado (z si no hay)
+decide la clasificación.
 
 Uso:
   conda activate concalab
   python scripts/calcular_zscore.py --codigo EA-001-2026
   python scripts/calcular_zscore.py --codigo EA-001-2026 --efecto-metodo
+  python scripts/calcular_zscore.py --codigo EA-001-2026 --estimadores
 """
 
 import os
 import sys
 import csv
 import json
+import math
 import argparse
+import functools
 import statistics
 from collections import defaultdict, Counter
-from datetime import date
-
-import numpy as np
 
-ENTRADA_DIR = "support"
-SALIDA_DIR  = os.path.join("data", "informes")
-CONFIG_PATH = "data/config.json"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Rutas y lectura de config viven en nucleo (sin NumPy); se reexportan aquí
+# porque el resto de los scripts las importa desde este módulo.
+from nucleo import (  # noqa: E402
+    ENTRADA_DIR, SALIDA_DIR, CONFIG_PATH, VERSIONES_PATH,
+    codigo_activo, fecha_calculo, analitos_por_grupo_pares, analitos_sin_evaluar,
+    estimador_robusto, puntaje_ronda, huella, registrar_versiones, ESTIMADOR_POR_DEFECTO,
+    SEPARADOR_MUESTRA, nombre_item, analito_de, muestra_de,
+)
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+import puntajes  # noqa: E402
 
 # n mínimo para que la estadística robusta sea defendible (ISO 13528 §7).
 N_MINIMO = 12
@@ -43,92 +67,6 @@ N_MINIMO_GRUPO = 8
 # asignado agrupado deja de ser confiable.
 RAZON_BIMODAL = 1.5
 
-def fecha_calculo(codigo):
-    """Fecha de cálculo de la ronda, declarada en data/config.json.
-
-    Sin esto cada corrida estampa `date.today()`, de modo que recalcular una
-    ronda ya emitida —aunque no cambie una sola cifra— movería su fecha y
-    sugeriría un recálculo que no ocurrió. La fecha de un informe emitido es un
-    dato del informe, no del momento en que se ejecuta el script.
-
-    Una ronda que aún no la declara usa la de hoy y avisa, para que congelarla
-    sea un paso consciente antes de publicar y no un valor heredado.
-    """
-    with open(CONFIG_PATH, encoding="utf-8") as f:
-        cfg = json.load(f)
-    declarada = cfg.get("fecha_calculo", {}).get(codigo)
-    if declarada:
-        return declarada
-    hoy = date.today().isoformat()
-    print(f"  AVISO: {codigo} no declara fecha de cálculo en data/config.json "
-          f"→ se usa hoy ({hoy}).")
-    print(f"         Antes de publicar, congelarla: "
-          f'"fecha_calculo": {{"{codigo}": "{hoy}"}}')
-    return hoy
-
-
-def analitos_por_grupo_pares(codigo, area="quimica"):
-    """
-    Analitos que esta ronda evalúa por GRUPO DE PARES en vez de agrupados
-    (ISO 13528 §7). Se leen de data/config.json, no de una constante.
-
-    Vivía como constante de módulo, y eso era una bomba de tiempo: la decisión
-    tomada para una ronda se habría aplicado sola a todas las siguientes,
-    aunque los datos dijeran otra cosa. Cambiar la base de evaluación de un
-    analito es una decisión del proveedor del ensayo y pertenece a la ronda,
-    no al código.
-
-    Una ronda sin entrada arranca vacía a propósito: detectar_bimodales()
-    avisa qué analitos son candidatos y el proveedor decide y lo declara en
-    config.json. No se automatiza cruzando un umbral.
-    """
-    try:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            cfg = json.load(f)
-    except (OSError, ValueError) as e:
-        print(f"  AVISO: no se pudo leer {CONFIG_PATH} ({e}); se evalúa todo agrupado.")
-        return frozenset()
-
-    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
-    analitos = frozenset(d.get("grupo_pares") or ())
-
-    if not analitos:
-        print(f"  AVISO: {codigo}/{area} no declara analitos por grupo de pares en "
-              f"{CONFIG_PATH}.\n"
-              f"         Se evalúa todo agrupado. Revisa los avisos de bimodalidad:\n"
-              f"         un analito bimodal evaluado agrupado produce un falso "
-              f"negativo (σ* inflada, nadie reprueba).")
-    return analitos
-
-
-def analitos_sin_evaluar(codigo, area="quimica"):
-    """
-    Analitos que esta ronda publica SIN calificación de desempeño.
-
-    Devuelve (nombres, nota_publica). Es una decisión de política del proveedor,
-    no una consecuencia de los datos: se toma cuando no puede establecerse un
-    valor asignado defendible —por dispersión sin consenso, o porque el
-    comportamiento del material frente a ciertas plataformas no es atribuible al
-    desempeño del laboratorio (falta de conmutabilidad)—. Evaluar igualmente
-    produciría no conformidades que el proveedor no puede sostener.
-
-    Lo que esto implica aguas abajo, y que NO puede quedarse a medias: los
-    resultados salen con clasificación 'NE' y sin Z-Score, y el analito se
-    excluye del desempeño global y del resumen por laboratorio. Publicar la nota
-    conservando las clasificaciones dejaría el texto diciendo lo contrario de lo
-    que muestran el heatmap y la tabla.
-    """
-    try:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            cfg = json.load(f)
-    except (OSError, ValueError):
-        return frozenset(), None
-
-    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
-    nombres = frozenset(d.get("sin_evaluar") or ())
-    return nombres, d.get("sin_evaluar_nota")
-
-
 # ====================================================================
 # ALGORITMOS ISO 13528
 # ====================================================================
@@ -140,6 +78,7 @@ def robust_mean_sd(data, max_iterations=50, tol=1e-6):
     Winsoriza iterativamente a X* ± 1.5σ* hasta converger. Resistente a
     outliers, que es justo lo que abunda en un ensayo de aptitud.
     """
+    import numpy as np   # aquí y no arriba: config y --help no cargan NumPy
     x = np.sort(np.asarray(data, dtype=float))
     n = len(x)
     if n < 3:
@@ -167,8 +106,700 @@ def robust_mean_sd(data, max_iterations=50, tol=1e-6):
     return x_star, s_star
 
 
+# Bootstrap de u(X*): remuestreos por analito o grupo. Con 10 000 el percentil
+# 2.5 del intervalo se apoya en 250 remuestreos y u(X*) se estabiliza en la
+# tercera cifra.
+REMUESTREOS = 10_000
+SEMILLA_BOOTSTRAP = 13528
+# ISO 13528 §9.2: si u(X*) > 0.3·σpt la incertidumbre del valor asignado deja de
+# ser despreciable frente al criterio de evaluación.
+LIMITE_U = 0.3
+
+
+def robust_mean_sd_pesos(x, pesos, max_iterations=50, tol=1e-6):
+    """
+    robust_mean_sd() de muchas muestras a la vez, cada una descrita por cuántas
+    veces toma cada valor de `x`.
+
+    `x` es la muestra original ORDENADA (n valores) y `pesos` una matriz
+    (filas × n) de enteros: la fila i es la muestra que repite x[j] pesos[i, j]
+    veces. Un remuestreo bootstrap es una fila así, y también "todos menos uno".
+
+    Mismo algoritmo, mismo arranque (mediana y MAD, con los mismos respaldos si
+    la MAD es 0) y mismo criterio de convergencia; cada fila deja de iterar al
+    converger. Como `x` está ordenada, winsorizar a [X* − 1.5σ*, X* + 1.5σ*]
+    es ubicar los dos cortes con searchsorted y leer sumas acumuladas: cada
+    iteración cuesta O(filas · log n) y no O(filas · n). Devuelve dos arrays
+    (X*, σ*). Toda fila debe sumar al menos 3.
+    """
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos)
+    filas, n = pesos.shape
+    m = pesos.sum(axis=1)
+
+    # Arranque sobre las muestras explícitas, cada fila ya ordenada.
+    if (m == m[0]).all():
+        muestras = np.repeat(np.tile(x, filas), pesos.ravel()).reshape(filas, m[0])
+        k = np.arange(filas)
+        x_star = (muestras[k, (m[0] - 1) // 2] + muestras[k, m[0] // 2]) / 2
+        s_star = 1.483 * np.median(np.abs(muestras - x_star[:, None]), axis=1)
+        cero = np.flatnonzero(s_star == 0)
+        if cero.size:
+            q75, q25 = np.percentile(muestras[cero], [75, 25], axis=1)
+            iqr = (q75 - q25) / 1.349
+            s_star[cero] = np.where(iqr == 0, np.std(muestras[cero], axis=1, ddof=1), iqr)
+    else:
+        x_star, s_star = np.array([robust_mean_sd(np.repeat(x, p)) for p in pesos]).T
+        x_star, s_star = x_star.copy(), s_star.copy()
+
+    # Sumas acumuladas por fila, centradas para no perder cifras al restar.
+    centro = x[n // 2]
+    xc = x - centro
+    x_star -= centro
+    # Tablas aplanadas: la fila i empieza en i·(n + 1), así cada lectura es un
+    # solo índice por fila activa y no una copia de la fila entera.
+    ceros = np.zeros((filas, 1))
+    cuenta = np.hstack([ceros, np.cumsum(pesos, axis=1)]).ravel()
+    suma = np.hstack([ceros, np.cumsum(pesos * xc, axis=1)]).ravel()
+    suma2 = np.hstack([ceros, np.cumsum(pesos * xc * xc, axis=1)]).ravel()
+
+    activas = np.arange(filas)
+    for _ in range(max_iterations):
+        if not activas.size:
+            break
+        xs, ss, ma = x_star[activas], s_star[activas], m[activas]
+        lo, hi = xs - 1.5 * ss, xs + 1.5 * ss
+        base = activas * (n + 1)
+        i_lo = base + np.searchsorted(xc, lo, side="left")
+        i_hi = base + np.searchsorted(xc, hi, side="right")
+        abajo, arriba = cuenta[i_lo], ma - cuenta[i_hi]
+        x_new = (lo * abajo + suma[i_hi] - suma[i_lo] + hi * arriba) / ma
+        cuadrados = (lo * lo * abajo + suma2[i_hi] - suma2[i_lo] + hi * hi * arriba
+                     - ma * x_new * x_new)
+        s_new = 1.134 * np.sqrt(np.maximum(cuadrados, 0) / (ma - 1))
+        listas = (np.abs(x_new - xs) < tol) & (np.abs(s_new - ss) < tol)
+        x_star[activas], s_star[activas] = x_new, s_new
+        activas = activas[~listas]
+
+    return x_star + centro, s_star
+
+
+def robust_mean_sd_sin_uno(x, x_star, s_star, max_iterations=50, tol=1e-6):
+    """
+    robust_mean_sd() de la muestra sin cada uno de sus valores (jackknife).
+
+    `x` es la muestra ORDENADA y (x_star, s_star) su solución completa. Quitar
+    un valor mueve poco X* y σ*, así que cada submuestra arranca desde la
+    solución completa en vez de mediana y MAD, y llega al mismo punto fijo
+    (dentro de `tol`) en pocas iteraciones. Las sumas acumuladas son las de la
+    muestra completa: a la submuestra i solo se le descuenta x[i] en el tramo
+    donde cae. Cada iteración cuesta O(n log n) y la memoria es O(n), no la
+    matriz n × n de robust_mean_sd_pesos().
+
+    Devuelve dos arrays (X*, σ*) de largo n: el elemento i es la muestra sin
+    x[i]. Necesita n ≥ 4.
+    """
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    m = n - 1
+    centro = x[n // 2]
+    xc = x - centro
+    suma = np.concatenate([[0.0], np.cumsum(xc)])
+    suma2 = np.concatenate([[0.0], np.cumsum(xc * xc)])
+    xs_todas = np.full(n, x_star - centro)
+    ss_todas = np.full(n, float(s_star))
+
+    activas = np.arange(n)
+    for _ in range(max_iterations):
+        if not activas.size:
+            break
+        xs, ss = xs_todas[activas], ss_todas[activas]
+        lo, hi = xs - 1.5 * ss, xs + 1.5 * ss
+        k_lo = np.searchsorted(xc, lo, side="left")
+        k_hi = np.searchsorted(xc, hi, side="right")
+        # x[i] está entre los k primeros si i < k: ahí se descuenta.
+        fuera_lo, fuera_hi = activas < k_lo, activas < k_hi
+        medio = fuera_hi & ~fuera_lo
+        xi = xc[activas]
+        abajo = k_lo - fuera_lo
+        arriba = m - (k_hi - fuera_hi)
+        s1 = suma[k_hi] - suma[k_lo] - np.where(medio, xi, 0.0)
+        s2 = suma2[k_hi] - suma2[k_lo] - np.where(medio, xi * xi, 0.0)
+        x_new = (lo * abajo + s1 + hi * arriba) / m
+        cuadrados = lo * lo * abajo + s2 + hi * hi * arriba - m * x_new * x_new
+        s_new = 1.134 * np.sqrt(np.maximum(cuadrados, 0) / (m - 1))
+        listas = (np.abs(x_new - xs) < tol) & (np.abs(s_new - ss) < tol)
+        xs_todas[activas], ss_todas[activas] = x_new, s_new
+        activas = activas[~listas]
+
+    return xs_todas + centro, ss_todas
+
+
+# --------------------------------------------------------------------
+# Otros estimadores de ISO 13528:2022 (anexo C). Cada uno con la forma del
+# Algoritmo A: una función de una muestra que devuelve (X*, σ*) y una versión
+# por lotes sobre la muestra ordenada y una matriz de pesos, como
+# robust_mean_sd_pesos(), que es la que usan el bootstrap y el jackknife.
+# --------------------------------------------------------------------
+
+# Cortes de la función Ψ del estimador de Hampel (ISO 13528:2022, C.5.3).
+HAMPEL = (1.5, 3.0, 4.5)
+# Elementos (filas × pares, o filas × nudos) que se arman de una vez; por encima
+# las filas van en bloques.
+BLOQUE = 2_000_000
+
+
+def _cuantil(x, cuenta, q):
+    """
+    Cuantil q de cada fila, con la interpolación lineal de np.percentile sobre
+    la muestra explícita.
+
+    `x` son los valores ordenados (n, o filas × n si cada fila tiene su orden) y
+    `cuenta` las sumas acumuladas de los pesos de cada fila.
+    """
+    import numpy as np
+    m = cuenta[:, -1]
+    h = (m - 1) * q
+    k = np.floor(h).astype(int)
+    x = np.broadcast_to(x, cuenta.shape)
+    filas = np.arange(len(m))
+    lo = x[filas, (cuenta > k[:, None]).argmax(axis=1)]
+    hi = x[filas, (cuenta > np.minimum(k + 1, m - 1)[:, None]).argmax(axis=1)]
+    return lo + (h - k) * (hi - lo)
+
+
+def _sd_pesos(x, pesos):
+    """Desviación estándar (n − 1) de cada fila: el último respaldo si la robusta da 0."""
+    import numpy as np
+    m = pesos.sum(axis=1)
+    media = (pesos * x).sum(axis=1) / m
+    return np.sqrt((pesos * (x - media[:, None]) ** 2).sum(axis=1) / (m - 1))
+
+
+def niqr_pesos(x, pesos):
+    """
+    Mediana y nIQR = (Q3 − Q1)/1.349 (ISO 13528:2022, C.2.2) de cada fila, con
+    la misma entrada que robust_mean_sd_pesos(). Si el nIQR es 0, la desviación
+    estándar.
+    """
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos)
+    cuenta = np.cumsum(pesos, axis=1)
+    s = (_cuantil(x, cuenta, 0.75) - _cuantil(x, cuenta, 0.25)) / 1.349
+    s = np.where(s == 0, _sd_pesos(x, pesos), s)
+    return _cuantil(x, cuenta, 0.5), s
+
+
+def made_pesos(x, pesos):
+    """
+    Mediana y MADe = 1.483·mediana(|x − mediana|) (ISO 13528:2022, C.2.1) de
+    cada fila; `x` también puede traer una fila ordenada por muestra
+    (made_filas). Con más de la mitad de los resultados iguales la MADe es 0: ahí
+    pasa al nIQR y de ahí a la desviación estándar, los mismos respaldos con que
+    arranca el Algoritmo A.
+    """
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos)
+    mediana = _cuantil(x, np.cumsum(pesos, axis=1), 0.5)
+    desvios = np.abs(x - mediana[:, None])
+    orden = np.argsort(desvios, axis=1, kind="stable")
+    cuenta = np.cumsum(np.take_along_axis(pesos, orden, axis=1), axis=1)
+    s = 1.483 * _cuantil(np.take_along_axis(desvios, orden, axis=1), cuenta, 0.5)
+    cero = s == 0
+    if cero.any():
+        s[cero] = niqr_pesos(x[cero] if x.ndim == 2 else x, pesos[cero])[1]
+    return mediana, s
+
+
+def _primer_par(x, r, i, t, a, b, estricto=False):
+    """
+    Para cada (fila r, posición i): el primer j en [a, b) con x[r, j] − x[r, i]
+    > t (≥ si `estricto`), o b si no hay ninguno. Todo son arrays planos del
+    mismo largo. `x` (filas × n) está ordenada por fila, así que la diferencia
+    crece con j. Se compara la misma resta que da la diferencia de cada par:
+    el corte es exacto, sin tolerancias.
+
+    Con una sola fila compartida (x de broadcast: bootstrap, jackknife) el
+    candidato sale de searchsorted sobre x_i + t y se corrige al borde exacto
+    saltando grupos de valores iguales; si no, búsqueda binaria por posición.
+    """
+    import numpy as np
+    xi = x[r, i]
+    pasa = (lambda j: x[r, j] - xi >= t) if estricto else (lambda j: x[r, j] - xi > t)
+    if x.strides[0] == 0:
+        fila = x[0]
+        c = np.clip(np.searchsorted(fila, xi + t, side="left" if estricto else "right"), a, b)
+        while True:
+            baja = (c > a) & pasa(np.maximum(c - 1, 0))
+            sube = (c < b) & ~pasa(np.minimum(c, len(fila) - 1))
+            if not (baja.any() or sube.any()):
+                return c
+            c = np.where(baja, np.maximum(np.searchsorted(fila, fila[c - 1], side="left"), a), c)
+            c = np.where(sube, np.minimum(np.searchsorted(
+                fila, fila[np.minimum(c, len(fila) - 1)], side="right"), b), c)
+    lo, hi = np.array(a), np.array(b)
+    ultimo = x.shape[1] - 1
+    while True:
+        abierto = lo < hi
+        if not abierto.any():
+            return lo
+        medio = (lo + hi) // 2
+        p = pasa(np.minimum(medio, ultimo))
+        hi = np.where(abierto & p, medio, hi)
+        lo = np.where(abierto & ~p, medio + 1, lo)
+
+
+def _q_contando(x, pesos):
+    """
+    σ* del método Q de cada fila, sin armar los pares.
+
+    `x` (filas × n, o n compartida) ordenada y `pesos` (filas × n). Los pares
+    con |xi − xj| ≤ t se cuentan con el primer j de cada i que se pasa de t
+    (_primer_par) y una suma acumulada de los pesos. El salto t* donde H1
+    alcanza la meta se ubica por selección: cotas lo < t* ≤ hi y, por cada i,
+    el rango de j cuyo par cae entre ellas; un par al azar de los que quedan
+    parte el intervalo, y solo se buscan las posiciones con rango no vacío,
+    así que cada vuelta cuesta lo que quedan pares. De t* salen los saltos
+    vecinos con peso en esa fila y la interpolación de G1, como en la norma.
+    Memoria por fila O(n), no O(n²).
+    """
+    import numpy as np
+    from statistics import NormalDist
+    filas, n = pesos.shape
+    x = np.broadcast_to(x, (filas, n))
+    pesos = np.asarray(pesos, dtype=float)
+    acum = np.zeros((filas, n + 1))
+    acum[:, 1:] = np.cumsum(pesos, axis=1)
+    m = acum[:, -1]
+    pares = m * (m - 1) / 2
+    empates = (pesos * (pesos - 1) / 2).sum(axis=1)
+    r_, i_ = np.divmod(np.arange(filas * n), n)
+    desde, fin = i_ + 1, np.full(filas * n, n)
+
+    def contar(u, r=r_, i=i_, base=empates, desde=desde):
+        """Pares ≤ t de cada fila: base + los de j en [desde, u) de cada posición."""
+        w = pesos[r, i] * (acum[r, u] - acum[r, desde])
+        return base + np.bincount(r, weights=w, minlength=filas)
+
+    def primero(t, estricto=False):
+        return _primer_par(x, r_, i_, np.repeat(t, n), desde, fin, estricto)
+
+    L = primero(np.zeros(filas))
+    h0 = contar(L) / pares
+    meta = (0.25 + 0.75 * h0) * pares
+    # Con h0 = 1 todos los valores son iguales: σ* = 0 y nada que buscar.
+    validas = h0 < 1
+
+    # Selección de t*, el menor salto con pares(t*) ≥ meta. Invariante: una
+    # cota lo (solo se guarda c_lo = pares(lo)) y hi con c_lo < meta ≤ c_hi;
+    # el par (i, j) cae estrictamente entre las cotas si j ∈ [L, U).
+    hi = np.where(validas, x[:, -1] - x[:, 0], 0.0)
+    c_lo, c_hi = h0 * pares, pares.copy()
+    U = np.where(validas[r_], primero(hi, estricto=True), L)
+    rng = np.random.default_rng(0)
+    while True:
+        k = np.flatnonzero(U > L)
+        if not k.size:
+            break
+        r, i, a, b = r_[k], i_[k], L[k], U[k]
+        cuantos = np.bincount(r, weights=b - a, minlength=filas).astype(int)
+        activas = np.flatnonzero(cuantos)
+        # Pivote de cada fila activa: su par número q de los que quedan, q al azar.
+        q = (rng.random(activas.size) * cuantos[activas]).astype(int)
+        hasta = np.cumsum(b - a)
+        inicio = np.concatenate([[0], hasta[:-1]])
+        primera = np.searchsorted(r, activas)          # r viene ordenado por fila
+        s_ = np.searchsorted(hasta, inicio[primera] + q, side="right")
+        p = np.zeros(filas)
+        p[activas] = x[activas, a[s_] + inicio[primera] + q - inicio[s_]] - x[activas, i[s_]]
+
+        u = _primer_par(x, r, i, p[r], a, b)
+        c = contar(u, r, i, c_lo, a)
+        alcanza = np.zeros(filas, dtype=bool)
+        alcanza[activas] = c[activas] >= meta[activas]
+        sube = alcanza[r]
+        U[k[sube]] = _primer_par(x, r[sube], i[sube], p[r[sube]], a[sube], u[sube], estricto=True)
+        L[k[~sube]] = u[~sube]
+        baja = np.zeros(filas, dtype=bool)
+        baja[activas] = ~alcanza[activas]
+        hi[alcanza], c_hi[alcanza] = p[alcanza], c[alcanza]
+        c_lo[baja] = c[baja]
+
+    # G1 en un salto t es el promedio de los pares ≤ t y < t. Si en t* no llega
+    # a la meta, llega en el salto siguiente; el salto anterior es la otra
+    # punta de la interpolación (en 0, G1 = H1(0)).
+    llega = (c_hi + c_lo) / 2 >= meta
+    idx = np.arange(n)
+    con_peso = (pesos > 0).ravel()
+    siguiente = np.hstack([np.minimum.accumulate(np.where(pesos > 0, idx, n)[:, ::-1], axis=1)[:, ::-1],
+                           np.full((filas, 1), n)])
+    anterior = np.maximum.accumulate(np.where(pesos > 0, idx, -1), axis=1)
+
+    j = siguiente[r_, primero(hi)]
+    d = np.where(con_peso & (j < n), x[r_, np.minimum(j, n - 1)] - x[r_, i_], np.inf)
+    t_sig = np.where(llega, hi, np.minimum.reduceat(d, np.arange(0, filas * n, n)))
+    c_sig = contar(primero(np.where(validas, t_sig, 0.0)))
+
+    j = anterior[r_, primero(hi, estricto=True) - 1]
+    d = np.where(con_peso & (j > i_), x[r_, np.maximum(j, 0)] - x[r_, i_], -np.inf)
+    t_ant = np.where(llega, np.maximum(np.maximum.reduceat(d, np.arange(0, filas * n, n)), 0.0), hi)
+    c_ant = contar(primero(t_ant, estricto=True))
+
+    t1, g1 = t_sig, np.where(llega, c_hi + c_lo, c_sig + c_hi) / 2
+    t0 = t_ant
+    g0 = np.where(t0 > 0, np.where(llega, c_lo + c_ant, c_hi + c_lo) / 2, h0 * pares)
+    normal = NormalDist()
+    cuantil = np.array([normal.inv_cdf(0.625 + 0.375 * h) if h < 1 else np.inf for h in h0])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        raiz = t0 + (meta - g0) * (t1 - t0) / (g1 - g0)
+        return np.where(validas, raiz / (np.sqrt(2) * cuantil), 0.0)
+
+
+def q_pesos(x, pesos):
+    """
+    σ* por el método Q (ISO 13528:2022, C.5.2) de cada fila.
+
+    H1(t) es la fracción de pares de resultados con |xi − xj| ≤ t, G1 la
+    interpola entre los saltos de H1 y σ* = G1⁻¹(0.25 + 0.75·H1(0)) /
+    (√2·Φ⁻¹(0.625 + 0.375·H1(0))). Sobre la muestra ORDENADA, H1 de cada fila
+    en cualquier umbral se cuenta con búsquedas y sumas acumuladas de sus pesos
+    (_q_contando()): nunca se arman las n(n − 1)/2 diferencias, y las filas van
+    en bloques de BLOQUE celdas.
+    """
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos)
+    filas, n = pesos.shape
+    s = np.zeros(filas)
+    paso = max(1, BLOQUE // n)
+    for a in range(0, filas, paso):
+        s[a:a + paso] = _q_contando(x, pesos[a:a + paso])
+    return s
+
+
+def q_filas(muestras):
+    """
+    q_pesos() de cada fila de una matriz de muestras independientes del mismo
+    tamaño: cada fila con su propio orden y pesos 1.
+    """
+    import numpy as np
+    x = np.sort(np.asarray(muestras, dtype=float), axis=1)
+    filas, n = x.shape
+    s = np.zeros(filas)
+    paso = max(1, BLOQUE // n)
+    for a in range(0, filas, paso):
+        s[a:a + paso] = _q_contando(x[a:a + paso], np.ones((len(x[a:a + paso]), n)))
+    return s
+
+
+def hampel_pesos(x, pesos, s_star, mediana):
+    """
+    X* por el estimador de Hampel (ISO 13528:2022, C.5.3) de cada fila, dada su σ*.
+
+    `x` es la muestra ordenada o, como en made_pesos(), una fila por muestra.
+    X* resuelve Σ Ψ((xi − X*)/σ*) = 0. Como función de X* esa suma es lineal
+    entre los nudos xi ± {1.5, 3, 4.5}·σ*: se ordenan los 6n nudos de cada
+    fila, el valor en cada nudo sale de sumas acumuladas de las pendientes y las
+    raíces se interpolan donde cambia de signo. Es exacto y no itera. Con varias
+    raíces se toma la más cercana a la mediana, como indica la norma; con
+    σ* = 0, la mediana.
+    """
+    import numpy as np
+    a, b, c = HAMPEL
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    n = pesos.shape[1]
+    k = a / (c - b)
+    desplazamientos = np.array([-c, -b, -a, a, b, c])
+    # Cambio de pendiente (en unidades de 1/σ*) al pasar X* por cada nudo.
+    cambios = np.array([k, -k, -1.0, 1.0, k, -k])
+
+    x_star = np.array(mediana, dtype=float)
+    validas = np.flatnonzero(np.asarray(s_star) > 0)
+    paso = max(1, BLOQUE // (6 * n))
+    for a0 in range(0, validas.size, paso):
+        filas = validas[a0:a0 + paso]
+        s, med = s_star[filas], x_star[filas]
+        xb = x[filas] if x.ndim == 2 else x[None]
+        nudos = (xb[:, :, None] + s[:, None, None] * desplazamientos).reshape(len(filas), -1)
+        delta = (pesos[filas][:, :, None] * cambios / s[:, None, None]).reshape(len(filas), -1)
+        orden = np.argsort(nudos, axis=1)
+        nudos = np.take_along_axis(nudos, orden, axis=1)
+        pendiente = np.cumsum(np.take_along_axis(delta, orden, axis=1), axis=1)
+        f = np.zeros_like(nudos)
+        f[:, 1:] = np.cumsum(pendiente[:, :-1] * np.diff(nudos, axis=1), axis=1)
+        # Un tramo donde la suma es 0 (nadie a menos de 4.5σ*) debe leerse como
+        # 0 y no como el residuo de redondeo de la suma acumulada.
+        f[np.abs(f) < 1e-9 * pesos[filas].sum(axis=1)[:, None]] = 0.0
+        f0, f1, n0, n1 = f[:, :-1], f[:, 1:], nudos[:, :-1], nudos[:, 1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            raiz = np.where(f0 == f1, np.clip(med[:, None], n0, n1),
+                            n0 + f0 * (n1 - n0) / (f0 - f1))
+        cruza = ((f0 > 0) & (f1 <= 0)) | ((f0 < 0) & (f1 >= 0)) | ((f0 == 0) & (f1 == 0))
+        distancia = np.where(cruza, np.abs(raiz - med[:, None]), np.inf)
+        x_star[filas] = raiz[np.arange(len(filas)), distancia.argmin(axis=1)]
+    return x_star
+
+
+def q_hampel_pesos(x, pesos):
+    """σ* por el método Q y X* por el estimador de Hampel, de cada fila."""
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    pesos = np.asarray(pesos)
+    s = q_pesos(x, pesos)
+    return hampel_pesos(x, pesos, s, _cuantil(x, np.cumsum(pesos, axis=1), 0.5)), s
+
+
+def q_hampel_filas(muestras):
+    """q_hampel_pesos() de cada fila de una matriz de muestras independientes."""
+    import numpy as np
+    x = np.sort(np.asarray(muestras, dtype=float), axis=1)
+    pesos = np.ones(x.shape, dtype=int)
+    s = q_filas(x)
+    return hampel_pesos(x, pesos, s, np.median(x, axis=1)), s
+
+
+def made_filas(muestras):
+    """made_pesos() de cada fila de una matriz de muestras independientes."""
+    import numpy as np
+    x = np.sort(np.asarray(muestras, dtype=float), axis=1)
+    return made_pesos(x, np.ones(x.shape, dtype=int))
+
+
+def niqr_filas(muestras):
+    """niqr_pesos() de cada fila de una matriz de muestras independientes."""
+    import numpy as np
+    x = np.sort(np.asarray(muestras, dtype=float), axis=1)
+    return niqr_pesos(x, np.ones(x.shape, dtype=int))
+
+
+def robust_mean_sd_filas(muestras, max_iterations=50, tol=1e-6):
+    """
+    robust_mean_sd() de cada fila de una matriz de muestras independientes del
+    mismo tamaño (al menos 3): mismo arranque, mismos respaldos y cada fila deja
+    de iterar al converger. Cada iteración winsoriza la matriz de las filas
+    activas de una vez. Devuelve dos arrays (X*, σ*).
+    """
+    import numpy as np
+    x = np.sort(np.asarray(muestras, dtype=float), axis=1)
+    filas, n = x.shape
+    x_star = np.median(x, axis=1)
+    s_star = 1.483 * np.median(np.abs(x - x_star[:, None]), axis=1)
+    cero = np.flatnonzero(s_star == 0)
+    if cero.size:
+        q75, q25 = np.percentile(x[cero], [75, 25], axis=1)
+        iqr = (q75 - q25) / 1.349
+        s_star[cero] = np.where(iqr == 0, np.std(x[cero], axis=1, ddof=1), iqr)
+
+    activas = np.arange(filas)
+    for _ in range(max_iterations):
+        if not activas.size:
+            break
+        xs, ss = x_star[activas], s_star[activas]
+        x_w = np.clip(x[activas], (xs - 1.5 * ss)[:, None], (xs + 1.5 * ss)[:, None])
+        x_new = x_w.mean(axis=1)
+        s_new = 1.134 * np.sqrt(((x_w - x_new[:, None]) ** 2).sum(axis=1) / (n - 1))
+        listas = (np.abs(x_new - xs) < tol) & (np.abs(s_new - ss) < tol)
+        x_star[activas], s_star[activas] = x_new, s_new
+        activas = activas[~listas]
+    return x_star, s_star
+
+
+def _una_muestra(lote, data):
+    """(X*, σ*) de una muestra con la versión por lotes, como una sola fila de pesos 1."""
+    import numpy as np
+    x = np.sort(np.asarray(data, dtype=float))
+    n = len(x)
+    if n < 3:
+        return float(np.mean(x)), float(np.std(x, ddof=1)) if n > 1 else 0.0
+    xs, ss = lote(x, np.ones((1, n), dtype=int))
+    return float(xs[0]), float(ss[0])
+
+
+def made(data):
+    """Mediana y MADe de una muestra (ISO 13528:2022, C.2.1)."""
+    return _una_muestra(made_pesos, data)
+
+
+def niqr(data):
+    """Mediana y nIQR de una muestra (ISO 13528:2022, C.2.2)."""
+    return _una_muestra(niqr_pesos, data)
+
+
+def q_hampel(data):
+    """Método Q y estimador de Hampel de una muestra (ISO 13528:2022, C.5)."""
+    return _una_muestra(q_hampel_pesos, data)
+
+
+# Estimadores que una ronda puede declarar en decisiones_evaluacion (clave
+# "estimador"). `calcular` toma una muestra, `lote` la muestra ordenada y una
+# matriz de pesos y `filas` una matriz de muestras distintas del mismo tamaño
+# (simulaciones); los textos son los que publican el JSON y el informe.
+ESTIMADORES = {
+    "algoritmo_a": {
+        "nombre": "Algoritmo A",
+        "referencia": "ISO 13528:2022, C.3",
+        "valor_asignado": "media robusta",
+        "sd_robusta": "SD robusta — Algoritmo S",
+        "explicacion": "El Algoritmo A es un estimador robusto: acota iterativamente la "
+                       "influencia de los valores extremos, de modo que un resultado "
+                       "groseramente desviado no arrastra el valor asignado del conjunto.",
+        "calcular": robust_mean_sd,
+        "lote": robust_mean_sd_pesos,
+        "filas": robust_mean_sd_filas,
+    },
+    "q_hampel": {
+        "nombre": "método Q y estimador de Hampel",
+        "referencia": "ISO 13528:2022, C.5",
+        "valor_asignado": "media robusta",
+        "sd_robusta": "SD robusta — método Q",
+        "explicacion": "El método Q estima la dispersión a partir de las diferencias "
+                       "entre todos los pares de resultados y el estimador de Hampel "
+                       "anula el peso de los que se alejan más de 4,5 desviaciones: un "
+                       "resultado groseramente desviado no arrastra el valor asignado "
+                       "del conjunto, aunque sean muchos.",
+        "calcular": q_hampel,
+        "lote": q_hampel_pesos,
+        "filas": q_hampel_filas,
+    },
+    "made": {
+        "nombre": "mediana y MADe",
+        "referencia": "ISO 13528:2022, C.2",
+        "valor_asignado": "mediana",
+        "sd_robusta": "MADe = 1,483 · mediana de |x − mediana|",
+        "explicacion": "La mediana y la MADe resisten hasta la mitad de resultados "
+                       "desviados, a cambio de una eficiencia estadística menor que "
+                       "la del Algoritmo A.",
+        "calcular": made,
+        "lote": made_pesos,
+        "filas": made_filas,
+    },
+    "niqr": {
+        "nombre": "mediana y nIQR",
+        "referencia": "ISO 13528:2022, C.2",
+        "valor_asignado": "mediana",
+        "sd_robusta": "nIQR = rango intercuartílico / 1,349",
+        "explicacion": "La mediana resiste hasta la mitad de resultados desviados y el "
+                       "nIQR, el rango intercuartílico normalizado, hasta una cuarta "
+                       "parte en cada extremo.",
+        "calcular": niqr,
+        "lote": niqr_pesos,
+        "filas": niqr_filas,
+    },
+}
+
+_estimador = ESTIMADOR_POR_DEFECTO
+
+
+def usar_estimador(clave):
+    """
+    Fija el estimador con que _stats() calcula X* y σ* y con que se remuestrea
+    u(X*). Cada script lo llama con nucleo.estimador_robusto() de la ronda.
+    """
+    global _estimador
+    if clave not in ESTIMADORES:
+        sys.exit(f"ERROR: estimador '{clave}' desconocido en {CONFIG_PATH}. "
+                 f"Opciones: {', '.join(ESTIMADORES)}.")
+    _estimador = clave
+
+
+def estimador():
+    """El estimador activo: su entrada de ESTIMADORES, con la clave."""
+    return {"clave": _estimador, **ESTIMADORES[_estimador]}
+
+
+def estimador_publico():
+    """Lo que el JSON publica del estimador; None con el de por defecto, que no se anota."""
+    if _estimador == ESTIMADOR_POR_DEFECTO:
+        return None
+    e = estimador()
+    return {k: e[k] for k in ("clave", "nombre", "referencia", "valor_asignado",
+                              "sd_robusta", "explicacion")}
+
+
+def incertidumbre_asignado(valores, sigma_pt, clave, remuestreos=REMUESTREOS):
+    """
+    u(X*) por bootstrap, con intervalos al 95% para X* y σ* (ISO 13528 §7.7).
+
+    La semilla sale de `clave` —el analito, o analito/grupo—, así que el
+    resultado no depende de qué otros analitos se calculen en la misma corrida
+    y el JSON es reproducible byte a byte. Por lo mismo el remuestreo de unos
+    valores con una clave se hace una sola vez por proceso (_bootstrap()): el
+    consenso y CLIA comparten valores y solo difieren en σpt, y vigilar.py
+    recalcula una y otra vez analitos cuyos valores no cambiaron.
+
+    `despreciable` es la comprobación u(X*) ≤ 0.3·σpt; None si no hay σpt.
+    Devuelve None con menos de 3 resultados: no hay remuestreo que sirva.
+    """
+    import numpy as np
+    x = np.sort(np.asarray(valores, dtype=float))
+    if len(x) < 3 or not remuestreos:
+        return None
+    u, x_lo, x_hi, s_lo, s_hi = _bootstrap(x.tobytes(), clave, remuestreos, _estimador)
+    return {
+        "u": round(u, 4),
+        "ic95_valor_asignado": [round(x_lo, 4), round(x_hi, 4)],
+        "ic95_sd_robusta": [round(s_lo, 4), round(s_hi, 4)],
+        "u_sobre_sigma_pt": round(u / sigma_pt, 3) if sigma_pt else None,
+        "despreciable": (u <= LIMITE_U * sigma_pt) if sigma_pt else None,
+        "remuestreos": remuestreos,
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def _bootstrap(datos, clave, remuestreos, clave_estimador):
+    """
+    u(X*) e intervalos al 95% de X* y σ* de la muestra ordenada `datos` (bytes
+    de float64), con el estimador `clave_estimador`.
+
+    Los remuestreos se arman como matrices de conteos sobre la muestra ordenada
+    y pasan juntos por la versión por lotes del estimador (robust_mean_sd_pesos()
+    con el Algoritmo A), en bloques de a lo sumo BLOQUE celdas: la memoria no
+    crece con n × remuestreos. Los bloques tienen un número par de filas para
+    que el sorteo sea el mismo que de una sola vez.
+    """
+    import zlib
+    import numpy as np
+    x = np.frombuffer(datos)
+    n = len(x)
+    rng = np.random.default_rng([SEMILLA_BOOTSTRAP, zlib.crc32(clave.encode("utf-8"))])
+    lote = ESTIMADORES[clave_estimador]["lote"]
+    paso = max(2, BLOQUE // n // 2 * 2)
+    xb, sb = np.empty(remuestreos), np.empty(remuestreos)
+    for a in range(0, remuestreos, paso):
+        r = min(paso, remuestreos - a)
+        # Conteos de cada valor en cada remuestreo: índice sorteado + desplazamiento de fila.
+        sorteo = rng.integers(0, n, size=(r, n)) + n * np.arange(r)[:, None]
+        pesos = np.bincount(sorteo.ravel(), minlength=r * n).reshape(r, n)
+        xb[a:a + r], sb[a:a + r] = lote(x, pesos)
+    x_lo, x_hi = np.percentile(xb, [2.5, 97.5])
+    s_lo, s_hi = np.percentile(sb, [2.5, 97.5])
+    return (float(np.std(xb, ddof=1)), float(x_lo), float(x_hi), float(s_lo), float(s_hi))
+
+
+def informar_incertidumbre(analitos, sigma="σpt"):
+    """Avisa qué valores asignados no cumplen u(X*) ≤ 0.3·σpt. Devuelve cuántos."""
+    fuera = []
+    for a in analitos:
+        bloques = [(f"{a['nombre']} / {g['nombre']}", g) for g in a.get("grupos", [])]
+        for etiqueta, b in bloques or [(a["nombre"], a)]:
+            u = b.get("incertidumbre")
+            if u and u["despreciable"] is False:
+                fuera.append((etiqueta, u["u_sobre_sigma_pt"]))
+    if fuera:
+        print(f"\n  AVISO: u(X*) > {LIMITE_U}·{sigma} en {len(fuera)} valor(es) asignado(s) "
+              f"(ISO 13528 §9.2): la incertidumbre del valor asignado no es despreciable.")
+        for etiqueta, r in fuera:
+            print(f"    · {etiqueta} — u(X*) = {r:.2f}·{sigma}")
+    return len(fuera)
+
+
 def clasificar(z):
-    if z is None or np.isnan(z):
+    if z is None or math.isnan(z):
         return "NR"
     a = abs(z)
     return "A" if a <= 2.0 else ("C" if a < 3.0 else "I")
@@ -236,15 +867,59 @@ def unidad_canonica(unidades):
     return min(sorted(conteo), key=lambda u: -conteo[u])
 
 
+# Lecturas ya hechas del CSV: (ruta, categoría) → (firma del archivo, lectura).
+# Solo la activa un proceso de larga vida (scripts/servidor.py); en una corrida
+# suelta cada CSV se lee una vez y la caché sería memoria sin uso.
+_cache_csv = None
+
+
+def activar_cache_csv():
+    global _cache_csv
+    if _cache_csv is None:
+        _cache_csv = {}
+
+
 def cargar(codigo, categoria="Quím"):
     ruta = os.path.join(ENTRADA_DIR, f"ensayos_{codigo}.csv")
     if not os.path.exists(ruta):
         sys.exit(f"ERROR: no existe {ruta}\n"
                  f"Ejecuta primero: python scripts/extraer_resultados_firebase.py --codigo {codigo}")
 
+    if _cache_csv is None:
+        por_analito, descartados, ceros = leer_csv(ruta, categoria)
+    else:
+        # La firma cambia si el CSV se reescribe (una nueva extracción): la
+        # lectura guardada deja de valer sin que nadie tenga que invalidarla.
+        st = os.stat(ruta)
+        clave, firma = (os.path.abspath(ruta), categoria), (st.st_mtime_ns, st.st_size)
+        if _cache_csv.get(clave, (None,))[0] != firma:
+            _cache_csv[clave] = (firma, leer_csv(ruta, categoria))
+        guardado, descartados, ceros = _cache_csv[clave][1]
+        # Copia por fila: quien recibe la lectura no puede alterar la guardada.
+        por_analito = defaultdict(list, {a: [dict(f) for f in filas]
+                                         for a, filas in guardado.items()})
+
+    if ceros:
+        print(f"\n  AVISO: {len(ceros)} resultado(s) con valor 0 excluidos como "
+              f"'no reportado' (ver leer_csv() para el criterio):")
+        for cod, analito, crudo in ceros:
+            print(f"    · {cod}  {analito}  (reportado como {crudo!r})")
+
+    return por_analito, descartados
+
+
+def leer_csv(ruta, categoria):
+    """Filas numéricas de la categoría, por analito. Devuelve (por_analito, descartados, ceros).
+
+    Una ronda con varias muestras trae la columna 'muestra': cada analito se
+    evalúa entonces por muestra y la clave es el ítem ("Glucosa · M1",
+    nucleo.nombre_item). Con una sola muestra, o sin la columna, la clave es el
+    analito como siempre.
+    """
     por_analito = defaultdict(list)
     descartados = 0
     ceros = []
+    muestras = set()
     with open(ruta, encoding="utf-8") as f:
         for r in csv.DictReader(f):
             if not r["categoria"].startswith(categoria):
@@ -265,22 +940,31 @@ def cargar(codigo, categoria="Quím"):
                 ceros.append((r["id_publico"], r["analito"], r["resultado_raw"]))
                 descartados += 1
                 continue
-            por_analito[r["analito"]].append({
+            muestra = (r.get("muestra") or "").strip()
+            muestras.add(muestra)
+            # Incertidumbre expandida que reporta el laboratorio; se guarda la estándar.
+            u = a_float(r.get("incertidumbre_raw") or "")
+            por_analito[(r["analito"], muestra)].append({
                 "cod": r["id_publico"],
                 "valor": v,
                 "unidad": r["unidad_raw"],
                 "metodo": r["metodo"],
                 "instrumento": r["instrumento"],
                 "plataforma": plataforma(r["instrumento"], r["metodo"]),
+                "u": u / puntajes.K_COBERTURA if u and u > 0 else None,
             })
-
-    if ceros:
-        print(f"\n  AVISO: {len(ceros)} resultado(s) con valor 0 excluidos como "
-              f"'no reportado' (ver cargar() para el criterio):")
-        for cod, analito, crudo in ceros:
-            print(f"    · {cod}  {analito}  (reportado como {crudo!r})")
-
-    return por_analito, descartados
+    varias = len(muestras) > 1
+    if varias:
+        if "" in muestras:
+            sys.exit(f"ERROR: {ruta} declara varias muestras pero hay resultados sin 'muestra'.")
+        raros = sorted({a for a, _ in por_analito if SEPARADOR_MUESTRA in a})
+        if raros:
+            sys.exit(f"ERROR: {ruta}: el nombre de {', '.join(raros)} contiene "
+                     f"{SEPARADOR_MUESTRA!r}, que separa analito y muestra.")
+    por_item = defaultdict(list)
+    for (analito, muestra), filas in por_analito.items():
+        por_item[nombre_item(analito, muestra if varias else None)] = filas
+    return por_item, descartados, ceros
 
 
 def detectar_bimodales(analitos, por_analito):
@@ -311,19 +995,259 @@ def detectar_bimodales(analitos, por_analito):
     return marcados
 
 
+# Detector por densidad (modas_kde). Quedan fuera los resultados a un factor
+# ≥ FACTOR_MAGNITUD de la mediana: son errores de unidad, de eso se ocupa
+# diagnostico_magnitud en la extracción. Una moda necesita al menos MASA_MODA de
+# los resultados y un valle que baje de PROFUNDIDAD_ANTIMODA de la menor de sus
+# dos cimas para contar como separada.
+PUNTOS_KDE = 512
+FACTOR_MAGNITUD = 3.0
+MASA_MODA = 0.1
+PROFUNDIDAD_ANTIMODA = 0.7
+
+
+def modas_kde(por_analito):
+    """
+    Modas de la densidad de cada analito, sin mirar la plataforma.
+
+    detectar_bimodales() solo compara medianas de plataformas grandes, así que
+    no ve una separación que no siga las reglas de plataforma() ni una
+    plataforma chica. Aquí se estima la densidad con un kernel gaussiano de
+    ancho h = 0.9·s·n^(-1/5) (s = 1.483·MAD, como el gráfico de densidad de
+    ISO 13528) y se cuentan sus modas.
+
+    Todos los analitos van juntos: cada uno se lleva a unidades de su propio h
+    sobre una grilla de PUNTOS_KDE puntos que cubre sus datos, se agrupa en ella
+    por interpolación lineal y una sola FFT por lotes lo convoluciona con el
+    kernel muestreado a su paso. Las modas de masa < MASA_MODA o sin un valle
+    claro se funden con la vecina.
+
+    Devuelve {analito: {"n", "modas", "antimodas", "masas"}} con las posiciones
+    en unidades del analito. Analitos con menos de N_MINIMO resultados, o sin
+    dispersión, no se analizan.
+    """
+    import numpy as np
+    filas, centros, anchos, nombres = [], [], [], []
+    for nombre in sorted(por_analito):
+        x = np.array([f["valor"] for f in por_analito[nombre]], dtype=float)
+        med = float(np.median(x)) if len(x) else 0.0
+        if med > 0:
+            x = x[(x > med / FACTOR_MAGNITUD) & (x < med * FACTOR_MAGNITUD)]
+        if len(x) < N_MINIMO:
+            continue
+        s = 1.483 * float(np.median(np.abs(x - med)))
+        if s == 0:
+            q75, q25 = np.percentile(x, [75, 25])
+            s = (q75 - q25) / 1.349
+        if s == 0:
+            continue
+        h = 0.9 * s * len(x) ** -0.2
+        filas.append((x - med) / h)
+        centros.append(med)
+        anchos.append(h)
+        nombres.append(nombre)
+    if not nombres:
+        return {}
+
+    # Grilla de cada analito: sus datos ± 4h, en unidades de h. El kernel cubre
+    # ±4h, a lo sumo PUNTOS_KDE/2 pasos por lado: con 2·PUNTOS_KDE de largo la
+    # convolución circular no se pisa la cola.
+    k = len(nombres)
+    cuantos = [len(u) for u in filas]
+    inicio = np.array([u.min() - 4.0 for u in filas])
+    paso = (np.array([u.max() + 4.0 for u in filas]) - inicio) / (PUNTOS_KDE - 1)
+    fila = np.repeat(np.arange(k), cuantos)
+    pos = (np.concatenate(filas) - inicio[fila]) / paso[fila]
+    peso = np.repeat([1.0 / c for c in cuantos], cuantos)
+    i = np.minimum(pos.astype(int), PUNTOS_KDE - 2)
+    w = pos - i
+    base = fila * PUNTOS_KDE + i
+    masa = (np.bincount(base, peso * (1 - w), minlength=k * PUNTOS_KDE)
+            + np.bincount(base + 1, peso * w, minlength=k * PUNTOS_KDE)).reshape(k, PUNTOS_KDE)
+
+    largo = 2 * PUNTOS_KDE
+    j = np.fft.fftfreq(largo, 1.0 / largo)           # 0, 1, …, −1: desplazamientos circulares
+    t = j[None, :] * paso[:, None]
+    kernel = np.where(np.abs(t) <= 4.0, np.exp(-0.5 * t * t) / np.sqrt(2 * np.pi), 0.0)
+    densidad = np.fft.irfft(np.fft.rfft(masa, largo, axis=1) * np.fft.rfft(kernel, axis=1),
+                            largo, axis=1)[:, :PUNTOS_KDE]
+
+    d = densidad
+    cima = np.zeros_like(d, dtype=bool)
+    cima[:, 1:-1] = (d[:, 1:-1] > d[:, :-2]) & (d[:, 1:-1] >= d[:, 2:])
+    cima &= d > 1e-3 * d.max(axis=1, keepdims=True)
+    acumulada = np.cumsum(d, axis=1) * paso[:, None]
+
+    resultado = {}
+    for r, nombre in enumerate(nombres):
+        picos = list(np.flatnonzero(cima[r]))
+        while True:
+            valles = [p + int(np.argmin(d[r, p:q])) for p, q in zip(picos, picos[1:])]
+            if not valles:
+                break
+            bordes = [0] + valles + [PUNTOS_KDE - 1]
+            masas = np.diff(acumulada[r, bordes])
+            hondura = [d[r, v] / min(d[r, picos[m]], d[r, picos[m + 1]]) for m, v in enumerate(valles)]
+            m = int(np.argmax(hondura))
+            if hondura[m] <= PROFUNDIDAD_ANTIMODA:
+                chica = int(np.argmin(masas))
+                if masas[chica] >= MASA_MODA:
+                    break
+                # La moda chica se funde con la vecina de valle menos hondo.
+                vecinos = [v for v in (chica - 1, chica) if 0 <= v < len(valles)]
+                m = max(vecinos, key=lambda v: hondura[v])
+            # Se quita el valle m: sobrevive la cima más alta de las dos.
+            del picos[m if d[r, picos[m]] < d[r, picos[m + 1]] else m + 1]
+        bordes = [0] + valles + [PUNTOS_KDE - 1]
+        a_valor = lambda g: round(float(centros[r] + (inicio[r] + g * paso[r]) * anchos[r]), 4)  # noqa: E731
+        resultado[nombre] = {
+            "n": len(filas[r]),
+            "modas": [a_valor(p) for p in picos],
+            "antimodas": [a_valor(v) for v in valles],
+            "masas": [round(float(x), 3) for x in np.diff(acumulada[r, bordes])],
+        }
+    return resultado
+
+
+def imprimir_modas(modas, por_analito):
+    """Analitos con más de una moda y qué plataformas caen en cada una. Devuelve cuántos."""
+    multimodales = {a: m for a, m in modas.items() if len(m["modas"]) > 1}
+    print("\n" + "=" * 78)
+    print("  MODAS DE LA DISTRIBUCIÓN — densidad por kernel, sin separar plataformas")
+    print("=" * 78)
+    for nombre, m in multimodales.items():
+        print(f"\n  {nombre}  (n={m['n']}, {len(m['modas'])} modas)")
+        # Mismos extremos que modas_kde(): los errores de magnitud no cuentan.
+        med = statistics.median(f["valor"] for f in por_analito[nombre])
+        cortes = [med / FACTOR_MAGNITUD] + m["antimodas"] + [med * FACTOR_MAGNITUD]
+        for k, (moda, masa) in enumerate(zip(m["modas"], m["masas"])):
+            plataformas = Counter(f["plataforma"] for f in por_analito[nombre]
+                                  if cortes[k] < f["valor"] <= cortes[k + 1])
+            detalle = ", ".join(f"{p} {c}" for p, c in plataformas.most_common())
+            print(f"      moda {moda:>10g}  ({masa:.0%})  {detalle}")
+            if k < len(m["antimodas"]):
+                print(f"      ── antimoda {m['antimodas'][k]:g}")
+    if not multimodales:
+        print("\n  Ningún analito muestra más de una moda.")
+    print("\n" + "-" * 78)
+    print(f"  Analitos con más de una moda: {len(multimodales)} de {len(modas)} analizados")
+    print("-" * 78)
+    return len(multimodales)
+
+
 # ====================================================================
 # CÁLCULO
 # ====================================================================
 
 def _stats(valores):
-    x, s = robust_mean_sd(valores)
+    x, s = ESTIMADORES[_estimador]["calcular"](valores)
     return round(x, 2), round(s, 2), round((s / x * 100) if x else 0.0, 1)
 
 
+def _stats_lote(listas):
+    """
+    _stats() de muchas muestras en una llamada por tamaño: las de igual n (el
+    mismo analito en cada muestra de la ronda, casi siempre) pasan juntas, como
+    filas de una matriz, por la versión `filas` del estimador, que da los mismos
+    X* y σ* que la de una muestra. Con menos de 3 valores, _stats() de siempre.
+    """
+    import numpy as np
+    por_n = defaultdict(list)
+    for i, v in enumerate(listas):
+        por_n[len(v)].append(i)
+    salida = [None] * len(listas)
+    for n, indices in por_n.items():
+        if n < 3:
+            for i in indices:
+                salida[i] = _stats(listas[i])
+            continue
+        xs, ss = ESTIMADORES[_estimador]["filas"](np.array([listas[i] for i in indices], dtype=float))
+        for i, x, s in zip(indices, xs.tolist(), ss.tolist()):
+            salida[i] = round(x, 2), round(s, 2), round((s / x * 100) if x else 0.0, 1)
+    return salida
+
+
+def hay_incertidumbre(por_analito):
+    """¿Algún laboratorio reportó su incertidumbre? Entonces ζ y En tienen con qué calcularse."""
+    return any(f.get("u") for filas in por_analito.values() for f in filas)
+
+
+def puntuar(filas, entrada, x_asignado, sigma_pt, incertidumbre, s_star, puntaje,
+            extra=None, redondeado=False):
+    """
+    Entradas de laboratorio de un bloque con todos los tipos de puntaje
+    (puntajes.calcular(), una sola operación) bajo puntajes.CLAVE. 'z_score'
+    sigue siendo z; la 'clasificacion' la decide el tipo `puntaje` de la ronda.
+    Un laboratorio sin ese puntaje (ζ o En sin incertidumbre reportada) queda
+    'NE' y sin 'z_score', como cualquier no evaluado; sus demás puntajes se
+    publican igual. z′, ζ y En se clasifican ya redondeados, el mismo número
+    que se publica; z conserva la regla de cada modelo (`redondeado` en CLIA).
+    """
+    u_x = puntajes.u_asignado(incertidumbre, s_star, len(filas))
+    P = puntajes.calcular([f["valor"] for f in filas],
+                          [f.get("u") or float("nan") for f in filas],
+                          x_asignado, sigma_pt, u_x)
+    fila = list(puntajes.PUNTAJES).index(puntaje)
+    labs = []
+    for k, f in enumerate(filas):
+        valor = float(P[fila, k])
+        mas = {**(extra or {}), puntajes.CLAVE: puntajes.publicos(P[:, k].tolist())}
+        if math.isnan(valor):
+            labs.append(entrada(f, None, mas))
+            continue
+        d = entrada(f, (f["valor"] - x_asignado) / sigma_pt if sigma_pt else None, mas)
+        if d["z_score"] is not None:
+            redondear = redondeado or puntaje != "z"
+            d["clasificacion"] = puntajes.clasificar(round(valor, 2) if redondear else valor,
+                                                     puntaje)
+        labs.append(d)
+    return labs
+
+
+def puntaje_de_ronda(codigo, area, modelo, por_analito):
+    """
+    Tipo de puntaje que clasifica a `modelo` en esta ronda (nucleo.puntaje_ronda()).
+    Sin declarar, None —z de siempre, JSON sin puntajes— salvo que el CSV traiga
+    incertidumbres: entonces se calculan todos y sigue clasificando z.
+    """
+    tipo = puntaje_ronda(codigo, area, modelo)
+    if tipo:
+        return puntajes.validar_tipo(tipo)
+    return puntajes.POR_DEFECTO if hay_incertidumbre(por_analito) else None
+
+
+def avisar_solo_z(codigo, area, modelos):
+    """
+    Los diagnósticos que reclasifican por su cuenta (influencia.py,
+    barrido_umbrales.py, potencia.py) lo hacen con z. Si la ronda declara otro
+    puntaje para alguno de `modelos`, sus cambios de clase y conteos A/C/I no
+    son los publicados: se avisa antes de mostrarlos.
+    """
+    for modelo in modelos:
+        tipo = puntaje_ronda(codigo, area, modelo)
+        if tipo and puntajes.validar_tipo(tipo) != puntajes.POR_DEFECTO:
+            p = puntajes.PUNTAJES[tipo]
+            print(f"\n  AVISO: {codigo} clasifica el modelo {modelo} con {p['nombre']} "
+                  f"= {p['formula']}; este diagnóstico clasifica por z.")
+            print(f"         Sus cambios de clase y conteos A/C/I no son los publicados.")
+
+
+def reemplazar_analitos(previos, nuevos, sucios, por_analito):
+    """Resultados previos con los analitos `sucios` sustituidos por `nuevos`.
+
+    Los que ya no tienen filas en `por_analito` salen. El orden es el de
+    siempre, por nombre, para que el JSON no dependa de qué se recalculó.
+    """
+    quedan = [a for a in previos if a["nombre"] not in sucios and a["nombre"] in por_analito]
+    return sorted(quedan + nuevos, key=lambda a: a["nombre"])
+
+
 def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=frozenset(),
-                      nota_sin_evaluar=None):
+                      nota_sin_evaluar=None, previos=None, sucios=None,
+                      remuestreos=REMUESTREOS, puntaje=None):
     """
-    Calcula X*, σ* y Z-Score por analito.
+    Calcula X*, σ* y Z-Score por analito (o por analito y muestra: un ítem de
+    leer_csv(); las decisiones se buscan por su analito, nucleo.analito_de()).
 
     Por defecto todos los laboratorios se evalúan juntos. Los analitos listados
     en `por_grupo_pares` se evalúan por grupo de pares (ISO 13528 §7): cada
@@ -332,7 +1256,33 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
     grupos. Un grupo con menos de N_MINIMO_GRUPO participantes no da estadística
     defendible: esos laboratorios se reportan SIN evaluar (clasificación 'NE'),
     no se anexan al grupo más parecido.
+
+    Con `previos` (la salida de una llamada anterior) solo se recalculan los
+    analitos de `sucios` y el resto se conserva. Cada analito depende solo de
+    sus propias filas y de su decisión, así que el resultado es el mismo que
+    recalcular todo; scripts/vigilar.py lo usa al editar una decisión.
+
+    Cada valor asignado lleva su `incertidumbre` (incertidumbre_asignado(), con
+    σpt = σ*). `remuestreos=0` la omite: la primera pasada que solo busca
+    bimodalidad no la necesita.
+
+    Con `puntaje` (un tipo de puntajes.PUNTAJES) cada laboratorio lleva además
+    z′, ζ y En bajo puntajes.CLAVE, y ese tipo decide su clasificación (puntuar()).
     """
+    if previos is not None:
+        sub = {n: por_analito[n] for n in sucios if n in por_analito}
+        nuevos = calcular_agrupado(sub, por_grupo_pares, sin_evaluar, nota_sin_evaluar,
+                                   remuestreos=remuestreos, puntaje=puntaje)
+        return reemplazar_analitos(previos, nuevos, sucios, por_analito)
+
+    # X* y σ* de todos los analitos agrupados en una sola pasada por lotes: con
+    # varias muestras por ronda hay un ítem por analito y muestra, y el
+    # estimador los procesa juntos en vez de uno a uno.
+    agrupados = [n for n in sorted(por_analito)
+                 if analito_de(n) not in sin_evaluar and analito_de(n) not in por_grupo_pares]
+    stats = dict(zip(agrupados, _stats_lote([[f["valor"] for f in por_analito[n]]
+                                             for n in agrupados])))
+
     analitos = []
     for nombre in sorted(por_analito):
         filas = por_analito[nombre]
@@ -356,7 +1306,7 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
         # cada laboratorio se ubique, pero NO se emite valor asignado. Publicar un
         # X* sería contradictorio — es justamente lo que la ronda no puede
         # sostener. La mediana viaja aparte, rotulada como referencia descriptiva.
-        if nombre in sin_evaluar:
+        if analito_de(nombre) in sin_evaluar:
             valores = [f["valor"] for f in filas]
             labs = [entrada(f, None) for f in filas]
             labs.sort(key=lambda l: l["resultado"])
@@ -377,7 +1327,7 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
             })
             continue
 
-        if nombre in por_grupo_pares:
+        if analito_de(nombre) in por_grupo_pares:
             grupos_filas = defaultdict(list)
             for f in filas:
                 grupos_filas[f["plataforma"]].append(f)
@@ -386,12 +1336,18 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
             for g, gf in sorted(grupos_filas.items(), key=lambda kv: -len(kv[1])):
                 evaluable = len(gf) >= N_MINIMO_GRUPO
                 if evaluable:
-                    gx, gs, gcv = _stats([f["valor"] for f in gf])
+                    valores = [f["valor"] for f in gf]
+                    gx, gs, gcv = _stats(valores)
+                    inc = incertidumbre_asignado(valores, gs, f"{nombre}/{g}", remuestreos)
                     grupos.append({
                         "nombre": g, "n": len(gf), "evaluado": True,
                         "valor_asignado": gx, "sd_robusta": gs, "cv": gcv,
                         "n_suficiente": len(gf) >= N_MINIMO,
+                        "incertidumbre": inc,
                     })
+                    if puntaje:
+                        labs.extend(puntuar(gf, entrada, gx, gs, inc, gs, puntaje, {"grupo": g}))
+                        continue
                     for f in gf:
                         z = (f["valor"] - gx) / gs if gs else None
                         labs.append(entrada(f, z, {"grupo": g}))
@@ -422,8 +1378,13 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
             })
             continue
 
-        x_star, s_star, cv = _stats([f["valor"] for f in filas])
-        labs = [entrada(f, (f["valor"] - x_star) / s_star if s_star else None) for f in filas]
+        valores = [f["valor"] for f in filas]
+        x_star, s_star, cv = stats[nombre]
+        inc = incertidumbre_asignado(valores, s_star, nombre, remuestreos)
+        if puntaje:
+            labs = puntuar(filas, entrada, x_star, s_star, inc, s_star, puntaje)
+        else:
+            labs = [entrada(f, (f["valor"] - x_star) / s_star if s_star else None) for f in filas]
         labs.sort(key=lambda l: (l["z_score"] is None, l["z_score"] or 0))
 
         analitos.append({
@@ -433,6 +1394,7 @@ def calcular_agrupado(por_analito, por_grupo_pares=frozenset(), sin_evaluar=froz
             "sd_robusta": s_star,
             "cv": cv,
             "n_suficiente": len(filas) >= N_MINIMO,
+            "incertidumbre": inc,
             "laboratorios": labs,
         })
     return analitos
@@ -485,23 +1447,198 @@ def imprimir_agrupado(analitos):
     print("=" * 96)
 
 
+# ====================================================================
+# DIAGNÓSTICO DE ESTIMADOR
+# ====================================================================
+
+def comparar_estimadores(por_analito, por_grupo_pares=frozenset(), sin_evaluar=frozenset(),
+                         nota_sin_evaluar=None, puntaje=None):
+    """
+    X* y σ* de cada analito (o grupo de pares) con cada estimador de
+    ESTIMADORES, y cuántas clasificaciones A/C/I daría cada uno, con las mismas
+    decisiones de la ronda (incluido el `puntaje` con que clasifica). Marca con * dónde algún X* se aparta del vigente más
+    de LIMITE_U·σ*: ahí elegir estimador cambia el valor asignado en una medida
+    que ISO 13528 ya no considera despreciable.
+
+    Devuelve {clave: analitos} (salida de calcular_agrupado()). Solo z prescinde
+    del bootstrap: z′, ζ y En dependen de u(X*) y la remuestran como el informe.
+    """
+    remuestreos = REMUESTREOS if puntaje not in (None, puntajes.POR_DEFECTO) else 0
+    vigente = _estimador
+    resultados = {}
+    try:
+        for clave in ESTIMADORES:
+            usar_estimador(clave)
+            resultados[clave] = calcular_agrupado(
+                por_analito, por_grupo_pares, sin_evaluar, nota_sin_evaluar,
+                remuestreos=remuestreos, puntaje=puntaje)
+    finally:
+        usar_estimador(vigente)
+
+    claves = list(ESTIMADORES)
+    print("\n" + "=" * 112)
+    print(f"  ESTIMADOR ROBUSTO — X* / σ* por estimador (vigente: {ESTIMADORES[vigente]['nombre']})")
+    print("=" * 112)
+    print(f"  {'Analito':<30}{'n':>4}" + "".join(f"{c:>19}" for c in claves))
+    print("  " + "-" * 108)
+
+    def fila(etiqueta, n, valores):
+        ref_x, ref_s = valores[vigente]
+        aparte = bool(ref_s) and any(abs(x - ref_x) > LIMITE_U * ref_s for x, _ in valores.values())
+        print(f" {'*' if aparte else ' '}{etiqueta[:30]:<30}{n:>4}"
+              + "".join(f"{f'{x:g} / {s:g}':>19}" for x, s in (valores[c] for c in claves)))
+        return aparte
+
+    marcados = 0
+    por_clave = {c: {a["nombre"]: a for a in resultados[c]} for c in claves}
+    for a in resultados[vigente]:
+        nombre = a["nombre"]
+        if a["evaluacion"] == "no_evaluada":
+            continue
+        if a["evaluacion"] == "agrupada":
+            filas = [(nombre, a["n"], {c: (por_clave[c][nombre]["valor_asignado"],
+                                           por_clave[c][nombre]["sd_robusta"]) for c in claves})]
+        else:
+            filas = []
+            for i, g in enumerate(a["grupos"]):
+                if g["evaluado"]:
+                    otros = {c: por_clave[c][nombre]["grupos"][i] for c in claves}
+                    filas.append((f"{nombre} / {g['nombre']}", g["n"],
+                                  {c: (o["valor_asignado"], o["sd_robusta"]) for c, o in otros.items()}))
+        for etiqueta, n, valores in filas:
+            marcados += fila(etiqueta, n, valores)
+
+    print("  " + "-" * 108)
+    print(f"  Clasificación por {puntajes.PUNTAJES[puntaje or puntajes.POR_DEFECTO]['nombre']}:")
+    for c in claves:
+        tot = Counter(l["clasificacion"] for a in resultados[c] for l in a["laboratorios"])
+        print(f"  {c:<14}{ESTIMADORES[c]['nombre']:<34}A {tot['A']:>5}   C {tot['C']:>4}   "
+              f"I {tot['I']:>4}   NE {tot['NE']:>4}")
+    print("=" * 112)
+    print(f"  * X* de algún estimador a más de {LIMITE_U}·σ* del vigente: {marcados}")
+    print("=" * 112)
+    return resultados
+
+
 # ====================================================================
 # DIAGNÓSTICO DE EFECTO DE MÉTODO
 # ====================================================================
 
+# Prueba de permutación del efecto de plataforma: como máximo PERMUTACIONES
+# reetiquetados por analito, por lotes que empiezan en LOTE_PERMUTACIONES y se
+# duplican sin pasar de CELDAS_LOTE valores (la memoria no crece con la
+# ronda). Un analito sale antes si su p ya está decidido para leerlo: con
+# PARADA_PERMUTACIONES excedencias es claramente grande (Besag y Clifford,
+# 1991); si el p de Monte Carlo ya es menor que P_PISO se informa "p < P_PISO"
+# sin refinarlo (sin excedencias, basta el primer lote). Solo los p
+# intermedios recorren todas.
+PERMUTACIONES = 9_999
+LOTE_PERMUTACIONES = 100
+CELDAS_LOTE = 4_000_000
+PARADA_PERMUTACIONES = 20
+P_PISO = 0.01
+SEMILLA_PERMUTACION = 17043
+
+
+def _diferencia_medianas(W, lim, primer_tramo):
+    """
+    Estadístico de cada analito en cada fila de `W`: mediana mayor menos
+    mediana menor entre sus plataformas. Cada fila tiene los valores de todos
+    los analitos uno tras otro, y dentro de cada analito plataforma tras
+    plataforma; cada plataforma ocupa un tramo `lim` = (inicio, fin) fijo, y
+    reetiquetar es barajar los valores dentro del bloque de su analito. Las
+    medianas de todos los tramos salen de un único sort: sumar 2·tramo a cada
+    valor (W ∈ [0, 1]) ordena cada tramo sin mezclarlo con los vecinos.
+    """
+    import numpy as np
+    tramo = np.repeat(np.arange(len(lim)), lim[:, 1] - lim[:, 0])
+    S = np.sort(W + 2.0 * tramo, axis=1)
+    lo, hi = (lim[:, 0] + lim[:, 1] - 1) // 2, (lim[:, 0] + lim[:, 1]) // 2
+    med = (S[:, lo] + S[:, hi]) / 2 - 2.0 * np.arange(len(lim))
+    return (np.maximum.reduceat(med, primer_tramo, axis=1)
+            - np.minimum.reduceat(med, primer_tramo, axis=1))
+
+
+def permutacion_plataformas(candidatos, permutaciones=PERMUTACIONES, semilla=SEMILLA_PERMUTACION):
+    """
+    p de la diferencia de medianas entre plataformas de cada analito bajo
+    reetiquetado al azar de los laboratorios (H0: la plataforma no importa).
+    `candidatos` es {nombre: [valores de cada plataforma]}. Devuelve
+    {nombre: (p, permutaciones hechas)}; p = P_PISO quiere decir "menor que".
+
+    Todos los analitos se permutan juntos en una matriz permutación ×
+    laboratorio, con un sort por lote para todos (_diferencia_medianas). Los
+    valores se llevan a [0, 1] dentro de cada analito; la diferencia escala
+    igual en el original y en cada permutación, así que el p no cambia y los
+    analitos comparten la matriz.
+
+    p = (excedencias + 1) / (permutaciones + 1); si el analito paró por
+    excedencias, excedencias / permutaciones.
+    """
+    import numpy as np
+    rng = np.random.default_rng(semilla)
+    nombres = sorted(candidatos)
+    u_de, lims_de = {}, {}
+    for n in nombres:
+        x = np.concatenate([np.asarray(g, dtype=float) for g in candidatos[n]])
+        rango = x.max() - x.min()
+        u_de[n] = (x - x.min()) / rango if rango else np.zeros_like(x)
+        lims_de[n] = np.cumsum([0] + [len(g) for g in candidatos[n]])
+
+    excedencias = dict.fromkeys(nombres, 0)
+    hechas = dict.fromkeys(nombres, 0)
+    piso = set()
+    activos, lote = list(nombres), LOTE_PERMUTACIONES
+    while activos:
+        inicio = np.cumsum([0] + [len(u_de[n]) for n in activos])[:-1]
+        lim = np.concatenate([np.column_stack([l[:-1], l[1:]]) + i0
+                              for n, i0 in zip(activos, inicio) for l in [lims_de[n]]])
+        primer_tramo = np.cumsum([0] + [len(lims_de[n]) - 1 for n in activos])[:-1]
+        t0 = _diferencia_medianas(np.concatenate([u_de[n] for n in activos])[None, :],
+                                  lim, primer_tramo)[0]
+
+        # Los activos llevan todos las mismas permutaciones: empezaron juntos.
+        b = min(lote, permutaciones - hechas[activos[0]],
+                max(LOTE_PERMUTACIONES, CELDAS_LOTE // int(inicio[-1] + len(u_de[activos[-1]]))))
+        W = np.concatenate([rng.permuted(np.tile(u_de[n], (b, 1)), axis=1) for n in activos],
+                           axis=1)
+        t = _diferencia_medianas(W, lim, primer_tramo)
+        exc = (t >= t0 - 1e-9).sum(axis=0)
+        siguen = []
+        for n, e in zip(activos, exc.tolist()):
+            excedencias[n] += e
+            hechas[n] += b
+            if (excedencias[n] + 1) / (hechas[n] + 1) < P_PISO:
+                piso.add(n)
+            elif excedencias[n] < PARADA_PERMUTACIONES and hechas[n] < permutaciones:
+                siguen.append(n)
+        activos, lote = siguen, lote * 2
+
+    return {n: (P_PISO if n in piso
+                else excedencias[n] / hechas[n] if excedencias[n] >= PARADA_PERMUTACIONES
+                else (excedencias[n] + 1) / (hechas[n] + 1), hechas[n])
+            for n in nombres}
+
+
+def _fmt_p(p):
+    return f"p < {P_PISO:g}" if p <= P_PISO else f"p = {p:.3f}"
+
+
 def efecto_metodo(analitos, por_analito):
     """
     Compara evaluación agrupada vs por grupo de pares (plataforma).
 
     Para cada analito con al menos dos plataformas de tamaño suficiente:
       - razón entre las medianas de las plataformas (magnitud del sesgo)
+      - p de una prueba de permutación de esa diferencia (significancia:
+        permutacion_plataformas(), todos los analitos a la vez)
       - cuántos laboratorios cambian de clasificación al evaluarse por grupo
     """
     print("\n" + "=" * 92)
     print("  EFECTO DE PLATAFORMA ANALÍTICA — agrupado vs. grupo de pares")
     print("=" * 92)
 
-    afectados = []
+    afectados, candidatos = [], {}
     for a in analitos:
         filas = por_analito[a["nombre"]]
 
@@ -519,6 +1656,7 @@ def efecto_metodo(analitos, por_analito):
         if len(grandes) < 2:
             continue
 
+        candidatos[a["nombre"]] = [[f["valor"] for f in v] for v in grandes.values()]
         medianas = {g: statistics.median([f["valor"] for f in v]) for g, v in grandes.items()}
         alto = max(medianas, key=medianas.get)
         bajo = min(medianas, key=medianas.get)
@@ -528,7 +1666,7 @@ def efecto_metodo(analitos, por_analito):
         cambios, detalle_grupos = 0, []
         for g, v in grandes.items():
             vals = [f["valor"] for f in v]
-            gx, gs = robust_mean_sd(vals)
+            gx, gs = ESTIMADORES[_estimador]["calcular"](vals)
             c_pool = Counter()
             c_peer = Counter()
             for f in v:
@@ -544,13 +1682,25 @@ def efecto_metodo(analitos, por_analito):
         if razon >= 1.5 or cambios:
             afectados.append((a, razon, cambios, detalle_grupos, x_pool, s_pool, cv_pool))
 
+    pvalores = permutacion_plataformas(candidatos)
+    # Una diferencia significativa puede ser demasiado chica para importar; se
+    # nombra, pero no es efecto relevante por sí sola.
+    solo_significativos = sorted(
+        n for n, (p, _) in pvalores.items()
+        if p < 0.05 and n not in {a["nombre"] for a, *_ in afectados})
+
     if not afectados:
         print("  Ningún analito muestra efecto de plataforma relevante.")
+        if solo_significativos:
+            print(f"  Diferencia significativa (p < 0.05) pero pequeña: "
+                  f"{', '.join(solo_significativos)}")
         return
 
     afectados.sort(key=lambda x: -x[1])
     for a, razon, cambios, detalle, x_pool, s_pool, cv_pool in afectados:
-        print(f"\n  {a['nombre']}  —  razón entre plataformas: {razon:.2f}x"
+        p, hechas = pvalores[a["nombre"]]
+        print(f"\n  {a['nombre']}  —  razón entre plataformas: {razon:.2f}x "
+              f"({_fmt_p(p)}, {hechas} perm.)"
               f"   |   reclasificarían: {cambios} lab(s)")
         print(f"      X* agrupado = {x_pool:g} {a['unidad']}   σ* = {s_pool:g}   CV = {cv_pool:.1f}%")
         print(f"      {'Plataforma':<26}{'n':>3}{'mediana':>10}{'X* grupo':>11}{'σ* grupo':>10}"
@@ -559,9 +1709,95 @@ def efecto_metodo(analitos, por_analito):
             print(f"      {g:<26}{n:>3}{med:>10g}{gx:>11.1f}{gs:>10.1f}"
                   f"{f'{c_pool[chr(65)]}/{c_pool[chr(67)]}/{c_pool[chr(73)]}':>18}"
                   f"{f'{c_peer[chr(65)]}/{c_peer[chr(67)]}/{c_peer[chr(73)]}':>19}")
+    if solo_significativos:
+        print(f"\n  Diferencia significativa (p < 0.05) pero pequeña: "
+              f"{', '.join(solo_significativos)}")
     print("\n" + "=" * 92)
     print("  Razón >= 1.5x indica que las plataformas no son comparables entre sí y que un")
     print("  único valor asignado penaliza a ambos grupos a la vez (ISO 13528 §7: grupo de pares).")
+    print("  p: prueba de permutación de la diferencia de medianas. Una razón alta con p")
+    print("  grande puede ser azar de grupos chicos: mirar n antes de separar.")
+    print("=" * 92)
+
+
+# ====================================================================
+# MUESTRAS PAREADAS (YOUDEN)
+# ====================================================================
+
+def youden(analitos):
+    """
+    Diagnóstico de Youden de cada par de muestras consecutivas de un analito
+    (M1–M2, M2–M3, …) en una ronda con varias muestras, sobre los z ya
+    calculados de los laboratorios que reportaron las dos.
+
+    Con z₁ = b + e₁ y z₂ = b + e₂ —b el sesgo propio del laboratorio, e el error
+    aleatorio de cada medición— la suma (z₁ + z₂)/√2 lleva 2b + e y la
+    diferencia (z₂ − z₁)/√2 solo e. Sus SD robustas entre laboratorios separan
+    las dos componentes: sd_aleatoria = SD(diferencia), sd_sistematica =
+    √((SD(suma)² − SD(diferencia)²)/2), ambas en unidades de z. En el gráfico de
+    Youden un punto lejos del origen sobre la diagonal es error sistemático;
+    lejos de ella, aleatorio.
+
+    Un laboratorio con algún z fuera de A recibe el diagnóstico de la componente
+    que domina su punto: 'sistematico' si |suma| ≥ |diferencia|, 'aleatorio' si
+    no. Todo el par se calcula como arrays, sin recorrer laboratorios.
+
+    Devuelve una entrada por par con al menos 3 laboratorios; [] en una ronda de
+    una muestra.
+    """
+    import numpy as np
+    calcular = ESTIMADORES[_estimador]["calcular"]
+    por_analito = defaultdict(list)
+    for a in analitos:
+        m = muestra_de(a["nombre"])
+        if m is not None and a.get("evaluacion") != "no_evaluada":
+            por_analito[analito_de(a["nombre"])].append((m, a))
+
+    pares = []
+    for analito, items in sorted(por_analito.items()):
+        for (m1, a1), (m2, a2) in zip(items, items[1:]):
+            z1 = {l["id"]: l["z_score"] for l in a1["laboratorios"] if l["z_score"] is not None}
+            z2 = {l["id"]: l["z_score"] for l in a2["laboratorios"] if l["z_score"] is not None}
+            ids = sorted(z1.keys() & z2.keys())
+            if len(ids) < 3:
+                continue
+            z = np.array([[z1[i], z2[i]] for i in ids])
+            suma = (z[:, 0] + z[:, 1]) / math.sqrt(2)
+            dif = (z[:, 1] - z[:, 0]) / math.sqrt(2)
+            _, s_suma = calcular(suma)
+            _, s_dif = calcular(dif)
+            fuera = np.abs(z).max(axis=1) > 2.0
+            diagnostico = np.where(np.abs(suma) >= np.abs(dif), "sistematico", "aleatorio")
+            pares.append({
+                "analito": analito,
+                "muestras": [m1, m2],
+                "n": len(ids),
+                "sd_sistematica": round(math.sqrt(max(0.0, s_suma ** 2 - s_dif ** 2) / 2), 2),
+                "sd_aleatoria": round(s_dif, 2),
+                "laboratorios": [
+                    {"id": i, "z": [float(a), float(b)], "suma": round(float(s), 2),
+                     "diferencia": round(float(d), 2), "diagnostico": str(g) if f else None}
+                    for i, (a, b), s, d, f, g in zip(ids, z.tolist(), suma, dif, fuera, diagnostico)
+                ],
+            })
+    return pares
+
+
+def imprimir_youden(pares):
+    print("\n" + "=" * 92)
+    print("  MUESTRAS PAREADAS — diagnóstico de Youden (en unidades de z)")
+    print("=" * 92)
+    print(f"  {'Analito':<28}{'muestras':>12}{'n':>5}{'sd sistem.':>12}{'sd aleat.':>11}"
+          f"{'sistemático':>13}{'aleatorio':>11}")
+    print("  " + "-" * 88)
+    for p in pares:
+        c = Counter(l["diagnostico"] for l in p["laboratorios"])
+        print(f"  {p['analito'][:28]:<28}{'–'.join(p['muestras']):>12}{p['n']:>5}"
+              f"{p['sd_sistematica']:>12.2f}{p['sd_aleatoria']:>11.2f}"
+              f"{c['sistematico']:>13}{c['aleatorio']:>11}")
+    print("=" * 92)
+    print("  sd sistemática > sd aleatoria: la dispersión entre laboratorios es sobre todo")
+    print("  sesgo propio de cada uno, que se repite de una muestra a la otra.")
     print("=" * 92)
 
 
@@ -617,22 +1853,25 @@ def consolidar_por_laboratorio(analitos):
             r = por_lab.setdefault(l["id"], {"id": l["id"], "A": 0, "C": 0, "I": 0})
             if l["clasificacion"] in ("A", "C", "I"):
                 r[l["clasificacion"]] += 1
-    for r in por_lab.values():
-        r["n"] = r["A"] + r["C"] + r["I"]
-        # Conformidad = dentro del criterio de aceptación, es decir A + C.
-        #
-        # Una alerta (2 < |z| < 3) está DENTRO del Error Total Permitido: el
-        # límite de CLIA es |z| = 3, no 2. Contarla como no conforme —que es lo
-        # que hacía A/n— contradecía la estratificación de la misma tabla, que
-        # solo cuenta las 'I': L-131 cerró EA-001-2026 con 15 A, 7 C y 0 I, o
-        # sea el 100% de sus resultados dentro del ETa, y aparecía con 68.2%
-        # mientras su estrato decía "Satisfactorio". Un laboratorio podía
-        # reclamar, con la norma en la mano, que un z de 2.4 no es un
-        # incumplimiento. La alerta no se pierde: sigue en su propia columna,
-        # que es donde informa sin penalizar.
-        r["pct_conformidad"] = (round((r["A"] + r["C"]) / r["n"] * 100, 1)
-                                if r["n"] else 0.0)
-    return sorted(por_lab.values(), key=lambda r: r["id"])
+    return [_fila_laboratorio(r["id"], r) for r in sorted(por_lab.values(), key=lambda r: r["id"])]
+
+
+def _fila_laboratorio(id_, c):
+    """Fila del consolidado por laboratorio a partir de sus conteos A/C/I."""
+    n = c["A"] + c["C"] + c["I"]
+    # Conformidad = dentro del criterio de aceptación, es decir A + C.
+    #
+    # Una alerta (2 < |z| < 3) está DENTRO del Error Total Permitido: el
+    # límite de CLIA es |z| = 3, no 2. Contarla como no conforme —que es lo
+    # que hacía A/n— contradecía la estratificación de la misma tabla, que
+    # solo cuenta las 'I': L-131 cerró EA-001-2026 con 15 A, 7 C y 0 I, o
+    # sea el 100% de sus resultados dentro del ETa, y aparecía con 68.2%
+    # mientras su estrato decía "Satisfactorio". Un laboratorio podía
+    # reclamar, con la norma en la mano, que un z de 2.4 no es un
+    # incumplimiento. La alerta no se pierde: sigue en su propia columna,
+    # que es donde informa sin penalizar.
+    return {"id": id_, "A": c["A"], "C": c["C"], "I": c["I"], "n": n,
+            "pct_conformidad": round((c["A"] + c["C"]) / n * 100, 1) if n else 0.0}
 
 
 def desempeno_global(analitos):
@@ -647,24 +1886,39 @@ def desempeno_global(analitos):
     acción correctiva equivocada.
     """
     labs = consolidar_por_laboratorio(analitos)
+    excluidos = [a["nombre"] for a in analitos if a.get("evaluacion_confiable") is False]
+    return _desempeno(labs, Counter(r["I"] for r in labs), excluidos)
+
+
+def _desempeno(labs, por_fallas, excluidos):
+    """desempeno_global() a partir del consolidado y del histograma de no conformes.
+
+    `por_fallas` cuenta laboratorios por número de 'I' ({0: 30, 1: 4, …}): los
+    estratos, los conformes y la concentración salen de ahí sin recorrer los
+    laboratorios, que es lo que permite a Agregados mantenerlo por diferencias.
+    """
     total = len(labs)
     if not total:
         return None
 
-    conformes = sum(1 for r in labs if r["I"] == 0)
+    conformes = por_fallas[0]
 
     estratos = []
     for e in leer_estratos():
         hasta = e.get("hasta")
-        dentro = [r for r in labs
-                  if r["I"] >= e.get("desde", 0) and (hasta is None or r["I"] <= hasta)]
-        estratos.append({**e, "laboratorios": len(dentro),
-                         "pct": round(len(dentro) / total * 100, 1)})
-
-    con_fallas = sorted((r for r in labs if r["I"] > 0), key=lambda r: -r["I"])
-    top = con_fallas[:TOP_CONCENTRACION]
-    total_i = sum(r["I"] for r in labs)
-    suma_top = sum(r["I"] for r in top)
+        dentro = sum(k for i, k in por_fallas.items()
+                     if i >= e.get("desde", 0) and (hasta is None or i <= hasta))
+        estratos.append({**e, "laboratorios": dentro,
+                         "pct": round(dentro / total * 100, 1)})
+
+    # Los TOP_CONCENTRACION laboratorios con más no conformes.
+    top, suma_top = 0, 0
+    for i in sorted((i for i in por_fallas if i > 0 and por_fallas[i] > 0), reverse=True):
+        k = min(por_fallas[i], TOP_CONCENTRACION - top)
+        top, suma_top = top + k, suma_top + k * i
+        if top == TOP_CONCENTRACION:
+            break
+    total_i = sum(i * k for i, k in por_fallas.items())
 
     return {
         "criterio": "Un laboratorio es satisfactorio solo si ninguno de sus "
@@ -674,17 +1928,114 @@ def desempeno_global(analitos):
         "pct_conformes": round(conformes / total * 100, 1),
         "estratos": estratos,
         "concentracion": {
-            "laboratorios": len(top),
+            "laboratorios": top,
             "no_conformes": suma_top,
             "no_conformes_total": total_i,
             "pct": round(suma_top / total_i * 100, 1) if total_i else 0.0,
         },
         "por_laboratorio": labs,
-        "analitos_excluidos": [a["nombre"] for a in analitos
-                               if a.get("evaluacion_confiable") is False],
+        "analitos_excluidos": excluidos,
     }
 
 
+def evaluacion_confiable(a, bimodales=None):
+    """False si el analito no entra en el desempeño global ni en el resumen por
+    laboratorio: no calificado por decisión del proveedor, o bimodal evaluado
+    agrupado (ver escribir_json()). Un bimodal por grupo de pares sí entra."""
+    if a.get("evaluacion") == "no_evaluada":
+        return False
+    return a.get("evaluacion") == "grupo_pares" or a["nombre"] not in (bimodales or {})
+
+
+class Agregados:
+    """
+    Lo que escribir_json() suma sobre toda la ronda —resumen, conteos por
+    analito, consolidado por laboratorio y estratos—, mantenido por
+    diferencias.
+
+    Cada analito aporta sus clasificaciones; al recalcular uno se resta su
+    aporte anterior y se suma el nuevo, en vez de volver a recorrer todos los
+    resultados de todos los laboratorios. `bimodales` decide qué analitos son
+    confiables en el consenso (en CLIA no se pasa); si cambia para un analito,
+    ese analito tiene que estar entre los que se actualizan.
+    """
+
+    def __init__(self, bimodales=None):
+        self.bimodales = bimodales
+        self.aportes = {}             # nombre → (confiable, [(id, clasificación), …])
+        self.conteos = {}             # nombre → conteos_analito()
+        self.tot = Counter()          # clasificaciones de toda la ronda
+        self.presencia = Counter()    # id → analitos en que aparece
+        self.por_lab = {}             # id → A/C/I sobre los confiables + "analitos"
+        self.por_fallas = Counter()   # nº de 'I' → laboratorios con ese número
+
+    @classmethod
+    def desde(cls, analitos, bimodales=None):
+        agr = cls(bimodales)
+        for a in analitos:
+            agr.agregar(a)
+        return agr
+
+    def agregar(self, a):
+        confiable = evaluacion_confiable(a, self.bimodales)
+        clasif = [(l["id"], l["clasificacion"]) for l in a["laboratorios"]]
+        self.aportes[a["nombre"]] = (confiable, clasif)
+        self.conteos[a["nombre"]] = conteos_analito(a["laboratorios"])
+        self._sumar(confiable, clasif, 1)
+
+    def quitar(self, nombre):
+        if nombre not in self.aportes:
+            return
+        confiable, clasif = self.aportes.pop(nombre)
+        del self.conteos[nombre]
+        self._sumar(confiable, clasif, -1)
+
+    def actualizar(self, analitos, sucios):
+        """Rehace el aporte de los analitos `sucios`; los que ya no están en `analitos` salen."""
+        for nombre in sucios:
+            self.quitar(nombre)
+        for a in analitos:
+            if a["nombre"] in sucios:
+                self.agregar(a)
+
+    def _sumar(self, confiable, clasif, signo):
+        for id_, c in clasif:
+            self.tot[c] += signo
+            self.presencia[id_] += signo
+            if not self.presencia[id_]:
+                del self.presencia[id_]
+            if not confiable:
+                continue
+            r = self.por_lab.get(id_)
+            if r is None:
+                r = self.por_lab[id_] = Counter()
+            else:
+                self.por_fallas[r["I"]] -= 1
+            r["analitos"] += signo
+            if c in ("A", "C", "I"):
+                r[c] += signo
+            if r["analitos"]:
+                self.por_fallas[r["I"]] += 1
+            else:
+                del self.por_lab[id_]
+
+    def resumen(self):
+        t = self.tot
+        return {
+            "laboratorios": len(self.presencia),
+            "aceptables": t["A"],
+            "cuestionables": t["C"],
+            "inaceptables": t["I"],
+            "sin_evaluar": t["NE"],
+            "total": t["A"] + t["C"] + t["I"],
+        }
+
+    def desempeno_global(self):
+        labs = [_fila_laboratorio(i, self.por_lab[i]) for i in sorted(self.por_lab)]
+        excluidos = [n for n in sorted(self.aportes) if not self.aportes[n][0]]
+        return _desempeno(labs, self.por_fallas, excluidos)
+
+
 def conteos_analito(laboratorios):
     """A/C/I/NE del analito más el % dentro del criterio de aceptación.
 
@@ -707,11 +2058,114 @@ def conteos_analito(laboratorios):
     }
 
 
-def escribir_json(codigo, analitos, area="quimica", bimodales=None):
+# Estado de cada celda del heatmap, un carácter por laboratorio: la fila entera
+# viaja como una sola cadena. En una ronda de cientos de laboratorios son
+# decenas de miles de celdas, y una lista de enteros con sangría ocuparía una
+# línea por celda en el JSON publicado.
+ESTADO_CELDA = {"A": "A", "C": "C", "I": "I", "NE": "N"}
+NO_REPORTO = "."
+# Recorte de color del heatmap (z = ±5 satura la escala), igual que en la web.
+RECORTE_Z_HEATMAP = 5
+
+
+def matriz_heatmap(analitos):
+    """Matriz laboratorio × analito, ya armada, para la web y el PDF.
+
+    Filas = analitos en el orden del informe; columnas = identificadores en
+    orden de texto (el relleno a 3 dígitos hace que coincida con el numérico).
+
+      estado        una cadena por analito, un carácter por laboratorio:
+                    A/C/I, N = sin evaluar, '.' = no reportó
+      z             z-score recortado a ±recorte_z, que es lo que decide el
+                    color; null donde no hay z
+      z_recortado   las pocas celdas [fila, columna, z publicado] que el
+                    recorte tapó, para que el tooltip no mienta
+      resultado     el resultado reportado; null donde no reportó
+
+    La web y el PDF la armaban cada uno recorriendo los laboratorios de cada
+    analito, con dos códigos que podían divergir. Calculada una vez aquí, los
+    dos mapas son el mismo por construcción y validar_informe.py la audita
+    contra analitos[].
+    """
+    labs = sorted({l["id"] for a in analitos for l in a["laboratorios"]})
+    col = {lid: j for j, lid in enumerate(labs)}
+    estado, z, resultado, recortado = [], [], [], []
+    for i, a in enumerate(analitos):
+        fe = [NO_REPORTO] * len(labs)
+        fz = [None] * len(labs)
+        fr = [None] * len(labs)
+        for l in a["laboratorios"]:
+            j = col[l["id"]]
+            fe[j] = ESTADO_CELDA[l["clasificacion"]]
+            fr[j] = l["resultado"]
+            if l["z_score"] is not None:
+                fz[j] = max(-RECORTE_Z_HEATMAP, min(RECORTE_Z_HEATMAP, l["z_score"]))
+                if abs(l["z_score"]) > RECORTE_Z_HEATMAP:
+                    recortado.append([i, j, l["z_score"]])
+        estado.append("".join(fe))
+        z.append(fz)
+        resultado.append(fr)
+    return {
+        "laboratorios": labs,
+        "analitos": [a["nombre"] for a in analitos],
+        "estado": estado,
+        "recorte_z": RECORTE_Z_HEATMAP,
+        "z": z,
+        "z_recortado": recortado,
+        "resultado": resultado,
+    }
+
+
+def escribir_fragmentos(doc, ruta):
+    """Índice + un fragmento por analito, junto al JSON completo.
+
+    La página pedía el JSON entero antes de dibujar nada, así que el primer
+    pintado crecía con el número de analitos. El índice trae lo que se ve al
+    abrir —encabezado, resumen, desempeño global, ficha de cada analito sin sus
+    resultados y el heatmap— y cada fragmento trae un analito
+    completo, que la página pide cuando su sección se acerca a la pantalla.
+
+    El JSON completo se sigue escribiendo y sigue siendo la fuente: el PDF, la
+    presentación y validar_informe.py leen ese. Los fragmentos son una copia
+    partida, y validar_informe.py comprueba que digan lo mismo.
+
+    Salida: <ruta sin .json>/indice.json y analito-NN.json. Se escriben sin
+    sangría: son para el navegador, no para leerlos a mano.
+    """
+    carpeta = os.path.splitext(ruta)[0]
+    os.makedirs(carpeta, exist_ok=True)
+    # Un fragmento de una corrida anterior con más analitos quedaría huérfano
+    # y servible; se borran antes de escribir.
+    for viejo in os.listdir(carpeta):
+        if viejo.startswith("analito-") and viejo.endswith(".json"):
+            os.remove(os.path.join(carpeta, viejo))
+
+    fichas = []
+    for i, a in enumerate(doc["analitos"]):
+        nombre = f"analito-{i:02d}.json"
+        with open(os.path.join(carpeta, nombre), "w", encoding="utf-8") as f:
+            json.dump(a, f, ensure_ascii=False, separators=(",", ":"))
+        fichas.append({**{k: v for k, v in a.items() if k != "laboratorios"},
+                       "fragmento": nombre})
+
+    # El heatmap ya viene en el documento (matriz_heatmap), así que el índice
+    # lo hereda tal cual.
+    indice = {**{k: v for k, v in doc.items() if k != "analitos"},
+              "analitos": fichas}
+    destino = os.path.join(carpeta, "indice.json")
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, separators=(",", ":"))
+    return destino
+
+
+def escribir_json(codigo, analitos, area="quimica", bimodales=None, agregados=None,
+                  puntaje=None):
+    """Escribe el JSON del consenso y sus fragmentos. `agregados` (Agregados) evita
+    volver a sumar la ronda entera cuando quien llama ya los mantiene al día.
+    `puntaje`: el tipo que clasificó (calcular_agrupado()); se describe en el JSON."""
     bimodales = bimodales or {}
-    tot = Counter()
-    for a in analitos:
-        tot.update(l["clasificacion"] for l in a["laboratorios"])
+    if agregados is None:
+        agregados = Agregados.desde(analitos, bimodales)
 
     # Copia saneada: se publica solo lo que el informe necesita dibujar.
     limpios = []
@@ -730,11 +2184,11 @@ def escribir_json(codigo, analitos, area="quimica", bimodales=None):
             # Los conteos se calculan aquí y no en el navegador: el JS los
             # recalculaba en dos sitios distintos del mismo archivo, y cada
             # ronda clonaba esa lógica sin forma de auditarla.
-            "conteos": conteos_analito(a["laboratorios"]),
+            "conteos": agregados.conteos[a["nombre"]],
             # Un analito sin calificar no es "evaluación confiable": es la señal
             # que usan consolidar_por_laboratorio() y el JS para excluirlo de los
             # conteos por laboratorio y del desempeño global.
-            "evaluacion_confiable": (b is None) and not no_evaluado,
+            "evaluacion_confiable": evaluacion_confiable(a, bimodales),
             "aviso_bimodal": None if b is None else {
                 "razon": round(b[0], 2),
                 "grupos": [{"plataforma": g, "n": n, "mediana": round(m, 2)} for g, n, m in b[1]],
@@ -745,27 +2199,33 @@ def escribir_json(codigo, analitos, area="quimica", bimodales=None):
             ],
         })
     analitos = limpios
+    # El estimador se anota solo si la ronda declaró uno distinto del Algoritmo A.
+    est = estimador_publico()
     doc = {
         "codigo": codigo,
         "area": area,
         "fecha": fecha_calculo(codigo),
-        "metodologia": "ISO/IEC 17043 & ISO 13528 (Estadística Robusta)",
+        "metodologia": "ISO/IEC 17043 & ISO 13528 (Estadística Robusta"
+                       + (f": {est['nombre']})" if est else ")"),
+        **({"estimador": est} if est else {}),
+        # Solo si se calcularon: una ronda que no los usa publica el JSON de siempre.
+        **({"puntajes": puntajes.descripcion(puntaje)} if puntaje else {}),
         "evaluacion": "agrupada",
-        "resumen": {
-            "laboratorios": len({l["id"] for a in analitos for l in a["laboratorios"]}),
-            "aceptables": tot["A"],
-            "cuestionables": tot["C"],
-            "inaceptables": tot["I"],
-            "sin_evaluar": tot["NE"],
-            "total": tot["A"] + tot["C"] + tot["I"],
-        },
-        "desempeno_global": desempeno_global(analitos),
+        "resumen": agregados.resumen(),
+        "desempeno_global": agregados.desempeno_global(),
         "analitos": analitos,
+        "heatmap": matriz_heatmap(analitos),
     }
+    # Solo una ronda con varias muestras tiene pares que diagnosticar.
+    pares = youden(analitos)
+    if pares:
+        doc["youden"] = pares
     os.makedirs(SALIDA_DIR, exist_ok=True)
     ruta = os.path.join(SALIDA_DIR, f"{codigo}-{area}.json")
     with open(ruta, "w", encoding="utf-8") as f:
         json.dump(doc, f, ensure_ascii=False, indent=2)
+    escribir_fragmentos(doc, ruta)
+    registrar_versiones(ruta)
     return ruta
 
 
@@ -774,26 +2234,41 @@ def main():
     ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
     ap.add_argument("--efecto-metodo", action="store_true",
                     help="Solo diagnóstico: compara agrupado vs grupo de pares. No escribe JSON.")
+    ap.add_argument("--estimadores", action="store_true",
+                    help="Solo diagnóstico: X*/σ* con cada estimador de ISO 13528. No escribe JSON.")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
     area = "quimica"
+    if args.perfil:
+        activar_perfil("calcular_zscore", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo, area))
 
-    por_analito, descartados = cargar(codigo)
+    with etapa("cargar"):
+        por_analito, descartados = cargar(codigo)
     if not por_analito:
         sys.exit(f"No hay resultados de Química Clínica para {codigo}.")
+    puntaje = puntaje_de_ronda(codigo, area, "consenso", por_analito)
 
     n_labs = len({f["cod"] for v in por_analito.values() for f in v})
     print(f"\nRonda {codigo} — Química Clínica")
-    print(f"  Analitos: {len(por_analito)}   Laboratorios: {n_labs}")
+    muestras = sorted({muestra_de(n) for n in por_analito} - {None})
+    print(f"  Analitos: {len({analito_de(n) for n in por_analito})}"
+          + (f" × {len(muestras)} muestras ({', '.join(muestras)})" if muestras else "")
+          + f"   Laboratorios: {n_labs}")
+    if _estimador != ESTIMADOR_POR_DEFECTO:
+        e = estimador()
+        print(f"  Estimador robusto: {e['nombre']} ({e['referencia']})")
     if descartados:
         print(f"  Valores no numéricos descartados: {descartados}")
+    if puntaje:
+        p = puntajes.PUNTAJES[puntaje]
+        print(f"  Clasifica: {p['nombre']} = {p['formula']} ({p['referencia']})")
 
     # Primera pasada agrupada, solo para detectar bimodalidad sobre datos sin separar.
-    bimodales = detectar_bimodales(calcular_agrupado(por_analito), por_analito)
+    with etapa("bimodalidad"):
+        bimodales = detectar_bimodales(calcular_agrupado(por_analito, remuestreos=0), por_analito)
 
     # Red de seguridad: si aparece un analito bimodal que la ronda no declaró,
     # hay que decidirlo, no dejar que pase silenciosamente.
@@ -802,7 +2277,8 @@ def main():
     # Un analito sin evaluar no necesita decisión de grupo de pares: no se
     # califica por ninguna vía, así que la bimodalidad deja de ser relevante.
     por_pares = por_pares - sin_eval
-    sin_decidir = sorted(set(bimodales) - por_pares - sin_eval)
+    sin_decidir = sorted(n for n in bimodales
+                         if analito_de(n) not in por_pares and analito_de(n) not in sin_eval)
     if sin_decidir:
         print(f"\n  AVISO: bimodalidad detectada en analitos que {codigo} NO declara "
               f"en decisiones_evaluacion de {CONFIG_PATH}:")
@@ -810,8 +2286,15 @@ def main():
             print(f"    · {nom} — plataformas separadas {bimodales[nom][0]:.1f}x")
         print("    Se publicarán como 'no concluyentes'. Revisar con --efecto-metodo.")
 
-    analitos = calcular_agrupado(por_analito, por_grupo_pares=por_pares,
-                                 sin_evaluar=sin_eval, nota_sin_evaluar=nota_sin_eval)
+    # Estimación robusta y puntaje z van juntos en calcular_agrupado. u(X*) solo
+    # cuando se publica: los diagnósticos no escriben JSON y el bootstrap es,
+    # con mucho, lo más caro de la corrida.
+    diagnostico = args.estimadores or args.efecto_metodo
+    with etapa("estimar_puntuar"):
+        analitos = calcular_agrupado(por_analito, por_grupo_pares=por_pares,
+                                     sin_evaluar=sin_eval, nota_sin_evaluar=nota_sin_eval,
+                                     remuestreos=0 if diagnostico else REMUESTREOS,
+                                     puntaje=puntaje)
     if por_pares:
         print(f"\n  Evaluados por grupo de pares: {', '.join(sorted(por_pares))}")
     if sin_eval:
@@ -821,13 +2304,26 @@ def main():
                      "'sin_evaluar_nota' en config.json. El informe no puede "
                      "publicar un analito sin calificar sin explicar por qué.")
     imprimir_agrupado(analitos)
+    informar_incertidumbre(analitos, sigma="σ*")
+    pares = youden(analitos)
+    if pares:
+        imprimir_youden(pares)
+
+    if args.estimadores:
+        with etapa("estimadores"):
+            comparar_estimadores(por_analito, por_pares, sin_eval, nota_sin_eval, puntaje)
+        print("\n(Diagnóstico: no se escribió JSON.)")
+        return
 
     if args.efecto_metodo:
-        efecto_metodo(analitos, por_analito)
+        with etapa("efecto_metodo"):
+            efecto_metodo(analitos, por_analito)
+            imprimir_modas(modas_kde(por_analito), por_analito)
         print("\n(Diagnóstico: no se escribió JSON.)")
         return
 
-    ruta = escribir_json(codigo, analitos, bimodales=bimodales)
+    with etapa("serializar"):
+        ruta = escribir_json(codigo, analitos, bimodales=bimodales, puntaje=puntaje)
     if sin_decidir:
         print(f"\n  Marcados como NO concluyentes: {', '.join(sin_decidir)}")
     print(f"  JSON escrito en: {ruta}")
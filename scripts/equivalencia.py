@@ -0,0 +1,360 @@
+"""
+Equivalencia de salidas — red de seguridad para cambios de rendimiento.
+
+Los JSON son informes publicados: una optimización que mueve un X* redondeado
+o cambia una clasificación no es una regresión de rendimiento, es un incidente
+de cumplimiento. Este script fija la salida de las implementaciones de
+referencia y compara contra ella, por analito y por laboratorio:
+
+  grabar     corre la referencia sobre cada ronda y guarda la salida dorada
+             en support/golden/<ronda>/.
+  verificar  vuelve a correr y compara contra lo grabado: diferencias
+             numéricas con su magnitud, cambios de clasificación y, para los
+             JSON escritos, igualdad byte a byte con el primer desplazamiento
+             distinto.
+
+Además, cada camino rápido nuevo se registra en CANDIDATAS junto a la etapa que
+reemplaza; `verificar` corre ambos lado a lado sobre la misma entrada y exige
+la misma salida.
+
+Etapas: calcular_agrupado, evaluar_clia.evaluar, conteos_analito,
+desempeno_global y escribir_json (consenso y CLIA, comparados como bytes).
+
+Rondas: la real (si su CSV está en support/) y sintéticas de
+generar_ronda_sintetica.py con semillas fijas. Todo corre en un directorio
+temporal: no se escribe nada en data/.
+
+Uso:
+  python scripts/equivalencia.py grabar        # antes del cambio
+  ...optimizar...
+  python scripts/equivalencia.py verificar     # sale con 1 si algo difiere
+"""
+
+import os
+import io
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import calcular_zscore as cz  # noqa: E402
+import evaluar_clia as ec  # noqa: E402
+import generar_ronda_sintetica as gs  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(RAIZ, "support", "golden")
+
+# (código, escala, semilla). Códigos EA-98N para no chocar con rondas reales ni
+# con las del benchmark.
+SINTETICAS = [
+    ("EA-980-2099", 1, 0),
+    ("EA-981-2099", 1, 1),
+    ("EA-982-2099", 1, 2),
+    ("EA-983-2099", 10, 0),
+]
+# Fecha fija para las sintéticas: escribir_json estampa fecha_calculo y, sin
+# declararla, sería la de hoy y el byte a byte fallaría al cambiar de día.
+FECHA_SINTETICA = "2099-01-01"
+
+# Caminos rápidos en evaluación: etapa → función(ctx) que debe devolver lo mismo
+# que la referencia. ctx trae por_analito, pares, sin_eval, nota y esp.
+CANDIDATAS = {}
+
+MAX_DIFERENCIAS = 20   # por etapa, en el reporte
+
+
+# ====================================================================
+# RONDAS
+# ====================================================================
+
+@contextlib.contextmanager
+def directorio_aislado(codigo, csv_origen=None, escala=1, semilla=0):
+    """Directorio de trabajo temporal con support/ensayos_<codigo>.csv y data/config.json."""
+    previo = os.getcwd()
+    tmp = tempfile.mkdtemp(prefix="concalab-golden-")
+    try:
+        os.makedirs(os.path.join(tmp, "data", "informes"))
+        with open(os.path.join(RAIZ, cz.CONFIG_PATH), encoding="utf-8") as f:
+            cfg = json.load(f)
+        if csv_origen is None:
+            cfg.setdefault("fecha_calculo", {})[codigo] = FECHA_SINTETICA
+        with open(os.path.join(tmp, cz.CONFIG_PATH), "w", encoding="utf-8") as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=2)
+        os.chdir(tmp)
+        if csv_origen:
+            os.makedirs(cz.ENTRADA_DIR, exist_ok=True)
+            shutil.copy(csv_origen, os.path.join(cz.ENTRADA_DIR, f"ensayos_{codigo}.csv"))
+        else:
+            gs.escribir_csv(gs.generar(round(gs.LABS_REALES * escala), semilla=semilla), codigo)
+        yield
+    finally:
+        os.chdir(previo)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def rondas():
+    """(código, kwargs de directorio_aislado) de cada ronda a verificar."""
+    with open(os.path.join(RAIZ, cz.CONFIG_PATH), encoding="utf-8") as f:
+        real = json.load(f)["ronda_activa"]["codigo"]
+    lista = []
+    csv_real = os.path.join(RAIZ, cz.ENTRADA_DIR, f"ensayos_{real}.csv")
+    if os.path.exists(csv_real):
+        lista.append((real, {"csv_origen": csv_real}))
+    lista += [(c, {"escala": e, "semilla": s}) for c, e, s in SINTETICAS]
+    return lista
+
+
+def contexto(codigo, real):
+    """Entradas de las etapas, resueltas como lo hace main() de cada script."""
+    por_analito, _ = cz.cargar(codigo)
+    if real:
+        pares = cz.analitos_por_grupo_pares(codigo)
+        sin_eval, nota = cz.analitos_sin_evaluar(codigo)
+        pares = pares - sin_eval
+    else:
+        # En las sintéticas el proveedor "decide" lo que detecta la primera pasada.
+        pares = frozenset(cz.detectar_bimodales(cz.calcular_agrupado(por_analito, remuestreos=0), por_analito))
+        sin_eval, nota = frozenset(), None
+    esp = gs.especificaciones_para(por_analito, ec.leer_especificaciones("quimica"))
+    return {"codigo": codigo, "por_analito": por_analito, "pares": pares,
+            "sin_eval": sin_eval, "nota": nota, "esp": esp}
+
+
+# ====================================================================
+# ETAPAS DE REFERENCIA
+# ====================================================================
+
+def _leer_bytes(ruta):
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def etapas(ctx):
+    """Salida de cada etapa de referencia. Los JSON escritos van como bytes."""
+    consenso = cz.calcular_agrupado(ctx["por_analito"], por_grupo_pares=ctx["pares"],
+                                    sin_evaluar=ctx["sin_eval"], nota_sin_evaluar=ctx["nota"])
+    clia = ec.evaluar(ctx["por_analito"], ctx["esp"], ctx["pares"],
+                      sin_evaluar=ctx["sin_eval"], nota_sin_evaluar=ctx["nota"])
+    bimodales = cz.detectar_bimodales(cz.calcular_agrupado(ctx["por_analito"], remuestreos=0),
+                                       ctx["por_analito"])
+    ruta = cz.escribir_json(ctx["codigo"], consenso, bimodales=bimodales)
+    ruta_clia, _ = ec.escribir_json(ctx["codigo"], clia)
+    return {
+        "calcular_agrupado": consenso,
+        "evaluar_clia": clia,
+        "conteos_analito": {a["nombre"]: cz.conteos_analito(a["laboratorios"]) for a in clia},
+        "desempeno_global": cz.desempeno_global(clia),
+        "escribir_json": _leer_bytes(ruta),
+        "escribir_json_clia": _leer_bytes(ruta_clia),
+    }
+
+
+# ====================================================================
+# CANDIDATAS
+# ====================================================================
+
+def _incremental(ctx):
+    """La ronda recalculada por diferencias, como la recorre scripts/vigilar.py.
+
+    Se parte de la ronda sin decisiones (todo agrupado, nada sin evaluar) y se
+    recalculan solo los analitos que las decisiones cambian, más el primero
+    para que siempre haya al menos uno. Los agregados se actualizan restando y
+    sumando el aporte de esos analitos.
+    """
+    if "_incremental" not in ctx:
+        por_analito = ctx["por_analito"]
+        sucios = set(ctx["pares"]) | set(ctx["sin_eval"]) | {min(por_analito)}
+        kw = {"por_grupo_pares": ctx["pares"], "sin_evaluar": ctx["sin_eval"],
+              "nota_sin_evaluar": ctx["nota"], "sucios": sucios}
+        bimodales = cz.detectar_bimodales(cz.calcular_agrupado(por_analito, remuestreos=0), por_analito)
+
+        previos = cz.calcular_agrupado(por_analito)
+        agr = cz.Agregados.desde(previos, bimodales)
+        consenso = cz.calcular_agrupado(por_analito, previos=previos, **kw)
+        agr.actualizar(consenso, sucios)
+
+        previos = ec.evaluar(por_analito, ctx["esp"], frozenset())
+        agr_clia = cz.Agregados.desde(previos)
+        clia = ec.evaluar(por_analito, ctx["esp"], previos=previos, **kw)
+        agr_clia.actualizar(clia, sucios)
+        ctx["_incremental"] = (consenso, agr, bimodales, clia, agr_clia)
+    return ctx["_incremental"]
+
+
+def _json_incremental(ctx):
+    consenso, agr, bimodales, _, _ = _incremental(ctx)
+    return _leer_bytes(cz.escribir_json(ctx["codigo"], consenso, bimodales=bimodales, agregados=agr))
+
+
+def _json_clia_incremental(ctx):
+    _, _, _, clia, agr_clia = _incremental(ctx)
+    return _leer_bytes(ec.escribir_json(ctx["codigo"], clia, agregados=agr_clia)[0])
+
+
+CANDIDATAS.update({
+    "calcular_agrupado": lambda ctx: _incremental(ctx)[0],
+    "evaluar_clia": lambda ctx: _incremental(ctx)[3],
+    "escribir_json": _json_incremental,
+    "escribir_json_clia": _json_clia_incremental,
+})
+
+
+# ====================================================================
+# DIFERENCIAS
+# ====================================================================
+
+def _clave(x):
+    """Identidad de un elemento de lista: analitos y grupos por nombre, labs por id."""
+    if isinstance(x, dict):
+        for k in ("nombre", "id", "clave"):
+            if k in x:
+                return x[k]
+    return None
+
+
+def diferencias(ref, nuevo, ruta=""):
+    """Lista de (ruta, referencia, nuevo) donde difieren. Compara exacto: un
+    número redondeado distinto ES una diferencia publicada."""
+    if isinstance(ref, dict) and isinstance(nuevo, dict):
+        out = []
+        for k in sorted(set(ref) | set(nuevo), key=str):
+            if k not in ref or k not in nuevo:
+                out.append((f"{ruta}/{k}", ref.get(k, "<falta>"), nuevo.get(k, "<falta>")))
+            else:
+                out += diferencias(ref[k], nuevo[k], f"{ruta}/{k}")
+        return out
+    if isinstance(ref, list) and isinstance(nuevo, list):
+        claves_r = [_clave(x) for x in ref]
+        if None not in claves_r and len(set(claves_r)) == len(claves_r):
+            por_clave = {_clave(x): x for x in nuevo}
+            out = [(f"{ruta}[{c}]", x, por_clave.get(c, "<falta>"))
+                   for c, x in zip(claves_r, ref) if c not in por_clave]
+            out += [(f"{ruta}[{_clave(x)}]", "<falta>", x)
+                    for x in nuevo if _clave(x) not in set(claves_r)]
+            for c, x in zip(claves_r, ref):
+                if c in por_clave:
+                    out += diferencias(x, por_clave[c], f"{ruta}[{c}]")
+            if not out and claves_r != [_clave(x) for x in nuevo]:
+                out.append((f"{ruta}(orden)", claves_r, [_clave(x) for x in nuevo]))
+            return out
+        if len(ref) != len(nuevo):
+            return [(f"{ruta}(largo)", len(ref), len(nuevo))]
+        out = []
+        for i, (a, b) in enumerate(zip(ref, nuevo)):
+            out += diferencias(a, b, f"{ruta}[{i}]")
+        return out
+    if ref != nuevo or type(ref) is not type(nuevo):
+        return [(ruta, ref, nuevo)]
+    return []
+
+
+def diferencia_bytes(ref, nuevo):
+    """None si son idénticos; si no, el primer desplazamiento distinto y su contexto."""
+    if ref == nuevo:
+        return None
+    i = next((k for k, (a, b) in enumerate(zip(ref, nuevo)) if a != b), min(len(ref), len(nuevo)))
+    ctx = lambda b: b[max(0, i - 40):i + 40].decode("utf-8", "replace").replace("\n", "⏎")
+    return (f"byte {i} (largo {len(ref)} → {len(nuevo)}; "
+            f"sha256 {hashlib.sha256(ref).hexdigest()[:12]} → {hashlib.sha256(nuevo).hexdigest()[:12]})\n"
+            f"        antes: …{ctx(ref)}…\n        ahora: …{ctx(nuevo)}…")
+
+
+def _fmt(ruta, a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) \
+            and not isinstance(a, bool) and not isinstance(b, bool):
+        return f"{ruta}: {a} → {b} (Δ {b - a:+.6g})"
+    return f"{ruta}: {a!r} → {b!r}"
+
+
+def comparar_etapa(nombre, ref, nuevo):
+    """Líneas de reporte de una etapa; vacía si es equivalente."""
+    if isinstance(ref, bytes):
+        d = diferencia_bytes(ref, nuevo)
+        if not d:
+            return []
+        # Además del primer byte, dónde está cada cambio: por analito y laboratorio.
+        try:
+            return [d] + [_fmt(*x) for x in diferencias(json.loads(ref), json.loads(nuevo))]
+        except ValueError:
+            return [d]
+    # Ida y vuelta por JSON: compara lo que se publicaría, no tipos de numpy.
+    ref, nuevo = json.loads(json.dumps(ref)), json.loads(json.dumps(nuevo))
+    return [_fmt(*d) for d in diferencias(ref, nuevo)]
+
+
+# ====================================================================
+# GRABAR / VERIFICAR
+# ====================================================================
+
+def _ruta_golden(codigo, etapa, binario):
+    return os.path.join(GOLDEN_DIR, codigo, etapa + (".bin" if binario else ".json"))
+
+
+def grabar():
+    for codigo, kw in rondas():
+        with directorio_aislado(codigo, **kw), contextlib.redirect_stdout(io.StringIO()):
+            salida = etapas(contexto(codigo, "csv_origen" in kw))
+        os.makedirs(os.path.join(GOLDEN_DIR, codigo), exist_ok=True)
+        for etapa, valor in salida.items():
+            binario = isinstance(valor, bytes)
+            with open(_ruta_golden(codigo, etapa, binario), "wb" if binario else "w",
+                      **({} if binario else {"encoding": "utf-8"})) as f:
+                if binario:
+                    f.write(valor)
+                else:
+                    json.dump(valor, f, ensure_ascii=False, indent=1)
+        print(f"  {codigo}: {len(salida)} etapa(s) grabadas")
+    print(f"  Salidas doradas en: {GOLDEN_DIR}")
+
+
+def verificar():
+    fallas = 0
+    for codigo, kw in rondas():
+        if not os.path.isdir(os.path.join(GOLDEN_DIR, codigo)):
+            print(f"  {codigo}: sin salida dorada — ejecuta primero 'grabar'")
+            fallas += 1
+            continue
+        with directorio_aislado(codigo, **kw), contextlib.redirect_stdout(io.StringIO()):
+            ctx = contexto(codigo, "csv_origen" in kw)
+            salida = etapas(ctx)
+            candidatas = {e: fn(ctx) for e, fn in CANDIDATAS.items()}
+
+        for etapa, valor in salida.items():
+            binario = isinstance(valor, bytes)
+            with open(_ruta_golden(codigo, etapa, binario), "rb" if binario else "r",
+                      **({} if binario else {"encoding": "utf-8"})) as f:
+                dorada = f.read() if binario else json.load(f)
+            informe = comparar_etapa(etapa, dorada, valor)
+            if etapa in candidatas:
+                informe += [f"(candidata) {l}" for l in comparar_etapa(etapa, valor, candidatas[etapa])]
+            if informe:
+                fallas += 1
+                print(f"  DIFIERE  {codigo}  {etapa}  ({len(informe)} diferencia(s))")
+                for l in informe[:MAX_DIFERENCIAS]:
+                    print(f"      {l}")
+                if len(informe) > MAX_DIFERENCIAS:
+                    print(f"      … y {len(informe) - MAX_DIFERENCIAS} más")
+            else:
+                marca = " (+ candidata)" if etapa in candidatas else ""
+                print(f"  igual    {codigo}  {etapa}{marca}")
+    return fallas
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Equivalencia de salidas contra la referencia.")
+    ap.add_argument("orden", choices=["grabar", "verificar"])
+    args = ap.parse_args()
+    if args.orden == "grabar":
+        grabar()
+        return
+    fallas = verificar()
+    print(f"\n  {'SIN diferencias.' if not fallas else f'{fallas} etapa(s) con diferencias.'}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
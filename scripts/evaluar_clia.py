@@ -6,7 +6,8 @@ un JSON aparte (`<codigo>-quimica-clia.json`) para un informe distinto.
 
 En qué se diferencia del modelo de consenso
 --------------------------------------------
-- Valor asignado X* = media robusta (Algoritmo A, ISO 13528) — IGUAL que consenso.
+- Valor asignado X* = media robusta (Algoritmo A, ISO 13528) — IGUAL que consenso,
+  incluido el estimador que la ronda declare en lugar del Algoritmo A.
 - σ* y CV se conservan, pero SOLO informan dispersión; no deciden la evaluación.
 - La evaluación NO usa la σ* de los participantes, sino una desviación por
   aptitud al uso: σpt = ETa/3, donde ETa (Error Total Permitido, "δE") sale de
@@ -30,17 +31,23 @@ import sys
 import json
 import argparse
 import statistics
-from collections import defaultdict, Counter
+from collections import defaultdict
 from datetime import date
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import (  # noqa: E402
+    analitos_por_grupo_pares, analitos_sin_evaluar, codigo_activo, estimador_robusto,
+    fecha_calculo, registrar_versiones, analito_de, SALIDA_DIR, CONFIG_PATH,
+)
 from calcular_zscore import (  # noqa: E402
-    cargar, robust_mean_sd, _stats, plataforma, unidad_canonica, clasificar,
-    analitos_por_grupo_pares, analitos_sin_evaluar, desempeno_global, CAMPOS_INTERNOS,
-    conteos_analito,
-    fecha_calculo,
-    N_MINIMO, N_MINIMO_GRUPO, SALIDA_DIR, CONFIG_PATH,
+    cargar, robust_mean_sd, _stats, _stats_lote, plataforma, unidad_canonica, clasificar,
+    CAMPOS_INTERNOS, conteos_analito, escribir_fragmentos, matriz_heatmap,
+    reemplazar_analitos, Agregados, incertidumbre_asignado, informar_incertidumbre,
+    usar_estimador, estimador, estimador_publico, youden, imprimir_youden,
+    puntuar, puntaje_de_ronda, REMUESTREOS, N_MINIMO, N_MINIMO_GRUPO,
 )
+import puntajes  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
 
 
 def leer_especificaciones(area="quimica"):
@@ -99,12 +106,36 @@ def _entrada(f, z, extra=None):
 
 
 def evaluar(por_analito, especificaciones, por_grupo_pares,
-            sin_evaluar=frozenset(), nota_sin_evaluar=None):
+            sin_evaluar=frozenset(), nota_sin_evaluar=None, previos=None, sucios=None,
+            remuestreos=REMUESTREOS, puntaje=None):
     """
     Igual estructura que calcular_agrupado(), pero el z-score usa σpt = δE/3
     en vez de la σ* del consenso. σ* y CV se calculan y se guardan como
     dispersión informativa.
+
+    `previos` y `sucios` como en calcular_agrupado(): solo se recalculan esos
+    analitos (p. ej. los que cambiaron de ETa) y el resto se conserva.
+
+    La `incertidumbre` de cada valor asignado se compara con este σpt: es la
+    comprobación u(X*) ≤ 0.3·σpt de ISO 13528 sobre el criterio que de verdad
+    califica.
+
+    `puntaje` como en calcular_agrupado(), con σpt = δE/3 en z y z′; el tipo
+    elegido clasifica ya redondeado, como z.
     """
+    if previos is not None:
+        sub = {n: por_analito[n] for n in sucios if n in por_analito}
+        nuevos = evaluar(sub, especificaciones, por_grupo_pares, sin_evaluar, nota_sin_evaluar,
+                         remuestreos=remuestreos, puntaje=puntaje)
+        return reemplazar_analitos(previos, nuevos, sucios, por_analito)
+
+    # X* y σ* de los analitos agrupados en una pasada por lotes, como en
+    # calcular_agrupado().
+    agrupados = [n for n in sorted(por_analito)
+                 if analito_de(n) not in sin_evaluar and analito_de(n) not in por_grupo_pares]
+    stats = dict(zip(agrupados, _stats_lote([[f["valor"] for f in por_analito[n]]
+                                             for n in agrupados])))
+
     analitos = []
     for nombre in sorted(por_analito):
         filas = por_analito[nombre]
@@ -114,7 +145,7 @@ def evaluar(por_analito, especificaciones, por_grupo_pares,
         # Se resuelve antes de buscar el ETa: un analito que no se evalúa no
         # necesita criterio de aceptación, y exigirlo obligaría a declarar un
         # límite que no se va a aplicar.
-        if nombre in sin_evaluar:
+        if analito_de(nombre) in sin_evaluar:
             valores = [f["valor"] for f in filas]
             labs = [_entrada(f, None) for f in filas]
             labs.sort(key=lambda l: l["resultado"])
@@ -133,12 +164,12 @@ def evaluar(por_analito, especificaciones, por_grupo_pares,
             })
             continue
 
-        spec = especificaciones.get(nombre)
+        spec = especificaciones.get(analito_de(nombre))
         if not spec:
             sys.exit(f"ERROR: '{nombre}' no tiene ETa en especificaciones_desempeno.")
 
         # --- Analito por GRUPO DE PARES (X* por plataforma) -----------------
-        if nombre in por_grupo_pares:
+        if analito_de(nombre) in por_grupo_pares:
             grupos_filas = defaultdict(list)
             for f in filas:
                 grupos_filas[f["plataforma"]].append(f)
@@ -146,15 +177,22 @@ def evaluar(por_analito, especificaciones, por_grupo_pares,
             grupos, labs = [], []
             for g, gf in sorted(grupos_filas.items(), key=lambda kv: -len(kv[1])):
                 if len(gf) >= N_MINIMO_GRUPO:
-                    gx, gs, gcv = _stats([f["valor"] for f in gf])
+                    valores = [f["valor"] for f in gf]
+                    gx, gs, gcv = _stats(valores)
                     dE = delta_e(spec, gx)
                     sigma_pt = dE / 3.0
+                    inc = incertidumbre_asignado(valores, sigma_pt, f"{nombre}/{g}", remuestreos)
                     grupos.append({
                         "nombre": g, "n": len(gf), "evaluado": True,
                         "valor_asignado": gx, "sd_robusta": gs, "cv": gcv,
                         "eta": _spec_publica(spec, dE), "sigma_pt": round(sigma_pt, 4),
                         "n_suficiente": len(gf) >= N_MINIMO,
+                        "incertidumbre": inc,
                     })
+                    if puntaje:
+                        labs.extend(puntuar(gf, _entrada, gx, sigma_pt, inc, gs, puntaje,
+                                            {"grupo": g}, redondeado=True))
+                        continue
                     for f in gf:
                         z = (f["valor"] - gx) / sigma_pt if sigma_pt else None
                         labs.append(_entrada(f, z, {"grupo": g}))
@@ -182,11 +220,17 @@ def evaluar(por_analito, especificaciones, por_grupo_pares,
             continue
 
         # --- Analito AGRUPADO (un X* para todos) ----------------------------
-        x_star, s_star, cv = _stats([f["valor"] for f in filas])
+        valores = [f["valor"] for f in filas]
+        x_star, s_star, cv = stats[nombre]
         dE = delta_e(spec, x_star)
         sigma_pt = dE / 3.0
-        labs = [_entrada(f, (f["valor"] - x_star) / sigma_pt if sigma_pt else None)
-                for f in filas]
+        inc = incertidumbre_asignado(valores, sigma_pt, nombre, remuestreos)
+        if puntaje:
+            labs = puntuar(filas, _entrada, x_star, sigma_pt, inc, s_star, puntaje,
+                           redondeado=True)
+        else:
+            labs = [_entrada(f, (f["valor"] - x_star) / sigma_pt if sigma_pt else None)
+                    for f in filas]
         labs.sort(key=lambda l: (l["z_score"] is None, l["z_score"] or 0))
 
         analitos.append({
@@ -195,6 +239,7 @@ def evaluar(por_analito, especificaciones, por_grupo_pares,
             "valor_asignado": x_star, "sd_robusta": s_star, "cv": cv,
             "eta": _spec_publica(spec, dE), "sigma_pt": round(sigma_pt, 4),
             "n_suficiente": len(filas) >= N_MINIMO,
+            "incertidumbre": inc,
             "laboratorios": labs,
         })
     return analitos
@@ -225,10 +270,32 @@ CRITERIOS = {
 }
 
 
-def escribir_json(codigo, analitos, area="quimica"):
-    tot = Counter()
-    for a in analitos:
-        tot.update(l["clasificacion"] for l in a["laboratorios"])
+def criterios_puntaje(criterios, puntaje):
+    """CRITERIOS con la evaluación y los niveles del tipo que clasifica, si no es z."""
+    if not puntaje or puntaje == "z":
+        return criterios
+    p = puntajes.PUNTAJES[puntaje]
+    c1, c2 = p["cortes"]
+    n = p["nombre"]
+    niveles = [
+        {"clasificacion": "A", "nombre": "Satisfactorio", "regla": f"|{n}| ≤ {c1:g}"},
+        *([{"clasificacion": "C", "nombre": "Alerta", "regla": f"{c1:g} < |{n}| < {c2:g}"}]
+          if c2 > c1 else []),
+        {"clasificacion": "I", "nombre": "No satisfactorio",
+         "regla": f"|{n}| {'≥' if c2 > c1 else '>'} {c2:g}"},
+    ]
+    return {
+        **criterios,
+        "evaluacion": f"{n} = {p['formula']} ({p['referencia']}), con σpt = ETa/3. "
+                      "El z-score se publica igual, como referencia.",
+        "niveles": niveles,
+    }
+
+
+def escribir_json(codigo, analitos, area="quimica", agregados=None, puntaje=None):
+    if agregados is None:
+        agregados = Agregados.desde(analitos)
+    tot = agregados.tot
 
     # Copia saneada: fuera los campos internos (metodo/instrumento/plataforma
     # re-identifican al laboratorio) y se fija evaluacion_confiable=True — en el
@@ -241,7 +308,7 @@ def escribir_json(codigo, analitos, area="quimica"):
             # entra en el desempeño global ni en el resumen por laboratorio.
             # Ese es el efecto de evaluacion_confiable=False aguas abajo.
             "evaluacion_confiable": a.get("evaluacion") != "no_evaluada",
-            "conteos": conteos_analito(a["laboratorios"]),
+            "conteos": agregados.conteos[a["nombre"]],
             "laboratorios": [
                 {k: v for k, v in l.items() if k not in CAMPOS_INTERNOS}
                 for l in a["laboratorios"]
@@ -249,30 +316,39 @@ def escribir_json(codigo, analitos, area="quimica"):
         })
     analitos = limpios
 
+    # Con otro estimador que el Algoritmo A cambian los textos del valor asignado
+    # y el JSON lo anota; por defecto se escribe como siempre.
+    e, est = estimador(), estimador_publico()
+    criterios = CRITERIOS if est is None else {
+        **CRITERIOS,
+        "valor_asignado": f"{e['valor_asignado'].capitalize()} ({e['nombre']}, ISO 13528:2022).",
+    }
+    criterios = criterios_puntaje(criterios, puntaje)
     doc = {
         "codigo": codigo,
         "area": area,
         "modelo": "clia",
         "fecha": fecha_calculo(codigo),
-        "metodologia": "Valor asignado: media robusta (ISO 13528, Algoritmo A). "
+        "metodologia": f"Valor asignado: {e['valor_asignado']} (ISO 13528, {e['nombre']}). "
                        "Evaluación: z-score con σpt = ETa/3 (CLIA §493.931).",
+        **({"estimador": est} if est else {}),
+        **({"puntajes": puntajes.descripcion(puntaje)} if puntaje else {}),
         "evaluacion": "clia",
-        "criterios_aceptacion": CRITERIOS,
-        "resumen": {
-            "laboratorios": len({l["id"] for a in analitos for l in a["laboratorios"]}),
-            "aceptables": tot["A"],
-            "cuestionables": tot["C"],
-            "inaceptables": tot["I"],
-            "sin_evaluar": tot["NE"],
-            "total": tot["A"] + tot["C"] + tot["I"],
-        },
-        "desempeno_global": desempeno_global(analitos),
+        "criterios_aceptacion": criterios,
+        "resumen": agregados.resumen(),
+        "desempeno_global": agregados.desempeno_global(),
         "analitos": analitos,
+        "heatmap": matriz_heatmap(analitos),
     }
+    pares = youden(analitos)
+    if pares:
+        doc["youden"] = pares
     os.makedirs(SALIDA_DIR, exist_ok=True)
     ruta = os.path.join(SALIDA_DIR, f"{codigo}-{area}-clia.json")
     with open(ruta, "w", encoding="utf-8") as f:
         json.dump(doc, f, ensure_ascii=False, indent=2)
+    escribir_fragmentos(doc, ruta)
+    registrar_versiones(ruta)
     return ruta, tot
 
 
@@ -280,14 +356,17 @@ def main():
     ap = argparse.ArgumentParser(
         description="Evaluación por aptitud al uso (modelo CLIA) — pipeline paralelo.")
     ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("evaluar_clia", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo, "quimica"))
 
-    por_analito, _ceros = cargar(codigo)
+    with etapa("cargar"):
+        por_analito, _ceros = cargar(codigo)
+    puntaje = puntaje_de_ronda(codigo, "quimica", "clia", por_analito)
     especificaciones = leer_especificaciones("quimica")
     por_grupo_pares = analitos_por_grupo_pares(codigo, "quimica")
     sin_eval, nota_sin_eval = analitos_sin_evaluar(codigo, "quimica")
@@ -296,18 +375,28 @@ def main():
         sys.exit("ERROR: hay analitos en 'sin_evaluar' pero falta "
                  "'sin_evaluar_nota' en config.json.")
 
-    analitos = evaluar(por_analito, especificaciones, por_grupo_pares,
-                       sin_evaluar=sin_eval, nota_sin_evaluar=nota_sin_eval)
-    ruta, tot = escribir_json(codigo, analitos)
+    with etapa("estimar_puntuar"):
+        analitos = evaluar(por_analito, especificaciones, por_grupo_pares,
+                           sin_evaluar=sin_eval, nota_sin_evaluar=nota_sin_eval,
+                           puntaje=puntaje)
+    with etapa("serializar"):
+        ruta, tot = escribir_json(codigo, analitos, puntaje=puntaje)
 
     evaluadas = tot["A"] + tot["C"] + tot["I"]
     print(f"\n  Evaluación CLIA (σpt = ETa/3) — {codigo}")
     print(f"  Escrito: {ruta}")
+    if puntaje:
+        p = puntajes.PUNTAJES[puntaje]
+        print(f"  Clasifica: {p['nombre']} = {p['formula']} ({p['referencia']})")
     print(f"  Evaluaciones: {evaluadas}   "
           f"A: {tot['A']} ({tot['A']/evaluadas*100:.1f}%)   "
           f"C: {tot['C']} ({tot['C']/evaluadas*100:.1f}%)   "
           f"I: {tot['I']} ({tot['I']/evaluadas*100:.1f}%)"
           + (f"   NE: {tot['NE']}" if tot["NE"] else ""))
+    informar_incertidumbre(analitos)
+    pares = youden(analitos)
+    if pares:
+        imprimir_youden(pares)
 
 
 if __name__ == "__main__":
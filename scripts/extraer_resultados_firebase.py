@@ -43,6 +43,9 @@ from collections import defaultdict
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from calcular_zscore import modas_kde, imprimir_modas, plataforma, nombre_item  # noqa: E402
+
 CREDS_PATH  = "support/concalab-uasd-64ff4-firebase-adminsdk-fbsvc-c400cdf10b.json"
 CONFIG_PATH = "data/config.json"
 COLECCION   = "resultados_generales"
@@ -55,6 +58,12 @@ COLUMNAS = [
     "id_publico", "categoria", "analito",
     "metodo", "instrumento", "resultado_raw", "unidad_raw", "fecha_reporte",
 ]
+# Solo una ronda con varias muestras por analito escribe esta columna: el CSV de
+# una ronda de una muestra queda como siempre.
+COLUMNA_MUESTRA = "muestra"
+# Incertidumbre expandida que reporta el laboratorio (para ζ y En, ver puntajes.py).
+# Como la muestra, solo se escribe si algún laboratorio la reportó.
+COLUMNA_INCERTIDUMBRE = "incertidumbre_raw"
 
 # Cualquier campo del documento que pueda de-anonimizar al laboratorio.
 #
@@ -143,9 +152,11 @@ def extraer(db, codigo, campo, formato):
                 "resultado_raw": resultado,
                 "unidad_raw":    str(r.get("unit", "")).strip(),
                 "fecha_reporte": fecha,
+                "muestra":       str(r.get("sample", "") or "").strip(),
+                COLUMNA_INCERTIDUMBRE: str(r.get("uncertainty", "") or "").strip(),
             })
 
-    filas.sort(key=lambda f: (f["categoria"], f["analito"], f["id_publico"]))
+    filas.sort(key=lambda f: (f["categoria"], f["analito"], f["muestra"], f["id_publico"]))
     return filas, sin_codigo, vacios
 
 
@@ -181,8 +192,12 @@ def verificar_identificadores(db, codigo, campo, formato):
 
 def escribir_csv(filas, codigo):
     ruta = os.path.join(SALIDA_DIR, f"ensayos_{codigo}.csv")
+    varias = len({f["muestra"] for f in filas}) > 1
+    con_u = any(f[COLUMNA_INCERTIDUMBRE] for f in filas)
     with open(ruta, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=COLUMNAS)
+        w = csv.DictWriter(f, fieldnames=COLUMNAS + [COLUMNA_MUESTRA] * varias
+                           + [COLUMNA_INCERTIDUMBRE] * con_u,
+                           extrasaction="ignore")
         w.writeheader()
         w.writerows(filas)
     return ruta
@@ -209,7 +224,8 @@ def diagnostico_magnitud(filas):
         if f["categoria"].startswith("Quím"):
             v = a_float(f["resultado_raw"])
             if v is not None and v > 0:
-                por_analito[f["analito"]].append((f["id_publico"], v, f["unidad_raw"]))
+                por_analito[nombre_item(f["analito"], f["muestra"])].append(
+                    (f["id_publico"], v, f["unidad_raw"]))
 
     print("\n" + "=" * 78)
     print("  DIAGNÓSTICO DE MAGNITUD — Química Clínica")
@@ -241,6 +257,25 @@ def diagnostico_magnitud(filas):
     return total_sosp
 
 
+def diagnostico_modas(filas):
+    """
+    Alerta temprana de bimodalidad, antes de calcular nada.
+
+    Cuenta las modas de la densidad de cada analito (calcular_zscore.modas_kde)
+    sobre todos los resultados, sin depender de cómo plataforma() agrupe los
+    equipos: un analito con dos modas necesita una decisión de evaluación en
+    config.json antes del informe.
+    """
+    por_analito = defaultdict(list)
+    for f in filas:
+        if f["categoria"].startswith("Quím"):
+            v = a_float(f["resultado_raw"])
+            if v is not None and v > 0:
+                por_analito[nombre_item(f["analito"], f["muestra"])].append(
+                    {"valor": v, "plataforma": plataforma(f["instrumento"], f["metodo"])})
+    return imprimir_modas(modas_kde(por_analito), por_analito)
+
+
 def main():
     ap = argparse.ArgumentParser(description="Extrae resultados de una ronda desde Firestore a CSV.")
     ap.add_argument("--codigo", help="Código de ensayo (por defecto: la ronda activa de config.json)")
@@ -274,6 +309,7 @@ def main():
     print(f"\n  CSV escrito en: {ruta}")
 
     diagnostico_magnitud(filas)
+    diagnostico_modas(filas)
 
 
 if __name__ == "__main__":
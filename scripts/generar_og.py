@@ -37,6 +37,9 @@ import subprocess
 import tempfile
 from datetime import date
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+
 RAIZ        = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SALIDA_DIR  = os.path.join(RAIZ, "assets", "images", "og")
 CONFIG_PATH = os.path.join(RAIZ, "data", "config.json")
@@ -254,18 +257,26 @@ def rondas_disponibles():
 def main():
     ap = argparse.ArgumentParser(description="Genera las tarjetas Open Graph del sitio.")
     ap.add_argument("--codigo", help="Solo esta ronda (por defecto: todas + la genérica)")
+    argumento_perfil(ap)
     args = ap.parse_args()
+    if args.perfil:
+        activar_perfil("generar_og", args.codigo, args.perfil)
 
-    nav = navegador()
-    logo_uri = logo_data_uri()
+    with etapa("preparar"):
+        nav = navegador()
+        logo_uri = logo_data_uri()
     print("Generando tarjetas de vista previa (1200x630) …")
 
+    # Cada tarjeta lanza el navegador headless: su CPU cuenta como 'hijos'.
     if args.codigo:
-        tarjeta_ronda(args.codigo, logo_uri, nav)
+        with etapa("renderizar"):
+            tarjeta_ronda(args.codigo, logo_uri, nav)
     else:
         for codigo in rondas_disponibles():
-            tarjeta_ronda(codigo, logo_uri, nav)
-        tarjeta_generica(logo_uri, nav)
+            with etapa("renderizar"):
+                tarjeta_ronda(codigo, logo_uri, nav)
+        with etapa("renderizar"):
+            tarjeta_generica(logo_uri, nav)
 
     print("\n  Recordatorio: las tarjetas son estáticas y se commitean. Si cambia el "
           "número de\n  participantes o de analitos de una ronda, hay que regenerarlas.")
@@ -0,0 +1,294 @@
+"""
+Genera una ronda SINTÉTICA de Química Clínica para pruebas de escala.
+
+Lo único real con que probar el pipeline es support/ensayos_EA-001-2026.csv
+(37 laboratorios × 26 analitos). Para medir cómo se comportan cargar,
+calcular_agrupado, evaluar_clia.evaluar, validar_informe e informe_pdf a 10×,
+100× o 1000× ese tamaño hace falta una ronda con la misma forma y los mismos
+defectos que la real, y reproducible: la misma semilla da el mismo CSV byte a
+byte, de modo que dos corridas de benchmark comparan código y no datos.
+
+Lo que se reproduce de EA-001-2026, porque es lo que ejercita las ramas
+difíciles del pipeline:
+
+  - Efecto de plataforma: la química seca lee desplazada en bloque en ALP,
+    LDH y GGT (ALP seca ≈ 2.7× la húmeda, LDH ≈ 0.53×, GGT ≈ 0.81×), que es
+    lo que dispara detectar_bimodales y la evaluación por grupo de pares.
+  - Errores de unidad: deslizamiento de coma (×10 / ÷10) y resultados en
+    unidades SI (mmol/L, µmol/L) donde el resto reporta mg/dL.
+  - Ceros como marcador de "no realizado", a veces con instrumento '-----'.
+  - Resultados no numéricos y con coma decimal.
+  - Instrumento en texto libre con erratas (FUJIFIMN, FUJI FILM, VITRO).
+
+Los centros y CV por analito son los de EA-001-2026 redondeados: cifras ya
+publicadas, no datos de ningún laboratorio.
+
+Salida: support/ensayos_<codigo>.csv (mismas columnas que
+extraer_resultados_firebase.py). Va en support/ como el CSV real; aunque sea
+sintético, así el pipeline lo lee sin cambios.
+
+Uso:
+  python scripts/generar_ronda_sintetica.py --escala 10                 # 370 labs
+  python scripts/generar_ronda_sintetica.py --labs 5000 --analitos 40 --semilla 7
+  python scripts/generar_ronda_sintetica.py --escala 100 --codigo EA-902-2099
+  python scripts/generar_ronda_sintetica.py --muestras 2 --codigo EA-903-2099
+  python scripts/generar_ronda_sintetica.py --homogeneidad   # + réplicas del ítem
+"""
+
+import os
+import sys
+import csv
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import ENTRADA_DIR  # noqa: E402
+
+# Columnas de extraer_resultados_firebase.COLUMNAS. No se importa de allí
+# porque ese módulo exige firebase_admin al cargarse.
+COLUMNAS = [
+    "id_publico", "categoria", "analito",
+    "metodo", "instrumento", "resultado_raw", "unidad_raw", "fecha_reporte",
+]
+
+LABS_REALES = 37
+CODIGO_POR_DEFECTO = "EA-900-2099"
+
+# nombre: (unidad, centro húmedo, CV entre labs, factor química seca,
+#          factor a la unidad SI que algunos laboratorios usan por error, unidad SI)
+ANALITOS = {
+    "ALT (TGP)":                ("U/L",    143,   0.13, 1.00, None,   None),
+    "AST (TGO)":                ("U/L",    145,   0.17, 1.00, None,   None),
+    "Albúmina":                 ("g/dL",   3.2,   0.13, 1.00, 10,     "g/L"),
+    "Amilasa":                  ("U/L",    301,   0.21, 1.00, None,   None),
+    "Bilirrubina Directa":      ("mg/dL",  1.9,   0.37, 1.00, 17.1,   "µmol/L"),
+    "Bilirrubina Total":        ("mg/dL",  4.9,   0.16, 1.00, 17.1,   "µmol/L"),
+    "CK-TOTAL":                 ("U/L",    553,   0.26, 1.00, None,   None),
+    "Calcio":                   ("mg/dL",  11.7,  0.11, 1.00, 0.2495, "mmol/L"),
+    "Cloruro":                  ("mmol/L", 114,   0.08, 1.00, None,   None),
+    "Colesterol":               ("mg/dL",  278,   0.15, 1.00, 0.02586, "mmol/L"),
+    "Colesterol HDL":           ("mg/dL",  89,    0.26, 1.00, 0.02586, "mmol/L"),
+    "Creatinina":               ("mg/dL",  3.8,   0.13, 1.00, 88.4,   "µmol/L"),
+    "Fosfatasa Alcalina (ALP)": ("U/L",    407,   0.28, 2.70, None,   None),
+    "Fósforo":                  ("mg/dL",  7.3,   0.13, 1.00, 0.3229, "mmol/L"),
+    "Gamma GGT":                ("U/L",    180,   0.12, 0.81, None,   None),
+    "Glucosa":                  ("mg/dL",  271,   0.10, 1.00, 0.0555, "mmol/L"),
+    "Hierro":                   ("ug/dL",  205,   0.22, 1.00, 0.179,  "µmol/L"),
+    "LDH":                      ("U/L",    704,   0.15, 0.53, None,   None),
+    "Lipasa":                   ("U/L",    66,    0.41, 1.00, None,   None),
+    "Magnesio":                 ("mg/dL",  4.3,   0.25, 1.00, 0.4114, "mmol/L"),
+    "Potasio":                  ("mmol/L", 6.1,   0.06, 1.00, None,   None),
+    "Proteínas Total":          ("g/dL",   4.8,   0.17, 1.00, 10,     "g/L"),
+    "Sodio":                    ("mmol/L", 154,   0.04, 1.00, None,   None),
+    "Triglicéridos":            ("mg/dL",  271,   0.17, 1.00, 0.01129, "mmol/L"),
+    "Urea":                     ("mg/dL",  107,   0.18, 1.00, 0.1665, "mmol/L"),
+    "Ácido Úrico":              ("mg/dL",  9.3,   0.16, 1.00, 59.48,  "µmol/L"),
+}
+
+# (plataforma, proporción de laboratorios, instrumentos en texto libre, método).
+# Las erratas son las que plataforma() ya tolera en los datos reales.
+PLATAFORMAS = [
+    ("humeda", 0.70, ["COBAS C311", "BS-200", "MINDRAY BS-240", "ARCHITECT C4000",
+                      "SELECTRA PRO M", "A15 BIOSYSTEMS", "cobas c111"], "Espectrofotometría"),
+    ("seca_a", 0.22, ["FUJIFILM DRI-CHEM NX700", "FUJIFIMN NX600", "FUJI FILM DRI CHEM",
+                      "fujifilm nx500"], "Química seca"),
+    ("seca_b", 0.08, ["VITROS 350", "VITRO 250", "Vitros 4600"], "Química seca"),
+]
+
+# Probabilidades por resultado.
+P_NO_REPORTA = 0.12       # el analito no está en el alcance del laboratorio
+P_CERO = 0.015            # "no realizado" escrito como 0
+P_NO_NUMERICO = 0.005
+P_UNIDAD_SI = 0.01        # reporta en SI con la etiqueta SI
+P_COMA = 0.01             # ×10 o ÷10 con la unidad correcta
+P_GROSERO = 0.02          # error grosero (transcripción, muestra)
+P_COMA_DECIMAL = 0.10     # "98,5" en lugar de "98.5"
+
+# Nivel de cada muestra respecto del centro del analito; la primera es la de
+# siempre, así que --muestras 1 da el mismo CSV que antes.
+NIVELES_MUESTRA = (1.0, 0.55, 1.6, 0.8)
+
+# Estudio de homogeneidad y estabilidad (homogeneidad.py): CV de repetibilidad,
+# CV entre frascos, y los analitos que se fabrican fuera de criterio para que
+# el estudio tenga algo que detectar: un lote heterogéneo y uno que se degrada
+# con la luz en el envío.
+CV_REPETIBILIDAD = 0.012
+CV_ENTRE_FRASCOS = 0.004
+HETEROGENEO = ("Lipasa", 0.06)
+INESTABLE = ("Bilirrubina Directa", 0.85)
+
+VARIANTES_UNIDAD = {"mg/dL": ["mg/dL", "mg/dl", "MG/DL"], "ug/dL": ["ug/dl", "µg/dL"],
+                    "g/dL": ["g/dL", "g/dl"], "U/L": ["U/L", "UI/L", "u/l"]}
+
+
+def nombres_analitos(n):
+    """Los primeros n del catálogo; más allá de 26 se repiten con sufijo [k].
+
+    Los repetidos mantienen los parámetros del original; nombre_base() quita
+    el sufijo para buscar su ETa en config.json.
+    """
+    base = list(ANALITOS)
+    return [base[i % len(base)] + (f" [{i // len(base) + 1}]" if i >= len(base) else "")
+            for i in range(n)]
+
+
+def nombre_base(nombre):
+    return nombre.split(" [")[0]
+
+
+def especificaciones_para(nombres, especificaciones):
+    """ETa de config.json extendidas a los analitos repetidos, para evaluar_clia."""
+    return {n: especificaciones[nombre_base(n)] for n in nombres
+            if nombre_base(n) in especificaciones}
+
+
+def generar(n_labs, n_analitos=len(ANALITOS), n_plataformas=3, semilla=0,
+            fecha_base=date(2099, 3, 1), muestras=1):
+    """Filas del CSV, en orden fijo. Misma semilla → mismas filas.
+
+    Con muestras > 1 cada analito se mide en varias muestras de distinto nivel
+    (NIVELES_MUESTRA) y cada fila lleva su 'muestra' (M1, M2, …). El sesgo de
+    cada laboratorio se repite en todas: es lo que ve el diagnóstico de Youden.
+    """
+    rng = np.random.default_rng(semilla)
+    plataformas = PLATAFORMAS[:max(1, min(n_plataformas, len(PLATAFORMAS)))]
+    pesos = np.array([p[1] for p in plataformas])
+    pesos = pesos / pesos.sum()
+
+    ancho = max(3, len(str(n_labs)))
+    ids = [f"L-{i:0{ancho}d}" for i in range(1, n_labs + 1)]
+    # Cada laboratorio usa un analizador para todo y tiene un sesgo propio
+    # que se repite en todos sus analitos.
+    plat_lab = rng.choice(len(plataformas), size=n_labs, p=pesos)
+    instr_lab = [plataformas[k][2][rng.integers(len(plataformas[k][2]))] for k in plat_lab]
+    sesgo_lab = rng.normal(0, 0.04, size=n_labs)
+    dia_lab = rng.integers(0, 60, size=n_labs)
+
+    filas = []
+    for nombre in nombres_analitos(n_analitos):
+        unidad, centro, cv, factor_seca, factor_si, unidad_si = ANALITOS[nombre_base(nombre)]
+        seca = np.array([plataformas[k][0] != "humeda" for k in plat_lab])
+        # Si el analito está en el alcance del laboratorio se decide una vez: quien
+        # lo mide reporta todas las muestras.
+        alcance = None
+        for j in range(muestras):
+            valor = centro * NIVELES_MUESTRA[j % len(NIVELES_MUESTRA)] \
+                * np.where(seca, factor_seca, 1.0) \
+                * (1 + sesgo_lab + rng.normal(0, cv * 0.8, size=n_labs))
+            u = rng.random((7, n_labs))
+            if alcance is None:
+                alcance = u[1] >= P_NO_REPORTA
+            grosero = u[0] < P_GROSERO
+            valor = np.where(grosero, valor * rng.uniform(0.4, 2.5, size=n_labs), valor)
+            valor = np.abs(valor)
+            muestra = {"muestra": f"M{j + 1}"} if muestras > 1 else {}
+            for i in range(n_labs):
+                if not alcance[i]:
+                    continue
+                instrumento, etiqueta, v = instr_lab[i], unidad, float(valor[i])
+                if u[2, i] < P_CERO:
+                    crudo = "0" if u[6, i] < 0.5 else "0.00"
+                    if u[6, i] < 0.3:
+                        instrumento = "-----"
+                elif u[3, i] < P_NO_NUMERICO:
+                    crudo = ["N/R", "", "pendiente", "-"][int(u[6, i] * 4)]
+                else:
+                    if factor_si and u[4, i] < P_UNIDAD_SI:
+                        v, etiqueta = v * factor_si, unidad_si
+                    elif u[4, i] < P_UNIDAD_SI + P_COMA:
+                        v = v * (10 if u[6, i] < 0.5 else 0.1)
+                    decimales = 0 if v >= 100 else (1 if v >= 10 else 2)
+                    crudo = f"{v:.{decimales}f}"
+                    if u[5, i] < P_COMA_DECIMAL:
+                        crudo = crudo.replace(".", ",")
+                variantes = VARIANTES_UNIDAD.get(etiqueta)
+                if variantes:
+                    etiqueta = variantes[int(u[6, i] * len(variantes)) % len(variantes)]
+                filas.append({
+                    "id_publico": ids[i],
+                    "categoria": "Química Clínica",
+                    "analito": nombre,
+                    "metodo": plataformas[plat_lab[i]][3],
+                    "instrumento": instrumento,
+                    "resultado_raw": crudo,
+                    "unidad_raw": etiqueta,
+                    "fecha_reporte": (fecha_base + timedelta(days=int(dia_lab[i]))).isoformat(),
+                    **muestra,
+                })
+    return filas
+
+
+def generar_homogeneidad(n_analitos=len(ANALITOS), frascos=10, replicas=2, semilla=0):
+    """Réplicas del ítem para homogeneidad.py: `frascos` × `replicas` por analito
+    en el estudio de homogeneidad y la mitad de frascos en el de estabilidad."""
+    rng = np.random.default_rng([semilla, 13528])
+    filas = []
+    for nombre in nombres_analitos(n_analitos):
+        unidad, centro = ANALITOS[nombre_base(nombre)][:2]
+        cv_frasco = HETEROGENEO[1] if nombre == HETEROGENEO[0] else CV_ENTRE_FRASCOS
+        for estudio, g, nivel in (("homogeneidad", frascos, 1.0),
+                                  ("estabilidad", max(2, frascos // 2),
+                                   INESTABLE[1] if nombre == INESTABLE[0] else 1.0)):
+            frasco = centro * nivel * (1 + rng.normal(0, cv_frasco, size=g))
+            valores = frasco[:, None] * (1 + rng.normal(0, CV_REPETIBILIDAD, size=(g, replicas)))
+            primero = 1 if estudio == "homogeneidad" else frascos + 1
+            for k in range(g):
+                for r in range(replicas):
+                    v = float(valores[k, r])
+                    decimales = 1 if v >= 100 else (2 if v >= 10 else 3)
+                    filas.append({"analito": nombre, "estudio": estudio,
+                                  "frasco": f"F{primero + k:02d}", "replica": r + 1,
+                                  "resultado": f"{v:.{decimales}f}", "unidad": unidad})
+    return filas
+
+
+def escribir_csv(filas, codigo):
+    os.makedirs(ENTRADA_DIR, exist_ok=True)
+    ruta = os.path.join(ENTRADA_DIR, f"ensayos_{codigo}.csv")
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNAS + ["muestra"] * ("muestra" in filas[0]))
+        w.writeheader()
+        w.writerows(filas)
+    return ruta
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera una ronda sintética reproducible.")
+    ap.add_argument("--codigo", default=CODIGO_POR_DEFECTO,
+                    help=f"Código de la ronda sintética (por defecto {CODIGO_POR_DEFECTO})")
+    ap.add_argument("--escala", type=float, default=1,
+                    help=f"Múltiplo del tamaño real ({LABS_REALES} laboratorios)")
+    ap.add_argument("--labs", type=int, help="Número de laboratorios (ignora --escala)")
+    ap.add_argument("--analitos", type=int, default=len(ANALITOS))
+    ap.add_argument("--plataformas", type=int, default=3, choices=[1, 2, 3])
+    ap.add_argument("--semilla", type=int, default=0)
+    ap.add_argument("--muestras", type=int, default=1,
+                    help="Muestras por analito (ronda de muestras pareadas)")
+    ap.add_argument("--homogeneidad", action="store_true",
+                    help="Escribe también support/homogeneidad_<codigo>.csv (homogeneidad.py)")
+    args = ap.parse_args()
+
+    if args.codigo == "EA-001-2026" or not args.codigo.startswith("EA-9"):
+        # Una ronda sintética con código real pisaría el CSV de extracción.
+        sys.exit("ERROR: usa un código EA-9NN-AAAA para rondas sintéticas.")
+
+    n_labs = args.labs or max(1, round(LABS_REALES * args.escala))
+    filas = generar(n_labs, args.analitos, args.plataformas, args.semilla,
+                    muestras=max(1, args.muestras))
+    ruta = escribir_csv(filas, args.codigo)
+    print(f"  {n_labs} laboratorios × {args.analitos} analitos → {len(filas)} filas")
+    print(f"  Semilla {args.semilla}. Escrito: {ruta}")
+    if args.homogeneidad:
+        filas = generar_homogeneidad(args.analitos, semilla=args.semilla)
+        ruta = os.path.join(ENTRADA_DIR, f"homogeneidad_{args.codigo}.csv")
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=list(filas[0]))
+            w.writeheader()
+            w.writerows(filas)
+        print(f"  Réplicas del ítem ({len(filas)} filas). Escrito: {ruta}")
+
+
+if __name__ == "__main__":
+    main()
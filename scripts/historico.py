@@ -0,0 +1,338 @@
+"""
+Histórico longitudinal de resultados — una base SQLite con todas las rondas.
+
+Cada ronda vive en su propio support/ensayos_<codigo>.csv y en sus
+data/informes/<codigo>-*.json, así que preguntar "cómo le fue a L-131 en
+Creatinina en las últimas seis rondas" obligaba a abrir archivo por archivo.
+Este script vuelca ambos a support/historico.sqlite, con índices por
+(laboratorio, analito, ronda), y expone funciones de consulta para el resto de
+scripts.
+
+Dos tablas de datos, porque son dos cosas distintas:
+
+  resultados    lo que el laboratorio reportó, tal cual (CSV de extracción),
+                con el valor numérico ya interpretado y su plataforma.
+  evaluaciones  lo que el informe publicó (z, clasificación, valor asignado),
+                una fila por modelo: el JSON de consenso y el -clia.
+
+La base va en support/ y NO en data/ por la misma razón que el CSV (ver
+extraer_resultados_firebase.py): lleva método e instrumento por laboratorio, y
+data/ se publica. Es regenerable desde los CSV y JSON en cualquier momento.
+
+Importar es idempotente por ronda: se borra y se reescribe la ronda entera en
+una sola transacción. Si las huellas de los archivos de origen no cambiaron,
+no se toca nada.
+
+La columna `lab` es el identificador público con que se publicó cada ronda, y
+ese identificador es una decisión del proveedor por ronda (identificador_publico
+en config.json): el mismo laboratorio puede ser 55 en EA-001-2025 y L-055 en
+EA-001-2026. Cada ronda guarda su esquema al importarse, y las consultas que
+cruzan rondas avisan cuando la ventana mezcla esquemas en vez de unir o partir
+laboratorios en silencio.
+
+Uso:
+  python scripts/historico.py importar --codigo EA-001-2026
+  python scripts/historico.py importar --todas
+  python scripts/historico.py consultar --lab L-131 --analito "Creatinina" --ultimas 6
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import glob
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import huella, esquema_identificador, ENTRADA_DIR, SALIDA_DIR  # noqa: E402
+from calcular_zscore import a_float, plataforma  # noqa: E402
+
+HISTORICO_PATH = os.path.join(ENTRADA_DIR, "historico.sqlite")
+# Esquema de una ronda que no declara identificador_publico.
+SIN_DECLARAR = "(sin declarar)"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS rondas (
+    codigo      TEXT PRIMARY KEY,
+    orden       INTEGER NOT NULL,
+    origenes    TEXT NOT NULL,         -- {archivo: huella} de lo importado
+    identificador TEXT                 -- esquema del identificador público; NULL si no se declaró
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    codigo      TEXT NOT NULL,
+    lab         TEXT NOT NULL,
+    categoria   TEXT,
+    analito     TEXT NOT NULL,
+    metodo      TEXT,
+    instrumento TEXT,
+    plataforma  TEXT,
+    crudo       TEXT,
+    valor       REAL,                  -- NULL si no es numérico
+    unidad      TEXT,
+    fecha       TEXT
+);
+CREATE TABLE IF NOT EXISTS evaluaciones (
+    codigo          TEXT NOT NULL,
+    area            TEXT NOT NULL,
+    modelo          TEXT NOT NULL,     -- 'consenso' | 'clia'
+    lab             TEXT NOT NULL,
+    analito         TEXT NOT NULL,
+    unidad          TEXT,
+    evaluacion      TEXT,
+    grupo           TEXT,
+    resultado       REAL,
+    valor_asignado  REAL,
+    sigma           REAL,              -- σpt en CLIA, σ* en consenso
+    z_score         REAL,
+    clasificacion   TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_res_lab ON resultados (lab, analito, codigo);
+CREATE INDEX IF NOT EXISTS ix_res_analito ON resultados (analito, codigo);
+CREATE INDEX IF NOT EXISTS ix_eva_lab ON evaluaciones (lab, analito, codigo);
+CREATE INDEX IF NOT EXISTS ix_eva_analito ON evaluaciones (analito, codigo);
+CREATE INDEX IF NOT EXISTS ix_eva_ronda ON evaluaciones (codigo, modelo);
+"""
+
+
+def orden_ronda(codigo):
+    """Clave cronológica de un código EA-NNN-AAAA: año y luego número de ronda.
+
+    El orden alfabético pondría EA-002-2025 después de EA-001-2026.
+    """
+    m = re.fullmatch(r"EA-(\d+)-(\d{4})", codigo)
+    if not m:
+        sys.exit(f"ERROR: código de ronda no reconocido: {codigo!r} (se espera EA-NNN-AAAA)")
+    return int(m.group(2)) * 1000 + int(m.group(1))
+
+
+def conectar(ruta=HISTORICO_PATH):
+    con = sqlite3.connect(ruta)
+    con.row_factory = sqlite3.Row
+    con.executescript(ESQUEMA)
+    # Históricos creados antes de guardar el esquema del identificador.
+    if "identificador" not in {c["name"] for c in con.execute("PRAGMA table_info(rondas)")}:
+        con.execute("ALTER TABLE rondas ADD COLUMN identificador TEXT")
+    return con
+
+
+# ====================================================================
+# IMPORTACIÓN
+# ====================================================================
+
+def origenes_ronda(codigo):
+    """Archivos de los que sale una ronda: su CSV (si existe) y sus JSON publicados."""
+    rutas = []
+    csv_ruta = os.path.join(ENTRADA_DIR, f"ensayos_{codigo}.csv")
+    if os.path.exists(csv_ruta):
+        rutas.append(csv_ruta)
+    # <codigo>.json (formato anterior) y <codigo>-<area>[-clia].json. Los
+    # fragmentos van en subcarpetas y no entran: repiten el JSON completo.
+    rutas += sorted(glob.glob(os.path.join(SALIDA_DIR, f"{codigo}.json")) +
+                    glob.glob(os.path.join(SALIDA_DIR, f"{codigo}-*.json")))
+    return rutas
+
+
+def filas_csv(codigo, ruta):
+    with open(ruta, encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            yield (codigo, r["id_publico"], r["categoria"], r["analito"],
+                   r["metodo"], r["instrumento"], plataforma(r["instrumento"], r["metodo"]),
+                   r["resultado_raw"], a_float(r["resultado_raw"]), r["unidad_raw"],
+                   r.get("fecha_reporte"))
+
+
+def filas_json(codigo, ruta):
+    with open(ruta, encoding="utf-8") as f:
+        d = json.load(f)
+    area = d.get("area") or "quimica"
+    modelo = d.get("modelo") or "consenso"
+    for a in d["analitos"]:
+        grupos = {g["nombre"]: g for g in a.get("grupos", [])}
+        for l in a["laboratorios"]:
+            # En grupo de pares el centro es el del grupo del laboratorio.
+            centro = grupos.get(l.get("grupo"), a)
+            yield (codigo, area, modelo, str(l["id"]), a["nombre"], a.get("unidad"),
+                   a.get("evaluacion"), l.get("grupo"), l.get("resultado"),
+                   centro.get("valor_asignado"),
+                   centro.get("sigma_pt", centro.get("sd_robusta")),
+                   l.get("z_score"), l.get("clasificacion"))
+
+
+def importar_ronda(con, codigo, forzar=False):
+    """Vuelca una ronda al histórico. Devuelve (resultados, evaluaciones) o None si no cambió."""
+    rutas = origenes_ronda(codigo)
+    if not rutas:
+        sys.exit(f"ERROR: no hay CSV ni JSON para {codigo} en {ENTRADA_DIR}/ ni {SALIDA_DIR}/")
+    origenes = json.dumps({os.path.basename(r): huella(r) for r in rutas}, sort_keys=True)
+    identificador = esquema_identificador(codigo)
+
+    previa = con.execute("SELECT origenes, identificador FROM rondas WHERE codigo = ?",
+                         (codigo,)).fetchone()
+    if (previa and previa["origenes"] == origenes and previa["identificador"] == identificador
+            and not forzar):
+        return None
+
+    with con:   # una transacción: la ronda queda entera o como estaba
+        con.execute("DELETE FROM resultados WHERE codigo = ?", (codigo,))
+        con.execute("DELETE FROM evaluaciones WHERE codigo = ?", (codigo,))
+        n_res = n_eva = 0
+        for r in rutas:
+            if r.endswith(".csv"):
+                cur = con.executemany(
+                    "INSERT INTO resultados VALUES (?,?,?,?,?,?,?,?,?,?,?)", filas_csv(codigo, r))
+                n_res += cur.rowcount
+            else:
+                cur = con.executemany(
+                    "INSERT INTO evaluaciones VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", filas_json(codigo, r))
+                n_eva += cur.rowcount
+        con.execute("INSERT OR REPLACE INTO rondas (codigo, orden, origenes, identificador) "
+                    "VALUES (?, ?, ?, ?)", (codigo, orden_ronda(codigo), origenes, identificador))
+    return n_res, n_eva
+
+
+def rondas_disponibles():
+    """Códigos con algún CSV o JSON en disco, en orden cronológico."""
+    codigos = set()
+    for ruta in glob.glob(os.path.join(ENTRADA_DIR, "ensayos_EA-*.csv")):
+        codigos.add(os.path.basename(ruta)[len("ensayos_"):-len(".csv")])
+    for ruta in glob.glob(os.path.join(SALIDA_DIR, "EA-*.json")):
+        m = re.match(r"(EA-\d+-\d{4})", os.path.basename(ruta))
+        if m:
+            codigos.add(m.group(1))
+    return sorted(codigos, key=orden_ronda)
+
+
+# ====================================================================
+# CONSULTAS
+# ====================================================================
+
+def rondas(con):
+    return [r["codigo"] for r in con.execute("SELECT codigo FROM rondas ORDER BY orden")]
+
+
+def identificadores(con):
+    """{codigo: esquema del identificador público}, en orden cronológico."""
+    return {r["codigo"]: r["identificador"] or SIN_DECLARAR
+            for r in con.execute("SELECT codigo, identificador FROM rondas ORDER BY orden")}
+
+
+def rondas_comparables(con):
+    """(comparables, omitidas): las rondas más recientes que comparten el
+    esquema de identificador de la última, y las anteriores a ese cambio.
+
+    Solo entre las comparables una misma etiqueta es un mismo laboratorio.
+    """
+    esquemas = list(identificadores(con).items())
+    i = len(esquemas)
+    while i > 0 and esquemas[i - 1][1] == esquemas[-1][1]:
+        i -= 1
+    return [c for c, _ in esquemas[i:]], [c for c, _ in esquemas[:i]]
+
+
+def avisar_identificadores(con, codigos):
+    """Avisa si `codigos` mezclan esquemas de identificador. Devuelve True si los mezclan."""
+    esquemas = identificadores(con)
+    usados = {c: esquemas[c] for c in esquemas if c in set(codigos)}
+    if len(set(usados.values())) < 2:
+        return False
+    print("  AVISO: la ventana mezcla identificadores públicos; una misma etiqueta no es")
+    print("         el mismo laboratorio en todas estas rondas, y la serie puede salir partida:")
+    for c, e in usados.items():
+        print(f"           {c:<12} {e}")
+    return True
+
+
+def trayectoria(con, lab, analito, ultimas=None, modelo="clia"):
+    """Evaluaciones de un laboratorio en un analito, de la más antigua a la más reciente.
+
+    `ultimas` limita a las N rondas más recientes en que el laboratorio
+    participó en ese analito. Si la ronda no publicó el `modelo` pedido, se
+    usa el de consenso, que toda ronda tiene.
+
+    La ventana abarca desde la ronda más antigua devuelta hasta la última del
+    histórico (todas si no se llenaron las `ultimas`: el laboratorio pudo
+    figurar con otra etiqueta). Si mezcla esquemas de identificador, se avisa.
+    """
+    filas = con.execute("""
+        SELECT e.*, r.orden FROM evaluaciones e JOIN rondas r USING (codigo)
+        WHERE e.lab = ? AND e.analito = ?
+          AND (e.modelo = ? OR NOT EXISTS (
+                SELECT 1 FROM evaluaciones x
+                WHERE x.codigo = e.codigo AND x.modelo = ? AND x.area = e.area))
+        ORDER BY r.orden DESC
+    """, (lab, analito, modelo, modelo)).fetchall()
+    if ultimas:
+        filas = filas[:ultimas]
+    llena = bool(ultimas) and len(filas) == ultimas
+    ventana = [c for c, o in con.execute("SELECT codigo, orden FROM rondas")
+               if not llena or o >= filas[-1]["orden"]]
+    avisar_identificadores(con, ventana)
+    return [dict(f) for f in reversed(filas)]
+
+
+def resultados_lab(con, lab, codigo=None):
+    """Lo que reportó un laboratorio, en una ronda o en todas."""
+    sql = ("SELECT s.* FROM resultados s JOIN rondas r USING (codigo) WHERE s.lab = ?"
+           + (" AND s.codigo = ?" if codigo else "") + " ORDER BY r.orden, s.analito")
+    return [dict(f) for f in con.execute(sql, (lab, codigo) if codigo else (lab,))]
+
+
+def evaluaciones_ronda(con, codigo, modelo="clia", analito=None):
+    sql = "SELECT * FROM evaluaciones WHERE codigo = ? AND modelo = ?"
+    args = [codigo, modelo]
+    if analito:
+        sql += " AND analito = ?"
+        args.append(analito)
+    return [dict(f) for f in con.execute(sql + " ORDER BY analito, lab", args)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Histórico longitudinal de resultados (SQLite).")
+    ap.add_argument("--db", default=HISTORICO_PATH)
+    sub = ap.add_subparsers(dest="orden", required=True)
+
+    imp = sub.add_parser("importar", help="Vuelca una ronda (o todas) al histórico")
+    imp.add_argument("--codigo")
+    imp.add_argument("--todas", action="store_true")
+    imp.add_argument("--forzar", action="store_true",
+                     help="Reimporta aunque los archivos de origen no hayan cambiado")
+
+    con_ = sub.add_parser("consultar", help="Trayectoria de un laboratorio en un analito")
+    con_.add_argument("--lab", required=True)
+    con_.add_argument("--analito", required=True)
+    con_.add_argument("--ultimas", type=int)
+    con_.add_argument("--modelo", choices=["consenso", "clia"], default="clia")
+    args = ap.parse_args()
+
+    con = conectar(args.db)
+
+    if args.orden == "importar":
+        if args.todas:
+            codigos = rondas_disponibles()
+        elif args.codigo:
+            codigos = [args.codigo]
+        else:
+            sys.exit("Indica --codigo o --todas.")
+        for codigo in codigos:
+            r = importar_ronda(con, codigo, forzar=args.forzar)
+            if r is None:
+                print(f"  {codigo}: sin cambios desde la última importación")
+            else:
+                print(f"  {codigo}: {r[0]} resultado(s) reportados, {r[1]} evaluación(es)")
+        print(f"  Histórico: {args.db}")
+        return
+
+    filas = trayectoria(con, args.lab, args.analito, args.ultimas, args.modelo)
+    if not filas:
+        sys.exit(f"Sin evaluaciones de {args.lab} en {args.analito}.")
+    print(f"\n{args.lab} — {args.analito}")
+    for f in filas:
+        z = "—" if f["z_score"] is None else f"{f['z_score']:+.2f}"
+        print(f"  {f['codigo']:<12} {f['modelo']:<9} {f['resultado']!s:>10} {f['unidad'] or '':<8} "
+              f"X*={f['valor_asignado']!s:<8} z={z:>6}  {f['clasificacion']}")
+
+
+if __name__ == "__main__":
+    main()
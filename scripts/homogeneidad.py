@@ -0,0 +1,353 @@
+"""
+Homogeneidad y estabilidad del ítem de ensayo — ISO 13528:2022, Anexo B.
+
+Antes de enviar una ronda hay que demostrar que los frascos son suficientemente
+iguales entre sí y que el material no cambia entre la preparación y la medición
+de los participantes. Si no, parte de la desviación de un laboratorio sería del
+frasco que le tocó y no suya, y la ronda le imputaría una no conformidad ajena.
+
+Lee las réplicas medidas por el proveedor en support/homogeneidad_<codigo>.csv:
+
+  analito,estudio,frasco,replica,resultado,unidad
+  Glucosa,homogeneidad,F01,1,271.3,mg/dL
+  Glucosa,homogeneidad,F01,2,270.8,mg/dL
+  Glucosa,estabilidad,F11,1,268.9,mg/dL
+  ...
+
+'estudio' es 'homogeneidad' (g frascos al azar, m réplicas de cada uno) o
+'estabilidad' (frascos guardados en las condiciones del envío y medidos al
+final). El resultado admite coma decimal, como el CSV de la ronda.
+
+Homogeneidad (§B.2). ANOVA de un factor por analito:
+
+  s_w  desviación dentro de frasco (repetibilidad), √MSW
+  s_x  desviación entre promedios de frasco, √(MSB/m)
+  s_s  desviación entre frascos, √max(0, s_x² − s_w²/m)
+
+  Criterio  s_s ≤ 0.3·σpt. Si no se cumple, el ampliado de §B.2.3:
+            s_s ≤ √(F1·(0.3·σpt)² + F2·s_w²), que descuenta que con pocas
+            réplicas s_s se estima mal (F1, F2 de la Tabla B.1).
+
+Estabilidad (§B.5): |ȳ_h − ȳ_e| ≤ 0.3·σpt, con ȳ_h el promedio del estudio de
+homogeneidad y ȳ_e el de estabilidad. Ampliado con las incertidumbres de ambos
+promedios: 0.3·σpt + 2·√(u(ȳ_h)² + u(ȳ_e)²).
+
+σpt es la del informe que se entrega: ETa/3 (evaluar_clia.delta_e() sobre ȳ_h).
+Un analito sin ETa declarado se informa sin criterio.
+
+Todos los analitos se calculan a la vez: las réplicas se pivotan a una matriz
+analito × frasco × réplica (NaN donde no hay medición) y las sumas de cuadrados
+salen de operaciones sobre sus ejes, sin bucles por analito. Con réplicas
+desiguales entre frascos se usa el n efectivo de un ANOVA desbalanceado.
+
+Escribe data/informes/<codigo>-<area>-homogeneidad.json; informe_pdf.py lo
+incluye como sección si existe.
+
+Uso:
+  python scripts/homogeneidad.py --codigo EA-001-2026
+  python scripts/homogeneidad.py --codigo EA-001-2026 --csv otra/ruta.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import ENTRADA_DIR, SALIDA_DIR, codigo_activo, registrar_versiones  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+
+# Fracción de σpt que la heterogeneidad o la inestabilidad pueden ocupar (§B.2.2, §B.5).
+FRACCION_SIGMA = 0.3
+ESTUDIOS = ("homogeneidad", "estabilidad")
+# Frascos mínimos para un estudio de homogeneidad defendible (ISO 13528 §B.2.1).
+G_MINIMO = 10
+
+# ISO 13528:2022 Tabla B.1: F1 y F2 (con m = 2 réplicas) por número de frascos g.
+# F1 = χ²(0.95; g−1)/(g−1), F2 = (F(0.95; g−1, g) − 1)/2. Sin scipy: son
+# constantes de tabla, como CHI2_95 en puntajes_combinados.py.
+TABLA_B1 = {
+    20: (1.59, 0.57), 19: (1.60, 0.59), 18: (1.62, 0.62), 17: (1.64, 0.64),
+    16: (1.67, 0.68), 15: (1.69, 0.71), 14: (1.72, 0.75), 13: (1.75, 0.80),
+    12: (1.79, 0.86), 11: (1.83, 0.93), 10: (1.88, 1.01), 9: (1.94, 1.11),
+    8: (2.01, 1.25), 7: (2.10, 1.43),
+}
+
+
+def leer_replicas(ruta):
+    """
+    Mediciones del CSV por estudio, {estudio: [(analito, frasco, valor)]}, y la
+    unidad de cada analito. Un resultado no numérico o un estudio desconocido
+    abortan: en un estudio de pocas réplicas descartar en silencio cambia el
+    veredicto. Las réplicas de un frasco se toman en el orden del archivo.
+    """
+    from calcular_zscore import a_float
+
+    if not os.path.exists(ruta):
+        sys.exit(f"ERROR: no existe {ruta}\n"
+                 f"Columnas esperadas: analito, estudio, frasco, replica, resultado, unidad")
+    filas = {e: [] for e in ESTUDIOS}
+    unidades = {}
+    with open(ruta, encoding="utf-8") as f:
+        for i, r in enumerate(csv.DictReader(f), start=2):
+            estudio = (r.get("estudio") or "").strip().lower()
+            if estudio not in filas:
+                sys.exit(f"ERROR: {ruta}:{i}: estudio '{estudio}' desconocido "
+                         f"({' o '.join(ESTUDIOS)}).")
+            v = a_float(r.get("resultado"))
+            if v is None:
+                sys.exit(f"ERROR: {ruta}:{i}: resultado '{r.get('resultado')}' no numérico.")
+            analito = r["analito"].strip()
+            filas[estudio].append((analito, r["frasco"].strip(), v))
+            if (r.get("unidad") or "").strip():
+                unidades.setdefault(analito, r["unidad"].strip())
+    return filas, unidades
+
+
+def _rango_en_grupo(grupo):
+    """Posición de cada elemento dentro de su grupo, en el orden en que aparecen."""
+    orden = np.lexsort((np.arange(len(grupo)), grupo))
+    g = grupo[orden]
+    rango = np.empty(len(grupo), dtype=int)
+    rango[orden] = np.arange(len(g)) - np.searchsorted(g, g, side="left")
+    return rango
+
+
+def pivotar(filas, analitos):
+    """
+    Matriz X[analito, frasco, réplica] (NaN = sin medición) en el orden de
+    `analitos`. Los frascos se numeran dentro de cada analito; las réplicas,
+    en el orden en que aparecen para cada frasco.
+    """
+    if not filas:
+        return np.full((len(analitos), 0, 0), np.nan)
+    pos = {a: i for i, a in enumerate(analitos)}
+    i_an = np.array([pos[a] for a, _, _ in filas])
+    _, primera, i_frasco_global = np.unique([f"{a}\x00{fr}" for a, fr, _ in filas],
+                                            return_index=True, return_inverse=True)
+    i_frasco = _rango_en_grupo(i_an[primera])[i_frasco_global]
+    i_rep = _rango_en_grupo(i_frasco_global)
+    X = np.full((len(analitos), i_frasco.max() + 1, i_rep.max() + 1), np.nan)
+    X[i_an, i_frasco, i_rep] = [v for _, _, v in filas]
+    return X
+
+
+def anova(X):
+    """
+    ANOVA de un factor de cada analito (fila de X) a la vez. Devuelve arrays
+    de longitud A: g, N, promedio general, s_w, s_x, s_s, n efectivo y u del
+    promedio. NaN donde no alcanzan los grados de libertad.
+    """
+    presente = ~np.isnan(X)
+    n_t = presente.sum(axis=2)                        # réplicas por frasco
+    con = n_t > 0
+    g = con.sum(axis=1)
+    N = n_t.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media_t = np.nansum(X, axis=2) / np.where(con, n_t, np.nan)
+        # Promedio de los promedios de frasco, como en ISO 13528 §B.3.
+        media = np.nansum(np.where(con, media_t, 0.0), axis=1) / g
+        media_pond = np.nansum(X, axis=(1, 2)) / N
+        ssw = np.nansum((X - media_t[..., None]) ** 2, axis=(1, 2))
+        ssb = np.nansum(np.where(con, n_t * (media_t - media_pond[:, None]) ** 2, 0.0), axis=1)
+        msw = np.where(N > g, ssw / (N - g), np.nan)
+        msb = np.where(g > 1, ssb / (g - 1), np.nan)
+        # n efectivo de un ANOVA desbalanceado; con réplicas iguales, m.
+        n0 = np.where(g > 1, (N - (n_t ** 2).sum(axis=1) / N) / (g - 1), np.nan)
+        s_x = np.sqrt(msb / n0)
+        s_w = np.sqrt(msw)
+        s_s = np.sqrt(np.maximum(0.0, (msb - msw) / n0))
+        # u del promedio general: dispersión entre promedios de frasco / √g.
+        sd_t = np.sqrt(np.nansum(np.where(con, (media_t - media[:, None]) ** 2, 0.0), axis=1)
+                       / (g - 1))
+        u = sd_t / np.sqrt(g)
+    return {"g": g, "N": N, "media": media, "s_w": s_w, "s_x": s_x, "s_s": s_s,
+            "n0": n0, "u": u}
+
+
+def criterio_ampliado(s_w, sigma_pt, g, m):
+    """Límite de §B.2.3 para s_s, o NaN si g queda fuera de la Tabla B.1."""
+    f1 = np.array([TABLA_B1.get(int(k), (np.nan, np.nan))[0] for k in g])
+    # F2 de la tabla es (F − 1)/2; con m réplicas, (F − 1)/m.
+    f2 = np.array([TABLA_B1.get(int(k), (np.nan, np.nan))[1] for k in g]) * 2 / m
+    return np.sqrt(f1 * (FRACCION_SIGMA * sigma_pt) ** 2 + f2 * s_w ** 2)
+
+
+def evaluar(filas, analitos, sigmas):
+    """Homogeneidad y estabilidad de todos los analitos en arrays de longitud A."""
+    sigma_pt = np.array([np.nan if s is None else s for s in sigmas], dtype=float)
+    h = anova(pivotar(filas["homogeneidad"], analitos))
+    e = anova(pivotar(filas["estabilidad"], analitos))
+    limite = FRACCION_SIGMA * sigma_pt
+    with np.errstate(invalid="ignore"):
+        ampliado = criterio_ampliado(h["s_w"], sigma_pt, h["g"], h["n0"])
+        diferencia = np.abs(h["media"] - e["media"])
+        limite_est = limite + 2 * np.sqrt(h["u"] ** 2 + np.nan_to_num(e["u"]) ** 2)
+    return {"h": h, "e": e, "sigma_pt": sigma_pt, "limite": limite, "ampliado": ampliado,
+            "diferencia": diferencia, "limite_estabilidad": limite_est}
+
+
+def _r(x, d=4):
+    return None if x is None or np.isnan(x) else round(float(x), d)
+
+
+def _cumple(valor, limite):
+    return None if np.isnan(valor) or np.isnan(limite) else bool(valor <= limite)
+
+
+def registros(r, analitos, unidades):
+    """Un registro por analito, listo para el JSON."""
+    h, e = r["h"], r["e"]
+    salida = []
+    for i, nombre in enumerate(analitos):
+        cumple = _cumple(h["s_s"][i], r["limite"][i])
+        ampliado = None if cumple is not False else _cumple(h["s_s"][i], r["ampliado"][i])
+        homogeneo = None if cumple is None else (cumple or bool(ampliado))
+        estabilidad = None
+        if e["g"][i]:
+            estable = _cumple(r["diferencia"][i], r["limite"][i])
+            if estable is False:
+                estable = _cumple(r["diferencia"][i], r["limite_estabilidad"][i])
+            estabilidad = {
+                "frascos": int(e["g"][i]), "mediciones": int(e["N"][i]),
+                "media": _r(e["media"][i]),
+                "diferencia": _r(r["diferencia"][i]),
+                "limite": _r(r["limite"][i]),
+                "limite_ampliado": _r(r["limite_estabilidad"][i]),
+                "estable": estable,
+            }
+        salida.append({
+            "nombre": nombre,
+            "unidad": unidades.get(nombre),
+            "frascos": int(h["g"][i]),
+            "replicas": _r(h["n0"][i], 2),
+            "media": _r(h["media"][i]),
+            "s_w": _r(h["s_w"][i]), "s_x": _r(h["s_x"][i]), "s_s": _r(h["s_s"][i]),
+            "sigma_pt": _r(r["sigma_pt"][i]),
+            "s_s_sobre_sigma_pt": _r(h["s_s"][i] / r["sigma_pt"][i], 3),
+            "limite": _r(r["limite"][i]),
+            "limite_ampliado": _r(r["ampliado"][i]),
+            "cumple": cumple,
+            "cumple_ampliado": ampliado,
+            "homogeneo": homogeneo,
+            "frascos_suficientes": bool(h["g"][i] >= G_MINIMO),
+            "estabilidad": estabilidad,
+        })
+    return salida
+
+
+def escribir_json(codigo, area, analitos, ruta_csv):
+    doc = {
+        "codigo": codigo,
+        "area": area,
+        "metodologia": "ISO 13528:2022 Anexo B — homogeneidad (ANOVA, §B.2) "
+                       "y estabilidad (§B.5) del ítem de ensayo",
+        "criterios": {
+            "sigma_pt": "ETa/3, la del modelo CLIA con que se evalúa la ronda",
+            "homogeneidad": f"s_s ≤ {FRACCION_SIGMA}·σpt; si no, s_s ≤ "
+                            f"√(F1·({FRACCION_SIGMA}·σpt)² + F2·s_w²) (§B.2.3)",
+            "estabilidad": f"|ȳ_h − ȳ_e| ≤ {FRACCION_SIGMA}·σpt; si no, "
+                           f"≤ {FRACCION_SIGMA}·σpt + 2·√(u(ȳ_h)² + u(ȳ_e)²) (§B.5)",
+            "frascos_minimos": G_MINIMO,
+        },
+        "fuente": os.path.basename(ruta_csv),
+        "resumen": {
+            "analitos": len(analitos),
+            "homogeneos": sum(1 for a in analitos if a["homogeneo"]),
+            "no_homogeneos": sum(1 for a in analitos if a["homogeneo"] is False),
+            "con_estabilidad": sum(1 for a in analitos if a["estabilidad"]),
+            "inestables": sum(1 for a in analitos
+                              if a["estabilidad"] and a["estabilidad"]["estable"] is False),
+        },
+        "analitos": analitos,
+    }
+    os.makedirs(SALIDA_DIR, exist_ok=True)
+    ruta = os.path.join(SALIDA_DIR, f"{codigo}-{area}-homogeneidad.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    registrar_versiones(ruta)
+    return ruta, doc
+
+
+def _fmt(x, d=3):
+    return "—" if x is None else f"{x:.{d}f}"
+
+
+def imprimir(codigo, doc):
+    print(f"\nHomogeneidad y estabilidad — {codigo} (ISO 13528 Anexo B)")
+    print("=" * 104)
+    print(f"  {'Analito':<28} {'g×m':>7} {'media':>10} {'s_w':>9} {'s_s':>9} "
+          f"{'0.3σpt':>9} {'s_s/σpt':>8}  {'Homog.':<9} {'|Δ|':>9} {'Estab.':<6}")
+    print("-" * 104)
+    for a in doc["analitos"]:
+        if a["homogeneo"] is None:
+            h = "sin σpt" if a["sigma_pt"] is None else "—"
+        else:
+            h = "sí" if a["cumple"] else ("ampliado" if a["homogeneo"] else "NO")
+        est = a["estabilidad"]
+        e = "—" if not est or est["estable"] is None else ("sí" if est["estable"] else "NO")
+        print(f"  {a['nombre'][:28]:<28} {a['frascos']:>3}×{_fmt(a['replicas'], 1):<3} "
+              f"{_fmt(a['media'], 2):>10} {_fmt(a['s_w']):>9} {_fmt(a['s_s']):>9} "
+              f"{_fmt(a['limite']):>9} {_fmt(a['s_s_sobre_sigma_pt'], 2):>8}  {h:<9} "
+              f"{_fmt(est and est['diferencia']):>9} {e:<6}")
+    print("=" * 104)
+    r = doc["resumen"]
+    print(f"  Homogéneos: {r['homogeneos']} de {r['analitos']}"
+          f"   Con estudio de estabilidad: {r['con_estabilidad']}"
+          + (f"   Inestables: {r['inestables']}" if r["inestables"] else ""))
+    pocos = [a["nombre"] for a in doc["analitos"] if not a["frascos_suficientes"]]
+    if pocos:
+        print(f"  AVISO: menos de {G_MINIMO} frascos en {', '.join(pocos)} (ISO 13528 §B.2.1).")
+    if r["no_homogeneos"] or r["inestables"]:
+        print("  AVISO: un ítem no homogéneo o inestable no puede evaluarse como si lo fuera:\n"
+              "         incluir s_s (o la deriva) en σpt o en u(X*), o no evaluar el analito\n"
+              "         (ISO 13528 §B.2.4, §B.5.3).")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Homogeneidad y estabilidad del ítem de ensayo (ISO 13528 Anexo B).")
+    ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    ap.add_argument("--area", default="quimica")
+    ap.add_argument("--csv", help="Réplicas (por defecto: support/homogeneidad_<codigo>.csv)")
+    argumento_perfil(ap)
+    args = ap.parse_args()
+
+    from evaluar_clia import leer_especificaciones, delta_e
+
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("homogeneidad", codigo, args.perfil)
+    ruta_csv = args.csv or os.path.join(ENTRADA_DIR, f"homogeneidad_{codigo}.csv")
+
+    with etapa("cargar"):
+        filas, unidades = leer_replicas(ruta_csv)
+    analitos = sorted({a for a, _, _ in filas["homogeneidad"]})
+    if not analitos:
+        sys.exit(f"ERROR: {ruta_csv} no trae mediciones del estudio de homogeneidad.")
+    sin_h = sorted({a for a, _, _ in filas["estabilidad"]} - set(analitos))
+    if sin_h:
+        sys.exit(f"ERROR: estabilidad sin homogeneidad para {', '.join(sin_h)}: "
+                 f"la diferencia se mide contra el promedio de homogeneidad.")
+
+    with etapa("anova"):
+        # σpt sobre el promedio de homogeneidad: el ETa se resuelve donde está el material.
+        medias = anova(pivotar(filas["homogeneidad"], analitos))["media"]
+        esp = leer_especificaciones(args.area)
+        sigmas = []
+        for nombre, m in zip(analitos, medias):
+            dE = delta_e(esp[nombre], m) if nombre in esp else None
+            sigmas.append(None if dE is None else dE / 3.0)
+        r = evaluar(filas, analitos, sigmas)
+
+    with etapa("serializar"):
+        ruta, doc = escribir_json(codigo, args.area, registros(r, analitos, unidades), ruta_csv)
+    imprimir(codigo, doc)
+    print(f"  JSON escrito en: {ruta}")
+
+
+if __name__ == "__main__":
+    main()
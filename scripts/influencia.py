@@ -0,0 +1,414 @@
+"""
+Influencia de cada laboratorio sobre el valor asignado (jackknife) — uso interno.
+
+Cuando un laboratorio reclama su resultado, la primera pregunta es qué X* habría
+salido sin él y si su presencia cambió la clasificación de alguien más. Este
+script lo responde para toda la ronda de una vez: por cada analito evaluado, y
+por cada grupo de pares evaluado, recalcula X* y σ* quitando cada laboratorio
+(robust_mean_sd_sin_uno: una pasada vectorizada sobre la muestra ordenada, con
+el Algoritmo A arrancando desde la solución completa) y con eso:
+
+  ΔX*/σpt      cuánto se mueve el valor asignado al quitar al laboratorio
+  reclasifica  a cuántos de los OTROS laboratorios les cambiaría la
+               clasificación si él no estuviera
+
+Se listan los laboratorios que mueven X* al menos --umbral·σpt o reclasifican a
+alguien. En un grupo de pares con exactamente N_MINIMO_GRUPO participantes,
+quitar a cualquiera deja al grupo sin evaluar: se informa aparte.
+
+El cálculo rápido arranca desde la solución completa; el publicado, desde la
+mediana, y con valores extremos el Algoritmo A puede tener más de un punto
+fijo o agotar las iteraciones antes de la tolerancia. Ambos no coinciden: en
+pruebas con muestras contaminadas X* difirió hasta 0.02·σpt y σ* hasta un 6 %.
+Por eso el cálculo rápido solo preselecciona: se confirma con el publicado
+(_stats sobre la muestra sin el laboratorio) toda entrada a MARGEN_X del
+umbral, con algún reclasificado, o que deja a otro laboratorio cerca de un
+corte de clase; y se lista o descarta con los valores confirmados. Lo que se
+informa, y todo el detalle de --lab, es exactamente lo que habría salido en
+el JSON.
+
+Con otro estimador que el Algoritmo A (el que declare la ronda) el jackknife
+pasa por su versión por lotes, con una fila de pesos por laboratorio quitado.
+
+Modelos: consenso (σpt = σ*, como calcular_zscore.py) o clia (σpt = δE(X*)/3,
+como evaluar_clia.py). Los analitos sin evaluar no tienen valor asignado y no
+entran.
+
+Uso:
+  conda activate concalab
+  python scripts/influencia.py --codigo EA-001-2026
+  python scripts/influencia.py --codigo EA-001-2026 --modelo clia
+  python scripts/influencia.py --codigo EA-001-2026 --lab L-021
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import (  # noqa: E402
+    analitos_por_grupo_pares, analitos_sin_evaluar, codigo_activo, estimador_robusto, analito_de,
+)
+from calcular_zscore import (  # noqa: E402
+    cargar, robust_mean_sd, robust_mean_sd_sin_uno, _stats, _stats_lote, clasificar, N_MINIMO_GRUPO,
+    usar_estimador, estimador, avisar_solo_z,
+)
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+
+# Desplazamiento de X*, en fracciones de σpt, a partir del cual se lista al
+# laboratorio aunque no reclasifique a nadie.
+INFLUENCIA_MIN = 0.1
+# Cuánto puede apartarse el cálculo rápido del publicado: X* en fracciones de
+# σpt y σ* en fracción de sí misma, con holgura sobre lo observado (0.02 y 6 %).
+MARGEN_X = 0.05
+MARGEN_S = 0.10
+# Cortes de |z| entre clases (A ≤ 2 < C < 3 ≤ I).
+CORTES = (2.0, 3.0)
+
+CLASES = ("A", "C", "I", "NE")
+# Filas por bloque en el reporte; el resto se resume en una línea.
+MAX_FILAS = 5
+
+
+# ====================================================================
+# BLOQUES EVALUADOS
+# ====================================================================
+
+def bloques(por_analito, por_pares, sin_eval):
+    """(etiqueta, analito, filas) de cada valor asignado que la ronda publica."""
+    for nombre in sorted(por_analito):
+        if analito_de(nombre) in sin_eval:
+            continue
+        filas = por_analito[nombre]
+        if analito_de(nombre) not in por_pares:
+            yield nombre, nombre, filas
+            continue
+        grupos = defaultdict(list)
+        for f in filas:
+            grupos[f["plataforma"]].append(f)
+        for g, gf in sorted(grupos.items(), key=lambda kv: -len(kv[1])):
+            if len(gf) >= N_MINIMO_GRUPO:
+                yield f"{nombre} / {g}", nombre, gf
+
+
+class Modelo:
+    """De dónde sale σpt y cómo se clasifica, igual que el script que publica."""
+
+    def __init__(self, nombre, especificaciones=None):
+        self.nombre = nombre
+        self.esp = especificaciones
+
+    def sigma_pt(self, analito, x_r, s_r):
+        """σpt para X* y σ* ya redondeados como en el JSON; arrays o escalares."""
+        if self.nombre == "consenso":
+            return s_r
+        import numpy as np
+        spec = self.esp.get(analito_de(analito))
+        if not spec:
+            sys.exit(f"ERROR: '{analito}' no tiene ETa en especificaciones_desempeno.")
+        # evaluar_clia.delta_e() elemento a elemento, con las mismas operaciones.
+        x_r = np.asarray(x_r, dtype=float)
+        candidatos = []
+        if spec.get("pct") is not None:
+            candidatos.append(spec["pct"] / 100.0 * np.abs(x_r))
+        if spec.get("abs") is not None:
+            candidatos.append(np.full(x_r.shape, float(spec["abs"])))
+        if not candidatos:
+            sys.exit(f"ERROR: el ETa de '{analito}' no declara 'pct' ni 'abs'.")
+        return np.maximum.reduce(candidatos) / 3.0
+
+    def z(self, valores, x_r, sigma):
+        """z de cada valor frente a (X*, σpt), tal como se clasifica; NaN sin σpt.
+
+        `valores` va en columnas y (x_r, sigma) en filas: con arrays de filas
+        devuelve la matriz submuestra × laboratorio. CLIA clasifica el z ya
+        redondeado (evaluar_clia._entrada); el consenso, el z crudo.
+        """
+        import numpy as np
+        x_r, sigma = np.asarray(x_r, dtype=float)[..., None], np.asarray(sigma, dtype=float)[..., None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(sigma > 0, (valores - x_r) / sigma, np.nan)
+        return np.round(z, 2) if self.nombre == "clia" else z
+
+    def clases(self, valores, x_r, sigma):
+        """Código de clase (índice en CLASES) de cada valor frente a (X*, σpt)."""
+        import numpy as np
+        a = np.abs(self.z(valores, x_r, sigma))
+        codigo = np.where(a <= 2.0, 0, np.where(a < 3.0, 1, 2))
+        return np.where(np.isnan(a), 3, codigo)
+
+
+# ====================================================================
+# JACKKNIFE
+# ====================================================================
+
+def influencia_bloque(etiqueta, analito, filas, modelo):
+    """
+    Una entrada por laboratorio del bloque, en orden de resultado, con X*/σpt
+    sin él y los laboratorios que cambiarían de clase. Valores del cálculo
+    rápido; confirmar() los lleva al cálculo publicado. `frontera` marca si sin
+    él algún otro laboratorio queda tan cerca de un corte que el cálculo
+    publicado podría clasificarlo distinto.
+    """
+    import numpy as np
+    orden = sorted(filas, key=lambda f: f["valor"])
+    x = np.array([f["valor"] for f in orden])
+    ids = [f["cod"] for f in orden]
+    n = len(x)
+    x_r, s_r, _ = _stats(x)
+    sigma = float(modelo.sigma_pt(analito, x_r, s_r))
+    antes = modelo.clases(x, x_r, sigma)
+
+    base = {"bloque": etiqueta, "analito": analito, "n": n,
+            "valor_asignado": x_r, "sigma_pt": sigma}
+    if etiqueta != analito and n - 1 < N_MINIMO_GRUPO:
+        # Sin cualquiera de ellos el grupo ya no se evalúa: todos pasan a NE.
+        return [dict(base, id=i, resultado=float(v), grupo_insuficiente=True,
+                     valor_sin=None, sigma_sin=None, delta=None, frontera=False,
+                     reclasificados=[(j, CLASES[antes[k]], "NE") for k, j in enumerate(ids) if j != i])
+                for i, v in zip(ids, x)]
+    if n < 4:
+        return []
+
+    e = estimador()
+    if e["calcular"] is robust_mean_sd:
+        xs, ss = robust_mean_sd(x)
+        xj, sj = robust_mean_sd_sin_uno(x, xs, ss)
+    else:
+        # Los demás estimadores no iteran desde un arranque: la versión por
+        # lotes con "todos menos uno" como matriz de pesos da el jackknife exacto.
+        xj, sj = e["lote"](x, 1 - np.eye(n, dtype=int))
+    xj_r, sj_r = np.round(xj, 2), np.round(sj, 2)
+    sigma_j = modelo.sigma_pt(analito, xj_r, sj_r)
+    despues = modelo.clases(x[None, :], xj_r, sigma_j)
+    cambia = despues != antes[None, :]
+    np.fill_diagonal(cambia, False)
+    a = np.abs(modelo.z(x[None, :], xj_r, sigma_j))
+    with np.errstate(invalid="ignore"):
+        cerca = np.min([np.abs(a - c) for c in CORTES], axis=0) < MARGEN_X + MARGEN_S * a
+    np.fill_diagonal(cerca, False)
+    frontera = cerca.any(axis=1)
+
+    salida = []
+    for k in range(n):
+        salida.append(dict(
+            base, id=ids[k], resultado=float(x[k]), grupo_insuficiente=False,
+            valor_sin=float(xj_r[k]), sigma_sin=float(sigma_j[k]),
+            delta=float(xj_r[k] - x_r), frontera=bool(frontera[k]),
+            reclasificados=[(ids[j], CLASES[antes[j]], CLASES[despues[k, j]])
+                            for j in np.flatnonzero(cambia[k])],
+        ))
+    return salida
+
+
+def confirmar(e, filas, modelo):
+    """La entrada `e` recalculada con el cálculo publicado, sin el laboratorio."""
+    import numpy as np
+    if e["grupo_insuficiente"]:
+        return e
+    resto = [f for f in filas if f["cod"] != e["id"]]
+    x_r, s_r, _ = _stats([f["valor"] for f in resto])
+    sigma = float(modelo.sigma_pt(e["analito"], x_r, s_r))
+    otros = np.array([f["valor"] for f in resto])
+    antes = modelo.clases(otros, e["valor_asignado"], e["sigma_pt"])
+    despues = modelo.clases(otros, x_r, sigma)
+    return dict(e, valor_sin=x_r, sigma_sin=sigma, delta=round(x_r - e["valor_asignado"], 2),
+                reclasificados=[(f["cod"], CLASES[a], CLASES[d])
+                                for f, a, d in zip(resto, antes, despues) if a != d])
+
+
+def confirmar_lote(entradas, filas, modelo):
+    """
+    confirmar() de varias entradas de un mismo bloque de una vez: X* y σ* sin
+    cada laboratorio salen de un solo _stats_lote() (los mismos que _stats()),
+    y las clases, de una matriz entrada × laboratorio como en influencia_bloque().
+    """
+    import numpy as np
+    sueltas = [e for e in entradas if not e["grupo_insuficiente"]]
+    if not sueltas:
+        return entradas
+    # Muestra ordenada, como la piden las versiones por lotes; los
+    # reclasificados se listan en el orden de `filas`, como en confirmar().
+    orden = sorted(range(len(filas)), key=lambda i: filas[i]["valor"])
+    x = np.array([filas[i]["valor"] for i in orden])
+    ids = [filas[i]["cod"] for i in orden]
+    posicion = {c: i for i, c in enumerate(ids)}
+    k = np.array([posicion[e["id"]] for e in sueltas])
+    e0 = sueltas[0]
+
+    stats = _stats_lote([np.delete(x, i) for i in k])
+    x_sin = np.array([st[0] for st in stats])
+    sigma_sin = modelo.sigma_pt(e0["analito"], x_sin, np.array([st[1] for st in stats]))
+    antes = modelo.clases(x, e0["valor_asignado"], e0["sigma_pt"])
+    despues = modelo.clases(x[None, :], x_sin, sigma_sin)
+    cambia = despues != antes[None, :]
+    cambia[np.arange(len(k)), k] = False
+
+    confirmadas = {id(e): dict(
+        e, valor_sin=float(x_sin[r]), sigma_sin=float(sigma_sin[r]),
+        delta=round(float(x_sin[r]) - e["valor_asignado"], 2),
+        reclasificados=[(ids[j], CLASES[antes[j]], CLASES[despues[r, j]])
+                        for j in sorted(np.flatnonzero(cambia[r]), key=orden.__getitem__)],
+    ) for r, e in enumerate(sueltas)}
+    return [confirmadas.get(id(e), e) for e in entradas]
+
+
+def relevante(e, umbral):
+    if e["reclasificados"]:
+        return True
+    return bool(e["sigma_pt"]) and abs(e["delta"]) >= umbral * e["sigma_pt"]
+
+
+def candidata(e, umbral):
+    """Si el cálculo publicado podría hacer relevante a una entrada del rápido."""
+    if e["reclasificados"] or e["frontera"]:
+        return True
+    return bool(e["sigma_pt"]) and abs(e["delta"]) >= (umbral - MARGEN_X) * e["sigma_pt"]
+
+
+def analizar(por_analito, por_pares, sin_eval, modelo, umbral=INFLUENCIA_MIN):
+    """Entradas relevantes de toda la ronda (confirmadas) y cuántas submuestras se calcularon."""
+    listadas, n_sub = [], 0
+    for etiqueta, analito, filas in bloques(por_analito, por_pares, sin_eval):
+        entradas = influencia_bloque(etiqueta, analito, filas, modelo)
+        n_sub += len(entradas)
+        candidatas = [e for e in entradas if candidata(e, umbral)]
+        listadas += [e for e in confirmar_lote(candidatas, filas, modelo) if relevante(e, umbral)]
+    return listadas, n_sub
+
+
+# ====================================================================
+# REPORTE
+# ====================================================================
+
+def _rel(e):
+    return e["delta"] / e["sigma_pt"] if e["sigma_pt"] else float("nan")
+
+
+def imprimir(listadas, modelo, umbral, n_sub, segundos):
+    sigma = "σ*" if modelo.nombre == "consenso" else "σpt"
+    print("\n" + "=" * 92)
+    print(f"  INFLUENCIA DE CADA LABORATORIO — jackknife, modelo {modelo.nombre}")
+    print("=" * 92)
+    print(f"  {n_sub} submuestras en {segundos:.2f} s. Se listan los laboratorios que mueven X* "
+          f"≥ {umbral}·{sigma} o reclasifican a otro.")
+    if not listadas:
+        print("\n  Ningún laboratorio mueve el valor asignado ni reclasifica a otro.")
+        return
+
+    por_bloque = defaultdict(list)
+    for e in listadas:
+        por_bloque[e["bloque"]].append(e)
+    for bloque in sorted(por_bloque):
+        es = por_bloque[bloque]
+        e0 = es[0]
+        print(f"\n  {bloque}  (n={e0['n']}, X* = {e0['valor_asignado']:g}, {sigma} = {e0['sigma_pt']:.4g})")
+        grupo = [e for e in es if e["grupo_insuficiente"]]
+        if grupo:
+            print(f"      Grupo de n = {N_MINIMO_GRUPO}: sin cualquiera de sus laboratorios queda "
+                  f"sin evaluar ({len(grupo)} laboratorios).")
+            continue
+        # Un laboratorio al borde de su clase cambia sin uno u otro de muchos: se
+        # resume una vez por bloque en vez de repetirse en cada fila.
+        sensibles = defaultdict(list)
+        for e in es:
+            for i, a, d in e["reclasificados"]:
+                sensibles[(i, a, d)].append(e["id"])
+        if sensibles:
+            print("      Cambiarían de clase: " + ", ".join(
+                f"{i} {a}→{d} (sin {len(q)} de {e0['n'] - 1})"
+                for (i, a, d), q in sorted(sensibles.items(), key=lambda kv: -len(kv[1]))))
+        print(f"      {'Lab':<10}{'resultado':>11}{'X* sin él':>11}{'ΔX*/' + sigma:>10}  reclasifica")
+        es = sorted(es, key=lambda e: (-abs(_rel(e)), -len(e["reclasificados"])))
+        for e in es[:MAX_FILAS]:
+            cambios = ", ".join(f"{i} {a}→{d}" for i, a, d in e["reclasificados"]) or "—"
+            print(f"      {e['id']:<10}{e['resultado']:>11g}{e['valor_sin']:>11g}{_rel(e):>+10.2f}  {cambios}")
+        if len(es) > MAX_FILAS:
+            print(f"      … y {len(es) - MAX_FILAS} más con menor efecto sobre X*.")
+    n_labs = len({e["id"] for e in listadas})
+    print("\n" + "=" * 92)
+    print(f"  {len(listadas)} caso(s), {n_labs} laboratorio(s). ΔX* = X* sin el laboratorio − X* publicado.")
+    print("=" * 92)
+
+
+def detalle_lab(lab, por_analito, por_pares, sin_eval, modelo):
+    """Todos los bloques donde participa `lab`, con y sin él (cálculo publicado)."""
+    sigma = "σ*" if modelo.nombre == "consenso" else "σpt"
+    print(f"\n  Laboratorio {lab} — X* con y sin su resultado (modelo {modelo.nombre})")
+    print(f"  {'Analito':<32}{'resultado':>10}{'X*':>10}{'sin él':>10}{'ΔX*/' + sigma:>10}"
+          f"{'z':>10}{'z sin él':>10}  reclasifica")
+    encontrados = 0
+    for etiqueta, analito, filas in bloques(por_analito, por_pares, sin_eval):
+        propias = [f for f in filas if f["cod"] == lab]
+        if not propias:
+            continue
+        encontrados += 1
+        x_r, s_r, _ = _stats([f["valor"] for f in filas])
+        sigma_pt = float(modelo.sigma_pt(analito, x_r, s_r))
+        e = confirmar({"bloque": etiqueta, "analito": analito, "n": len(filas), "id": lab,
+                       "valor_asignado": x_r, "sigma_pt": sigma_pt,
+                       "grupo_insuficiente": etiqueta != analito and len(filas) - 1 < N_MINIMO_GRUPO},
+                      filas, modelo)
+        v = propias[0]["valor"]
+        z = (v - x_r) / sigma_pt if sigma_pt else None
+        if e["grupo_insuficiente"]:
+            print(f"  {etiqueta:<32}{v:>10g}{x_r:>10g}{'—':>10}{'—':>10}{_z(z):>10}{'—':>10}"
+                  f"  sin él el grupo no se evalúa")
+            continue
+        z_sin = (v - e["valor_sin"]) / e["sigma_sin"] if e["sigma_sin"] else None
+        cambios = ", ".join(f"{i} {a}→{d}" for i, a, d in e["reclasificados"]) or "—"
+        print(f"  {etiqueta:<32}{v:>10g}{x_r:>10g}{e['valor_sin']:>10g}{_rel(e):>+10.2f}"
+              f"{_z(z):>10}{_z(z_sin):>10}  {cambios}")
+    if not encontrados:
+        sys.exit(f"{lab} no tiene resultados evaluados en esta ronda.")
+
+
+def _z(z):
+    return "—" if z is None else f"{z:+.2f} {clasificar(z)}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Influencia de cada laboratorio sobre X* (jackknife).")
+    ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    ap.add_argument("--area", default="quimica")
+    ap.add_argument("--modelo", choices=["consenso", "clia"], default="consenso")
+    ap.add_argument("--lab", help="Detalle de un laboratorio: X*, σpt y su z con y sin él")
+    ap.add_argument("--umbral", type=float, default=INFLUENCIA_MIN,
+                    help=f"ΔX* mínimo, en fracciones de σpt, para listar (por defecto {INFLUENCIA_MIN})")
+    argumento_perfil(ap)
+    args = ap.parse_args()
+
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("influencia", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo, args.area))
+
+    with etapa("cargar"):
+        por_analito, _ = cargar(codigo)
+    if not por_analito:
+        sys.exit(f"No hay resultados de Química Clínica para {codigo}.")
+    sin_eval, _ = analitos_sin_evaluar(codigo, args.area)
+    por_pares = analitos_por_grupo_pares(codigo, args.area) - sin_eval
+    esp = None
+    if args.modelo == "clia":
+        from evaluar_clia import leer_especificaciones
+        esp = leer_especificaciones(args.area)
+    modelo = Modelo(args.modelo, esp)
+
+    print(f"\nRonda {codigo} — influencia sobre el valor asignado")
+    avisar_solo_z(codigo, args.area, [args.modelo])
+    if args.lab:
+        with etapa("detalle"):
+            detalle_lab(args.lab, por_analito, por_pares, sin_eval, modelo)
+        return
+
+    t0 = time.perf_counter()
+    with etapa("jackknife"):
+        listadas, n_sub = analizar(por_analito, por_pares, sin_eval, modelo, args.umbral)
+    imprimir(listadas, modelo, args.umbral, n_sub, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
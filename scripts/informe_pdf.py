@@ -26,11 +26,7 @@ import subprocess
 import sys
 from pathlib import Path
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-import numpy as np
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa
 
 RAIZ = Path(__file__).resolve().parent.parent
 
@@ -47,7 +43,7 @@ COLOR_GRUPO = ["#1f4e9c", "#c77f0a", "#00857a", "#7b4ea3"]
 Z_VISTA = 5      # rango visible del histograma, en σ*
 Z_VIS = 6        # recorte del eje de Z-Score
 
-plt.rcParams.update({
+ESTILO = {
     "font.size": 8,
     "axes.titlesize": 9.5,
     "axes.titlecolor": "#1a237e",
@@ -56,7 +52,27 @@ plt.rcParams.update({
     "grid.color": "#eeeeee",
     "figure.dpi": 110,
     "pdf.fonttype": 42,
-})
+}
+_estilo_aplicado = False
+
+
+def pyplot():
+    """matplotlib.pyplot con el estilo del informe.
+
+    Se importa al dibujar la primera figura y no al cargar el módulo: solo
+    matplotlib cuesta más de medio segundo, y ni --help ni presentacion.py
+    importando constantes tienen por qué pagarlo. El estilo se aplica una sola
+    vez, así que quien lo ajuste después (presentacion._estilo_slide) no es
+    pisado por la figura siguiente.
+    """
+    global _estilo_aplicado
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    if not _estilo_aplicado:
+        plt.rcParams.update(ESTILO)
+        _estilo_aplicado = True
+    return plt
 
 
 # ── Utilidades ────────────────────────────────────────────────────────────
@@ -69,6 +85,7 @@ SIMBOLOS = {
     "⅔": r"$\tfrac{2}{3}$", "⅓": r"$\tfrac{1}{3}$",
     "→": r"$\rightarrow$", "↔": r"$\leftrightarrow$",
     "≠": r"$\neq$", "‰": r"\textperthousand{}",
+    "ζ": r"$\zeta$", "′": r"$'$", "√": r"$\surd$",
     "–": r"\textendash{}", "—": r"\textemdash{}", "…": r"\dots{}",
     "“": "``", "”": "''", "‘": "`", "’": "'",
 }
@@ -94,6 +111,12 @@ def esc(t):
     return t
 
 
+def estimador(d):
+    """El estimador robusto del valor asignado. Un JSON sin "estimador" es del
+    Algoritmo A: así se escribieron todas las rondas y así sigue por defecto."""
+    return d.get("estimador") or {"nombre": "Algoritmo A", "valor_asignado": "media robusta"}
+
+
 def desmarcar(html):
     """Las notas del proveedor viven en el JSON como HTML (las lee la web).
     Aquí se convierten a LaTeX conservando el énfasis, que es parte de la
@@ -173,6 +196,8 @@ def fig_histograma(a, destino):
     rango acotado a |z| ≤ 5 sobre σ*, banda de aceptación X* ± ETa, y los
     laboratorios que caen fuera dibujados en el borde y nombrados — contar
     cuántos quedaron fuera no basta, cada lab debe localizarse."""
+    import numpy as np
+    plt = pyplot()
     resultados = [l["resultado"] for l in a["laboratorios"]]
     unidad = a["unidad"]
 
@@ -252,6 +277,8 @@ def fig_zscore(a, destino):
     """Z-Score por laboratorio. Eje acotado a |z| ≤ 6 (se han visto z de +56,
     que aplastan las otras 36 barras contra el cero); las barras recortadas
     conservan su valor real en la etiqueta. Solo se rotula |z| > 2."""
+    import numpy as np
+    plt = pyplot()
     labs = [l for l in a["laboratorios"] if l["z_score"] is not None]
     sin_ev = [l for l in a["laboratorios"] if l["z_score"] is None]
     labs = sorted(labs, key=lambda l: l["z_score"])
@@ -310,6 +337,8 @@ def fig_no_evaluado(a, destino_hist, destino_barras):
     Deliberadamente sin banda de aceptación, sin línea de X* y sin Z-Score —
     cada uno de esos elementos afirma un criterio de conformidad, que es
     justamente lo que la ronda declara que no puede sostener aquí."""
+    import numpy as np
+    plt = pyplot()
     resultados = [l["resultado"] for l in a["laboratorios"]]
     ref = a.get("referencia_descriptiva", {})
     unidad = a["unidad"]
@@ -359,6 +388,8 @@ def fig_no_evaluado(a, destino_hist, destino_barras):
 def fig_estratos(d, destino):
     """Estratificación del desempeño global. El porcentaje solo no distingue
     una falla aislada de trece; el estrato sí."""
+    import numpy as np
+    plt = pyplot()
     estratos = d["desempeno_global"]["estratos"]
     fig, ax = plt.subplots(figsize=(6.6, 1.9))
     ys = np.arange(len(estratos))[::-1]
@@ -383,23 +414,25 @@ def fig_estratos(d, destino):
 
 
 def fig_heatmap(d, destino):
-    """Mapa consolidado laboratorio × analito. El orden lexicográfico de los
-    identificadores coincide con el numérico por el relleno a 3 dígitos."""
-    lab_ids = sorted({l["id"] for a in d["analitos"] for l in a["laboratorios"]})
+    """Mapa consolidado laboratorio × analito. Dibuja el bloque `heatmap` del
+    JSON tal cual (calcular_zscore.matriz_heatmap), el mismo que dibuja la web:
+    así los dos mapas no pueden divergir."""
+    import numpy as np
+    from matplotlib.colors import ListedColormap
+    from matplotlib.patches import Patch
+    plt = pyplot()
+    h = d["heatmap"]
+    lab_ids = h["laboratorios"]
     analitos = d["analitos"]
 
     # Matriz de estado, no de z: en papel no hay tooltip que desambigüe, así
-    # que el color debe ser categórico y la leyenda explícita.
+    # que el color debe ser categórico y la leyenda explícita. 'N' (sin
+    # evaluar) y '.' (no reportó) quedan en gris.
     mapa = {"A": 0, "C": 1, "I": 2}
-    M = np.full((len(analitos), len(lab_ids)), np.nan)
-    for i, a in enumerate(analitos):
-        por_id = {l["id"]: l for l in a["laboratorios"]}
-        for j, lid in enumerate(lab_ids):
-            l = por_id.get(lid)
-            if l and l["clasificacion"] in mapa:
-                M[i, j] = mapa[l["clasificacion"]]
-
-    cmap = matplotlib.colors.ListedColormap([VERDE, AMARILLO, ROJO])
+    M = np.array([[mapa.get(c, np.nan) for c in fila] for fila in h["estado"]],
+                 dtype=float).reshape(len(analitos), len(lab_ids))
+
+    cmap = ListedColormap([VERDE, AMARILLO, ROJO])
     cmap.set_bad("#e9ecef")
 
     alto = max(4.2, len(analitos) * 0.20 + 1.5)
@@ -502,6 +535,7 @@ def portada(d, cfg, meta):
     logo_uasd = RAIZ / "pic" / "Uasd.png"
     logo_badge = RAIZ / "pic" / "logo-badge.png"
     ronda = cfg.get("ronda_activa", {})
+    est = estimador(d)
     return rf"""
 \begin{{titlepage}}
 \thispagestyle{{empty}}
@@ -538,7 +572,7 @@ def portada(d, cfg, meta):
 \textbf{{{len(d['analitos'])}}} analitos \quad\textbullet\quad
 \textbf{{{d['resumen']['total']}}} resultados evaluados\\[0.5cm]
 Evaluación por aptitud al uso según \textbf{{CLIA}} (Error Total Permitido, 42 CFR §493.931)\\
-Valor asignado por media robusta \textemdash{{}} \textbf{{ISO 13528:2022}}, Algoritmo A\\
+Valor asignado por {esc(est['valor_asignado'])} \textemdash{{}} \textbf{{ISO 13528:2022}}, {esc(est['nombre'])}\\
 Elaborado conforme a las directrices de la \textbf{{ISO/IEC 17043}}
 }}
 \end{{minipage}}
@@ -681,6 +715,10 @@ def seccion_criterios(d):
     niveles = "\n".join(
         rf"{esc(n['clasificacion'])} & {esc(n['nombre'])} & {esc(n['regla'])} \\"
         for n in crit["niveles"])
+    est = d.get("estimador")
+    explicacion = esc(est["explicacion"]) if est else """El Algoritmo A es un estimador robusto: acota
+iterativamente la influencia de los valores extremos, de modo que un resultado
+groseramente desviado no arrastra el valor asignado del conjunto."""
     return rf"""
 \section{{Criterios de evaluación de la conformidad}}
 \label{{sec:criterios}}
@@ -691,9 +729,7 @@ def seccion_criterios(d):
 
 \subsection{{Valor asignado (X*)}}
 
-{esc(crit['valor_asignado'])} El Algoritmo A es un estimador robusto: acota
-iterativamente la influencia de los valores extremos, de modo que un resultado
-groseramente desviado no arrastra el valor asignado del conjunto.
+{esc(crit['valor_asignado'])} {explicacion}
 
 \subsection{{Dispersión (\texorpdfstring{{$\sigma^*$}}{{sigma*}}, CV)}}
 
@@ -817,6 +853,82 @@ participante pueda ubicar su valor respecto al conjunto.
 """
 
 
+def seccion_homogeneidad(codigo, area):
+    """Sección del estudio de homogeneidad y estabilidad (scripts/homogeneidad.py).
+    Sin su JSON no se escribe nada: el informe no afirma lo que no se midió."""
+    ruta = RAIZ / "data" / "informes" / f"{codigo}-{area}-homogeneidad.json"
+    if not ruta.exists():
+        return ""
+    h = json.loads(ruta.read_text(encoding="utf-8"))
+
+    def num(x, d=3):
+        return "---" if x is None else f"{x:.{d}f}".replace(".", "{,}")
+
+    def veredicto(ok, ampliado=False):
+        if ok is None:
+            return "---"
+        return (r"Sí\textsuperscript{*}" if ampliado else "Sí") if ok else r"\textbf{No}"
+
+    filas = []
+    for a in h["analitos"]:
+        e = a.get("estabilidad") or {}
+        filas.append(
+            rf"{esc(a['nombre'])} & {a['frascos']} & {num(a['media'], 2)} & {num(a['s_w'])} "
+            rf"& {num(a['s_s'])} & {num(a['limite'])} "
+            rf"& {veredicto(a['homogeneo'], a['cumple'] is False)} "
+            rf"& {num(e.get('diferencia'))} & {veredicto(e.get('estable'))} \\")
+    cuerpo = "\n".join(filas)
+    r = h["resumen"]
+    problemas = [a["nombre"] for a in h["analitos"]
+                 if a["homogeneo"] is False
+                 or (a.get("estabilidad") or {}).get("estable") is False]
+    if problemas:
+        cierre = rf"""
+\begin{{aviso}}
+No cumplen el criterio: \textbf{{{", ".join(esc(n) for n in problemas)}}}. La
+heterogeneidad o la deriva de esos analitos se suma a la desviación de cada
+participante y debe considerarse al interpretar su resultado (ISO 13528, §B.2.4
+y §B.5.3).
+\end{{aviso}}
+"""
+    else:
+        cierre = r"""
+Todos los analitos con criterio declarado resultaron homogéneos y estables: la
+diferencia entre frascos no explica la desviación de ningún participante.
+"""
+    encabezado = r"""\toprule
+\textbf{Analito} & \textbf{$g$} & \textbf{$\bar y_h$} & \textbf{$s_w$} &
+\textbf{$s_s$} & \textbf{$0{,}3\,\sigma_{pt}$} & \textbf{Homog.} &
+\textbf{$|\Delta|$} & \textbf{Estable} \\
+\midrule"""
+    return rf"""
+\subsection{{Homogeneidad y estabilidad del ítem de ensayo}}
+\label{{sec:homogeneidad}}
+
+Antes del envío se midieron, con réplicas, frascos del lote elegidos al azar
+para verificar que todos los participantes recibieron el mismo material
+(ISO 13528:2022, Anexo B). La desviación entre frascos $s_s$ se obtiene por
+análisis de varianza y debe cumplir $s_s \le 0{{,}}3\,\sigma_{{pt}}$, con
+$\sigma_{{pt}} = ET_a/3$; cuando no lo cumple se aplica el criterio ampliado de
+§B.2.3 (\textsuperscript{{*}}), que descuenta la repetibilidad $s_w$ del método.
+La estabilidad compara el promedio de los frascos guardados en las condiciones
+del envío con el de homogeneidad: $|\bar y_h - \bar y_e| \le 0{{,}}3\,\sigma_{{pt}}$.
+Resultaron homogéneos {r['homogeneos']} de {r['analitos']} analitos.
+
+\begin{{footnotesize}}
+\begin{{longtable}}{{@{{}}lrrrrrcrc@{{}}}}
+{encabezado}
+\endfirsthead
+{encabezado}
+\endhead
+\bottomrule
+\endfoot
+{cuerpo}
+\end{{longtable}}
+\end{{footnotesize}}
+{cierre}"""
+
+
 def seccion_resultados_globales(d):
     r = d["resumen"]
     g = d["desempeno_global"]
@@ -1385,13 +1497,15 @@ $ET_a$ deseable derivado de variación biológica (EFLM).}}
 """
 
 
-def anexo_referencias():
+def anexo_referencias(d):
+    nombre = esc(estimador(d)["nombre"])
+    nombre = nombre[0].upper() + nombre[1:]
     return r"""
 \section{Referencias normativas}
 
 \begin{itemize}
 \item \textbf{ISO 13528:2022} — \emph{Statistical methods for use in proficiency
-testing by interlaboratory comparison}. Algoritmo A (Anexo C) para el valor
+testing by interlaboratory comparison}. """ + nombre + r""" (Anexo C) para el valor
 asignado y la desviación robusta; §7 para la evaluación por grupo de pares.
 \item \textbf{ISO/IEC 17043} — \emph{Conformity assessment. General requirements
 for the competence of proficiency testing providers}. Estructura y contenido del
@@ -1472,18 +1586,25 @@ def main():
     ap.add_argument("--area", default="quimica")
     ap.add_argument("--solo-tex", action="store_true",
                     help="genera figuras y .tex sin compilar")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
     cfg = json.loads((RAIZ / "data" / "config.json").read_text(encoding="utf-8"))
     codigo = args.codigo or cfg["ronda_activa"]["codigo"]
+    if args.perfil:
+        activar_perfil("informe_pdf", codigo, args.perfil)
 
     ruta_json = RAIZ / "data" / "informes" / f"{codigo}-{args.area}-clia.json"
     if not ruta_json.exists():
         sys.exit(f"No existe {ruta_json}. Corra primero scripts/evaluar_clia.py.")
-    d = json.loads(ruta_json.read_text(encoding="utf-8"))
+    with etapa("cargar"):
+        d = json.loads(ruta_json.read_text(encoding="utf-8"))
 
     if d.get("modelo") != "clia":
         sys.exit("El JSON no declara modelo 'clia'. Este informe reporta CLIA.")
+    if "heatmap" not in d:
+        sys.exit(f"{ruta_json.name} no trae el bloque 'heatmap'. Corra de nuevo "
+                 "scripts/evaluar_clia.py.")
 
     build = RAIZ / "support" / f"pdf_{codigo}"
     figs = build / "figs"
@@ -1496,59 +1617,67 @@ def main():
     }
 
     print(f"→ Figuras ({len(d['analitos'])} analitos)…")
-    fig_estratos(d, figs / "estratos.pdf")
-    fig_heatmap(d, figs / "heatmap.pdf")
-    for i, a in enumerate(d["analitos"]):
-        if es_no_evaluado(a):
-            fig_no_evaluado(a, figs / f"hist-{i}.pdf", figs / f"bar-{i}.pdf")
-        else:
-            fig_histograma(a, figs / f"hist-{i}.pdf")
-            fig_zscore(a, figs / f"bar-{i}.pdf")
-        print(f"   · {a['nombre']}")
+    with etapa("dibujar"):
+        with etapa("fig_estratos"):
+            fig_estratos(d, figs / "estratos.pdf")
+        with etapa("fig_heatmap"):
+            fig_heatmap(d, figs / "heatmap.pdf")
+        for i, a in enumerate(d["analitos"]):
+            if es_no_evaluado(a):
+                with etapa("fig_no_evaluado"):
+                    fig_no_evaluado(a, figs / f"hist-{i}.pdf", figs / f"bar-{i}.pdf")
+            else:
+                with etapa("fig_histograma"):
+                    fig_histograma(a, figs / f"hist-{i}.pdf")
+                with etapa("fig_zscore"):
+                    fig_zscore(a, figs / f"bar-{i}.pdf")
+            print(f"   · {a['nombre']}")
 
     print("→ Documento LaTeX…")
-    partes = [
-        PREAMBULO.replace("__CODIGO__", esc(codigo))
-                 .replace("__AREA__", esc(meta["area_nombre"])),
-        portada(d, cfg, meta),
-        r"\tableofcontents" + "\n" + r"\clearpage",
-        control_documento(d, meta, leer_equipo()),
-        r"\clearpage",
-        seccion_concalab().replace(r"\end{aviso}", r"\end{aviso}"),
-        seccion_alcance(d, cfg, meta),
-        r"\clearpage",
-        seccion_criterios(d),
-        seccion_decision_no_evaluado(d, cfg),
-        r"\clearpage",
-        seccion_resultados_globales(d),
-        tabla_laboratorios(d),
-        tabla_analitos(d),
-        tabla_consolidado_analito(d),
-        r"\clearpage" + "\n" + r"\section{Resultados por analito}" + "\n"
-        + "Cada analito se presenta con sus estadísticas de la ronda, la "
-          "distribución de los resultados y el Z-Score de cada laboratorio. "
-          "Los identificadores corresponden al identificador público de esta "
-          "ronda.",
-        *[ficha_analito(a, i) for i, a in enumerate(d["analitos"])],
-        heatmap_seccion(),
-        seccion_limitaciones(d, cfg),
-        seccion_conclusiones(d),
-        anexo_eta(cfg, d),
-        anexo_referencias(),
-        r"\end{document}",
-    ]
-    tex = build / f"informe_{codigo}.tex"
-    # fsync antes de compilar: pdflatex es OTRO proceso y, si el .tex recién
-    # escrito no está materializado en disco, lee un archivo a medias. El fallo
-    # no aparece al leerlo —TeX no se queja del .tex— sino mucho después, al
-    # releer su propio .aux al cerrar el documento, con un "Text line contains
-    # an invalid character" que apunta al auxiliar y no a la causa. Compilar el
-    # mismo .tex a mano funciona siempre, porque para entonces ya está en disco:
-    # por eso el error solo se ve desde el script y parece no determinista.
-    with open(tex, "w", encoding="utf-8") as f:
-        f.write("\n".join(partes))
-        f.flush()
-        os.fsync(f.fileno())
+    with etapa("componer"):
+        partes = [
+            PREAMBULO.replace("__CODIGO__", esc(codigo))
+                     .replace("__AREA__", esc(meta["area_nombre"])),
+            portada(d, cfg, meta),
+            r"\tableofcontents" + "\n" + r"\clearpage",
+            control_documento(d, meta, leer_equipo()),
+            r"\clearpage",
+            seccion_concalab().replace(r"\end{aviso}", r"\end{aviso}"),
+            seccion_alcance(d, cfg, meta),
+            r"\clearpage",
+            seccion_criterios(d),
+            seccion_decision_no_evaluado(d, cfg),
+            seccion_homogeneidad(codigo, args.area),
+            r"\clearpage",
+            seccion_resultados_globales(d),
+            tabla_laboratorios(d),
+            tabla_analitos(d),
+            tabla_consolidado_analito(d),
+            r"\clearpage" + "\n" + r"\section{Resultados por analito}" + "\n"
+            + "Cada analito se presenta con sus estadísticas de la ronda, la "
+              "distribución de los resultados y el Z-Score de cada laboratorio. "
+              "Los identificadores corresponden al identificador público de esta "
+              "ronda.",
+            *[ficha_analito(a, i) for i, a in enumerate(d["analitos"])],
+            heatmap_seccion(),
+            seccion_limitaciones(d, cfg),
+            seccion_conclusiones(d),
+            anexo_eta(cfg, d),
+            anexo_referencias(d),
+            r"\end{document}",
+        ]
+        tex = build / f"informe_{codigo}.tex"
+        # fsync antes de compilar: pdflatex es OTRO proceso y, si el .tex recién
+        # escrito no está materializado en disco, lee un archivo a medias. El fallo
+        # no aparece al leerlo —TeX no se queja del .tex— sino mucho después, al
+        # releer su propio .aux al cerrar el documento, con un "Text line contains
+        # an invalid character" que apunta al auxiliar y no a la causa. Compilar el
+        # mismo .tex a mano funciona siempre, porque para entonces ya está en disco:
+        # por eso el error solo se ve desde el script y parece no determinista.
+        with open(tex, "w", encoding="utf-8") as f:
+            f.write("\n".join(partes))
+            f.flush()
+            os.fsync(f.fileno())
     print(f"   {tex.relative_to(RAIZ)}")
 
     if args.solo_tex:
@@ -1562,11 +1691,12 @@ def main():
         (build / f"informe_{codigo}.{aux}").unlink(missing_ok=True)
 
     for pasada in (1, 2):
-        p = subprocess.run(
-            ["pdflatex", "-interaction=nonstopmode", "-halt-on-error",
-             tex.name],
-            cwd=build, capture_output=True, text=True,
-            encoding="utf-8", errors="replace")
+        with etapa("compilar"):
+            p = subprocess.run(
+                ["pdflatex", "-interaction=nonstopmode", "-halt-on-error",
+                 tex.name],
+                cwd=build, capture_output=True, text=True,
+                encoding="utf-8", errors="replace")
         if p.returncode != 0:
             cola = "\n".join(p.stdout.splitlines()[-40:])
             sys.exit(f"pdflatex falló en la pasada {pasada}:\n{cola}")
@@ -25,7 +25,6 @@ Uso:
 
 import os
 import sys
-import json
 import html
 import argparse
 import statistics
@@ -33,9 +32,10 @@ from collections import defaultdict, Counter
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import analitos_por_grupo_pares, analito_de, codigo_activo, estimador_robusto  # noqa: E402
 from calcular_zscore import (  # noqa: E402
-    cargar, calcular_agrupado, robust_mean_sd, plataforma, detectar_bimodales,
-    N_MINIMO, N_MINIMO_GRUPO, RAZON_BIMODAL, CONFIG_PATH, analitos_por_grupo_pares,
+    cargar, calcular_agrupado, robust_mean_sd, plataforma, detectar_bimodales, usar_estimador,
+    N_MINIMO, N_MINIMO_GRUPO, RAZON_BIMODAL,
 )
 
 
@@ -386,20 +386,18 @@ def main():
     ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
+    usar_estimador(estimador_robusto(codigo))
 
     por_analito, _ = cargar(codigo)
     if not por_analito:
         sys.exit(f"No hay resultados de Química Clínica para {codigo}.")
 
     por_pares = analitos_por_grupo_pares(codigo)
-    analitos = calcular_agrupado(por_analito, por_grupo_pares=por_pares)
-    bimodales = detectar_bimodales(calcular_agrupado(por_analito), por_analito)
+    analitos = calcular_agrupado(por_analito, por_grupo_pares=por_pares, remuestreos=0)
+    bimodales = detectar_bimodales(calcular_agrupado(por_analito, remuestreos=0), por_analito)
     # Los resueltos por grupo de pares ya no son un problema pendiente.
-    bimodales = {k: v for k, v in bimodales.items() if k not in por_pares}
+    bimodales = {k: v for k, v in bimodales.items() if analito_de(k) not in por_pares}
 
     os.makedirs(SALIDA_DIR, exist_ok=True)
     ruta = os.path.join(SALIDA_DIR, f"preliminar_{codigo}-quimica.html")
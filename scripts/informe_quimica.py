@@ -28,16 +28,19 @@ Uso:
   python scripts/informe_quimica.py --codigo EA-001-2026
   python scripts/informe_quimica.py --desde calcular      # reusa el CSV ya extraído
   python scripts/informe_quimica.py --solo-verificar      # no recalcula, solo comprueba
+  python scripts/informe_quimica.py --perfil              # dónde se va el tiempo, por etapa
+  python scripts/informe_quimica.py --vigilar             # recalcula al editar las decisiones
 """
 
 import os
 import sys
-import json
 import time
 import argparse
 import subprocess
 
-CONFIG_PATH = "data/config.json"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import CONFIG_PATH, codigo_activo  # noqa: E402
+
 AREA = "quimica"
 
 PY = sys.executable
@@ -52,11 +55,13 @@ ETAPAS = [
     ("auditar",  "Auditar unidades",            "auditar_unidades.py"),
     ("preliminar", "Informe preliminar",        "informe_preliminar.py"),
 ]
+# Etapas que aceptan --perfil (scripts/perfil.py).
+CON_PERFIL = {"calcular", "validar", "auditar"}
 
 
-def ejecutar(script, codigo, mostrar_todo=False):
+def ejecutar(script, codigo, mostrar_todo=False, extra=()):
     """Corre una etapa. Devuelve (ok, salida)."""
-    cmd = [PY, os.path.join(BASE, script), "--codigo", codigo]
+    cmd = [PY, os.path.join(BASE, script), "--codigo", codigo, *extra]
     r = subprocess.run(cmd, capture_output=True, text=True)
     salida = (r.stdout or "") + (r.stderr or "")
     if mostrar_todo:
@@ -107,12 +112,18 @@ def main():
     ap.add_argument("--solo-verificar", action="store_true",
                     help="No recalcula: solo valida el contrato y audita unidades")
     ap.add_argument("--verboso", action="store_true", help="Muestra la salida completa")
+    ap.add_argument("--perfil", action="store_true",
+                    help="Perfila por dentro las etapas que lo admiten (support/perfiles/)")
+    ap.add_argument("--vigilar", "--watch", action="store_true",
+                    help="No encadena etapas: recalcula consenso y CLIA y los valida cada "
+                         "vez que cambian config.json o el CSV (scripts/vigilar.py)")
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
+    if args.vigilar:
+        from vigilar import vigilar
+        vigilar(codigo)
+        return
 
     etapas = ETAPAS
     if args.solo_verificar:
@@ -127,13 +138,18 @@ def main():
     print("=" * 74)
 
     pendientes = []
+    tiempos = []
+    perfiles = []
     t0 = time.time()
 
     for n, (clave, titulo, script) in enumerate(etapas, 1):
         etiqueta = f"  [{n}/{len(etapas)}] {titulo}"
         print(f"{etiqueta} {'.' * max(3, 42 - len(etiqueta))} ", end="", flush=True)
 
-        ok, salida = ejecutar(script, codigo, args.verboso)
+        extra = ["--perfil"] if args.perfil and clave in CON_PERFIL else []
+        te = time.time()
+        ok, salida = ejecutar(script, codigo, args.verboso, extra)
+        tiempos.append((clave, time.time() - te))
         if not ok:
             print("FALLÓ\n")
             print(salida)
@@ -144,6 +160,8 @@ def main():
 
         print(resumir(clave, salida))
         pendientes += avisos(salida)
+        perfiles += [l.split(":", 1)[1].strip() for l in salida.splitlines()
+                     if l.strip().startswith("Perfil escrito en:")]
 
     print("=" * 74)
 
@@ -163,7 +181,8 @@ def main():
 
     2. Decidir qué analitos van por grupo de pares y declararlo en
        {CONFIG_PATH} → decisiones_evaluacion.{codigo}.{AREA}.grupo_pares
-       (si cambia algo, volver a correr desde 'calcular')
+       (si cambia algo, volver a correr desde 'calcular'; con --vigilar
+        el recálculo y la validación son automáticos al guardar)
 
     3. Decidir si algún analito se publica SIN calificación de desempeño:
        {CONFIG_PATH} → decisiones_evaluacion.{codigo}.{AREA}.sin_evaluar
@@ -178,7 +197,9 @@ def main():
        python3 scripts/validar_informe.py --codigo {codigo} --modelo clia
 
     7. Armazón HTML de la ronda: publicaciones/informes/{codigo}.html
-       (window.INFORME → modelo 'clia' y el JSON -quimica-clia.json)
+       (window.INFORME → modelo 'clia', el JSON -quimica-clia.json y su
+        índice -quimica-clia/indice.json; se publica la carpeta completa,
+        junto con data/informes/versiones.json para el service worker)
        Registrar la tarjeta en publicaciones/informes.html
        Verificar sirviendo el sitio: python3 -m http.server 8765
 
@@ -188,7 +209,10 @@ def main():
   El PDF y la tarjeta OG son ESTATICOS: si el JSON cambia, hay que
   regenerarlos o seguiran mostrando las cifras anteriores.
 """)
-    print(f"  {len(etapas)} etapa(s) en {time.time() - t0:.1f}s")
+    print(f"  {len(etapas)} etapa(s) en {time.time() - t0:.1f}s: "
+          + " · ".join(f"{c} {s:.1f}s" for c, s in tiempos))
+    for p in perfiles:
+        print(f"  Perfil: {p}")
     print("=" * 74)
 
 
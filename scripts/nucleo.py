@@ -0,0 +1,241 @@
+"""
+Núcleo liviano compartido por los scripts: rutas y lectura de data/config.json.
+
+Todo lo que un script necesita para saber QUÉ hacer —la ronda activa, sus
+decisiones de evaluación, la fecha de cálculo, dónde escribir— sin cargar lo
+que necesita para HACERLO. Solo biblioteca estándar: importar este módulo
+cuesta milisegundos, mientras que calcular_zscore trae la estadística e
+informe_pdf trae matplotlib. Los scripts que solo leen config o validan un JSON
+importan de aquí; calcular_zscore reexporta estos nombres para no romper a
+quien ya los importa desde allí.
+
+Las rutas son relativas al directorio de trabajo (la raíz del repositorio),
+como en el resto del pipeline.
+"""
+
+import os
+import json
+import hashlib
+from datetime import date
+
+ENTRADA_DIR = "support"
+SALIDA_DIR  = os.path.join("data", "informes")
+CONFIG_PATH = "data/config.json"
+# Huella de contenido de cada JSON publicado; la lee el service worker (sw.js).
+VERSIONES_PATH = os.path.join(SALIDA_DIR, "versiones.json")
+# Estimador robusto de una ronda que no declara otro (ISO 13528, Algoritmo A).
+ESTIMADOR_POR_DEFECTO = "algoritmo_a"
+# En una ronda con varias muestras cada analito se evalúa por muestra, como un
+# ítem propio: "Glucosa · M1". Las decisiones de config.json siguen siendo por
+# analito y valen para todas sus muestras (ver analito_de()).
+SEPARADOR_MUESTRA = " · "
+
+
+def leer_config():
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def codigo_activo():
+    """Código de la ronda activa: el valor por defecto de --codigo en todos los scripts."""
+    return leer_config()["ronda_activa"]["codigo"]
+
+
+def fecha_calculo(codigo):
+    """Fecha de cálculo de la ronda, declarada en data/config.json.
+
+    Sin esto cada corrida estampa `date.today()`, de modo que recalcular una
+    ronda ya emitida —aunque no cambie una sola cifra— movería su fecha y
+    sugeriría un recálculo que no ocurrió. La fecha de un informe emitido es un
+    dato del informe, no del momento en que se ejecuta el script.
+
+    Una ronda que aún no la declara usa la de hoy y avisa, para que congelarla
+    sea un paso consciente antes de publicar y no un valor heredado.
+    """
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        cfg = json.load(f)
+    declarada = cfg.get("fecha_calculo", {}).get(codigo)
+    if declarada:
+        return declarada
+    hoy = date.today().isoformat()
+    print(f"  AVISO: {codigo} no declara fecha de cálculo en data/config.json "
+          f"→ se usa hoy ({hoy}).")
+    print(f"         Antes de publicar, congelarla: "
+          f'"fecha_calculo": {{"{codigo}": "{hoy}"}}')
+    return hoy
+
+
+def nombre_item(analito, muestra=None):
+    """Nombre con que se evalúa el analito en esa muestra; sin muestra, el del analito."""
+    return f"{analito}{SEPARADOR_MUESTRA}{muestra}" if muestra else analito
+
+
+def analito_de(nombre):
+    """El analito de un ítem ("Glucosa · M1" → "Glucosa"). Es la clave con que se
+    buscan grupo_pares, sin_evaluar y el ETa: se deciden por analito, no por muestra."""
+    return nombre.rpartition(SEPARADOR_MUESTRA)[0] or nombre
+
+
+def muestra_de(nombre):
+    """La muestra de un ítem ("Glucosa · M1" → "M1"); None en una ronda de una muestra."""
+    return nombre.rpartition(SEPARADOR_MUESTRA)[2] if SEPARADOR_MUESTRA in nombre else None
+
+
+def analitos_por_grupo_pares(codigo, area="quimica"):
+    """
+    Analitos que esta ronda evalúa por GRUPO DE PARES en vez de agrupados
+    (ISO 13528 §7). Se leen de data/config.json, no de una constante.
+
+    Vivía como constante de módulo, y eso era una bomba de tiempo: la decisión
+    tomada para una ronda se habría aplicado sola a todas las siguientes,
+    aunque los datos dijeran otra cosa. Cambiar la base de evaluación de un
+    analito es una decisión del proveedor del ensayo y pertenece a la ronda,
+    no al código.
+
+    Una ronda sin entrada arranca vacía a propósito: detectar_bimodales()
+    avisa qué analitos son candidatos y el proveedor decide y lo declara en
+    config.json. No se automatiza cruzando un umbral.
+    """
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  AVISO: no se pudo leer {CONFIG_PATH} ({e}); se evalúa todo agrupado.")
+        return frozenset()
+
+    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
+    analitos = frozenset(d.get("grupo_pares") or ())
+
+    if not analitos:
+        print(f"  AVISO: {codigo}/{area} no declara analitos por grupo de pares en "
+              f"{CONFIG_PATH}.\n"
+              f"         Se evalúa todo agrupado. Revisa los avisos de bimodalidad:\n"
+              f"         un analito bimodal evaluado agrupado produce un falso "
+              f"negativo (σ* inflada, nadie reprueba).")
+    return analitos
+
+
+def analitos_sin_evaluar(codigo, area="quimica"):
+    """
+    Analitos que esta ronda publica SIN calificación de desempeño.
+
+    Devuelve (nombres, nota_publica). Es una decisión de política del proveedor,
+    no una consecuencia de los datos: se toma cuando no puede establecerse un
+    valor asignado defendible —por dispersión sin consenso, o porque el
+    comportamiento del material frente a ciertas plataformas no es atribuible al
+    desempeño del laboratorio (falta de conmutabilidad)—. Evaluar igualmente
+    produciría no conformidades que el proveedor no puede sostener.
+
+    Lo que esto implica aguas abajo, y que NO puede quedarse a medias: los
+    resultados salen con clasificación 'NE' y sin Z-Score, y el analito se
+    excluye del desempeño global y del resumen por laboratorio. Publicar la nota
+    conservando las clasificaciones dejaría el texto diciendo lo contrario de lo
+    que muestran el heatmap y la tabla.
+    """
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return frozenset(), None
+
+    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
+    nombres = frozenset(d.get("sin_evaluar") or ())
+    return nombres, d.get("sin_evaluar_nota")
+
+
+def estimador_robusto(codigo, area="quimica"):
+    """
+    Clave del estimador robusto con que esta ronda calcula X* y σ*
+    (calcular_zscore.ESTIMADORES). Se declara como "estimador" junto a las demás
+    decisiones de la ronda; sin declarar, el Algoritmo A de siempre.
+
+    Elegir otro estimador de ISO 13528 —el método Q con Hampel para un analito
+    con muchos resultados atípicos, la mediana con MADe cuando n es chico— es,
+    como el grupo de pares, una decisión del proveedor para esa ronda.
+    """
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return ESTIMADOR_POR_DEFECTO
+
+    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
+    return d.get("estimador") or ESTIMADOR_POR_DEFECTO
+
+
+def puntaje_ronda(codigo, area="quimica", modelo="consenso"):
+    """
+    Tipo de puntaje (puntajes.PUNTAJES) que decide la clasificación de este
+    modelo: "puntaje" en decisiones_evaluacion, como texto para los dos modelos
+    o por modelo ({"consenso": "z_prima", "clia": "zeta"}). None si la ronda no
+    lo declara: clasifica z, como siempre.
+    """
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
+    p = d.get("puntaje")
+    return p.get(modelo) if isinstance(p, dict) else p
+
+
+def esquema_identificador(codigo):
+    """
+    Esquema del identificador público de la ronda ("campo → formato", de
+    identificador_publico en config.json), o None si no lo declara.
+
+    Cambiar el identificador es una decisión del proveedor por ronda: el mismo
+    laboratorio puede figurar como 55 en una ronda y como L-055 en la
+    siguiente. Dos rondas solo se pueden cruzar por laboratorio si comparten
+    esquema.
+    """
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    d = (cfg.get("identificador_publico") or {}).get(codigo)
+    return f"{d['campo']} → {d['formato']}" if d else None
+
+
+def huella(ruta):
+    """Primeros 16 hex del SHA-256 del archivo: cambia si y solo si cambia el contenido."""
+    with open(ruta, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def registrar_versiones(ruta):
+    """Anota en versiones.json la huella del JSON y de sus fragmentos.
+
+    El service worker guarda cada JSON de informe bajo su huella y lo sirve
+    desde la caché mientras la huella publicada no cambie: un laboratorio con
+    mala conexión que reabre el informe no lo vuelve a descargar, y cuando la
+    ronda se recalcula recibe la versión nueva sin esperar a que caduque nada.
+    Una huella por contenido, no por fecha: regenerar sin cambios no invalida.
+
+    Solo se reescriben las entradas de este informe; las de otras rondas y
+    áreas se conservan. Las claves son rutas relativas a SALIDA_DIR con "/".
+    """
+    carpeta = os.path.splitext(ruta)[0]
+    rel = lambda p: os.path.relpath(p, SALIDA_DIR).replace(os.sep, "/")
+    try:
+        with open(VERSIONES_PATH, encoding="utf-8") as f:
+            archivos = json.load(f)["archivos"]
+    except FileNotFoundError:
+        archivos = {}
+    # Los fragmentos de la corrida anterior ya se borraron del disco; sus
+    # entradas también.
+    prefijo = rel(carpeta) + "/"
+    archivos = {k: v for k, v in archivos.items() if not k.startswith(prefijo)}
+    archivos[rel(ruta)] = huella(ruta)
+    if os.path.isdir(carpeta):
+        for nombre in os.listdir(carpeta):
+            if nombre.endswith(".json"):
+                destino = os.path.join(carpeta, nombre)
+                archivos[rel(destino)] = huella(destino)
+    with open(VERSIONES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"archivos": dict(sorted(archivos.items()))}, f, ensure_ascii=False, indent=2)
+    return VERSIONES_PATH
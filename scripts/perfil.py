@@ -0,0 +1,212 @@
+"""
+Perfil por etapas de los scripts del pipeline: tiempo, CPU y memoria.
+
+informe_quimica.py solo informaba el total; para saber qué etapa atacar primero
+hace falta ver dónde se va el tiempo DENTRO de cada script. Cada script marca
+sus etapas con `with etapa("cargar"):` y acepta `--perfil`; sin la bandera las
+etapas no hacen nada (una comparación por entrada), así que pueden quedarse en
+el código.
+
+Con `--perfil`, por cada etapa se registra:
+  pared_s      tiempo de reloj (perf_counter)
+  cpu_s        CPU del propio proceso (usuario + sistema)
+  cpu_hijos_s  CPU de subprocesos que terminaron dentro de la etapa
+               (pdflatex, el navegador headless de generar_og)
+  rss_max_mb   máximo de memoria residente del proceso al cerrar la etapa
+Con `--perfil memoria`, además:
+  pico_mb      pico de memoria Python asignada durante la etapa (tracemalloc;
+               NumPy reporta sus buffers ahí, así que incluye los arrays)
+
+Las etapas se anidan ("dibujar/fig_zscore") y las que se repiten en un bucle se
+acumulan en una sola fila con su número de llamadas. Al terminar el proceso
+—también si sale con sys.exit— se imprime un resumen legible y se escribe la
+traza en support/perfiles/<script>-<codigo>-<fecha>.json.
+
+La memoria va aparte porque tracemalloc intercepta cada asignación: en las
+figuras de matplotlib multiplica el tiempo por diez. Con `memoria` los tiempos
+no sirven; sin ella, el costo del perfil es despreciable.
+
+Solo biblioteca estándar, y lo que solo hace falta con --perfil se importa al
+activarlo: todos los scripts cargan este módulo aunque no perfilen.
+
+Uso:
+  python scripts/calcular_zscore.py --perfil
+  python scripts/calcular_zscore.py --perfil memoria
+  python scripts/informe_pdf.py --solo-tex --perfil
+  python scripts/informe_quimica.py --desde calcular --perfil
+"""
+
+import os
+import sys
+import time
+import atexit
+import contextlib
+
+try:
+    import resource
+except ImportError:    # Windows: sin getrusage, el RSS queda fuera de la traza
+    resource = None
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERFIL_DIR = os.path.join(RAIZ, "support", "perfiles")
+
+# Estado del proceso. None = perfil desactivado: etapa() no mide nada.
+_traza = None
+_atexit = False
+
+
+def argumento(ap):
+    """Agrega --perfil a un ArgumentParser."""
+    ap.add_argument("--perfil", nargs="?", const="tiempo", choices=["tiempo", "memoria"],
+                    help="Mide cada etapa (tiempo, CPU, RSS) y escribe la traza en "
+                         "support/perfiles/. 'memoria' agrega el pico por etapa "
+                         "(tracemalloc; mucho más lento)")
+
+
+def activar(script, codigo=None, modo="tiempo"):
+    """Empieza a medir. La traza se escribe al salir del proceso."""
+    global _traza
+    if _traza is not None:
+        return
+    from datetime import datetime
+    if modo == "memoria":
+        import tracemalloc
+        tracemalloc.start()
+    _traza = {
+        "script": script,
+        "codigo": codigo,
+        "modo": modo,
+        "inicio": datetime.now(),
+        "t0": time.perf_counter(),
+        "cpu0": _cpu(),
+        "pila": [],
+        "etapas": {},      # ruta → acumulado, en orden de primera aparición
+    }
+    global _atexit
+    if not _atexit:
+        atexit.register(cerrar)
+        _atexit = True
+
+
+def _cpu():
+    # process_time tiene resolución fina; os.times (10 ms) solo para los hijos,
+    # que no tiene equivalente.
+    t = os.times()
+    return time.process_time(), t.children_user + t.children_system
+
+
+def _rss_mb():
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes.
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def etapa(nombre):
+    """Mide el bloque como una etapa del perfil activo; sin perfil, no hace nada."""
+    if _traza is None:
+        yield
+        return
+    pila = _traza["pila"]
+    memoria = _traza["modo"] == "memoria"
+    if memoria:
+        import tracemalloc
+    # El pico de tracemalloc es uno solo por proceso: antes de reiniciarlo para
+    # esta etapa se le acredita a la etapa que la contiene lo acumulado hasta aquí.
+    if memoria:
+        if pila:
+            pila[-1]["pico"] = max(pila[-1]["pico"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    ruta = f"{pila[-1]['ruta']}/{nombre}" if pila else nombre
+    # Se registra al entrar para que el resumen liste cada etapa antes que las suyas.
+    e = _traza["etapas"].setdefault(ruta, {
+        "etapa": ruta, "llamadas": 0, "pared_s": 0.0, "cpu_s": 0.0,
+        "cpu_hijos_s": 0.0, "pico_mb": None, "rss_max_mb": None})
+    marco = {"ruta": ruta, "pico": 0, "t0": time.perf_counter(), "cpu0": _cpu()}
+    pila.append(marco)
+    try:
+        yield
+    finally:
+        pila.pop()
+        pared = time.perf_counter() - marco["t0"]
+        cpu, hijos = (a - b for a, b in zip(_cpu(), marco["cpu0"]))
+        e["llamadas"] += 1
+        e["pared_s"] += pared
+        e["cpu_s"] += cpu
+        e["cpu_hijos_s"] += hijos
+        e["rss_max_mb"] = _rss_mb()
+        if memoria:
+            pico = max(marco["pico"], tracemalloc.get_traced_memory()[1])
+            if pila:
+                pila[-1]["pico"] = max(pila[-1]["pico"], pico)
+            e["pico_mb"] = round(max(e["pico_mb"] or 0, pico / 1e6), 1)
+
+
+def cerrar():
+    """Escribe la traza y el resumen. Corre al salir del proceso; un proceso que
+    no sale entre una orden y otra (scripts/servidor.py) la llama al terminar
+    cada una."""
+    global _traza
+    t, _traza = _traza, None
+    if t is None:
+        return
+    import json
+    import socket
+    import platform
+    total = time.perf_counter() - t["t0"]
+    cpu, hijos = (a - b for a, b in zip(_cpu(), t["cpu0"]))
+    pico = None
+    if t["modo"] == "memoria":
+        import tracemalloc
+        pico = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+
+    etapas = []
+    for e in t["etapas"].values():
+        etapas.append({k: round(v, 4) if isinstance(v, float) else v for k, v in e.items()})
+    # Lo que quedó fuera de toda etapa entre activar() y la salida.
+    medido = sum(e["pared_s"] for e in t["etapas"].values() if "/" not in e["etapa"])
+    doc = {
+        "script": t["script"],
+        "codigo": t["codigo"],
+        "modo": t["modo"],
+        "fecha": t["inicio"].isoformat(timespec="seconds"),
+        "maquina": {"host": socket.gethostname(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "total": {"pared_s": round(total, 4), "cpu_s": round(cpu, 4),
+                  "cpu_hijos_s": round(hijos, 4), "sin_etapa_s": round(total - medido, 4),
+                  "pico_mb": pico, "rss_max_mb": _rss_mb()},
+        "etapas": etapas,
+    }
+    os.makedirs(PERFIL_DIR, exist_ok=True)
+    ruta = os.path.join(PERFIL_DIR, f"{t['script']}-{t['codigo'] or 'todas'}-"
+                                    f"{t['inicio']:%Y%m%d-%H%M%S}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    imprimir(doc)
+    print(f"  Perfil escrito en: {os.path.relpath(ruta, RAIZ)}")
+
+
+def imprimir(doc):
+    """Resumen legible de una traza: una fila por etapa, anidadas con sangría."""
+    tot = doc["total"]
+    print(f"\n  PERFIL — {doc['script']}" + (f" {doc['codigo']}" if doc["codigo"] else ""))
+    print(f"  {'etapa':<30} {'llam.':>5} {'pared ms':>10} {'%':>5} {'CPU ms':>10} "
+          f"{'hijos ms':>9} {'pico MB':>8} {'RSS MB':>7}")
+    for e in doc["etapas"]:
+        nivel = e["etapa"].count("/")
+        nombre = "  " * nivel + e["etapa"].rsplit("/", 1)[-1]
+        pct = e["pared_s"] / tot["pared_s"] if tot["pared_s"] else 0
+        print(f"  {nombre:<30} {e['llamadas']:>5} {e['pared_s'] * 1000:>10.1f} {pct:>5.0%} "
+              f"{e['cpu_s'] * 1000:>10.1f} {e['cpu_hijos_s'] * 1000:>9.1f} "
+              f"{_mb(e['pico_mb']):>8} {_mb(e['rss_max_mb']):>7}")
+    print(f"  {'(fuera de etapas)':<30} {'':>5} {tot['sin_etapa_s'] * 1000:>10.1f}")
+    print(f"  {'TOTAL':<30} {'':>5} {tot['pared_s'] * 1000:>10.1f} {'':>5} "
+          f"{tot['cpu_s'] * 1000:>10.1f} {tot['cpu_hijos_s'] * 1000:>9.1f} "
+          f"{_mb(tot['pico_mb']):>8} {_mb(tot['rss_max_mb']):>7}")
+
+
+def _mb(x):
+    return "—" if x is None else f"{x:.1f}"
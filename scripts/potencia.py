@@ -0,0 +1,340 @@
+"""
+Estudio de potencia por Monte Carlo para diseñar una ronda — uso interno.
+
+N_MINIMO, N_MINIMO_GRUPO y cuántos participantes hacen falta por plataforma se
+fijaron por regla práctica. Este script lo mide: dado un modelo por analito
+—valor verdadero, SD entre laboratorios, sesgo de cada plataforma, tasa de
+resultados atípicos y n por plataforma— simula miles de rondas, las evalúa como
+el pipeline (el estimador de la ronda, X* y σ* redondeados como en el JSON,
+los cortes de clasificar()) y cuenta cuántas veces la evaluación se equivoca
+frente a la que se obtendría conociendo los parámetros verdaderos:
+
+  falsa aceptación   no sale I un resultado que con X* y σ verdaderos sería I
+  falso rechazo      sale I un resultado que con X* y σ verdaderos no lo sería
+
+Se mide para el consenso (σpt = σ*) y para CLIA (σpt = δE(X*)/3), cada uno
+contra su propio criterio con los parámetros verdaderos. El X* verdadero es el
+valor del material si el analito se evalúa agrupado, y el de la plataforma
+(valor·(1 + sesgo)) si va por grupo de pares; la σ verdadera es la SD entre
+laboratorios, sin atípicos. Un atípico se desplaza ±ATIPICO SD de su centro.
+Los grupos de pares con menos de N_MINIMO_GRUPO quedan NE y no entran en las
+tasas.
+
+El modelo sale de la ronda (--codigo: X* agrupado, SD de los residuos a la
+mediana de cada plataforma, sesgo de cada mediana frente a X*, fracción de
+residuos a más de 3 SD, n y decisión de grupo de pares de config.json) o de un
+JSON (--diseno):
+
+  {"Glucosa": {"valor": 100, "sd": 4, "atipicos": 0.03, "grupo_pares": false,
+               "plataformas": {"Química seca": {"n": 12, "sesgo": 0.08},
+                               "Química húmeda": {"n": 20}}}}
+
+--escalas multiplica el n de cada plataforma y --n lo fija igual para todas:
+cada valor es un escenario. Cada ronda simulada es una fila de una matriz de
+NumPy y el estimador la procesa por filas (ESTIMADORES[...]["filas"]); las
+tareas analito × escenario se reparten entre procesos. La semilla de cada tarea
+sale del analito y del escenario: el resultado no depende de --procesos.
+
+Uso:
+  conda activate concalab
+  python scripts/potencia.py --codigo EA-001-2026
+  python scripts/potencia.py --codigo EA-001-2026 --n 6,8,12 --rondas 20000
+  python scripts/potencia.py --diseno diseno.json --escalas 0.5,1,2 --csv potencia.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import zlib
+import argparse
+import statistics
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import (  # noqa: E402
+    analitos_por_grupo_pares, analitos_sin_evaluar, codigo_activo, estimador_robusto, analito_de,
+)
+from calcular_zscore import (  # noqa: E402
+    cargar, usar_estimador, estimador, avisar_solo_z, ESTIMADORES, BLOQUE, N_MINIMO_GRUPO,
+)
+from influencia import Modelo  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
+
+RONDAS = 5_000
+SEMILLA = 13528
+# Desplazamiento de un resultado atípico, en SD entre laboratorios: uniforme en
+# este rango y con signo al azar.
+ATIPICO = (4.0, 10.0)
+MODELOS = ("consenso", "clia")
+CONTADORES = ("resultados", "ne", "i_verdad", "aceptados", "no_i_verdad", "rechazados")
+
+
+# ====================================================================
+# MODELO
+# ====================================================================
+
+def modelo_desde_ronda(por_analito, por_pares, sin_eval):
+    """El modelo de cada analito estimado de los resultados de una ronda."""
+    import numpy as np
+    calcular = estimador()["calcular"]
+    modelo = {}
+    for nombre in sorted(n for n in por_analito if analito_de(n) not in sin_eval):
+        filas = por_analito[nombre]
+        grupos = defaultdict(list)
+        for f in filas:
+            grupos[f["plataforma"]].append(f["valor"])
+        valor, _ = calcular([f["valor"] for f in filas])
+        global_ = statistics.median(f["valor"] for f in filas)
+        # Cada plataforma con n ≥ 3 aporta su mediana; las demás, la global.
+        centros = {g: statistics.median(v) if len(v) >= 3 else global_ for g, v in grupos.items()}
+        residuos = np.concatenate([np.asarray(v) - centros[g] for g, v in grupos.items()])
+        _, sd = calcular(residuos)
+        modelo[nombre] = {
+            "valor": valor,
+            "sd": sd,
+            "atipicos": float(np.mean(np.abs(residuos) > 3 * sd)) if sd else 0.0,
+            "grupo_pares": analito_de(nombre) in por_pares,
+            "plataformas": {
+                g: {"n": len(v), "sesgo": centros[g] / valor - 1 if len(v) >= 3 and valor else 0.0}
+                for g, v in sorted(grupos.items(), key=lambda kv: -len(kv[1]))
+            },
+        }
+    return modelo
+
+
+def leer_diseno(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        diseno = json.load(f)
+    for nombre, m in diseno.items():
+        faltan = {"valor", "sd", "plataformas"} - set(m)
+        if faltan:
+            sys.exit(f"ERROR: {ruta}: '{nombre}' no declara {', '.join(sorted(faltan))}.")
+        m.setdefault("atipicos", 0.0)
+        m.setdefault("grupo_pares", False)
+        for p in m["plataformas"].values():
+            p.setdefault("sesgo", 0.0)
+    return diseno
+
+
+def escenarios(escalas, ns):
+    """(etiqueta, n de una plataforma → n del escenario)."""
+    if ns:
+        return [(f"n={n}", lambda _, n=n: n) for n in ns]
+    return [(f"×{e:g}", lambda n, e=e: max(1, round(n * e))) for e in escalas]
+
+
+# ====================================================================
+# SIMULACIÓN
+# ====================================================================
+
+def _contar(conteo, puntuado, verdad):
+    """Suma a `conteo` los resultados de una matriz de clases (códigos de Modelo.clases)."""
+    evaluado = puntuado != 3
+    i_p, i_v = puntuado == 2, verdad == 2
+    conteo["resultados"] += puntuado.size
+    conteo["ne"] += int((~evaluado).sum())
+    conteo["i_verdad"] += int((i_v & evaluado).sum())
+    conteo["aceptados"] += int((i_v & evaluado & ~i_p).sum())
+    conteo["no_i_verdad"] += int((~i_v & evaluado).sum())
+    conteo["rechazados"] += int((~i_v & i_p).sum())
+
+
+def simular(tarea):
+    """
+    Simula `rondas` rondas de un analito en un escenario y cuenta, por modelo,
+    resultados, NE, I verdaderos, falsas aceptaciones, no-I verdaderos y falsos
+    rechazos. Corre en un proceso aparte: recibe todo lo que necesita.
+    """
+    import numpy as np
+    nombre, m, n_plataformas, esp, clave, rondas, semilla = tarea
+    usar_estimador(clave)
+    por_filas = ESTIMADORES[clave]["filas"]
+    rng = np.random.default_rng(semilla)
+    modelos = [Modelo("consenso")] + ([Modelo("clia", {analito_de(nombre): esp})] if esp else [])
+    conteos = {mod.nombre: dict.fromkeys(CONTADORES, 0) for mod in modelos}
+
+    valor, sd = m["valor"], m["sd"]
+    centros = [valor * (1 + p["sesgo"]) for p in m["plataformas"].values()]
+    n_total = sum(n_plataformas)
+    paso = max(1, BLOQUE // max(n_total, 1))
+    for a in range(0, rondas, paso):
+        r = min(paso, rondas - a)
+        bloques = []
+        for centro, n in zip(centros, n_plataformas):
+            x = centro + sd * rng.standard_normal((r, n))
+            atipico = rng.random((r, n)) < m["atipicos"]
+            salto = rng.uniform(*ATIPICO, size=(r, n)) * rng.choice((-1.0, 1.0), size=(r, n))
+            bloques.append((centro, x + np.where(atipico, salto * sd, 0.0)))
+        if not m["grupo_pares"]:
+            bloques = [(valor, np.hstack([x for _, x in bloques]))]
+
+        for objetivo, x in bloques:
+            n = x.shape[1]
+            evaluable = n >= N_MINIMO_GRUPO if m["grupo_pares"] else n >= 3
+            if evaluable:
+                x_star, s_star = por_filas(x)
+                x_r, s_r = np.round(x_star, 2), np.round(s_star, 2)
+            for mod in modelos:
+                if not evaluable:
+                    ne = np.full(x.shape, 3)
+                    _contar(conteos[mod.nombre], ne, ne)
+                    continue
+                puntuado = mod.clases(x, x_r, mod.sigma_pt(nombre, x_r, s_r))
+                verdad = mod.clases(x, objetivo, mod.sigma_pt(nombre, objetivo, sd))
+                _contar(conteos[mod.nombre], puntuado, verdad)
+    return conteos
+
+
+def tareas(modelo, especificaciones, lista_escenarios, clave, rondas):
+    """Una tarea por analito × escenario, con su propia semilla."""
+    salida = []
+    for k, (etiqueta, n_de) in enumerate(lista_escenarios):
+        for nombre, m in modelo.items():
+            n_plataformas = [n_de(p["n"]) for p in m["plataformas"].values()]
+            semilla = [SEMILLA, zlib.crc32(nombre.encode("utf-8")), k]
+            salida.append(((nombre, etiqueta), (nombre, m, n_plataformas,
+                                                (especificaciones or {}).get(analito_de(nombre)),
+                                                clave, rondas, semilla)))
+    return salida
+
+
+def estudiar(modelo, especificaciones, lista_escenarios, rondas=RONDAS, procesos=None):
+    """
+    Corre todas las tareas y devuelve {(analito, escenario): (n, conteos)}. Con
+    procesos=1 corre en este proceso; si no, en un ProcessPoolExecutor.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    lista = tareas(modelo, especificaciones, lista_escenarios, estimador()["clave"], rondas)
+    if procesos == 1:
+        resultados = [simular(t) for _, t in lista]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as ex:
+            resultados = list(ex.map(simular, [t for _, t in lista]))
+    return {clave: (sum(t[2]), r) for (clave, t), r in zip(lista, resultados)}
+
+
+# ====================================================================
+# REPORTE
+# ====================================================================
+
+def tasas(c):
+    """(NE, falsa aceptación, falso rechazo) en fracciones; None sin denominador."""
+    return (c["ne"] / c["resultados"] if c["resultados"] else None,
+            c["aceptados"] / c["i_verdad"] if c["i_verdad"] else None,
+            c["rechazados"] / c["no_i_verdad"] if c["no_i_verdad"] else None)
+
+
+def _pct(v, ancho=7, dec=1):
+    return f"{'—':>{ancho}}" if v is None else f"{v * 100:>{ancho}.{dec}f}"
+
+
+def imprimir(resultados, modelo, lista_escenarios, rondas):
+    print("\n" + "=" * 100)
+    print(f"  POTENCIA — {rondas} rondas simuladas por analito y escenario "
+          f"(estimador: {estimador()['nombre']})")
+    print("=" * 100)
+    print(f"  {'Analito':<28}{'escenario':>10}{'n':>5}{'NE%':>7}"
+          f"{'consenso FA%':>15}{'FR%':>7}{'CLIA FA%':>12}{'FR%':>7}")
+    print("  " + "-" * 96)
+    totales = {e: {mod: dict.fromkeys(CONTADORES, 0) for mod in MODELOS}
+               for e, _ in lista_escenarios}
+    for nombre in modelo:
+        for etiqueta, _ in lista_escenarios:
+            n, conteos = resultados[(nombre, etiqueta)]
+            cons = tasas(conteos["consenso"])
+            clia = tasas(conteos["clia"]) if "clia" in conteos else (None, None, None)
+            marca = "  (pares)" if modelo[nombre]["grupo_pares"] else ""
+            print(f"  {nombre[:28]:<28}{etiqueta:>10}{n:>5}{_pct(cons[0])}"
+                  f"{_pct(cons[1], 15, 2)}{_pct(cons[2], 7, 2)}"
+                  f"{_pct(clia[1], 12, 2)}{_pct(clia[2], 7, 2)}{marca}")
+            for mod, c in conteos.items():
+                for k in CONTADORES:
+                    totales[etiqueta][mod][k] += c[k]
+    print("  " + "-" * 96)
+    for etiqueta, _ in lista_escenarios:
+        cons, clia = tasas(totales[etiqueta]["consenso"]), tasas(totales[etiqueta]["clia"])
+        print(f"  {'Todos':<28}{etiqueta:>10}{'':>5}{_pct(cons[0])}"
+              f"{_pct(cons[1], 15, 2)}{_pct(cons[2], 7, 2)}"
+              f"{_pct(clia[1], 12, 2)}{_pct(clia[2], 7, 2)}")
+    print("=" * 100)
+    print("  FA% = I verdaderos que no salen I · FR% = no-I verdaderos que salen I.")
+    print("  Verdadero = X* y σ del modelo; CLIA solo en analitos con ETa declarado.")
+    print("=" * 100)
+
+
+def escribir_csv(resultados, ruta):
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["analito", "escenario", "n", "modelo", *CONTADORES,
+                    "tasa_ne", "tasa_falsa_aceptacion", "tasa_falso_rechazo"])
+        for (nombre, etiqueta), (n, conteos) in resultados.items():
+            for mod, c in conteos.items():
+                w.writerow([nombre, etiqueta, n, mod, *(c[k] for k in CONTADORES),
+                            *("" if t is None else round(t, 6) for t in tasas(c))])
+
+
+def _lista(tipo):
+    def leer(txt):
+        try:
+            return tuple(tipo(v) for v in txt.split(",") if v.strip())
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"lista inválida: {txt!r}")
+    return leer
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Estudio de potencia por Monte Carlo.")
+    ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    ap.add_argument("--area", default="quimica")
+    ap.add_argument("--diseno", help="JSON con el modelo de cada analito (en vez de la ronda)")
+    ap.add_argument("--analitos", type=_lista(str), help="Solo estos analitos")
+    ap.add_argument("--escalas", type=_lista(float), default=(1.0,),
+                    help="Factores sobre el n de cada plataforma, p. ej. 0.5,1,2")
+    ap.add_argument("--n", type=_lista(int), help="n fijo por plataforma, p. ej. 6,8,12")
+    ap.add_argument("--rondas", type=int, default=RONDAS)
+    ap.add_argument("--procesos", type=int, help="Procesos (por defecto, uno por CPU)")
+    ap.add_argument("--csv", help="Escribe además los conteos en este CSV")
+    argumento_perfil(ap)
+    args = ap.parse_args()
+
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("potencia", codigo, args.perfil)
+    usar_estimador(estimador_robusto(codigo, args.area))
+
+    if args.diseno:
+        modelo = leer_diseno(args.diseno)
+        origen = args.diseno
+    else:
+        with etapa("cargar"):
+            por_analito, _ = cargar(codigo)
+        if not por_analito:
+            sys.exit(f"No hay resultados de Química Clínica para {codigo}.")
+        sin_eval, _ = analitos_sin_evaluar(codigo, args.area)
+        por_pares = analitos_por_grupo_pares(codigo, args.area) - sin_eval
+        modelo = modelo_desde_ronda(por_analito, por_pares, sin_eval)
+        origen = f"ronda {codigo}"
+    if args.analitos:
+        faltan = set(args.analitos) - set(modelo)
+        if faltan:
+            sys.exit(f"ERROR: sin modelo para {', '.join(sorted(faltan))}.")
+        modelo = {n: modelo[n] for n in args.analitos}
+
+    from evaluar_clia import leer_especificaciones
+    esp = leer_especificaciones(args.area)
+    lista_escenarios = escenarios(args.escalas, args.n)
+
+    print(f"\nEstudio de potencia — modelo de {origen}: {len(modelo)} analitos, "
+          f"{len(lista_escenarios)} escenario(s)")
+    avisar_solo_z(codigo, args.area, MODELOS)
+    with etapa("simular"):
+        resultados = estudiar(modelo, esp, lista_escenarios, args.rondas, args.procesos)
+    imprimir(resultados, modelo, lista_escenarios, args.rondas)
+    if args.csv:
+        escribir_csv(resultados, args.csv)
+        print(f"  CSV escrito en: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,17 +41,13 @@ import subprocess
 from pathlib import Path
 from datetime import date
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import numpy as np
-
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from informe_pdf import (  # noqa: E402
     fig_estratos, fig_heatmap, fig_zscore, fig_histograma,
-    es_no_evaluado, leer_equipo, titulo_humano,
+    es_no_evaluado, leer_equipo, titulo_humano, pyplot,
     AZUL, ORO, VERDE, AMARILLO, ROJO, GRIS, MESES, AREAS, RAIZ,
 )
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
 
 SALIDA_DIR = RAIZ / "publicaciones" / "presentaciones"
 
@@ -95,6 +91,7 @@ def buscar(d, nombre):
 def _estilo_slide():
     """Las figuras del informe se leen a 20 cm de los ojos; estas, en una
     pantalla compartida por videollamada, comprimida. Todo sube de tamaño."""
+    plt = pyplot()
     plt.rcParams.update({
         "font.size": 12,
         "axes.titlesize": 14,
@@ -110,6 +107,7 @@ def fig_brecha(d, destino):
     """La distancia entre «% de resultados satisfactorios» y «% de laboratorios
     sin ninguna no conformidad». Es el titular de la ronda y la diapositiva
     que más se va a citar: merece una gráfica propia y no una viñeta."""
+    plt = pyplot()
     r, g = d["resumen"], d["desempeno_global"]
     pct_res = r["aceptables"] / r["total"] * 100
     pct_lab = g["pct_conformes"]
@@ -141,6 +139,8 @@ def fig_analitos(d, destino):
     """% dentro del criterio por analito, de peor a mejor. Es el consolidado
     por analito del informe hecho gráfica: en una tabla de 26 filas proyectada
     nadie encuentra el fondo de la lista, que es justo el dato accionable."""
+    import numpy as np
+    plt = pyplot()
     ev = [a for a in d["analitos"] if a["conteos"]["pct_dentro"] is not None]
     ev.sort(key=lambda a: a["conteos"]["pct_dentro"])
     nombres = [a["nombre"] for a in ev]
@@ -174,6 +174,7 @@ def fig_criterio(destino):
     """La regla de decisión dibujada: dónde caen A, C e I sobre el eje z, y
     que |z| = 3 ES el límite de CLIA. Explicado solo con palabras, «σpt =
     ETa/3» se pierde; con la banda a la vista se entiende de una."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(9.4, 2.6))
     tramos = [(-6, -3, ROJO), (-3, -2, AMARILLO), (-2, 2, VERDE),
               (2, 3, AMARILLO), (3, 6, ROJO)]
@@ -837,15 +838,19 @@ def main():
                          "(por defecto: hoy)")
     ap.add_argument("--pdf", action="store_true",
                     help="además del HTML, exporta la versión estática en PDF")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
     cfg = json.loads((RAIZ / "data" / "config.json").read_text(encoding="utf-8"))
     codigo = args.codigo or cfg["ronda_activa"]["codigo"]
+    if args.perfil:
+        activar_perfil("presentacion", codigo, args.perfil)
 
     ruta_json = RAIZ / "data" / "informes" / f"{codigo}-{args.area}-clia.json"
     if not ruta_json.exists():
         sys.exit(f"No existe {ruta_json}. Corra primero scripts/evaluar_clia.py.")
-    d = json.loads(ruta_json.read_text(encoding="utf-8"))
+    with etapa("cargar"):
+        d = json.loads(ruta_json.read_text(encoding="utf-8"))
     if d.get("modelo") != "clia":
         sys.exit("El JSON no declara modelo 'clia'.")
 
@@ -868,18 +873,19 @@ def main():
 
     print(f"→ Figuras SVG en {figs.relative_to(RAIZ)}…")
     _estilo_slide()
-    fig_criterio(figs / "criterio.svg")
-    fig_brecha(d, figs / "brecha.svg")
-    fig_analitos(d, figs / "analitos.svg")
-    fig_estratos(d, figs / "estratos.svg")
-    fig_heatmap(d, figs / "heatmap.svg")
-
-    a_metodo = buscar(d, EJEMPLO_METODO)
-    if a_metodo:
-        fig_histograma(a_metodo, figs / "metodo.svg")
-    a_lectura = buscar(d, EJEMPLO_LECTURA)
-    if a_lectura:
-        fig_zscore(a_lectura, figs / "lectura.svg")
+    with etapa("dibujar"):
+        fig_criterio(figs / "criterio.svg")
+        fig_brecha(d, figs / "brecha.svg")
+        fig_analitos(d, figs / "analitos.svg")
+        fig_estratos(d, figs / "estratos.svg")
+        fig_heatmap(d, figs / "heatmap.svg")
+
+        a_metodo = buscar(d, EJEMPLO_METODO)
+        if a_metodo:
+            fig_histograma(a_metodo, figs / "metodo.svg")
+        a_lectura = buscar(d, EJEMPLO_LECTURA)
+        if a_lectura:
+            fig_zscore(a_lectura, figs / "lectura.svg")
     for f in sorted(figs.glob("*.svg")):
         print(f"   · {f.name}")
 
@@ -887,57 +893,58 @@ def main():
         return
 
     print("→ Diapositivas…")
-    equipo = leer_equipo()
-    slides = [
-        portada(d, meta, equipo),
-        divisor(1, "Introducción"),
-        s_introduccion(d),
-        divisor(2, "Objetivos del programa"),
-        s_objetivos(),
-        divisor(3, "Metodología de evaluación"),
-        s_metodologia_1(d),
-        s_metodologia_porque_clia(d),
-        s_metodologia_criterio(d),
-        s_metodologia_pares(d),
-        s_alcance(d, meta),
-        divisor(4, "Principales resultados"),
-        s_resultados_tarjeta(d),
-        s_resultados_brecha(d),
-        s_resultados_estratos(d),
-        divisor(5, "Principales hallazgos"),
-        s_hallazgo_analitos(d),
-        s_hallazgo_metodo(d),
-        s_hallazgo_no_evaluado(d, cfg),
-        s_hallazgo_unidades(d),
-        divisor(6, "Recomendaciones"),
-        s_mapa(d),
-        s_como_leer(d),
-        s_ejemplo_z(d),
-        s_recomendaciones(d),
-        divisor(7, "Conclusiones"),
-        s_conclusiones(d),
-        s_referencias(d),
-        s_anexos(d, meta),
-        s_cierre(d, meta),
-    ]
-    slides = [s for s in slides if s]
-
-    # El pie con la marca va en todas menos portada y divisores (los oculta
-    # el CSS); ponerlo aquí evita repetirlo en cada función.
-    marca = pie(codigo, meta["area_nombre"])
-    slides = [s.replace("\n</section>", f"\n{marca}\n</section>") for s in slides]
-    # Las figuras viven en un directorio por ronda, junto al HTML. El
-    # marcador se resuelve aquí y no en cada diapositiva para que agregar una
-    # ronda no obligue a tocar 28 funciones.
-    slides = [s.replace("__FIGS__", f"figs-{codigo}") for s in slides]
-
-    salida = SALIDA_DIR / f"{codigo}-resumen.html"
-    salida.write_text(PLANTILLA.format(
-        titulo=f"CONCALAB-UASD — Resultados {codigo} · {meta['area_nombre']}",
-        descripcion=(f"Sesión de devolución de resultados de la ronda {codigo} "
-                     f"de {meta['area_nombre']} a los laboratorios participantes."),
-        slides="\n\n".join(slides),
-    ), encoding="utf-8")
+    with etapa("componer"):
+        equipo = leer_equipo()
+        slides = [
+            portada(d, meta, equipo),
+            divisor(1, "Introducción"),
+            s_introduccion(d),
+            divisor(2, "Objetivos del programa"),
+            s_objetivos(),
+            divisor(3, "Metodología de evaluación"),
+            s_metodologia_1(d),
+            s_metodologia_porque_clia(d),
+            s_metodologia_criterio(d),
+            s_metodologia_pares(d),
+            s_alcance(d, meta),
+            divisor(4, "Principales resultados"),
+            s_resultados_tarjeta(d),
+            s_resultados_brecha(d),
+            s_resultados_estratos(d),
+            divisor(5, "Principales hallazgos"),
+            s_hallazgo_analitos(d),
+            s_hallazgo_metodo(d),
+            s_hallazgo_no_evaluado(d, cfg),
+            s_hallazgo_unidades(d),
+            divisor(6, "Recomendaciones"),
+            s_mapa(d),
+            s_como_leer(d),
+            s_ejemplo_z(d),
+            s_recomendaciones(d),
+            divisor(7, "Conclusiones"),
+            s_conclusiones(d),
+            s_referencias(d),
+            s_anexos(d, meta),
+            s_cierre(d, meta),
+        ]
+        slides = [s for s in slides if s]
+
+        # El pie con la marca va en todas menos portada y divisores (los oculta
+        # el CSS); ponerlo aquí evita repetirlo en cada función.
+        marca = pie(codigo, meta["area_nombre"])
+        slides = [s.replace("\n</section>", f"\n{marca}\n</section>") for s in slides]
+        # Las figuras viven en un directorio por ronda, junto al HTML. El
+        # marcador se resuelve aquí y no en cada diapositiva para que agregar una
+        # ronda no obligue a tocar 28 funciones.
+        slides = [s.replace("__FIGS__", f"figs-{codigo}") for s in slides]
+
+        salida = SALIDA_DIR / f"{codigo}-resumen.html"
+        salida.write_text(PLANTILLA.format(
+            titulo=f"CONCALAB-UASD — Resultados {codigo} · {meta['area_nombre']}",
+            descripcion=(f"Sesión de devolución de resultados de la ronda {codigo} "
+                         f"de {meta['area_nombre']} a los laboratorios participantes."),
+            slides="\n\n".join(slides),
+        ), encoding="utf-8")
 
     print(f"\n  {len(slides)} diapositivas")
     print(f"  {salida.relative_to(RAIZ)}")
@@ -945,7 +952,9 @@ def main():
     if args.pdf:
         print("\n→ PDF estático…")
         destino = SALIDA_DIR / f"{codigo}-resumen.pdf"
-        if exportar_pdf(salida, destino):
+        with etapa("exportar_pdf"):
+            exportado = exportar_pdf(salida, destino)
+        if exportado:
             print(f"  {destino.relative_to(RAIZ)}  "
                   f"({destino.stat().st_size / 1e6:.1f} MB)")
     print("\n  Verla:  python3 -m http.server 8765")
@@ -0,0 +1,125 @@
+"""
+Tipos de puntaje de desempeño de una ronda — ISO 13528:2022 §9.
+
+El pipeline clasificaba solo con z contra σ* (consenso) o σpt = ETa/3 (CLIA).
+ISO 13528 define además puntajes que incluyen incertidumbres:
+
+  z     = (x − X*) / σpt                           §9.4
+  z′    = (x − X*) / √(σpt² + u(X*)²)              §9.5   cuando u(X*) no es despreciable
+  ζ     = (x − X*) / √(u(x)² + u(X*)²)             §9.6   con la incertidumbre del laboratorio
+  En    = (x − X*) / √(U(x)² + U(X*)²)             §9.7   U = k·u, k = K_COBERTURA
+
+z, z′ y ζ se leen con los cortes de siempre (|·| ≤ 2 A, < 3 C, ≥ 3 I); En con
+|En| ≤ 1 satisfactorio y > 1 no satisfactorio, sin zona de alerta.
+
+Todos los tipos de un bloque (un analito o un grupo de pares) salen de UNA
+operación: la diferencia x − X* de cada laboratorio dividida por una matriz
+tipo × laboratorio de denominadores. Agregar un tipo es agregar una fila a
+PUNTAJES, no otra pasada por los laboratorios.
+
+u(x) es la incertidumbre que reporta cada laboratorio (columna
+'incertidumbre_raw' del CSV, expandida con k = K_COBERTURA como en un
+certificado); sin ella ζ y En quedan vacíos para ese laboratorio. u(X*) es la
+del bootstrap del valor asignado; sin bootstrap, 1.25·s*/√p (ISO 13528 §7.7.3).
+
+Qué tipo decide la 'clasificacion' lo declara la ronda ("puntaje" en
+decisiones_evaluacion, uno para los dos modelos o uno por modelo); el JSON
+guarda todos bajo CLAVE, versionada: si cambia la definición de un puntaje,
+cambia la clave y ningún lector confunde una versión con otra.
+"""
+
+import sys
+import math
+
+VERSION = 1
+CLAVE = f"puntajes_v{VERSION}"
+POR_DEFECTO = "z"
+# Factor de cobertura de la incertidumbre expandida que reportan los laboratorios.
+K_COBERTURA = 2.0
+
+# Cada tipo: cómo se publica, su denominador a partir de (σpt, u(X*), u(x), k) y
+# sus cortes (A hasta el primero inclusive, C por debajo del segundo, I desde él).
+PUNTAJES = {
+    "z": {
+        "nombre": "z",
+        "formula": "(x − X*) / σpt",
+        "referencia": "ISO 13528:2022, 9.4",
+        "denominador": lambda spt, ux, ul, k: spt,
+        "cortes": (2.0, 3.0),
+    },
+    "z_prima": {
+        "nombre": "z′",
+        "formula": "(x − X*) / √(σpt² + u(X*)²)",
+        "referencia": "ISO 13528:2022, 9.5",
+        "denominador": lambda spt, ux, ul, k: (spt ** 2 + ux ** 2) ** 0.5,
+        "cortes": (2.0, 3.0),
+    },
+    "zeta": {
+        "nombre": "ζ",
+        "formula": "(x − X*) / √(u(x)² + u(X*)²)",
+        "referencia": "ISO 13528:2022, 9.6",
+        "denominador": lambda spt, ux, ul, k: (ul ** 2 + ux ** 2) ** 0.5,
+        "cortes": (2.0, 3.0),
+    },
+    "en": {
+        "nombre": "En",
+        "formula": "(x − X*) / √(U(x)² + U(X*)²)",
+        "referencia": "ISO 13528:2022, 9.7",
+        "denominador": lambda spt, ux, ul, k: k * (ul ** 2 + ux ** 2) ** 0.5,
+        "cortes": (1.0, 1.0),
+    },
+}
+
+
+def validar_tipo(tipo):
+    if tipo not in PUNTAJES:
+        sys.exit(f"ERROR: puntaje '{tipo}' desconocido. Disponibles: {', '.join(PUNTAJES)}.")
+    return tipo
+
+
+def u_asignado(incertidumbre, s_star, n):
+    """u(X*) del bootstrap si lo hay; si no, 1.25·s*/√p (ISO 13528 §7.7.3)."""
+    if incertidumbre:
+        return incertidumbre["u"]
+    return 1.25 * s_star / math.sqrt(n) if n else float("nan")
+
+
+def calcular(valores, u_lab, x_asignado, sigma_pt, u_x, k=K_COBERTURA):
+    """
+    Matriz (tipo × laboratorio) con todos los puntajes de un bloque, en el orden
+    de PUNTAJES. `u_lab` es la incertidumbre estándar de cada laboratorio (NaN
+    si no la reportó). NaN donde el denominador no existe o es 0.
+    """
+    import numpy as np
+    x = np.asarray(valores, dtype=float)
+    ul = np.asarray(u_lab, dtype=float)
+    spt, ux = float(sigma_pt or 0.0), float(u_x)
+    den = np.stack([np.broadcast_to(np.asarray(p["denominador"](spt, ux, ul, k), dtype=float),
+                                    x.shape) for p in PUNTAJES.values()])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, (x - x_asignado) / den, np.nan)
+
+
+def clasificar(valor, tipo):
+    """A/C/I de un puntaje según los cortes de su tipo; None si no hay valor."""
+    if valor is None or math.isnan(valor):
+        return None
+    a, (c1, c2) = abs(valor), PUNTAJES[tipo]["cortes"]
+    return "A" if a <= c1 else ("C" if a < c2 else "I")
+
+
+def publicos(columna):
+    """El bloque CLAVE de un laboratorio: cada tipo redondeado a 2 decimales, None si falta."""
+    return {t: None if math.isnan(v) else round(v, 2) for t, v in zip(PUNTAJES, columna)}
+
+
+def descripcion(tipo):
+    """Lo que el JSON publica de los puntajes: versión, cuál clasifica y cada fórmula."""
+    return {
+        "version": VERSION,
+        "clave": CLAVE,
+        "clasifica": tipo,
+        "k_cobertura": K_COBERTURA,
+        "tipos": {t: {c: p[c] for c in ("nombre", "formula", "referencia")}
+                  for t, p in PUNTAJES.items()},
+    }
@@ -0,0 +1,253 @@
+"""
+Puntajes combinados entre rondas — RSZ y SSZ (ISO 13528 §9.8).
+
+Un z aislado dice cómo le fue a un laboratorio en una ronda; no distingue un
+tropiezo de un sesgo que se repite. ISO 13528 propone combinar los z de varias
+rondas del mismo analito:
+
+  RSZ = Σz / √n     suma reescalada: se lee como un z (|RSZ| ≥ 3 → I). Detecta
+                    sesgo sostenido en una dirección, aunque cada z por
+                    separado sea aceptable.
+  SSZ = Σz²         suma de cuadrados: bajo desempeño normal sigue una χ² con n
+                    grados de libertad. Detecta dispersión excesiva aunque los
+                    signos se cancelen.
+
+Se calculan en una ventana móvil de las últimas VENTANA rondas en que el
+laboratorio reportó el analito (los huecos no cuentan), para todos los
+laboratorios y analitos a la vez: el histórico se pivota a una matriz
+laboratorio × analito × ronda y las sumas móviles salen de sumas acumuladas
+sobre el eje de rondas. El costo crece con el tamaño de la matriz, no con
+bucles por laboratorio.
+
+Lee las evaluaciones de support/historico.sqlite (scripts/historico.py), así
+que primero hay que importar las rondas. Solo entran las rondas que comparten
+el identificador público de la más reciente (historico.rondas_comparables):
+con otro esquema, la misma etiqueta no es el mismo laboratorio. Y solo las que
+publicaron el modelo pedido: el consenso de una ronda sin CLIA no sustituye a
+su z CLIA (ver cargar_z()). Escribe
+data/informes/combinados-<area>-<modelo>.json para la web y el PDF.
+
+Uso:
+  python scripts/historico.py importar --todas
+  python scripts/puntajes_combinados.py
+  python scripts/puntajes_combinados.py --modelo consenso --ventana 6
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import SALIDA_DIR, registrar_versiones  # noqa: E402
+from historico import conectar, identificadores, rondas_comparables, HISTORICO_PATH  # noqa: E402
+
+# Rondas que entran en cada puntaje combinado.
+VENTANA = 4
+# Con menos z que esto en la ventana no se emite señal: una sola ronda ya la
+# califica su propio z.
+N_MINIMO_COMBINADO = 2
+# Sesgo persistente: al menos estos z seguidos del mismo signo y con |z| > 1.
+# Bajo desempeño normal, tres así ocurren por azar en <1% de los casos.
+N_TENDENCIA = 3
+
+# Valores críticos de χ² (grados de libertad 1..10). Sin scipy: son constantes
+# de tabla, no vale la pena la dependencia.
+CHI2_95 = (3.841, 5.991, 7.815, 9.488, 11.070, 12.592, 14.067, 15.507, 16.919, 18.307)
+CHI2_99 = (6.635, 9.210, 11.345, 13.277, 15.086, 16.812, 18.475, 20.090, 21.666, 23.209)
+
+
+def cargar_z(con, area="quimica", modelo="clia", codigos=None):
+    """Evaluaciones del histórico como matriz Z[lab, analito, ronda] (NaN = sin z).
+
+    Solo entran las rondas que publicaron el `modelo` pedido (ver
+    rondas_sin_modelo()). Completar con el consenso haría que RSZ y SSZ sumen
+    z calculados contra σpt distintos (σ* y ETa/3) bajo una etiqueta de modelo
+    que no les corresponde. `codigos` limita a esas rondas (por defecto, todas).
+    """
+    filas = con.execute("""
+        SELECT e.codigo, e.lab, e.analito, e.z_score, r.orden
+        FROM evaluaciones e JOIN rondas r USING (codigo)
+        WHERE e.area = ? AND e.modelo = ? AND e.z_score IS NOT NULL
+    """, (area, modelo)).fetchall()
+    if codigos is not None:
+        filas = [f for f in filas if f["codigo"] in set(codigos)]
+    if not filas:
+        return [], [], [], np.empty((0, 0, 0))
+
+    codigos = np.array([f["codigo"] for f in filas])
+    orden = np.array([f["orden"] for f in filas])
+    labs, i_lab = np.unique([f["lab"] for f in filas], return_inverse=True)
+    analitos, i_an = np.unique([f["analito"] for f in filas], return_inverse=True)
+    ordenes, i_ro = np.unique(orden, return_inverse=True)
+    rondas = [codigos[orden == o][0] for o in ordenes]
+
+    Z = np.full((len(labs), len(analitos), len(rondas)), np.nan)
+    Z[i_lab, i_an, i_ro] = [f["z_score"] for f in filas]
+    return list(labs), list(analitos), rondas, Z
+
+
+def rondas_sin_modelo(con, area, modelo, codigos):
+    """Rondas de `codigos` con evaluaciones en el área pero sin el `modelo` pedido."""
+    con_area = {r["codigo"]: set(r["modelos"].split(",")) for r in con.execute(
+        "SELECT codigo, group_concat(DISTINCT modelo) AS modelos FROM evaluaciones "
+        "WHERE area = ? GROUP BY codigo", (area,))}
+    return [c for c in codigos if c in con_area and modelo not in con_area[c]]
+
+
+def compactar(Z):
+    """Desplaza los z de cada serie al final, sin huecos, conservando el orden.
+
+    La ventana cuenta rondas en que el laboratorio participó, no rondas del
+    calendario: un laboratorio que faltó a una ronda no debe perder la mitad
+    de su historia. Devuelve la matriz compactada y, para cada posición, la
+    ronda original de la que viene (-1 = vacío).
+    """
+    L, A, R = Z.shape
+    presente = ~np.isnan(Z)
+    # Orden estable: primero los huecos, luego los presentes en su orden.
+    idx = np.argsort(presente, axis=2, kind="stable")
+    Zc = np.take_along_axis(Z, idx, axis=2)
+    origen = np.where(np.take_along_axis(presente, idx, axis=2), idx, -1)
+    return Zc, origen
+
+
+def sumas_moviles(Z, ventana):
+    """Σz, Σz² y n sobre las últimas `ventana` posiciones terminando en cada posición."""
+    presente = ~np.isnan(Z)
+    z = np.where(presente, Z, 0.0)
+    ceros = np.zeros(Z.shape[:2] + (1,))
+    acum = lambda x: np.concatenate([ceros, np.cumsum(x, axis=2)], axis=2)
+    cs, cs2, cn = acum(z), acum(z * z), acum(presente.astype(float))
+    fin = np.arange(1, Z.shape[2] + 1)
+    ini = np.maximum(0, fin - ventana)
+    return (cs[..., fin] - cs[..., ini], cs2[..., fin] - cs2[..., ini],
+            (cn[..., fin] - cn[..., ini]).astype(int))
+
+
+def puntajes(Z, ventana=VENTANA):
+    """RSZ, SSZ, n y señales de la ventana más reciente de cada (lab, analito).
+
+    Devuelve arrays L × A. `rsz_movil` es L × A × R (R = posiciones
+    compactadas), útil para dibujar la serie.
+    """
+    if ventana > len(CHI2_95):
+        sys.exit(f"ERROR: ventana máxima {len(CHI2_95)} (tabla de χ² en CHI2_95)")
+    Zc, origen = compactar(Z)
+    s, s2, n = sumas_moviles(Zc, ventana)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsz_movil = np.where(n > 0, s / np.sqrt(n), np.nan)
+    ssz_movil = np.where(n > 0, s2, np.nan)
+
+    rsz, ssz, nv = rsz_movil[..., -1], ssz_movil[..., -1], n[..., -1]
+    k = np.clip(nv, 1, len(CHI2_95)) - 1
+    basta = nv >= N_MINIMO_COMBINADO
+    senal_rsz = np.where(basta & (np.abs(rsz) >= 3), "I",
+                         np.where(basta & (np.abs(rsz) > 2), "C", ""))
+    senal_ssz = np.where(basta & (ssz > np.take(CHI2_99, k)), "I",
+                         np.where(basta & (ssz > np.take(CHI2_95, k)), "C", ""))
+
+    # Sesgo persistente: los últimos N_TENDENCIA z del mismo signo y |z| > 1.
+    # Con menos rondas (o huecos) no hay N_TENDENCIA z que mirar: sin señal.
+    ultimos = Zc[..., -N_TENDENCIA:]
+    completos = (~np.isnan(ultimos)).sum(axis=2) == N_TENDENCIA
+    tendencia = completos & (np.all(ultimos > 1, axis=2) | np.all(ultimos < -1, axis=2))
+    return {
+        "rsz": rsz, "ssz": ssz, "n": nv,
+        "senal_rsz": senal_rsz, "senal_ssz": senal_ssz, "tendencia": tendencia,
+        "rsz_movil": rsz_movil, "origen": origen, "Zc": Zc,
+    }
+
+
+def _r(x):
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+def escribir_json(labs, analitos, rondas, p, area, modelo, ventana, identificador, sin_modelo):
+    """Un registro por (laboratorio, analito) con al menos un z en el histórico."""
+    registros = []
+    for i, j in zip(*np.nonzero(p["n"] > 0)):
+        pos = p["origen"][i, j] >= 0
+        serie = [{"ronda": rondas[o], "z": _r(z), "rsz": _r(r)}
+                 for o, z, r in zip(p["origen"][i, j][pos], p["Zc"][i, j][pos],
+                                    p["rsz_movil"][i, j][pos])]
+        senales = []
+        if p["senal_rsz"][i, j]:
+            senales.append(f"RSZ:{p['senal_rsz'][i, j]}")
+        if p["senal_ssz"][i, j]:
+            senales.append(f"SSZ:{p['senal_ssz'][i, j]}")
+        if p["tendencia"][i, j]:
+            senales.append("tendencia")
+        registros.append({
+            "lab": labs[i], "analito": analitos[j], "n": int(p["n"][i, j]),
+            "rsz": _r(p["rsz"][i, j]), "ssz": _r(p["ssz"][i, j]),
+            "senales": senales, "serie": serie,
+        })
+
+    doc = {
+        "area": area,
+        "modelo": modelo,
+        "metodologia": "ISO 13528 §9.8 — RSZ = Σz/√n, SSZ = Σz²",
+        "ventana": ventana,
+        "identificador": identificador,
+        "criterios": {
+            "n_minimo": N_MINIMO_COMBINADO,
+            "rsz": "|RSZ| ≤ 2 A · 2 < |RSZ| < 3 C · |RSZ| ≥ 3 I",
+            "ssz": "SSZ > χ²(n; 0.95) C · SSZ > χ²(n; 0.99) I",
+            "tendencia": f"últimos {N_TENDENCIA} z del mismo signo con |z| > 1",
+        },
+        "rondas": rondas,
+        "rondas_sin_modelo": sin_modelo,
+        "laboratorios": len({r["lab"] for r in registros}),
+        "con_senal": sum(1 for r in registros if r["senales"]),
+        "registros": registros,
+    }
+    os.makedirs(SALIDA_DIR, exist_ok=True)
+    ruta = os.path.join(SALIDA_DIR, f"combinados-{area}-{modelo}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    registrar_versiones(ruta)
+    return ruta, doc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Puntajes combinados RSZ/SSZ entre rondas (ISO 13528).")
+    ap.add_argument("--db", default=HISTORICO_PATH)
+    ap.add_argument("--area", default="quimica")
+    ap.add_argument("--modelo", choices=["consenso", "clia"], default="clia")
+    ap.add_argument("--ventana", type=int, default=VENTANA)
+    args = ap.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"ERROR: no existe {args.db}\n"
+                 f"Ejecuta primero: python scripts/historico.py importar --todas")
+    con = conectar(args.db)
+    comparables, omitidas = rondas_comparables(con)
+    labs, analitos, rondas, Z = cargar_z(con, args.area, args.modelo, comparables)
+    sin_modelo = rondas_sin_modelo(con, args.area, args.modelo, comparables)
+    if not rondas:
+        sys.exit(f"El histórico no tiene evaluaciones {args.modelo} para esa área.")
+    identificador = identificadores(con)[rondas[-1]]
+
+    p = puntajes(Z, args.ventana)
+    ruta, doc = escribir_json(labs, analitos, rondas, p, args.area, args.modelo, args.ventana,
+                              identificador, sin_modelo)
+
+    print(f"\nPuntajes combinados — {args.area}, modelo {args.modelo}, ventana {args.ventana}")
+    print(f"  Rondas: {', '.join(rondas)}   ·   identificador: {identificador}")
+    if omitidas:
+        print(f"  AVISO: se omiten {', '.join(omitidas)}: publicaron con otro identificador")
+        print(f"         público y sus etiquetas no son los mismos laboratorios.")
+    if sin_modelo:
+        print(f"  AVISO: se omiten {', '.join(sin_modelo)}: no publicaron el modelo {args.modelo}.")
+    print(f"  {len(labs)} laboratorios × {len(analitos)} analitos")
+    if len(rondas) < N_MINIMO_COMBINADO:
+        print(f"  AVISO: con {len(rondas)} ronda(s) no hay puntaje combinado que señalar todavía.")
+    print(f"  Pares con señal: {doc['con_senal']} de {len(doc['registros'])}")
+    print(f"  JSON escrito en: {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Servidor local que mantiene el pipeline cargado entre órdenes.
+
+Durante la revisión de una ronda se corren decenas de veces calcular_zscore
+--efecto-metodo, evaluar_clia, validar_informe e informe_pdf --solo-tex, y cada
+corrida paga de nuevo el arranque de Python, NumPy y matplotlib y vuelve a leer
+el CSV. Este servidor se queda escuchando en un socket Unix con todo eso ya
+cargado y ejecuta el main() del script pedido con los mismos argumentos que
+en la línea de comandos; la salida llega al cliente a medida que se produce y
+el código de salida es el del script.
+
+Qué se conserva entre órdenes y cuándo deja de valer:
+  · Los módulos, NumPy y matplotlib: siempre. Si cambia el código de algún
+    script, el servidor lo detecta en la orden siguiente, se detiene y el
+    cliente corre el script directamente (reiniciar es cosa de un comando).
+  · La lectura del CSV de cada ronda (calcular_zscore.cargar): hasta que el
+    archivo cambie de fecha o tamaño, p. ej. tras una nueva extracción.
+  · data/config.json NO se guarda: cada orden lo relee, así que una decisión
+    de evaluación recién editada se ve en la orden siguiente.
+  · El estilo de matplotlib: cada orden corre dentro de su propio
+    rc_context, para que el de presentacion.py no se filtre al PDF.
+
+Las órdenes se atienden de a una, en el directorio de trabajo del cliente.
+Sin servidor activo el cliente corre el script como siempre.
+
+Uso:
+  python scripts/servidor.py iniciar &            # deja el servidor escuchando
+  python scripts/servidor.py evaluar_clia --codigo EA-001-2026
+  python scripts/servidor.py calcular_zscore --efecto-metodo
+  python scripts/servidor.py informe_pdf --solo-tex
+  python scripts/servidor.py estado
+  python scripts/servidor.py detener
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE = os.path.join(RAIZ, "scripts")
+SOCKET_PATH = os.path.join(RAIZ, "support", "servidor.sock")
+
+# Scripts que el servidor sabe correr: todos tienen main() y leen sys.argv.
+SCRIPTS = (
+    "calcular_zscore", "evaluar_clia", "validar_informe", "auditar_unidades",
+    "informe_preliminar", "informe_pdf", "presentacion", "influencia", "barrido_umbrales",
+    "potencia", "homogeneidad",
+)
+
+
+# ====================================================================
+# SERVIDOR
+# ====================================================================
+
+class Salida:
+    """Archivo de texto que reenvía cada escritura al cliente como un mensaje."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def write(self, texto):
+        if texto:
+            enviar(self.conexion, {"texto": texto})
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def enviar(conexion, mensaje):
+    conexion.sendall((json.dumps(mensaje, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def fuentes():
+    """Fecha de modificación de cada script: si alguna cambia, el código cargado ya no es el del disco."""
+    return {n: os.stat(os.path.join(BASE, n)).st_mtime_ns
+            for n in os.listdir(BASE) if n.endswith(".py")}
+
+
+def ejecutar(modulo, args, cwd, salida):
+    """Corre modulo.main() como si fuera `python scripts/<modulo>.py args`. Devuelve el código de salida."""
+    import traceback
+    import contextlib
+    import matplotlib
+    import perfil
+
+    previo_cwd, previo_argv = os.getcwd(), sys.argv
+    codigo = 0
+    with contextlib.redirect_stdout(salida), contextlib.redirect_stderr(salida), \
+            matplotlib.rc_context():
+        try:
+            os.chdir(cwd)
+            sys.argv = [os.path.join(BASE, modulo.__name__ + ".py"), *args]
+            modulo.main()
+        except SystemExit as e:
+            # Misma semántica que el intérprete: None → 0, texto → se imprime y 1.
+            if e.code is None or isinstance(e.code, int):
+                codigo = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                codigo = 1
+        except Exception:
+            traceback.print_exc()
+            codigo = 1
+        finally:
+            os.chdir(previo_cwd)
+            sys.argv = previo_argv
+            # El perfil se escribe al salir del proceso; aquí el proceso no sale.
+            perfil.cerrar()
+    return codigo
+
+
+def servir():
+    import socketserver
+    import importlib
+
+    if conectar() is not None:
+        sys.exit(f"Ya hay un servidor escuchando en {SOCKET_PATH}.")
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)    # quedó de un servidor que murió sin limpiar
+
+    t0 = time.perf_counter()
+    sys.path.insert(0, BASE)
+    modulos = {n: importlib.import_module(n) for n in SCRIPTS}
+    modulos["informe_pdf"].pyplot()        # matplotlib + estilo base, una vez
+    import calcular_zscore
+    calcular_zscore.activar_cache_csv()
+    firmas = fuentes()
+    estado = {"inicio": time.time(), "ordenes": 0}
+    print(f"  Servidor listo en {os.path.relpath(SOCKET_PATH, RAIZ)} "
+          f"({time.perf_counter() - t0:.1f}s de carga, pid {os.getpid()})")
+
+    class Atender(socketserver.StreamRequestHandler):
+        def handle(self):
+            linea = self.rfile.readline()
+            if not linea:       # una sonda de conectar(), sin pedido
+                return
+            pedido = json.loads(linea)
+            orden = pedido.get("orden")
+            if orden == "estado":
+                enviar(self.request, {"texto": informe_estado(estado, calcular_zscore._cache_csv), "fin": 0})
+            elif orden == "detener":
+                enviar(self.request, {"texto": "  Servidor detenido.\n", "fin": 0})
+                self.server.detenido = True
+            elif fuentes() != firmas:
+                enviar(self.request, {"obsoleto": True})
+                self.server.detenido = True
+            elif pedido.get("script") not in modulos:
+                enviar(self.request, {"texto": f"Script no admitido: {pedido.get('script')}\n", "fin": 2})
+            else:
+                estado["ordenes"] += 1
+                codigo = ejecutar(modulos[pedido["script"]], pedido.get("args", []),
+                                  pedido.get("cwd", RAIZ), Salida(self.request))
+                enviar(self.request, {"fin": codigo})
+
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    with socketserver.UnixStreamServer(SOCKET_PATH, Atender) as srv:
+        os.chmod(SOCKET_PATH, 0o600)    # solo el dueño: el servidor escribe en el repo
+        srv.detenido = False
+        try:
+            while not srv.detenido:
+                srv.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(SOCKET_PATH)
+    if fuentes() != firmas:
+        print("  El código de los scripts cambió: servidor detenido. Vuelve a iniciarlo.")
+
+
+def informe_estado(estado, cache):
+    activo = time.time() - estado["inicio"]
+    lineas = [f"  Servidor activo desde hace {activo / 60:.0f} min · pid {os.getpid()} · "
+              f"{estado['ordenes']} orden(es) atendida(s)"]
+    for (ruta, categoria), _ in sorted((cache or {}).items()):
+        lineas.append(f"    CSV en memoria: {ruta} ({categoria})")
+    return "\n".join(lineas) + "\n"
+
+
+# ====================================================================
+# CLIENTE
+# ====================================================================
+
+def conectar():
+    """Socket conectado al servidor, o None si no hay uno escuchando."""
+    if not os.path.exists(SOCKET_PATH):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(SOCKET_PATH)
+    except OSError:
+        s.close()
+        return None
+    return s
+
+
+def pedir(pedido):
+    """Envía un pedido y vuelca la respuesta a medida que llega.
+    Devuelve el código de salida, o None si el servidor no pudo atenderlo."""
+    s = conectar()
+    if s is None:
+        return None
+    with s, s.makefile("r", encoding="utf-8") as respuesta:
+        s.sendall((json.dumps(pedido, ensure_ascii=False) + "\n").encode("utf-8"))
+        for linea in respuesta:
+            m = json.loads(linea)
+            if m.get("obsoleto"):
+                return None
+            if "texto" in m:
+                sys.stdout.write(m["texto"])
+                sys.stdout.flush()
+            if "fin" in m:
+                return m["fin"]
+    return None
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+        print(__doc__)
+        sys.exit(0)
+    orden, args = sys.argv[1], sys.argv[2:]
+
+    if orden == "iniciar":
+        servir()
+        return
+    if orden in ("estado", "detener"):
+        codigo = pedir({"orden": orden})
+        if codigo is None:
+            print("  No hay servidor activo.")
+        sys.exit(codigo or 0)
+    if orden.endswith(".py"):
+        orden = orden[:-3]
+    if orden not in SCRIPTS:
+        sys.exit(f"Orden desconocida: {orden}. Scripts: {', '.join(SCRIPTS)}")
+
+    codigo = pedir({"orden": "ejecutar", "script": orden, "args": args, "cwd": os.getcwd()})
+    if codigo is None:
+        # Sin servidor (o con código viejo): el script corre como siempre.
+        script = os.path.join(BASE, orden + ".py")
+        os.execv(sys.executable, [sys.executable, script, *args])
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()
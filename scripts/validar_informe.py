@@ -34,10 +34,13 @@ import os
 import re
 import sys
 import json
+import hashlib
 import argparse
 
-SALIDA_DIR  = os.path.join("data", "informes")
-CONFIG_PATH = "data/config.json"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import SALIDA_DIR, CONFIG_PATH, analito_de, codigo_activo  # noqa: E402
+import puntajes  # noqa: E402
+from perfil import activar as activar_perfil, argumento as argumento_perfil, etapa  # noqa: E402
 
 # Campos que el JS de la página lee en cada nivel.
 CAMPOS_RAIZ    = ("codigo", "fecha", "area", "analitos", "resumen")
@@ -69,6 +72,9 @@ MARCAS = ("fujifilm", "vitros", "dri-chem", "dirui", "mindray", "humastar",
           "biosystems", "architect", "bioclin", "wiener", "urit", "prietest")
 
 CLASIFICACIONES = {"A", "C", "I", "NE"}
+# ISO 13528 §9.2: u(X*) ≤ 0.3·σpt. Mismo límite que calcular_zscore.LIMITE_U;
+# se repite aquí para no cargar la estadística en el validador.
+LIMITE_U = 0.3
 # Formatos admitidos de identificador público. 'L-NNN' es el de EA-001-2026 en
 # adelante; el de 2 letras + dígito se conserva porque las rondas ya publicadas
 # mantienen el identificador con el que se entregaron y deben seguir validando.
@@ -148,6 +154,12 @@ class Validador:
 
     # ── 2. Semántica ─────────────────────────────────────────────────────
     def semantica(self, d):
+        # Qué puntaje decide la clasificación: z salvo que el JSON declare otro.
+        decl = d.get("puntajes") or {}
+        tipo, clave = decl.get("clasifica", puntajes.POR_DEFECTO), decl.get("clave")
+        if tipo not in puntajes.PUNTAJES:
+            self.error(f"puntajes.clasifica '{tipo}' desconocido")
+            tipo = puntajes.POR_DEFECTO
         for a in d.get("analitos", []):
             nom = a.get("nombre", "?")
             por_pares = a.get("evaluacion") == "grupo_pares"
@@ -184,12 +196,17 @@ class Validador:
                 if clas != "NE" and z is None:
                     self.error(f"{nom}/{cod}: clasificado {clas} sin z_score")
 
-                # Coherencia entre |z| y la clasificación (ISO 13528 §9).
+                # Coherencia entre el puntaje que clasifica y la clasificación
+                # (ISO 13528 §9): |z|, o el tipo declarado en 'puntajes'.
+                if tipo != "z":
+                    z = (l.get(clave) or {}).get(tipo) if z is not None else None
+                    if clas in ("A", "C", "I") and z is None:
+                        self.error(f"{nom}/{cod}: clasificado {clas} sin {tipo} en '{clave}'")
                 if z is not None and clas in ("A", "C", "I"):
-                    esperada = "A" if abs(z) <= 2 else ("C" if abs(z) < 3 else "I")
+                    esperada = puntajes.clasificar(z, tipo)
                     if esperada != clas:
-                        self.error(f"{nom}/{cod}: z={z} debería clasificar {esperada}, "
-                                   f"no {clas}")
+                        self.error(f"{nom}/{cod}: {puntajes.PUNTAJES[tipo]['nombre']}={z} "
+                                   f"debería clasificar {esperada}, no {clas}")
 
                 # Un 0 nunca es una medición en química clínica cuantitativa.
                 if l.get("resultado") == 0:
@@ -323,6 +340,100 @@ class Validador:
             self.error(f"el estrato '{primero.get('clave')}' declara "
                        f"{primero['laboratorios']} pero hay {conformes} conformes")
 
+    # ── 2c. Heatmap ──────────────────────────────────────────────────────
+    def heatmap(self, d):
+        """
+        Rehace la matriz laboratorio × analito desde analitos[] y la compara
+        celda por celda con el bloque `heatmap` del JSON.
+
+        La web y el PDF ya no recorren los laboratorios: dibujan este bloque
+        tal cual. Un estado corrido de columna pintaría de rojo a un
+        laboratorio que no falló, y la coherencia z↔clasificación de
+        semantica() no lo vería, porque mira analitos[] y no el mapa.
+        """
+        h = d.get("heatmap")
+        if not h:
+            self.error("falta 'heatmap' (la web y el PDF dibujan el mapa desde ahí)")
+            return
+        analitos = d.get("analitos", [])
+        ids = sorted({l.get("id") for a in analitos for l in a.get("laboratorios", [])})
+        if h.get("laboratorios") != ids:
+            self.error("heatmap.laboratorios no coincide con los laboratorios del informe "
+                       "en orden de texto")
+            return
+        if h.get("analitos") != [a.get("nombre") for a in analitos]:
+            self.error("heatmap.analitos no sigue el orden de analitos[]")
+            return
+
+        recorte = h.get("recorte_z")
+        if not isinstance(recorte, (int, float)) or recorte <= 0:
+            self.error(f"heatmap.recorte_z={recorte} no es un recorte válido")
+            return
+        letra = {"A": "A", "C": "C", "I": "I", "NE": "N"}
+        col = {lid: j for j, lid in enumerate(ids)}
+        estado, z, res = h.get("estado") or [], h.get("z") or [], h.get("resultado") or []
+        if not (len(estado) == len(z) == len(res) == len(analitos)):
+            self.error("heatmap: estado, z y resultado deben tener una fila por analito")
+            return
+
+        recortado_esperado = []
+        for i, a in enumerate(analitos):
+            nom = a.get("nombre", "?")
+            fe, fz, fr = ["."] * len(ids), [None] * len(ids), [None] * len(ids)
+            for l in a.get("laboratorios", []):
+                j = col[l.get("id")]
+                fe[j] = letra.get(l.get("clasificacion"), "?")
+                fr[j] = l.get("resultado")
+                zl = l.get("z_score")
+                if zl is not None:
+                    fz[j] = max(-recorte, min(recorte, zl))
+                    if abs(zl) > recorte:
+                        recortado_esperado.append([i, j, zl])
+            if estado[i] != "".join(fe):
+                self.error(f"heatmap/{nom}: la fila de estado no coincide con las "
+                           f"clasificaciones publicadas")
+            if z[i] != fz:
+                self.error(f"heatmap/{nom}: la fila de z no coincide con los Z-Score publicados")
+            if res[i] != fr:
+                self.error(f"heatmap/{nom}: la fila de resultados no coincide con analitos[]")
+        if h.get("z_recortado") != recortado_esperado:
+            self.error("heatmap.z_recortado no lista exactamente las celdas con "
+                       f"|z| > {recorte}")
+
+    # ── 2d. Incertidumbre del valor asignado ─────────────────────────────
+    def incertidumbre(self, d):
+        """
+        Coherencia de `incertidumbre` (bootstrap de u(X*)) con el σpt del bloque:
+        σpt = ETa/3 en CLIA, σ* en el consenso. La marca `despreciable` es la
+        que lee quien mira el informe; si no sale de u/σpt ≤ 0.3, miente.
+
+        Un valor asignado con u(X*) > 0.3·σpt es un AVISO, no un error: ISO 13528
+        pide declararlo (y considerar z′), no impide publicar.
+        """
+        clia = d.get("modelo") == "clia"
+        for a in d.get("analitos", []):
+            bloques = [(f"{a.get('nombre')}/grupo {g.get('nombre')}", g)
+                       for g in a.get("grupos") or [] if g.get("evaluado")]
+            if a.get("evaluacion") == "agrupada":
+                bloques.append((a.get("nombre"), a))
+            for etiqueta, b in bloques:
+                u = b.get("incertidumbre")
+                if not u:
+                    continue
+                sigma = b.get("sigma_pt") if clia else b.get("sd_robusta")
+                r = u.get("u_sobre_sigma_pt")
+                if sigma and r is not None and abs(r - u["u"] / sigma) > max(0.002, 0.01 * r):
+                    self.error(f"{etiqueta}: u_sobre_sigma_pt={r} no cuadra con "
+                               f"u={u['u']} y σpt={sigma}")
+                # r viaja con 3 decimales: solo se acusa lo que el redondeo no explica.
+                if r is not None and (r > LIMITE_U + 0.0005 if u.get("despreciable")
+                                      else r < LIMITE_U - 0.0005):
+                    self.error(f"{etiqueta}: despreciable={u.get('despreciable')} pero "
+                               f"u(X*) = {r}·σpt")
+                if u.get("despreciable") is False:
+                    self.aviso(f"{etiqueta}: u(X*) = {r}·σpt > {LIMITE_U}·σpt "
+                               f"(ISO 13528 §9.2)")
+
     # ── 3. Anonimato ─────────────────────────────────────────────────────
     def anonimato(self, d, crudo):
         def recorrer(o, ruta=""):
@@ -402,7 +513,7 @@ class Validador:
             # límite que no se usa. estructura() ya comprueba su coherencia.
             if a.get("evaluacion") == "no_evaluada":
                 continue
-            spec_cfg = esp.get(nom)
+            spec_cfg = esp.get(analito_de(nom))
             if spec_cfg is None:
                 self.error(f"{nom}: sin ETa en config.especificaciones_desempeno.quimica")
             if a.get("evaluacion") == "grupo_pares":
@@ -414,6 +525,64 @@ class Validador:
             else:
                 self._bloque_clia(nom, a, spec_cfg, a.get("laboratorios", []))
 
+    # ── 5. Fragmentos ────────────────────────────────────────────────────
+    # La página lee el índice y un fragmento por analito, no el JSON completo
+    # que se valida arriba. Si se desincronizaran —una corrida a medias, un
+    # fragmento editado a mano— la web mostraría cifras que nadie auditó.
+    def fragmentos(self, d, carpeta):
+        ruta_indice = os.path.join(carpeta, "indice.json")
+        if not os.path.exists(ruta_indice):
+            self.error(f"existe {carpeta}/ pero falta indice.json")
+            return
+        with open(ruta_indice, encoding="utf-8") as f:
+            indice = json.load(f)
+
+        for k, v in d.items():
+            if k != "analitos" and indice.get(k) != v:
+                self.error(f"indice.json: '{k}' no coincide con el JSON completo")
+
+        fichas = indice.get("analitos") or []
+        if len(fichas) != len(d.get("analitos", [])):
+            self.error(f"indice.json declara {len(fichas)} analitos y el JSON "
+                       f"completo {len(d.get('analitos', []))}")
+            return
+        for ficha, a in zip(fichas, d["analitos"]):
+            nom = a.get("nombre", "?")
+            if "laboratorios" in ficha:
+                self.error(f"indice.json/{nom}: trae 'laboratorios' (van en el fragmento)")
+            resto = {k: v for k, v in ficha.items() if k != "fragmento"}
+            if resto != {k: v for k, v in a.items() if k != "laboratorios"}:
+                self.error(f"indice.json/{nom}: la ficha no coincide con el JSON completo")
+            ruta = os.path.join(carpeta, ficha.get("fragmento") or "")
+            if not ficha.get("fragmento") or not os.path.exists(ruta):
+                self.error(f"{nom}: falta su fragmento ({ficha.get('fragmento')})")
+                continue
+            with open(ruta, encoding="utf-8") as f:
+                if json.load(f) != a:
+                    self.error(f"{nom}: {ficha['fragmento']} no coincide con el JSON completo")
+
+    # El service worker sirve de caché un JSON mientras su huella en
+    # versiones.json no cambie. Una huella vieja haría que un laboratorio siga
+    # viendo la versión anterior del informe hasta que la caché se borre.
+    def versiones(self, ruta, carpeta):
+        ruta_versiones = os.path.join(SALIDA_DIR, "versiones.json")
+        if not os.path.exists(ruta_versiones):
+            self.aviso("falta versiones.json: el service worker no podrá cachear el informe")
+            return
+        with open(ruta_versiones, encoding="utf-8") as f:
+            archivos = json.load(f).get("archivos", {})
+        publicados = [ruta]
+        if os.path.isdir(carpeta):
+            publicados += [os.path.join(carpeta, n) for n in sorted(os.listdir(carpeta))
+                           if n.endswith(".json")]
+        for p in publicados:
+            clave = os.path.relpath(p, SALIDA_DIR).replace(os.sep, "/")
+            with open(p, "rb") as f:
+                real = hashlib.sha256(f.read()).hexdigest()[:16]
+            if archivos.get(clave) != real:
+                self.error(f"versiones.json: la huella de {clave} no coincide con el archivo")
+
+
     def informar(self, ruta):
         print("=" * 78)
         print(f"  VALIDACIÓN DEL CONTRATO JSON ↔ INFORME HTML")
@@ -440,17 +609,27 @@ def validar(codigo, area="quimica", modelo=None):
         sys.exit(f"ERROR: no existe {ruta}\n"
                  f"Ejecuta primero: python scripts/{script} --codigo {codigo}")
 
-    with open(ruta, encoding="utf-8") as f:
-        crudo = f.read()
-    d = json.loads(crudo)
+    with etapa("cargar"):
+        with open(ruta, encoding="utf-8") as f:
+            crudo = f.read()
+        d = json.loads(crudo)
 
     v = Validador()
-    v.estructura(d)
-    v.semantica(d)
-    v.metricas(d)
-    if d.get("modelo") == "clia":
-        v.clia(d)
-    v.anonimato(d, crudo)
+    with etapa("contrato"):
+        v.estructura(d)
+        v.semantica(d)
+        v.metricas(d)
+        v.heatmap(d)
+        v.incertidumbre(d)
+        if d.get("modelo") == "clia":
+            v.clia(d)
+    with etapa("anonimato"):
+        v.anonimato(d, crudo)
+    with etapa("fragmentos"):
+        carpeta = os.path.splitext(ruta)[0]
+        if os.path.isdir(carpeta):
+            v.fragmentos(d, carpeta)
+        v.versiones(ruta, carpeta)
     return v, ruta
 
 
@@ -460,12 +639,12 @@ def main():
     ap.add_argument("--area", default="quimica")
     ap.add_argument("--modelo", choices=["consenso", "clia"], default="consenso",
                     help="'clia' valida el JSON -clia.json (evaluación por ETa)")
+    argumento_perfil(ap)
     args = ap.parse_args()
 
-    codigo = args.codigo
-    if not codigo:
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            codigo = json.load(f)["ronda_activa"]["codigo"]
+    codigo = args.codigo or codigo_activo()
+    if args.perfil:
+        activar_perfil("validar_informe", codigo, args.perfil)
 
     v, ruta = validar(codigo, args.area, args.modelo)
     sys.exit(0 if v.informar(ruta) else 1)
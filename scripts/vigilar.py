@@ -0,0 +1,353 @@
+"""
+Modo vigilante: recalcula la ronda cada vez que cambia una decisión.
+
+Decidir qué analitos van por grupo de pares, cuáles se publican sin calificar o
+qué ETa se aplica es un ir y venir: se edita data/config.json, se recalcula, se
+mira el resultado y se vuelve a editar. Con el pipeline de siempre cada vuelta
+es "volver a correr desde 'calcular'" más evaluar_clia y las dos validaciones,
+y recalcula los veinticinco analitos para ver el efecto de tocar uno.
+
+Este script deja la ronda cargada en memoria y vigila data/config.json y el
+CSV de la ronda. Ante cada cambio averigua qué analitos toca:
+
+  grupo_pares / sin_evaluar   los que entran o salen de la lista
+  sin_evaluar_nota            todos los sin evaluar (la nota va en cada uno)
+  especificaciones_desempeno  los analitos cuyo ETa cambió (solo CLIA)
+  estimador                   todos: cambia X* y σ* de cada analito
+  fecha_calculo, estratos     ninguno: solo se reescriben los JSON
+  el CSV                      los analitos cuyas filas cambiaron
+  cualquier otra clave        todos, por las dudas
+
+recalcula solo esos analitos —cada uno es independiente de los demás—,
+actualiza por diferencias el resumen, los conteos y el consolidado por
+laboratorio (calcular_zscore.Agregados), reescribe los dos JSON (consenso y
+CLIA) y los valida. El resultado es byte a byte el de calcular_zscore.py +
+evaluar_clia.py sobre la misma configuración.
+
+No reemplaza al orquestador: la auditoría de unidades y el informe preliminar
+siguen corriendo con informe_quimica.py antes de publicar.
+
+Uso:
+  python scripts/vigilar.py                        # ronda activa
+  python scripts/vigilar.py --codigo EA-001-2026 --intervalo 0.5
+  python scripts/informe_quimica.py --vigilar      # lo mismo, desde el orquestador
+"""
+
+import os
+import sys
+import time
+import argparse
+import traceback
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nucleo import (  # noqa: E402
+    CONFIG_PATH, ENTRADA_DIR, ESTIMADOR_POR_DEFECTO, analito_de, codigo_activo, leer_config,
+)
+
+AREA = "quimica"
+# Segundos entre dos miradas a los archivos. Un stat cuesta microsegundos.
+INTERVALO = 0.25
+
+# Claves de config.json que no cambian ningún analito: se leen al escribir.
+CLAVES_SOLO_ESCRITURA = ("fecha_calculo", "estratos_desempeno")
+
+
+def decisiones(cfg, codigo, area=AREA):
+    """Lo que de config.json decide la evaluación de cada analito de la ronda.
+
+    Misma lectura que analitos_por_grupo_pares(), analitos_sin_evaluar(),
+    estimador_robusto() y puntaje_ronda(), pero sobre un config ya leído: aquí
+    hay que comparar el de antes con el de ahora.
+    """
+    d = (cfg.get("decisiones_evaluacion") or {}).get(codigo, {}).get(area, {})
+    sin_eval = frozenset(d.get("sin_evaluar") or ())
+    p = d.get("puntaje")
+    return {
+        "pares": frozenset(d.get("grupo_pares") or ()) - sin_eval,
+        "sin_evaluar": sin_eval,
+        "nota": d.get("sin_evaluar_nota"),
+        "estimador": d.get("estimador") or ESTIMADOR_POR_DEFECTO,
+        "puntaje": {m: p.get(m) if isinstance(p, dict) else p for m in ("consenso", "clia")},
+        "eta": (cfg.get("especificaciones_desempeno") or {}).get(area) or {},
+    }
+
+
+def _resto(cfg, codigo, area=AREA):
+    """config.json sin lo que decisiones() ya compara ni lo que solo se lee al escribir."""
+    resto = {k: v for k, v in cfg.items() if k not in CLAVES_SOLO_ESCRITURA}
+    dec = dict(resto.get("decisiones_evaluacion") or {})
+    ronda = dict(dec.get(codigo) or {})
+    ronda.pop(area, None)
+    dec[codigo] = ronda
+    esp = dict(resto.get("especificaciones_desempeno") or {})
+    esp.pop(area, None)
+    resto["decisiones_evaluacion"], resto["especificaciones_desempeno"] = dec, esp
+    return resto
+
+
+def afectados(antes, ahora, codigo, area=AREA):
+    """Analitos a recalcular tras un cambio de config.json.
+
+    Devuelve (consenso, clia, motivos). `None` en lugar de un conjunto quiere
+    decir todos: el cambio fue en una clave cuyo efecto no se sabe acotar.
+    """
+    if _resto(antes, codigo, area) != _resto(ahora, codigo, area):
+        return None, None, ["config.json fuera de las decisiones de la ronda"]
+    a, d = decisiones(antes, codigo, area), decisiones(ahora, codigo, area)
+    if a["estimador"] != d["estimador"]:
+        return None, None, [f"estimador {a['estimador']} → {d['estimador']}"]
+    if a["puntaje"] != d["puntaje"]:
+        return None, None, ["puntaje"]
+    motivos = []
+    sucios = set()
+    for clave in ("pares", "sin_evaluar"):
+        delta = a[clave] ^ d[clave]
+        if delta:
+            nombre = "grupo_pares" if clave == "pares" else "sin_evaluar"
+            motivos.append(f"{nombre} " + " ".join(
+                ("+" if n in d[clave] else "-") + n for n in sorted(delta)))
+            sucios |= delta
+    if a["nota"] != d["nota"]:
+        motivos.append("sin_evaluar_nota")
+        sucios |= a["sin_evaluar"] | d["sin_evaluar"]
+    eta = {n for n in set(a["eta"]) | set(d["eta"]) if a["eta"].get(n) != d["eta"].get(n)}
+    if eta:
+        motivos.append("ETa " + ", ".join(sorted(eta)))
+    for clave in CLAVES_SOLO_ESCRITURA:
+        if antes.get(clave) != ahora.get(clave):
+            motivos.append(clave)
+    return sucios, sucios | eta, motivos
+
+
+def filas_cambiadas(antes, ahora):
+    """Analitos cuyas filas del CSV cambiaron, aparecieron o desaparecieron."""
+    return {n for n in set(antes) | set(ahora) if antes.get(n) != ahora.get(n)}
+
+
+def _firma(ruta):
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Ronda:
+    """Una ronda cargada en memoria con sus dos evaluaciones ya calculadas."""
+
+    def __init__(self, codigo, area=AREA):
+        self.codigo, self.area = codigo, area
+        self.csv = os.path.join(ENTRADA_DIR, f"ensayos_{codigo}.csv")
+        self.cfg = leer_config()
+        self.por_analito = {}
+        self.bimodales = {}
+        self.consenso, self.clia = [], []
+        # Tipo de puntaje que clasifica cada modelo (calcular_zscore.puntaje_de_ronda()).
+        self.puntaje = {}
+        # Resumen, conteos y consolidado por laboratorio de cada modelo, al día
+        # con los analitos en memoria (calcular_zscore.Agregados).
+        self.agregados = {}
+        # Tras un error a mitad de un recálculo los resultados en memoria quedan
+        # mezclados: el siguiente cambio recalcula todo.
+        self.completo = False
+
+    # --- cálculo --------------------------------------------------------
+    def cargar(self):
+        import calcular_zscore as cz
+        por_analito, _ = cz.cargar(self.codigo)
+        if not por_analito:
+            sys.exit(f"No hay resultados de Química Clínica para {self.codigo}.")
+        return dict(por_analito)
+
+    def recalcular(self, consenso=None, clia=None):
+        """Recalcula los analitos indicados de cada modelo (None = todos).
+        Devuelve los que de verdad recalculó: un cambio de puntaje los vuelve todos."""
+        import calcular_zscore as cz
+        import evaluar_clia as ec
+
+        dec = decisiones(self.cfg, self.codigo, self.area)
+        if dec["sin_evaluar"] and not dec["nota"]:
+            raise SystemExit("ERROR: hay analitos en 'sin_evaluar' pero falta "
+                             "'sin_evaluar_nota' en config.json.")
+        cz.usar_estimador(dec["estimador"])
+        # Sin puntaje declarado, el CSV decide si hay puntajes (trae incertidumbres
+        # o no): un cambio de filas puede activarlos y entonces cambia todo.
+        puntaje = {m: cz.puntajes.validar_tipo(t) if t else
+                   (cz.puntajes.POR_DEFECTO if cz.hay_incertidumbre(self.por_analito) else None)
+                   for m, t in dec["puntaje"].items()}
+        if puntaje != self.puntaje:
+            consenso = clia = None
+            self.puntaje = puntaje
+        kw = {"por_grupo_pares": dec["pares"], "sin_evaluar": dec["sin_evaluar"],
+              "nota_sin_evaluar": dec["nota"]}
+        if consenso is None:
+            self.consenso = cz.calcular_agrupado(self.por_analito, **kw,
+                                                 puntaje=puntaje["consenso"])
+            self.agregados["consenso"] = cz.Agregados.desde(self.consenso, self.bimodales)
+        else:
+            self.consenso = cz.calcular_agrupado(self.por_analito, **kw,
+                                                 puntaje=puntaje["consenso"],
+                                                 previos=self.consenso, sucios=consenso)
+            self.agregados["consenso"].actualizar(self.consenso, consenso)
+
+        if clia is None:
+            self.clia = ec.evaluar(self.por_analito, dec["eta"], **kw, puntaje=puntaje["clia"])
+            self.agregados["clia"] = cz.Agregados.desde(self.clia)
+        else:
+            self.clia = ec.evaluar(self.por_analito, dec["eta"], **kw, puntaje=puntaje["clia"],
+                                   previos=self.clia, sucios=clia)
+            self.agregados["clia"].actualizar(self.clia, clia)
+
+        sin_decidir = sorted(n for n in self.bimodales
+                             if analito_de(n) not in dec["pares"] | dec["sin_evaluar"])
+        if sin_decidir:
+            print(f"  AVISO: bimodales sin decisión (se publican no concluyentes): "
+                  f"{', '.join(sin_decidir)}")
+        return consenso, clia
+
+    def detectar_bimodales(self, nombres):
+        # La bimodalidad se mira sobre los datos sin separar: solo cambia si
+        # cambian las filas del analito, no por una decisión.
+        import calcular_zscore as cz
+        sub = {n: self.por_analito[n] for n in nombres if n in self.por_analito}
+        for n in nombres:
+            self.bimodales.pop(n, None)
+        self.bimodales.update(cz.detectar_bimodales(cz.calcular_agrupado(sub, remuestreos=0), sub))
+
+    def escribir(self):
+        import calcular_zscore as cz
+        import evaluar_clia as ec
+        cz.escribir_json(self.codigo, self.consenso, self.area, bimodales=self.bimodales,
+                         agregados=self.agregados["consenso"], puntaje=self.puntaje["consenso"])
+        _, tot = ec.escribir_json(self.codigo, self.clia, self.area,
+                                  agregados=self.agregados["clia"], puntaje=self.puntaje["clia"])
+        return tot
+
+    def validar(self):
+        """Valida los dos JSON. Devuelve una línea por modelo."""
+        import validar_informe as vi
+        lineas, ok = [], True
+        for modelo in ("consenso", "clia"):
+            v, _ = vi.validar(self.codigo, self.area, modelo)
+            ok = ok and not v.errores
+            estado = "OK" if not v.errores else f"{len(v.errores)} ERROR(ES)"
+            lineas.append(f"    validar {modelo:<8} {estado}"
+                          + (f" ({len(v.avisos)} aviso(s))" if v.avisos else ""))
+            lineas += [f"      ERROR {e}" for e in v.errores]
+        return ok, lineas
+
+    def items(self, analitos):
+        """Los ítems en memoria de esos analitos: en una ronda con varias muestras,
+        una decisión sobre "Glucosa" recalcula "Glucosa · M1", "Glucosa · M2"…"""
+        if analitos is None:
+            return None
+        return {n for n in self.por_analito if analito_de(n) in analitos}
+
+    # --- ciclo ------------------------------------------------------------
+    def inicial(self):
+        self.por_analito = self.cargar()
+        self.detectar_bimodales(set(self.por_analito))
+        self.recalcular()
+
+    def cambio(self, config=True, csv=True):
+        """Atiende un cambio en config.json o en el CSV. Devuelve (motivos, consenso, clia), o None si no hubo."""
+        consenso, clia, motivos = set(), set(), []
+        if config:
+            try:
+                cfg = leer_config()
+            except ValueError as e:
+                # Guardado a medias o error de sintaxis: se espera al próximo guardado.
+                raise SystemExit(f"ERROR: {CONFIG_PATH} no es JSON válido ({e}).")
+            consenso, clia, motivos = afectados(self.cfg, cfg, self.codigo, self.area)
+            consenso, clia = self.items(consenso), self.items(clia)
+            self.cfg = cfg
+        if csv:
+            por_analito = self.cargar()
+            filas = filas_cambiadas(self.por_analito, por_analito)
+            if filas:
+                self.por_analito = por_analito
+                self.detectar_bimodales(filas)
+                motivos.append(f"CSV ({len(filas)} analito(s) con filas distintas)")
+                if consenso is not None:
+                    consenso, clia = consenso | filas, clia | filas
+        if not motivos and not self.completo:
+            return None
+        if self.completo:
+            consenso = clia = None
+        try:
+            consenso, clia = self.recalcular(consenso, clia)
+        except BaseException:
+            self.completo = True
+            raise
+        self.completo = False
+        return motivos, consenso, clia
+
+
+def _lista(nombres, total):
+    if nombres is None or len(nombres) == total:
+        return "todos"
+    return ", ".join(sorted(nombres)) if nombres else "ninguno"
+
+
+def vigilar(codigo, intervalo=INTERVALO):
+    """Recalcula, escribe y valida la ronda cada vez que cambia config.json o su CSV. Ctrl+C sale."""
+    t0 = time.perf_counter()
+    ronda = Ronda(codigo)
+    ronda.inicial()
+    tot = ronda.escribir()
+    ok, lineas = ronda.validar()
+    print(f"\n  {codigo}: {len(ronda.por_analito)} analitos calculados, escritos y "
+          f"validados en {time.perf_counter() - t0:.2f}s "
+          f"(CLIA — A {tot['A']} · C {tot['C']} · I {tot['I']})")
+    print("\n".join(lineas))
+    print(f"\n  Vigilando {CONFIG_PATH} y {ronda.csv} (Ctrl+C para salir)")
+
+    firmas = (_firma(CONFIG_PATH), _firma(ronda.csv))
+    try:
+        while True:
+            time.sleep(intervalo)
+            ahora = (_firma(CONFIG_PATH), _firma(ronda.csv))
+            if ahora == firmas:
+                continue
+            config, csv = (a != b for a, b in zip(ahora, firmas))
+            firmas = ahora
+            t0 = time.perf_counter()
+            try:
+                hubo = ronda.cambio(config, csv)
+                if hubo is None:
+                    continue
+                motivos, consenso, clia = hubo
+                tot = ronda.escribir()
+                ok, lineas = ronda.validar()
+            except SystemExit as e:
+                # Un error de la decisión no tumba al vigilante: se corrige y se guarda de nuevo.
+                print(f"\n  [{datetime.now():%H:%M:%S}] {e.code}")
+                continue
+            except Exception:
+                # Lo mismo con una entrada mal formada (un ETa sin 'pct' ni 'abs', …).
+                print(f"\n  [{datetime.now():%H:%M:%S}] ERROR al recalcular:")
+                traceback.print_exc()
+                continue
+            n = len(ronda.por_analito)
+            print(f"\n  [{datetime.now():%H:%M:%S}] {' · '.join(motivos)}")
+            print(f"    recalculados  consenso: {_lista(consenso, n)}  ·  CLIA: {_lista(clia, n)}")
+            print(f"    CLIA — A {tot['A']} · C {tot['C']} · I {tot['I']} · NE {tot['NE']}   "
+                  f"({time.perf_counter() - t0:.2f}s)")
+            print("\n".join(lineas))
+    except KeyboardInterrupt:
+        print("\n  Vigilancia detenida.")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Recalcula la ronda al cambiar data/config.json o el CSV.")
+    ap.add_argument("--codigo", help="Código de ensayo (por defecto: ronda activa)")
+    ap.add_argument("--intervalo", type=float, default=INTERVALO,
+                    help=f"Segundos entre comprobaciones (por defecto {INTERVALO})")
+    args = ap.parse_args()
+    vigilar(args.codigo or codigo_activo(), args.intervalo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+/*
+ * Service worker del sitio — caché para visitas repetidas.
+ *
+ * Los laboratorios abren el mismo informe muchas veces, a menudo con mala
+ * conexión, y cada visita volvía a bajar Plotly (~3.5 MB), el JSON de la ronda,
+ * las hojas de estilo y, en resultados.html, los módulos de Firebase. Aquí:
+ *
+ *   - Armazón y librerías de terceros se precachean al instalar. Las de
+ *     terceros van fijadas a una versión en la URL (plotly-2.27.0,
+ *     firebasejs/10.7.1), así que su contenido nunca cambia: caché primero.
+ *   - El resto de archivos propios (css, js, imágenes, PDF) se sirve de la
+ *     caché y se refresca en segundo plano.
+ *   - Las páginas HTML y los JSON de data/ fuera de data/informes/ van a la
+ *     red primero: una corrección del informe debe verse en la visita
+ *     siguiente, y data/config.json abre y cierra la ronda (ronda_activa).
+ *     Sin red, se sirve la última copia.
+ *   - Lo que se guarda, se guarda sin la consulta de la URL (charts.js pide
+ *     ensayos_aptitud.json?t=<ahora>): cada visita sumaría una entrada.
+ *   - Los JSON de data/informes/ se guardan bajo la huella de contenido que
+ *     publican calcular_zscore.py y evaluar_clia.py en versiones.json
+ *     (registrar_versiones). Mientras la huella no cambie no se vuelven a
+ *     descargar; cuando la ronda se recalcula, la huella cambia y se baja la
+ *     versión nueva.
+ *
+ * Las peticiones a Firestore, Auth y EmailJS no se tocan: son datos vivos.
+ *
+ * Se registra desde js/main.js. Al cambiar la lista de precarga o la lógica de
+ * este archivo, subir VERSION para que las cachés viejas se descarten.
+ */
+
+const VERSION = 'v3';
+const CACHE_ARMAZON = `concalab-armazon-${VERSION}`;
+const CACHE_TERCEROS = `concalab-terceros-${VERSION}`;
+const CACHE_INFORMES = 'concalab-informes';   // versionada por huella, no por VERSION
+
+const ARMAZON = [
+    'css/main.css',
+    'css/responsive.css',
+    'css/animations.css',
+    'css/informe.css',
+    'js/main.js',
+    'js/search.js',
+    'js/scroll-reveal.js',
+    'js/informe.js',
+    'js/informe-datos.js',
+    'js/informe-worker.js',
+    'js/firebase-config.js',
+    'js/results-form.js',
+    'assets/images/logo-concalab.png',
+];
+
+const TERCEROS = [
+    'https://cdn.plot.ly/plotly-2.27.0.min.js',
+    'https://www.gstatic.com/firebasejs/10.7.1/firebase-app.js',
+    'https://www.gstatic.com/firebasejs/10.7.1/firebase-firestore.js',
+    'https://www.gstatic.com/firebasejs/10.7.1/firebase-auth.js',
+    'https://www.gstatic.com/firebasejs/10.7.1/firebase-analytics.js',
+];
+const HOSTS_TERCEROS = ['cdn.plot.ly', 'www.gstatic.com', 'cdn.jsdelivr.net'];
+
+const RAIZ = new URL('./', self.location).href;
+const DATOS = new URL('data/', RAIZ).href;
+const INFORMES = new URL('data/informes/', DATOS).href;
+const VERSIONES = new URL('versiones.json', INFORMES).href;
+
+self.addEventListener('install', e => {
+    e.waitUntil((async () => {
+        const armazon = await caches.open(CACHE_ARMAZON);
+        await armazon.addAll(ARMAZON.map(p => new URL(p, RAIZ).href));
+        // Un CDN caído no debe impedir instalar: lo que falte se guarda en
+        // la primera visita que lo pida.
+        const terceros = await caches.open(CACHE_TERCEROS);
+        await Promise.allSettled(TERCEROS.map(u => terceros.add(new Request(u, { mode: 'cors' }))));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', e => {
+    const vigentes = [CACHE_ARMAZON, CACHE_TERCEROS, CACHE_INFORMES];
+    e.waitUntil((async () => {
+        for (const nombre of await caches.keys()) {
+            if (nombre.startsWith('concalab-') && !vigentes.includes(nombre)) {
+                await caches.delete(nombre);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', e => {
+    const req = e.request;
+    if (req.method !== 'GET') return;
+    const url = new URL(req.url);
+
+    if (req.url.startsWith(INFORMES) && url.pathname.endsWith('.json')) {
+        e.respondWith(informeVersionado(req, url));
+    } else if (req.mode === 'navigate') {
+        e.respondWith(redPrimero(req, CACHE_ARMAZON));
+    } else if (req.url.startsWith(DATOS) && url.pathname.endsWith('.json')) {
+        e.respondWith(redPrimero(req, CACHE_ARMAZON, { cache: 'no-cache' }));
+    } else if (HOSTS_TERCEROS.includes(url.host)) {
+        e.respondWith(cachePrimero(req, CACHE_TERCEROS));
+    } else if (req.url.startsWith(RAIZ)) {
+        e.respondWith(cacheYRefresco(req, e));
+    }
+});
+
+async function cachePrimero(req, nombre) {
+    const hit = await caches.match(req);
+    if (hit) return hit;
+    const res = await fetch(req);
+    if (res.ok) (await caches.open(nombre)).put(req, res.clone());
+    return res;
+}
+
+// Clave de caché sin la consulta: una URL con ?t=<ahora> no suma entradas.
+function sinConsulta(req) {
+    const url = new URL(req.url);
+    return url.origin + url.pathname;
+}
+
+async function redPrimero(req, nombre, opciones = {}) {
+    const clave = sinConsulta(req);
+    try {
+        const res = await fetch(req, opciones);
+        if (res.ok) (await caches.open(nombre)).put(clave, res.clone());
+        return res;
+    } catch (err) {
+        const hit = await caches.match(clave);
+        if (hit) return hit;
+        throw err;
+    }
+}
+
+// stale-while-revalidate: responde con lo que hay y actualiza para la próxima.
+// Con consulta en la URL va directo a la red: guardarla sin la consulta
+// mezclaría versiones (app.js?v=2 con app.js?v=1).
+async function cacheYRefresco(req, e) {
+    if (new URL(req.url).search) return fetch(req);
+    const cache = await caches.open(CACHE_ARMAZON);
+    const hit = await cache.match(req);
+    const red = fetch(req).then(res => {
+        if (res.ok) cache.put(req, res.clone());
+        return res;
+    });
+    if (hit) {
+        e.waitUntil(red.catch(() => {}));
+        return hit;
+    }
+    return red;
+}
+
+// ── JSON de informes ─────────────────────────────────────────────────────
+// versiones.json se pide a la red una vez por ráfaga: la página pide el índice
+// y luego un fragmento por analito, y no tiene sentido consultar la huella 27
+// veces en pocos segundos. Sin red, vale la última copia guardada.
+const VIGENCIA_VERSIONES_MS = 60 * 1000;
+let versiones = null;
+
+async function leerVersiones() {
+    if (versiones && Date.now() - versiones.leido < VIGENCIA_VERSIONES_MS) {
+        return versiones.archivos;
+    }
+    const cache = await caches.open(CACHE_INFORMES);
+    let archivos = null;
+    try {
+        const res = await fetch(VERSIONES, { cache: 'no-cache' });
+        if (res.ok) {
+            await cache.put(VERSIONES, res.clone());
+            archivos = (await res.json()).archivos;
+        }
+    } catch (err) {
+        const hit = await cache.match(VERSIONES);
+        if (hit) archivos = (await hit.json()).archivos;
+    }
+    versiones = { archivos: archivos || {}, leido: Date.now() };
+    return versiones.archivos;
+}
+
+async function informeVersionado(req, url) {
+    const cache = await caches.open(CACHE_INFORMES);
+    const base = url.origin + url.pathname;
+    // no-cache: revalidar con el servidor. GitHub Pages manda max-age=600 y
+    // la caché HTTP del navegador podría devolver bytes de la publicación
+    // anterior, que quedarían guardados bajo la huella nueva.
+    if (base === VERSIONES) return redPrimero(req, CACHE_INFORMES, { cache: 'no-cache' });
+
+    const clave = decodeURIComponent(base.slice(INFORMES.length));
+    const huella = (await leerVersiones())[clave];
+    if (huella) {
+        const versionada = `${base}?v=${huella}`;
+        const hit = await cache.match(versionada);
+        if (hit) return hit;
+        try {
+            const res = await fetch(req, { cache: 'no-cache' });
+            if (res.ok) {
+                // Las versiones anteriores del mismo archivo ya no sirven.
+                for (const vieja of await cache.keys()) {
+                    if (vieja.url.startsWith(base + '?')) await cache.delete(vieja);
+                }
+                await cache.put(versionada, res.clone());
+            }
+            return res;
+        } catch (err) {
+            // Sin red y con huella nueva: mejor la versión anterior que nada.
+            const vieja = await cache.match(base, { ignoreSearch: true });
+            if (vieja) return vieja;
+            throw err;
+        }
+    }
+
+    // Sin huella (p. ej. rondas escritas antes de versiones.json): red
+    // primero, con la última copia como respaldo.
+    try {
+        const res = await fetch(req);
+        if (res.ok) await cache.put(base, res.clone());
+        return res;
+    } catch (err) {
+        const hit = await cache.match(base, { ignoreSearch: true });
+        if (hit) return hit;
+        throw err;
+    }
+}